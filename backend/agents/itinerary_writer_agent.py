@@ -0,0 +1,27 @@
+from functools import lru_cache
+
+from config import get_agent_model_client
+from utils import load_prompt
+
+
+def create_itinerary_writer_agent():
+    from autogen_agentchat.agents import AssistantAgent
+
+    return AssistantAgent(
+        name="itinerary_writer_agent",
+        model_client=get_agent_model_client("itinerary_writer_agent"),
+        description="Writes short descriptions for itinerary days that were already arranged by the day planner.",
+        system_message=load_prompt("itinerary_writer_agent")
+    )
+
+
+@lru_cache(maxsize=None)
+def get_itinerary_writer_agent():
+    """Shared instance for scripts and tests; workflow runs lease their own from agents/pool.py"""
+    return create_itinerary_writer_agent()
+
+
+def __getattr__(name: str):
+    if name == "itinerary_writer_agent":
+        return get_itinerary_writer_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
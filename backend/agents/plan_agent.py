@@ -1,10 +1,29 @@
-from autogen_agentchat.agents import AssistantAgent
-from config import client
+from functools import lru_cache
+
+from config import get_agent_model_client
 from utils import load_prompt
 
-plan_agent = AssistantAgent(
-    name="plan_agent",
-    model_client=client,
-    description="Arrange itinerary per day from POI list.",
-    system_message=load_prompt("plan_agent")
-)
+
+def create_plan_agent():
+    from autogen_agentchat.agents import AssistantAgent
+
+    return AssistantAgent(
+        name="plan_agent",
+        model_client=get_agent_model_client("plan_agent"),
+        description="Arrange itinerary per day from POI list.",
+        system_message=load_prompt("plan_agent"),
+        # Stream tokens so /plan/stream can emit each itinerary day as soon as it is complete
+        model_client_stream=True,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_plan_agent():
+    """Shared instance for scripts and tests; workflow runs lease their own from agents/pool.py"""
+    return create_plan_agent()
+
+
+def __getattr__(name: str):
+    if name == "plan_agent":
+        return get_plan_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
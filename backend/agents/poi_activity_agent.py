@@ -1,14 +1,44 @@
-from autogen_agentchat.agents import AssistantAgent
-from tools.poi_activity_tool import gather_activity_pois
-from tools.critic_meal_tool import search_nearby_restaurants
-from config import client
+from functools import lru_cache
+
+from tools.poi_activity_tool import gather_activity_pois_compact
+from tools.critic_meal_tool import search_nearby_restaurants_compact
+from config import get_agent_model_client
 from utils import load_prompt
-from typing import List, Dict, Any, Optional
-
-poi_activity_agent = AssistantAgent(
-    name="poi_activity_agent",
-    model_client=client,
-    description="Enhanced agent that finds activity POIs and restaurants with MBTI-based scoring",
-    tools=[gather_activity_pois, search_nearby_restaurants],
-    system_message=load_prompt("poi_activity_agent"),
-)
+
+
+def create_poi_activity_agent():
+    from autogen_agentchat.agents import AssistantAgent
+    from autogen_core.tools import FunctionTool
+
+    # The tools keep their usual names but answer in the compact POI wire format (tools/poi_model.py),
+    # so the group chat context carries short keys instead of full Places details
+    return AssistantAgent(
+        name="poi_activity_agent",
+        model_client=get_agent_model_client("poi_activity_agent"),
+        description="Enhanced agent that finds activity POIs and restaurants with MBTI-based scoring",
+        tools=[
+            FunctionTool(
+                gather_activity_pois_compact,
+                name="gather_activity_pois",
+                description="Find and MBTI-score activity POIs for a location, including restaurants near the top activities",
+            ),
+            FunctionTool(
+                search_nearby_restaurants_compact,
+                name="search_nearby_restaurants",
+                description="Find MBTI-scored restaurants near a coordinate",
+            ),
+        ],
+        system_message=load_prompt("poi_activity_agent"),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_poi_activity_agent():
+    """Shared instance for scripts and tests; workflow runs lease their own from agents/pool.py"""
+    return create_poi_activity_agent()
+
+
+def __getattr__(name: str):
+    if name == "poi_activity_agent":
+        return get_poi_activity_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
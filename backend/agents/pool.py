@@ -0,0 +1,147 @@
+"""
+Agent pools: every workflow run leases its own agent instances.
+
+An AssistantAgent keeps the conversation in its model context, so agents shared between
+requests would accumulate every earlier plan in their prompts and two concurrent runs would
+write into the same context. Instead each run leases instances from a pool per agent name:
+
+    async with lease_agents("summarize_agent", "plan_agent") as (summarize_agent, plan_agent):
+        ...
+
+Returned agents are reset (model context cleared) and kept for the next run. At most
+AGENT_POOL_SIZE instances exist per agent name; further runs wait for a free one, which bounds
+memory and the number of concurrent LLM conversations per agent. Instances are built on first
+use by the create_<name>() factories in the agent modules.
+"""
+import asyncio
+import importlib
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from observability import AGENT_POOL
+
+# Instances per agent name, i.e. workflow runs that can use the same agent at once
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "8"))
+
+# Leases always take agents in this order, so runs holding several agents cannot deadlock
+AGENT_NAMES = ("summarize_agent", "poi_activity_agent", "plan_agent", "itinerary_writer_agent")
+
+
+def _factory(name: str) -> Callable[[], Any]:
+    def create() -> Any:
+        module = importlib.import_module(f"agents.{name}")
+        return getattr(module, f"create_{name}")()
+    return create
+
+
+class AgentPool:
+    """Bounded pool of interchangeable agent instances"""
+
+    def __init__(self, name: str, factory: Callable[[], Any], size: int = AGENT_POOL_SIZE):
+        self.name = name
+        self.factory = factory
+        self.size = max(1, size)
+        self.created = 0
+        self.leased = 0
+        self.resets = 0
+        self._idle: List[Any] = []
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    async def acquire(self) -> Any:
+        while not self._idle and self.created >= self.size:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._publish()
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()  # pass the instance we were woken for to the next waiter
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.leased += 1
+        if self._idle:
+            self._publish()
+            return self._idle.pop()
+        self.created += 1
+        try:
+            return self.factory()
+        except Exception:
+            self.created -= 1
+            self.leased -= 1
+            raise
+        finally:
+            self._publish()
+
+    async def release(self, agent: Any) -> None:
+        """Reset the agent and keep it; an agent that cannot be reset is dropped"""
+        from autogen_core import CancellationToken
+
+        self.leased -= 1
+        try:
+            await agent.on_reset(CancellationToken())
+        except Exception as e:
+            print(f"[agent_pool] dropping {self.name} instance, reset failed: {e}")
+            self.created -= 1
+        else:
+            self.resets += 1
+            self._idle.append(agent)
+        self._wake()
+        self._publish()
+
+    def _wake(self) -> None:
+        free = len(self._idle) + (self.size - self.created)
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _publish(self) -> None:
+        AGENT_POOL.labels(agent=self.name, state="created").set(self.created)
+        AGENT_POOL.labels(agent=self.name, state="leased").set(self.leased)
+        AGENT_POOL.labels(agent=self.name, state="waiting").set(len(self._waiters))
+
+    def preload(self, count: int = 1) -> None:
+        """Create idle instances ahead of the first run"""
+        while self.created < min(count, self.size):
+            self._idle.append(self.factory())
+            self.created += 1
+        self._publish()
+
+    def stats(self) -> Dict[str, int]:
+        return {"created": self.created, "idle": len(self._idle), "leased": self.leased,
+                "waiting": len(self._waiters), "resets": self.resets}
+
+
+_pools: Dict[str, AgentPool] = {}
+
+
+def get_agent_pool(name: str) -> AgentPool:
+    if name not in AGENT_NAMES:
+        raise ValueError(f"Unknown agent '{name}', expected one of {AGENT_NAMES}")
+    if name not in _pools:
+        _pools[name] = AgentPool(name, _factory(name))
+    return _pools[name]
+
+
+@asynccontextmanager
+async def lease_agents(*names: str) -> AsyncIterator[Tuple[Any, ...]]:
+    """Exclusive, freshly reset instances of the named agents for one workflow run"""
+    leased: Dict[str, Any] = {}
+    try:
+        for name in sorted(set(names), key=AGENT_NAMES.index):
+            leased[name] = await get_agent_pool(name).acquire()
+        yield tuple(leased[name] for name in names)
+    finally:
+        # Shielded, so a cancelled request still returns (and resets) its agents
+        if leased:
+            await asyncio.shield(asyncio.gather(*(get_agent_pool(name).release(agent) for name, agent in leased.items())))
+
+
+def agent_pool_stats() -> Dict[str, Dict[str, int]]:
+    return {name: pool.stats() for name, pool in _pools.items()}
@@ -1,10 +1,27 @@
-from autogen_agentchat.agents import AssistantAgent
+from functools import lru_cache
+
+from config import get_agent_model_client
 from utils import load_prompt
-from config import client
-
-summarize_agent = AssistantAgent(
-    "summarize_agent",
-    model_client=client,
-    description="This agent analyzes raw user input and produces a structured JSON...",
-    system_message=load_prompt("summarize_agent")
-)
+
+
+def create_summarize_agent():
+    from autogen_agentchat.agents import AssistantAgent
+
+    return AssistantAgent(
+        "summarize_agent",
+        model_client=get_agent_model_client("summarize_agent"),
+        description="This agent analyzes raw user input and produces a structured JSON...",
+        system_message=load_prompt("summarize_agent")
+    )
+
+
+@lru_cache(maxsize=None)
+def get_summarize_agent():
+    """Shared instance for scripts and tests; workflow runs lease their own from agents/pool.py"""
+    return create_summarize_agent()
+
+
+def __getattr__(name: str):
+    if name == "summarize_agent":
+        return get_summarize_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
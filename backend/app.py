@@ -5,20 +5,39 @@ to generate itineraries, and stores results in MongoDB.
 Database:
   - Name: Specified by MONGODB_DB environment variable (default: "trip_agent")
   - Collection: "conversations", stores session_id, user input, final itinerary JSON and timestamps.
+    Each record also carries input_hash (normalized mbti/budget/query/itinerary) so identical
+    submissions can be coalesced and, within PLAN_REUSE_WINDOW_SECONDS, served from a recent plan.
+    Itineraries reference their POIs instead of embedding them (see plan_store.py).
+  - Collection: "pois", the place details the stored itineraries reference, keyed by place_id.
+  Stored plans are read back through GET /plans/{session_id} and listed by GET /trips.
+  - Collection: "plan_jobs", the queue behind POST /plan/jobs (see job_queue.py).
 """
 import os
 import json
 import uuid
-from datetime import datetime, timezone
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException as FastAPIHTTPException 
+from fastapi import FastAPI, Header, HTTPException as FastAPIHTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Any, List, Dict 
+from typing import Optional, Any, AsyncIterator, List, Dict, Tuple
 import motor.motor_asyncio
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import the refactored Agent workflow execution function
-from autogen_itinerary import run_autogen_workflow
+from autogen_itinerary import preload_agents, run_autogen_workflow, stream_autogen_workflow
+from batch import PLAN_BATCH_MAX_ITEMS, stream_batch_workflow
+from http_client import init_http_client, close_http_client
+from coalesce import SingleFlight
+from job_queue import PLAN_JOB_WORKERS, JobQueue, PermanentJobError, QueueFull
+from cache import TieredCache, normalize_text
+from observability import PLAN_DURATION, PLANS, metrics_payload, register_cache_stats, span, start_trace
+from plan_schema import PlanJSONResponse, dumps_bytes
+from plan_store import InvalidCursor, PlanStore
+from replan import BasePlan, base_plan_from, incremental_replan
 
 load_dotenv()
 
@@ -26,6 +45,18 @@ MONGODB_URI = os.getenv("MONGODB_URI")
 MONGODB_DB = os.getenv("MONGODB_DB", "trip_agent")
 if not MONGODB_URI:
     raise RuntimeError("Please set the MONGODB_URI environment variable in your .env file")
+# Opt-in: serve an identical plan stored within this many seconds instead of re-running the agents (0 = off)
+PLAN_REUSE_WINDOW_SECONDS = int(os.getenv("PLAN_REUSE_WINDOW_SECONDS", "0"))
+# Send an SSE comment this often while /plan/stream is quiet, so idle timeouts don't cut the connection
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# Agents and the model client are built on the first plan; "true" builds one of each in the background at startup
+PRELOAD_AGENTS = os.getenv("PRELOAD_AGENTS", "false").lower() == "true"
+# GET /trips page size (default and max)
+TRIPS_PAGE_SIZE = int(os.getenv("TRIPS_PAGE_SIZE", "20"))
+TRIPS_PAGE_MAX = int(os.getenv("TRIPS_PAGE_MAX", "100"))
+# Seconds a rendered /trips page is served from memory (also its Cache-Control max-age; 0 = off)
+TRIPS_CACHE_TTL = float(os.getenv("TRIPS_CACHE_TTL", "10"))
+TRIPS_CACHE_MAX_ENTRIES = int(os.getenv("TRIPS_CACHE_MAX_ENTRIES", "512"))
 
 app = FastAPI(
     title="Trip-sonality API",
@@ -45,6 +76,11 @@ app.add_middleware(
 mongo_client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URI)
 db = mongo_client[MONGODB_DB]
 conversations = db.get_collection("conversations")
+plan_jobs = db.get_collection("plan_jobs")
+plan_store = PlanStore(conversations, db.get_collection("pois"))
+# Hot listing pages, rendered to bytes with their ETag; concurrent misses share one query
+trips_cache = TieredCache("trips", ttl=TRIPS_CACHE_TTL, max_entries=TRIPS_CACHE_MAX_ENTRIES, enabled=TRIPS_CACHE_TTL > 0)
+register_cache_stats("trips", trips_cache)
 
 # Define user input Pydantic model (corresponds to query form in flowchart)
 # "User's MBTI type (one of 16 types)"
@@ -56,38 +92,118 @@ class UserInput(BaseModel):
     budget: Optional[int] = Field(None, description="User's budget ")
     query: str = Field(..., description="user's natural language query, including destination, number of days, preferences, etc.")
     current_itinerary: Optional[Dict[str, Any]] = Field(None, description="Existing itineraries that the user may provide (optional, JSON object)")
+    session_id: Optional[str] = Field(None, description="Session of a stored plan to edit (optional); the query then describes the change")
 
 # Define API response model - simplified to only include session_id and raw JSON data
 class ItineraryResponse(BaseModel):
     session_id: str
     data: Any = Field(..., description="Original itinerary JSON data")
 
+class PlanJobRequest(UserInput):
+    priority: int = Field(0, description="Higher priority jobs are started first")
+
+class PlanBatchItem(BaseModel):
+    mbti: str = Field(..., description="user's MBTI type ")
+    budget: Optional[int] = Field(None, description="User's budget ")
+    query: str = Field(..., description="user's natural language query, including destination, number of days, preferences, etc.")
+
+class PlanBatchRequest(BaseModel):
+    items: List[PlanBatchItem] = Field(..., min_length=1, max_length=PLAN_BATCH_MAX_ITEMS, description="New trips to plan (edits of stored plans go through /plan)")
+
+class PlanJobResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, done or failed")
+    priority: int = 0
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    result: Optional[ItineraryResponse] = Field(None, description="The /plan response body once the job is done")
+    error: Optional[str] = None
+
 @app.on_event("startup")
 async def startup_db_client():
     try:
         await mongo_client.admin.command('ping')
         print("Successfully connected to MongoDB.")
-        await conversations.create_index("session_id", unique=True)
-        await conversations.create_index("updated_at")
+        await plan_store.create_indexes()
     except Exception as e:
         print(f"Failed to connect to MongoDB: {e}")
 
+@app.on_event("startup")
+async def startup_http_client():
+    # One pooled, keep-alive client shared by every Places/Tavily tool call
+    await init_http_client()
+
+@app.on_event("startup")
+async def startup_preload_agents():
+    # Not awaited: /health answers while autogen is still importing in a thread
+    if PRELOAD_AGENTS:
+        app.state.preload = asyncio.create_task(preload_agents())
+        app.state.preload.add_done_callback(_log_preload_result)
+
+def _log_preload_result(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Agent preload failed, agents will be built on first use: {task.exception()}")
+
+@app.on_event("startup")
+async def startup_job_workers():
+    try:
+        await plan_job_queue.create_indexes()
+    except Exception as e:
+        print(f"Failed to create plan job indexes: {e}")
+    if PLAN_JOB_WORKERS > 0:
+        plan_job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_job_workers():
+    await plan_job_queue.stop()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     print("Closing MongoDB connection...")
     mongo_client.close()
 
-@app.post("/plan", response_model=ItineraryResponse, tags=["Itinerary Planning"])
-async def generate_plan(user_input: UserInput):
-    """
-    # Receive user's itinerary planning request, call Agent workflow to generate itinerary,
-    # Store raw JSON result in MongoDB and return directly to frontend
-    """
-    session_id = str(uuid.uuid4())
-    print(f"Received new plan request. Session ID: {session_id}")
-    print(f"User Input: {user_input.dict()}")
-   
-    # Prepare input dictionary to pass to Agent workflow   
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    print("Closing shared HTTP client...")
+    await close_http_client()
+
+# Concurrent identical /plan submissions share one in-flight workflow run
+plan_flights = SingleFlight("plan")
+
+def plan_input_hash(user_input: UserInput) -> str:
+    """Stable hash of the inputs that determine a plan (case/whitespace-insensitive query)"""
+    normalized = {
+        "mbti": user_input.mbti.strip().upper(),
+        "budget": user_input.budget,
+        "query": normalize_text(user_input.query),
+        "current_itinerary": user_input.current_itinerary,
+    }
+    if user_input.session_id:
+        normalized["session_id"] = user_input.session_id
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def find_reusable_plan(input_hash: str) -> Optional[Dict[str, Any]]:
+    """Most recent successful plan for the same inputs inside the reuse window"""
+    if PLAN_REUSE_WINDOW_SECONDS <= 0:
+        return None
+    since = datetime.now(timezone.utc) - timedelta(seconds=PLAN_REUSE_WINDOW_SECONDS)
+    try:
+        # has_itinerary: "data" may be stored compressed; older records only have data.itinerary
+        record = await plan_store.find_one(
+            {"input_hash": input_hash, "updated_at": {"$gte": since},
+             "$or": [{"has_itinerary": True}, {"data.itinerary": {"$exists": True}}]},
+            fields=["session_id", "data"],
+            sort=[("updated_at", -1)],
+        )
+    except Exception as e:
+        print(f"Error looking up reusable plan: {e}")
+        return None
+    return record
+
+def build_workflow_input(user_input: UserInput) -> Dict[str, Any]:
+    """Prepare input dictionary to pass to Agent workflow"""
     workflow_input = {
         "mbti": user_input.mbti,
         "Budget": user_input.budget,
@@ -95,12 +211,64 @@ async def generate_plan(user_input: UserInput):
         "CurrentItinerary": user_input.current_itinerary
     }
     # Remove keys with None values to avoid passing null  
-    workflow_input = {k: v for k, v in workflow_input.items() if v is not None}
+    return {k: v for k, v in workflow_input.items() if v is not None}
+
+async def load_base_plan(user_input: UserInput) -> Optional[BasePlan]:
+    """The itinerary an edit applies to: the stored session if given, else the supplied CurrentItinerary"""
+    if user_input.session_id:
+        try:
+            record = await plan_store.find_one(
+                {"session_id": user_input.session_id},
+                fields=["session_id", "user_input", "data"],
+            )
+        except Exception as e:
+            print(f"Error loading session {user_input.session_id}: {e}")
+            record = None
+        if record:
+            base = base_plan_from(record.get("data"), record.get("user_input"), record["session_id"])
+            if base is not None:
+                return base
+    if user_input.current_itinerary:
+        return base_plan_from(user_input.current_itinerary)
+    return None
+
+async def run_workflow(user_input: UserInput, workflow_input: Dict[str, Any]) -> Any:
+    """Edits of an existing plan are applied incrementally when possible, everything else runs the agents"""
+    base = await load_base_plan(user_input)
+    if base is not None:
+        result = await incremental_replan(workflow_input, base)
+        if result is not None:
+            return result
+    return await run_autogen_workflow(workflow_input)
+
+async def save_plan_record(session_id: str, user_input: UserInput, input_hash: str, raw_data: Any) -> None:
+    record = {
+        "session_id": session_id,
+        "input_hash": input_hash,
+        "user_input": user_input.dict(),
+        "data": raw_data,
+        "created_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc)
+    }
+    try:
+        with span("mongo_insert"):
+            inserted_id = await plan_store.save(record)
+        print(f"Successfully inserted record into MongoDB with ID: {inserted_id}")
+    except Exception as e:
+        print(f"Error saving record to MongoDB: {e}")
+
+async def create_plan(user_input: UserInput, input_hash: str) -> Dict[str, Any]:
+    """Run the Agent workflow and store the result; returns the /plan response body"""
+    session_id = str(uuid.uuid4())
+    print(f"Received new plan request. Session ID: {session_id}")
+    print(f"User Input: {user_input.dict()}")
+   
+    workflow_input = build_workflow_input(user_input)
 
     try:
         # Execute Agent workflow
         print("--- Calling AutoGen Workflow --- ")
-        result_data = await run_autogen_workflow(workflow_input)
+        result_data = await run_workflow(user_input, workflow_input)
         print("--- AutoGen Workflow Finished Successfully --- ")
         # Don't separate data anymore, use raw result directly
         raw_data = result_data
@@ -115,18 +283,7 @@ async def generate_plan(user_input: UserInput):
             detail=f"An internal error occurred during itinerary generation: {e}"
         )
 
-    record = {
-        "session_id": session_id,
-        "user_input": user_input.dict(),
-        "data": raw_data,
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc)
-    }
-    try:
-        insert_result = await conversations.insert_one(record)
-        print(f"Successfully inserted record into MongoDB with ID: {insert_result.inserted_id}")
-    except Exception as e:
-        print(f"Error saving record to MongoDB: {e}")
+    await save_plan_record(session_id, user_input, input_hash, raw_data)
 
     response_data = {
         "session_id": session_id,
@@ -134,6 +291,361 @@ async def generate_plan(user_input: UserInput):
     }
     return response_data
 
+@app.post("/plan", response_model=ItineraryResponse, response_class=PlanJSONResponse, tags=["Itinerary Planning"])
+async def generate_plan(user_input: UserInput):
+    """
+    # Receive user's itinerary planning request, call Agent workflow to generate itinerary,
+    # Store raw JSON result in MongoDB and return directly to frontend.
+    # Identical requests already in flight share one workflow run; with PLAN_REUSE_WINDOW_SECONDS
+    # set, a recent identical plan is returned without running the agents at all.
+    # With session_id or current_itinerary set, an edit like "swap day 2's dinner" only re-plans
+    # the affected days (see replan.py); anything else regenerates the whole itinerary.
+    # The Server-Timing header breaks the request down by stage (see observability.py).
+    # The body is rendered with orjson directly; it is not re-validated against ItineraryResponse.
+    """
+    input_hash = plan_input_hash(user_input)
+    outcome = "error"
+    with start_trace(f"plan {input_hash[:12]}") as trace:
+        try:
+            result = await find_reusable_plan(input_hash)
+            if result:
+                print(f"Reusing stored plan {result['session_id']} for identical request {input_hash[:12]}")
+                outcome = "reused"
+            else:
+                result = await plan_flights.do(input_hash, lambda: create_plan(user_input, input_hash))
+                outcome = "ok"
+        finally:
+            PLANS.labels(endpoint="plan", outcome=outcome).inc()
+            PLAN_DURATION.labels(endpoint="plan").observe(time.perf_counter() - trace.start)
+    return PlanJSONResponse(result, headers={"Server-Timing": trace.server_timing()})
+
+async def run_plan_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job handler: same reuse/coalescing path as /plan, bounded by the worker pool"""
+    user_input = UserInput(**job["payload"])
+    input_hash = plan_input_hash(user_input)
+    outcome = "error"
+    with start_trace(f"plan/job {job['job_id'][:12]}") as trace:
+        try:
+            result = await find_reusable_plan(input_hash)
+            if result:
+                outcome = "reused"
+            else:
+                try:
+                    result = await plan_flights.do(input_hash, lambda: create_plan(user_input, input_hash))
+                except FastAPIHTTPException as http_exc:
+                    if http_exc.status_code < 500:
+                        raise PermanentJobError(http_exc.detail)
+                    raise
+                outcome = "ok"
+        finally:
+            PLANS.labels(endpoint="plan_job", outcome=outcome).inc()
+            PLAN_DURATION.labels(endpoint="plan_job").observe(time.perf_counter() - trace.start)
+    return result
+
+# At most PLAN_JOB_WORKERS workflows run at once for /plan/jobs; the rest wait in MongoDB
+plan_job_queue = JobQueue(plan_jobs, run_plan_job)
+
+@app.post("/plan/jobs", response_model=PlanJobResponse, status_code=202, tags=["Itinerary Planning"])
+async def submit_plan_job(job_request: PlanJobRequest):
+    """
+    # Queue an itinerary request and return its job id immediately; poll GET /plan/jobs/{job_id}.
+    # Answers 429 when PLAN_JOB_QUEUE_MAX jobs are already waiting.
+    """
+    payload = job_request.dict(exclude={"priority"})
+    try:
+        job = await plan_job_queue.enqueue(payload, priority=job_request.priority)
+    except QueueFull as e:
+        raise FastAPIHTTPException(status_code=429, detail=f"Plan queue is full: {e}", headers={"Retry-After": "30"})
+    print(f"Queued plan job {job['job_id']} (priority {job['priority']})")
+    return job
+
+@app.get("/plan/jobs/{job_id}", response_model=PlanJobResponse, tags=["Itinerary Planning"])
+async def get_plan_job(job_id: str):
+    """Status of a queued plan; result holds the {session_id, data} body once status is done"""
+    job = await plan_job_queue.get(job_id)
+    if job is None:
+        raise FastAPIHTTPException(status_code=404, detail="Job not found")
+    return job
+
+def format_sse(event: str, payload: Any) -> str:
+    return f"event: {event}\ndata: {dumps_bytes(payload).decode('utf-8')}\n\n"
+
+async def with_keepalive(events: AsyncIterator[Tuple[str, Any]], interval: float) -> AsyncIterator[Optional[Tuple[str, Any]]]:
+    """Re-yield events, yielding None whenever nothing arrived for `interval` seconds"""
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for item in events:
+                await queue.put(item)
+            await queue.put(done)
+        except Exception as e:
+            await queue.put(e)
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=interval)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        task.cancel()
+        # Let the cancellation reach the source, then close it: its finally blocks (agent leases)
+        # run now, not whenever the generator is garbage collected
+        await asyncio.wait([task])
+        aclose = getattr(events, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+async def replan_or_plan_events(workflow_input: Dict[str, Any], base: Optional[BasePlan]) -> AsyncIterator[Tuple[str, Any]]:
+    """The changed days and final result of an incremental replan of `base`, or the full workflow's events"""
+    replanned = await incremental_replan(workflow_input, base) if base is not None else None
+    if replanned is None:
+        async for item in stream_autogen_workflow(workflow_input):
+            yield item
+        return
+    changed = set(replanned["replan"]["changed_days"])
+    for index, day in enumerate(replanned["itinerary"]["itinerary"]):
+        if day["day"] in changed:
+            yield "day", {"index": index, "day": day}
+    yield "final", replanned
+
+async def plan_event_stream(user_input: UserInput, input_hash: str) -> AsyncIterator[str]:
+    start = time.perf_counter()
+    outcome = "error"
+    with start_trace(f"plan/stream {input_hash[:12]}"):
+        try:
+            async for chunk in _plan_events(user_input, input_hash):
+                if chunk.startswith("event: final"):
+                    outcome = "ok"
+                yield chunk
+        finally:
+            PLANS.labels(endpoint="plan_stream", outcome=outcome).inc()
+            PLAN_DURATION.labels(endpoint="plan_stream").observe(time.perf_counter() - start)
+
+async def _plan_events(user_input: UserInput, input_hash: str) -> AsyncIterator[str]:
+    session_id = str(uuid.uuid4())
+    print(f"Received new streaming plan request. Session ID: {session_id}")
+    yield format_sse("session", {"session_id": session_id})
+
+    reused = await find_reusable_plan(input_hash)
+    if reused:
+        print(f"Reusing stored plan {reused['session_id']} for identical request {input_hash[:12]}")
+        yield format_sse("final", reused)
+        return
+
+    workflow_input = build_workflow_input(user_input)
+    base = await load_base_plan(user_input)
+
+    final_output = None
+    try:
+        # Keep-alives also cover a slow incremental replan
+        async for item in with_keepalive(replan_or_plan_events(workflow_input, base), SSE_KEEPALIVE_SECONDS):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            event, payload = item
+            if event == "final":
+                final_output = payload
+                continue
+            yield format_sse(event, payload)
+    except Exception as e:
+        print(f"Error during streaming AutoGen workflow execution: {e}")
+        yield format_sse("error", {"detail": f"An internal error occurred during itinerary generation: {e}"})
+        return
+
+    await save_plan_record(session_id, user_input, input_hash, final_output)
+    yield format_sse("final", {"session_id": session_id, "data": final_output})
+
+@app.post("/plan/stream", tags=["Itinerary Planning"])
+async def generate_plan_stream(user_input: UserInput):
+    """
+    # Server-sent-events variant of /plan: emits progress, tool_call, tool_result, summary,
+    # pois and day events while the agents work, then a final event with the same
+    # {session_id, data} body /plan returns. The result is stored in MongoDB the same way.
+    """
+    return StreamingResponse(
+        plan_event_stream(user_input, plan_input_hash(user_input)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def batch_event_stream(batch: PlanBatchRequest) -> AsyncIterator[str]:
+    start = time.perf_counter()
+    with start_trace(f"plan/batch {len(batch.items)} items"):
+        try:
+            async for chunk in _batch_events(batch):
+                yield chunk
+        finally:
+            PLAN_DURATION.labels(endpoint="plan_batch").observe(time.perf_counter() - start)
+
+async def _batch_events(batch: PlanBatchRequest) -> AsyncIterator[str]:
+    user_inputs = [UserInput(**item.dict()) for item in batch.items]
+    # Identical items are planned once and share the result, like concurrent identical /plan calls
+    indices_by_hash: Dict[str, List[int]] = {}
+    for index, user_input in enumerate(user_inputs):
+        indices_by_hash.setdefault(plan_input_hash(user_input), []).append(index)
+    hashes = list(indices_by_hash)
+    print(f"Received plan batch: {len(user_inputs)} items, {len(hashes)} distinct")
+    yield format_sse("batch", {"items": len(user_inputs), "distinct": len(hashes)})
+
+    ok = errors = 0
+    reused = await asyncio.gather(*(find_reusable_plan(input_hash) for input_hash in hashes))
+    pending = []
+    for input_hash, record in zip(hashes, reused):
+        if not record:
+            pending.append(input_hash)
+            continue
+        for index in indices_by_hash[input_hash]:
+            ok += 1
+            PLANS.labels(endpoint="plan_batch", outcome="reused").inc()
+            yield format_sse("item", {"index": index, **record})
+
+    def first_input(input_hash: str) -> UserInput:
+        return user_inputs[indices_by_hash[input_hash][0]]
+
+    workflow_inputs = [build_workflow_input(first_input(input_hash)) for input_hash in pending]
+    groups = 0
+    try:
+        async for item in with_keepalive(stream_batch_workflow(workflow_inputs), SSE_KEEPALIVE_SECONDS):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            event, payload = item
+            if event == "group":
+                groups += 1
+                indices = [i for position in payload["items"] for i in indices_by_hash[pending[position]]]
+                yield format_sse("group", {**payload, "items": indices})
+                continue
+            input_hash = pending[payload["index"]]
+            if event == "item":
+                session_id = str(uuid.uuid4())
+                await save_plan_record(session_id, first_input(input_hash), input_hash, payload["data"])
+                for index in indices_by_hash[input_hash]:
+                    ok += 1
+                    PLANS.labels(endpoint="plan_batch", outcome="ok").inc()
+                    yield format_sse("item", {"index": index, "session_id": session_id, "data": payload["data"]})
+            else:
+                error = payload["error"]
+                status_code = error.status_code if isinstance(error, FastAPIHTTPException) else 500
+                detail = error.detail if isinstance(error, FastAPIHTTPException) else f"An internal error occurred during itinerary generation: {error}"
+                print(f"Batch item for {input_hash[:12]} failed: {detail}")
+                for index in indices_by_hash[input_hash]:
+                    errors += 1
+                    PLANS.labels(endpoint="plan_batch", outcome="error").inc()
+                    yield format_sse("error", {"index": index, "status_code": status_code, "detail": detail})
+    except Exception as e:
+        print(f"Error during batch workflow execution: {e}")
+        yield format_sse("error", {"detail": f"An internal error occurred during batch planning: {e}"})
+    yield format_sse("done", {"items": len(user_inputs), "ok": ok, "errors": errors, "groups": groups})
+
+@app.post("/plan/batch", tags=["Itinerary Planning"])
+async def generate_plan_batch(batch: PlanBatchRequest):
+    """
+    # Plan many new trips in one request (group tours, the same city for several MBTI types).
+    # Trips to the same destination and theme share one POI crawl, scored per MBTI type, and the
+    # planning stages run concurrently under PLAN_BATCH_CONCURRENCY (see batch.py).
+    # Server-sent events: batch, then group (POIs of a destination are in), item ({index,
+    # session_id, data}, the /plan body of one trip) or error ({index, status_code, detail}) per
+    # trip as it finishes, and done. Every plan is stored in MongoDB like a /plan result.
+    """
+    return StreamingResponse(
+        batch_event_stream(batch),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:24] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+@app.get("/plans/{session_id}", response_model=ItineraryResponse, response_class=PlanJSONResponse, tags=["Itinerary Planning"])
+async def get_plan(session_id: str, if_none_match: Optional[str] = Header(None)):
+    """
+    # A stored plan in the /plan response shape, plus created_at/updated_at.
+    # The ETag hashes the rendered body: place details are shared between plans (see
+    # plan_store.py) and updated by later saves, so a stored plan can change without its
+    # record changing. A client returning to a plan it already has gets a 304 without the body.
+    """
+    try:
+        record = await plan_store.find_one(
+            {"session_id": session_id}, fields=["session_id", "data", "created_at", "updated_at"]
+        )
+    except Exception as e:
+        print(f"Error loading session {session_id}: {e}")
+        raise FastAPIHTTPException(status_code=503, detail="Stored plans are unavailable, try again later")
+    if record is None:
+        raise FastAPIHTTPException(status_code=404, detail=f"No plan stored for session {session_id}")
+    body = dumps_bytes({"session_id": record["session_id"], "data": record.get("data"),
+                        "created_at": record.get("created_at"), "updated_at": record.get("updated_at")})
+    headers = {"ETag": body_etag(body), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def render_trips_page(filters: Dict[str, Any], limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    with span("mongo_list_trips"):
+        page = await plan_store.list_trips(filters, limit, cursor)
+    body = dumps_bytes(page)
+    return {"body": body, "etag": body_etag(body)}
+
+@app.get("/trips", tags=["Community Trips"])
+async def list_trips(
+    location: Optional[str] = None,
+    theme: Optional[str] = None,
+    mbti: Optional[str] = None,
+    days: Optional[int] = Query(None, ge=1),
+    limit: int = Query(TRIPS_PAGE_SIZE, ge=1, le=TRIPS_PAGE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    # Stored trips, newest first: {"items": [{session_id, trip, created_at, updated_at}], "next_cursor"}.
+    # Filters match case-insensitively (location, theme) or exactly (mbti, days); pass next_cursor
+    # back as cursor for the following page. Pages are keyset-paginated on indexes, so a deep page
+    # costs the same as the first one, and served from memory for TRIPS_CACHE_TTL seconds.
+    """
+    filters = {
+        "location": normalize_text(location) or None,
+        "theme": normalize_text(theme) or None,
+        "mbti": mbti.strip().upper() if mbti else None,
+        "days": days,
+    }
+    key = json.dumps([filters, limit, cursor], sort_keys=True)
+    try:
+        page = await trips_cache.get_or_fetch(key, lambda: render_trips_page(filters, limit, cursor))
+    except InvalidCursor as e:
+        raise FastAPIHTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error listing trips: {e}")
+        raise FastAPIHTTPException(status_code=503, detail="Stored trips are unavailable, try again later")
+    headers = {"ETag": page["etag"], "Cache-Control": f"public, max-age={int(TRIPS_CACHE_TTL)}"}
+    if etag_matches(if_none_match, page["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=page["body"], media_type="application/json", headers=headers)
+
+@app.get("/metrics", tags=["Health Check"])
+async def metrics():
+    """Prometheus metrics: stage/LLM/external API timings, token counts, cache hit rates"""
+    payload = metrics_payload()
+    if payload is None:
+        raise FastAPIHTTPException(status_code=503, detail="prometheus_client is not installed")
+    body, content_type = payload
+    return Response(content=body, media_type=content_type)
+
 @app.get("/health", tags=["Health Check"])
 async def health_check():
     return {"status": "ok"}
@@ -1,124 +1,171 @@
+import ast
 import asyncio
 import json
 import os 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 from http.client import HTTPException
-from config import client
-from utils import clean_json_content
-from agents.summarize_agent import summarize_agent
-from agents.poi_activity_agent import poi_activity_agent
-from agents.plan_agent import plan_agent
+from config import get_agent_model_client, get_model_client
+from observability import span
+from utils import parse_agent_json, ItineraryDayExtractor
+from plan_schema import parse_plan_output
+from agents.pool import get_agent_pool, lease_agents
+from tools.poi_model import load_places, rehydrate_day, rehydrate_itinerary, rehydrate_pois
 
-from autogen_agentchat.conditions import TextMentionTermination
-from autogen_agentchat.teams import MagenticOneGroupChat
-from autogen_agentchat.ui import Console
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+# autogen_agentchat is imported inside the functions that run a workflow, so importing this
+# module (and app.py) stays cheap; the agents and model client are built on first use too
 
+# Agents of the Magentic-One team, leased from agents/pool.py for each run
+GROUP_CHAT_AGENTS = ("summarize_agent", "poi_activity_agent", "plan_agent")
 
+# "magentic": MagenticOneGroupChat orchestrates the agents (default)
+# "pipeline": pipeline.py calls them in their fixed order, without orchestrator LLM calls
+PLAN_ENGINE = os.getenv("PLAN_ENGINE", "magentic")
+PLAN_ENGINES = ("magentic", "pipeline")
 
-async def run_autogen_workflow(initial_user_input: Dict[str, Any]) -> Dict[str, Any]:
-    print("--- Starting AutoGen Workflow ---")
-    print(f"Initial User Input: {initial_user_input}")
+
+def build_group_chat(agents: Tuple[Any, ...]):
+    """Create the Magentic-One team for one workflow run from its leased agents"""
+    from autogen_agentchat.conditions import TextMentionTermination
+    from autogen_agentchat.teams import MagenticOneGroupChat
 
     # 3 enhanced agents in sequence - now 50% faster, half the API calls, saves 60% cost
-    agents=[
-        summarize_agent,
-        poi_activity_agent,
-        plan_agent,
-    
-    ]
+    agents = list(agents)
 
     # Set termination condition: end when plan_agent outputs valid JSON
     termination = TextMentionTermination(text="TERMINATE")
 
     # Create MagenticOneGroupChat instance
     # Executes agents in sequence, passing output from one to the next
-    group_chat = MagenticOneGroupChat(
+    return MagenticOneGroupChat(
         agents,
         termination_condition=termination,
-        model_client=client,
+        model_client=get_agent_model_client("orchestrator"),
     )
 
+
+def format_final_output(plan_data: Any, initial_user_input: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape the parsed itinerary for the frontend"""
+    # Format for your frontend needs
+    original_input = dict(initial_user_input)
+
+    return {
+        "success": True,
+        "itinerary": plan_data,
+        "original_request": original_input,  # Pass through original request
+        "extracted_metadata": {
+            # Let frontend handle extraction, or extract here with regex
+            "query": original_input.get("Query", ""),
+            "mbti": original_input.get("mbti", ""),
+            "budget": original_input.get("Budget", 0)
+        }
+    }
+
+
+def extract_final_output(messages: List[Any], initial_user_input: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Build the /plan payload from the last plan_agent message"""
+    print(f"--- Workflow completed with {len(messages)} messages ---")
+
+    print("Checking for agent errors...")
+    for i, msg in enumerate(messages):
+        try:
+            # Handle different message types safely
+            if hasattr(msg, 'content'):
+                content = str(msg.content)
+            elif hasattr(msg, 'message'):
+                content = str(msg.message)
+            else:
+                content = str(msg)
+    
+            lowered = content.lower()
+            if 'error' in lowered or 'failed' in lowered or 'exception' in lowered:
+                source = getattr(msg, 'source', f'unknown_type_{type(msg).__name__}')
+                print(f"⚠️  Message {i+1} ({source}): {content[:200]}...")
+        except Exception as debug_error:
+            print(f"⚠️  Message {i+1}: Debug error - {debug_error}")
+
+    # Debug: Print all message sources
+    print("Message sources:")
+    for i, msg in enumerate(messages):
+        print(f"  {i+1}. {msg.source}")
+
+    # Extract plan_agent output (PROPERLY INDENTED)
+    print("Extracting final itinerary data...")
+
+    for msg in reversed(messages):
+        if hasattr(msg, 'source') and hasattr(msg, 'content') and msg.source == 'plan_agent' and isinstance(msg.content, str):
+            print("✅ Found plan_agent output")
+    
+            # Use regular Python to format for frontend (no AI needed - removes need for format agent)
+            try:
+                with span("json_extraction"):
+                    # plan_agent refers to POIs by id; put the full details back
+                    plan_data = rehydrate_itinerary(parse_plan_output(msg.content))
+                final_output = format_final_output(plan_data, initial_user_input)
+                print(f"✅ Successfully formatted itinerary: {len(plan_data['itinerary'])} days")
+                return final_output
+            except Exception as format_error:
+                print(f"JSON parsing failed: {format_error}")
+                # Fallback if not JSON
+                return {"success": True, "raw_plan": str(msg.content)}
+
+    print("❌ No plan found")
+    return None
+
+
+async def load_plan_places(messages: List[Any]) -> None:
+    """Load the places of the last plan_agent message, so extract_final_output rehydrates from memory"""
+    for msg in reversed(messages):
+        if getattr(msg, "source", None) == "plan_agent" and isinstance(getattr(msg, "content", None), str):
+            try:
+                await load_places(parse_plan_output(msg.content))
+            except Exception:
+                pass  # extract_final_output reports the unparsable plan
+            return
+
+
+def resolve_engine(engine: Optional[str] = None) -> str:
+    engine = (engine or PLAN_ENGINE).lower()
+    if engine not in PLAN_ENGINES:
+        raise ValueError(f"Unknown plan engine '{engine}', expected one of {PLAN_ENGINES}")
+    return engine
+
+
+def _import_agent_runtime() -> None:
+    import autogen_agentchat.agents  # noqa: F401
+    import autogen_agentchat.teams  # noqa: F401
+    import autogen_core  # noqa: F401
+    get_model_client()
+
+
+async def preload_agents(engine: Optional[str] = None) -> None:
+    """Import autogen and build the model client and one instance of each agent the engine uses now, not on the first plan"""
+    # The imports take most of the time and run in a thread; the pools are only touched on the event loop
+    await asyncio.to_thread(_import_agent_runtime)
+    names = GROUP_CHAT_AGENTS if resolve_engine(engine) == "magentic" else ("summarize_agent", "plan_agent", "itinerary_writer_agent")
+    for name in names:
+        get_agent_pool(name).preload()
+
+
+async def run_autogen_workflow(initial_user_input: Dict[str, Any], engine: Optional[str] = None) -> Dict[str, Any]:
+    if resolve_engine(engine) == "pipeline":
+        from pipeline import run_pipeline_workflow
+        return await run_pipeline_workflow(initial_user_input)
+
+    print("--- Starting AutoGen Workflow ---")
+    print(f"Initial User Input: {initial_user_input}")
+
     initial_task = json.dumps(initial_user_input)
     print(f"--- Initiating Group Chat with Task: {initial_task[:200]}... ---")
 
     try:
         # Run the agent workflow
         # Use run() instead of run_stream() to get final result
-        final_result = await group_chat.run(task=initial_task)
-        messages = final_result.messages
-        final_output = None
-
-        print(f"--- Workflow completed with {len(messages)} messages ---")
-
-        print("Checking for agent errors...")
-        for i, msg in enumerate(messages):
-            try:
-                # Handle different message types safely
-                if hasattr(msg, 'content'):
-                    content = str(msg.content)
-                elif hasattr(msg, 'message'):
-                    content = str(msg.message)
-                else:
-                    content = str(msg)
-        
-                if 'error' in content.lower() or 'failed' in content.lower() or 'exception' in content.lower():
-                    source = getattr(msg, 'source', f'unknown_type_{type(msg).__name__}')
-                    print(f"⚠️  Message {i+1} ({source}): {content[:200]}...")
-            except Exception as debug_error:
-                print(f"⚠️  Message {i+1}: Debug error - {debug_error}")
-    
-        # Debug: Print all message sources
-        print("Message sources:")
-        print(f"🔍 plan_agent in workflow: {'plan_agent' in [agent.name for agent in agents]}")
-        print(f"🔍 Total agents registered: {len(agents)}")
-        for i, msg in enumerate(messages):
-            print(f"  {i+1}. {msg.source}")
-
-        # Extract plan_agent output (PROPERLY INDENTED)
-        print("Extracting final itinerary data...")
-    
-        for msg in reversed(messages):
-            if hasattr(msg, 'source') and hasattr(msg, 'content') and msg.source == 'plan_agent':
-                print("✅ Found plan_agent output")
-        
-                # Use regular Python to format for frontend (no AI needed - removes need for format agent)
-                try:
-                    cleaned_content = clean_json_content(msg.content)
-                    import re
-                    json_match = re.search(r'```json\s*\n(.*?)\n```', cleaned_content, re.DOTALL)
-                    if json_match:
-                        json_content = json_match.group(1).strip()
-                    else:
-                        json_content = cleaned_content  # Fallback to original behavior
-    
-                    plan_data = json.loads(json_content)
-            
-                    # Format for your frontend needs
-                    original_input = json.loads(initial_task)
-
-                    final_output = {
-                        "success": True,
-                        "itinerary": plan_data,
-                        "original_request": original_input,  # Pass through original request
-                        "extracted_metadata": {
-                            # Let frontend handle extraction, or extract here with regex
-                            "query": original_input.get("Query", ""),
-                            "mbti": original_input.get("mbti", ""),
-                            "budget": original_input.get("Budget", 0)
-                        }
-                    }
-                    print(f"Plan agent output structure: {json.dumps(plan_data, indent=2)[:500]}...")
-                    print("✅ Successfully formatted itinerary")
-                    break
-                except Exception as format_error:
-                    print(f"JSON parsing failed: {format_error}")
-                    # Fallback if not JSON
-                    final_output = {"success": True, "raw_plan": str(msg.content)}
-                    break
-        else:
-            print("❌ No plan found")
-            final_output = None
+        async with lease_agents(*GROUP_CHAT_AGENTS) as agents:
+            group_chat = build_group_chat(agents)
+            with span("group_chat"):
+                final_result = await group_chat.run(task=initial_task)
+        await load_plan_places(final_result.messages)
+        final_output = extract_final_output(final_result.messages, initial_user_input)
 
         print("--- AutoGen Workflow Completed ---")
         return final_output
@@ -131,6 +178,111 @@ async def run_autogen_workflow(initial_user_input: Dict[str, Any]) -> Dict[str,
         raise Exception(f"An error occurred during the itinerary generation: {e}")
 
 
+def _parse_tool_result(content: str) -> Optional[Any]:
+    """Tool results arrive as str() of the return value, i.e. a Python literal"""
+    try:
+        return ast.literal_eval(content)
+    except Exception:
+        return parse_agent_json(content)
+
+
+async def stream_autogen_workflow(initial_user_input: Dict[str, Any], engine: Optional[str] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Same workflow as run_autogen_workflow, but yields (event, payload) pairs while it runs:
+      progress / tool_call / tool_result  - one per agent turn and tool call
+      summary                             - parsed summarize_agent output
+      pois                                - POI list from gather_activity_pois
+      day                                 - each itinerary day as soon as it can be extracted
+      final                               - the same payload run_autogen_workflow returns
+    """
+    if resolve_engine(engine) == "pipeline":
+        from pipeline import stream_pipeline_workflow
+        async for item in stream_pipeline_workflow(initial_user_input):
+            yield item
+        return
+
+    from autogen_agentchat.base import TaskResult
+    from autogen_agentchat.messages import ModelClientStreamingChunkEvent, ToolCallExecutionEvent, ToolCallRequestEvent
+
+    print("--- Starting AutoGen Workflow (streaming) ---")
+    print(f"Initial User Input: {initial_user_input}")
+
+    initial_task = json.dumps(initial_user_input)
+    day_extractor = ItineraryDayExtractor()
+    plan_chunks_seen = False
+
+    try:
+        # The lease is held until the stream ends or the client goes away
+        async with lease_agents(*GROUP_CHAT_AGENTS) as agents:
+            async for message in build_group_chat(agents).run_stream(task=initial_task):
+                if isinstance(message, TaskResult):
+                    await load_plan_places(message.messages)
+                    yield "final", extract_final_output(message.messages, initial_user_input)
+                    continue
+
+                source = getattr(message, "source", "")
+
+                if isinstance(message, ModelClientStreamingChunkEvent):
+                    if source == "plan_agent":
+                        plan_chunks_seen = True
+                        for index, day in day_extractor.feed(message.content):
+                            await load_places(day)
+                            yield "day", {"index": index, "day": rehydrate_day(day)}
+                    continue
+
+                if isinstance(message, ToolCallRequestEvent):
+                    yield "tool_call", {
+                        "source": source,
+                        "tools": [{"name": call.name, "arguments": call.arguments} for call in message.content],
+                    }
+                    continue
+
+                if isinstance(message, ToolCallExecutionEvent):
+                    yield "tool_result", {
+                        "source": source,
+                        "tools": [{"name": result.name, "is_error": bool(result.is_error)} for result in message.content],
+                    }
+                    for result in message.content:
+                        if result.name == "gather_activity_pois" and not result.is_error:
+                            pois = _parse_tool_result(result.content)
+                            if isinstance(pois, list):
+                                await load_places(pois)
+                                yield "pois", {"source": "gather_activity_pois", "pois": rehydrate_pois(pois)}
+                    continue
+
+                content = getattr(message, "content", None)
+                if not isinstance(content, str):
+                    continue
+                yield "progress", {"source": source, "type": type(message).__name__, "preview": content[:200]}
+
+                if source == "summarize_agent":
+                    summary = parse_agent_json(content)
+                    if isinstance(summary, dict):
+                        yield "summary", summary
+                elif source == "poi_activity_agent":
+                    poi_output = parse_agent_json(content)
+                    if isinstance(poi_output, dict) and isinstance(poi_output.get("pois"), list):
+                        await load_places(poi_output["pois"])
+                        yield "pois", {"source": "poi_activity_agent", "pois": rehydrate_pois(poi_output["pois"])}
+                elif source == "plan_agent":
+                    # Without token streaming the whole plan arrives in one message
+                    if not plan_chunks_seen:
+                        for index, day in day_extractor.feed(content):
+                            await load_places(day)
+                            yield "day", {"index": index, "day": rehydrate_day(day)}
+                    # A later plan_agent turn starts a fresh itinerary
+                    day_extractor = ItineraryDayExtractor()
+                    plan_chunks_seen = False
+
+        print("--- AutoGen Workflow Completed (streaming) ---")
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        print(f"--- AutoGen Workflow Error: {e} ---")
+        raise Exception(f"An error occurred during the itinerary generation: {e}")
+
+
 # --- Main program entry (example) ---
 # Usually this function would be called by app.py
 async def main_test():
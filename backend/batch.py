@@ -0,0 +1,133 @@
+"""
+Batch planning (POST /plan/batch): many new trips in one request, sharing the POI crawl.
+
+Partners submit group tours or the same city for several MBTI types at once. Planned one by
+one, every trip repeats the same gather_activity_pois searches; here the batch runs the
+pipeline stages (pipeline.py) across all items:
+
+    summarize_stage  every item (identical queries share one completion via llm_cache.py)
+    group            items with the same destination, theme and inclusions
+    POIs             gather_activity_pois_by_mbti once per group, scored per MBTI type
+    plan_stage       every item, as soon as its group's POIs are in
+
+At most PLAN_BATCH_CONCURRENCY summarize/POI/plan steps of one batch run at once, so a batch of
+50 trips does not take every agent from the pools. Results are yielded per item as they finish.
+The batch always uses the pipeline engine (PLAN_ENGINE only applies to single plans);
+PLANNER_MODE is honoured.
+"""
+import asyncio
+import os
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+from cache import normalize_text
+from observability import span
+from pipeline import PoiHandoff, TripSummary, plan_stage, summarize_stage
+from tools.poi_activity_tool import gather_activity_pois_by_mbti
+from tools.web_discovery import WEB_DISCOVERY_ENABLED
+
+T = TypeVar("T")
+
+# Items per POST /plan/batch request
+PLAN_BATCH_MAX_ITEMS = int(os.getenv("PLAN_BATCH_MAX_ITEMS", "100"))
+# Stage runs (summaries, POI crawls, plans) of one batch in flight at once
+PLAN_BATCH_CONCURRENCY = int(os.getenv("PLAN_BATCH_CONCURRENCY", "8"))
+
+GroupKey = Tuple[str, str, Tuple[str, ...]]
+
+
+def group_key(summary: TripSummary) -> GroupKey:
+    """Trips with the same key get the same POI candidates; only the MBTI scoring differs"""
+    return (
+        normalize_text(summary.location),
+        normalize_text(summary.theme),
+        tuple(sorted({normalize_text(inc) for inc in summary.inclusion})),
+    )
+
+
+def group_summaries(summaries: List[Tuple[int, TripSummary]]) -> Dict[GroupKey, List[Tuple[int, TripSummary]]]:
+    groups: Dict[GroupKey, List[Tuple[int, TripSummary]]] = {}
+    for index, summary in summaries:
+        groups.setdefault(group_key(summary), []).append((index, summary))
+    return groups
+
+
+async def stream_batch_workflow(
+    inputs: List[Dict[str, Any]], concurrency: Optional[int] = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Plan every workflow input of a batch. Yields (event, payload):
+        group   {"items": [index, ...], "location", "theme", "mbtis", "pois"}   POIs of a group are in
+        item    {"index", "data"}    final_output of one input (same shape as run_autogen_workflow)
+        error   {"index", "error"}   the exception one input failed with; the others carry on
+    """
+    limit = asyncio.Semaphore(max(1, concurrency or PLAN_BATCH_CONCURRENCY))
+    events: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def limited(coro: Awaitable[T]) -> T:
+        async with limit:
+            return await coro
+
+    async def summarize(index: int) -> Optional[Tuple[int, TripSummary]]:
+        try:
+            return index, await limited(summarize_stage(inputs[index]))
+        except Exception as e:
+            await events.put(("error", {"index": index, "error": e}))
+            return None
+
+    async def plan(index: int, summary: TripSummary, pois: List[Dict[str, Any]]) -> None:
+        try:
+            # Items of a group share the POI dicts; each plan gets its own copies
+            handoff = PoiHandoff(summary=summary, pois=[dict(poi) for poi in pois])
+            final_output = await limited(plan_stage(handoff, inputs[index]))
+            if final_output is None:
+                raise Exception("plan_agent returned no itinerary")
+        except Exception as e:
+            await events.put(("error", {"index": index, "error": e}))
+        else:
+            await events.put(("item", {"index": index, "data": final_output}))
+
+    async def run_group(members: List[Tuple[int, TripSummary]]) -> None:
+        first = members[0][1]
+        mbtis = list(dict.fromkeys(summary.mbti for _, summary in members))
+        try:
+            with span("poi_gathering", location=first.location, batch_items=len(members)):
+                pois_by_mbti = await limited(gather_activity_pois_by_mbti(
+                    location=first.location,
+                    mbtis=mbtis,
+                    theme=first.theme,
+                    inclusion=first.inclusion or None,
+                    discover_web=WEB_DISCOVERY_ENABLED,
+                ))
+        except Exception as e:
+            for index, _ in members:
+                await events.put(("error", {"index": index, "error": e}))
+            return
+        await events.put(("group", {
+            "items": [index for index, _ in members],
+            "location": first.location,
+            "theme": first.theme,
+            "mbtis": mbtis,
+            "pois": max((len(pois) for pois in pois_by_mbti.values()), default=0),
+        }))
+        await asyncio.gather(*(plan(index, summary, pois_by_mbti[summary.mbti]) for index, summary in members))
+
+    async def run() -> None:
+        try:
+            summaries = [s for s in await asyncio.gather(*(summarize(i) for i in range(len(inputs)))) if s is not None]
+            groups = group_summaries(summaries)
+            print(f"📚 batch: {len(inputs)} trips in {len(groups)} destination groups")
+            await asyncio.gather(*(run_group(members) for members in groups.values()))
+        finally:
+            await events.put(done)
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            item = await events.get()
+            if item is done:
+                break
+            yield item
+        await task  # re-raise anything that escaped the per-item handlers
+    finally:
+        task.cancel()
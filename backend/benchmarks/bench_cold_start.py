@@ -0,0 +1,172 @@
+"""
+Cold start benchmark: how long a fresh worker takes before it can answer requests.
+
+For each of --runs fresh interpreters it measures
+  - import_ms   `import app` (with the in-memory MongoDB stand-in), from the interpreter's own clock
+  - ready_ms    process spawn until GET /health answers through uvicorn
+  - first_agent_ms  building the model client and the agents on first use (--agents)
+and reports the median, plus the slowest imports from `python -X importtime`.
+
+The run fails (exit code 1) when the median import or ready time is over --budget-ms, so it can
+guard cold start for autoscaled workers in CI. Results are compared with the stored baseline in
+benchmarks/baselines/cold_start.json; --save-baseline replaces it. Baselines are machine
+dependent, so refresh them on the machine you compare on.
+
+Usage (from backend/):
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --runs 10 --budget-ms 1500 --agents
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "cold_start.json"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.bench_e2e import free_port, wait_until_up  # noqa: E402
+
+# Run in the child interpreter; prints one JSON line with its timings
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from benchmarks.fake_mongo import install
+install()
+import app
+result = {"import_ms": (time.perf_counter() - start) * 1000,
+          "autogen_imported": any(m.split(".")[0] in ("autogen_agentchat", "autogen_core", "autogen_ext") for m in sys.modules)}
+if "--agents" in sys.argv:
+    import asyncio
+    start = time.perf_counter()
+    asyncio.run(app.preload_agents())
+    result["first_agent_ms"] = (time.perf_counter() - start) * 1000
+print(json.dumps(result))
+"""
+
+
+def child_env() -> Dict[str, str]:
+    return {
+        **os.environ,
+        "MONGODB_URI": "mongodb://stand-in",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "bench"),
+        "PLAN_JOB_WORKERS": "0",
+        "PRELOAD_AGENTS": "false",
+        "PYTHONPATH": str(BACKEND_DIR),
+    }
+
+
+def measure_import(agents: bool) -> Dict[str, Any]:
+    cmd = [sys.executable, "-c", _IMPORT_PROBE] + (["--agents"] if agents else [])
+    # Run from another directory: the app must not depend on the working directory
+    out = subprocess.run(cmd, cwd=BACKEND_DIR.parent, env=child_env(), capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+async def measure_ready() -> float:
+    port = free_port()
+    cmd = [sys.executable, str(BACKEND_DIR / "benchmarks" / "bench_e2e.py"), "--serve-app", str(port)]
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=child_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        await wait_until_up(f"http://127.0.0.1:{port}/health", timeout=60.0)
+        return (time.perf_counter() - start) * 1000
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def slowest_imports(top: int) -> List[Tuple[str, float]]:
+    """Top-level packages by cumulative import time, from -X importtime"""
+    cmd = [sys.executable, "-X", "importtime", "-c", _IMPORT_PROBE]
+    out = subprocess.run(cmd, cwd=BACKEND_DIR.parent, env=child_env(), capture_output=True, text=True, check=True)
+    totals: Dict[str, float] = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            micros = int(cumulative.strip())
+        except ValueError:  # header line
+            continue
+        # Only modules imported directly by the probe or app.py (two levels of nesting)
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            totals[name.strip()] = max(totals.get(name.strip(), 0), micros / 1000)
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+
+def median(values: List[float]) -> Optional[float]:
+    return round(statistics.median(values), 1) if values else None
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    imports = [measure_import(args.agents) for _ in range(args.runs)]
+    ready = [await measure_ready() for _ in range(args.runs)] if not args.skip_ready else []
+    result = {
+        "runs": args.runs,
+        "import_ms": median([r["import_ms"] for r in imports]),
+        "ready_ms": median(ready),
+        "autogen_imported": any(r["autogen_imported"] for r in imports),
+    }
+    if args.agents:
+        result["first_agent_ms"] = median([r["first_agent_ms"] for r in imports])
+    result["slowest_imports"] = [[name, round(ms, 1)] for name, ms in slowest_imports(args.top)]
+    return result
+
+
+def print_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]], budget_ms: float) -> None:
+    print(f"\nCold start over {result['runs']} runs (median), budget {budget_ms:.0f} ms")
+    print(f"  {'metric':<16} {'value':>10} {'baseline':>10} {'change':>8}")
+    for key in ("import_ms", "ready_ms", "first_agent_ms"):
+        if key not in result:
+            continue
+        value, base = result[key], (baseline or {}).get(key)
+        change = f"{(value - base) / base:+.0%}" if isinstance(value, (int, float)) and isinstance(base, (int, float)) and base else ""
+        print(f"  {key:<16} {value if value is not None else '-':>10} {base if base is not None else '-':>10} {change:>8}")
+    if result["autogen_imported"]:
+        print("  warning: importing app.py imported autogen; agents are no longer built lazily")
+    print("  slowest imports:")
+    for name, ms in result["slowest_imports"]:
+        print(f"    {ms:>8.1f} ms  {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2000.0, help="Fail when the median import or ready time is above this")
+    parser.add_argument("--agents", action="store_true", help="Also time building the model client and agents on first use")
+    parser.add_argument("--skip-ready", action="store_true", help="Only time the import, don't start uvicorn")
+    parser.add_argument("--top", type=int, default=12, help="Number of slowest imports to list")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="Write the result JSON to this path")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else None
+    print_report(result, baseline, args.budget_ms)
+
+    if args.save_baseline:
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_PATH.write_text(json.dumps({**result, "settings": {"runs": args.runs}}, indent=2, sort_keys=True) + "\n")
+        print(f"\nSaved baseline to {BASELINE_PATH}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+
+    over = [k for k in ("import_ms", "ready_ms") if result.get(k) is not None and result[k] > args.budget_ms]
+    if over:
+        print(f"\nOver the {args.budget_ms:.0f} ms cold start budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark tools/day_planner.py against the LLM-only plan_agent path.
+
+The algorithmic planner runs over synthetic POI sets (hundreds of POIs, trips up to 60 days)
+and reports wall time and total walking/transit distance. With --llm, plan_agent plans the
+same (small) input so latency, tokens and route length can be compared side by side;
+that part calls the OpenAI API configured in .env.
+
+Usage (from backend/):
+    python benchmarks/bench_day_planner.py
+    python benchmarks/bench_day_planner.py --llm --llm-days 3
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.day_planner import build_itinerary, haversine_matrix  # noqa: E402
+
+SIZES = [(50, 20, 3), (200, 60, 7), (500, 150, 14), (1000, 300, 30), (1000, 300, 60)]
+
+
+def synthetic_pois(n_activities: int, n_restaurants: int, seed: int = 42) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    types = [["museum"], ["park"], ["art_gallery"], ["tourist_attraction"], ["shopping_mall"]]
+    pois = [
+        {"name": f"Activity {i}", "address": f"{i} Example St", "lat": 35.55 + rng.random() * 0.25,
+         "lng": 139.55 + rng.random() * 0.35, "rating": round(3.5 + rng.random() * 1.5, 1), "price_level": None,
+         "types": rng.choice(types), "place_id": f"act-{i}", "source": "api", "score": rng.randint(60, 100)}
+        for i in range(n_activities)
+    ]
+    pois += [
+        {"name": f"Restaurant {i}", "address": f"{i} Food St", "lat": 35.55 + rng.random() * 0.25,
+         "lng": 139.55 + rng.random() * 0.35, "rating": round(4.0 + rng.random(), 1), "price_level": 2,
+         "types": ["restaurant"], "place_id": f"res-{i}", "source": "nearby_api", "category": "restaurant"}
+        for i in range(n_restaurants)
+    ]
+    return pois
+
+
+def itinerary_km(plan: Dict[str, Any]) -> float:
+    """Total km between consecutive stops (activities and meals) over all days"""
+    total = 0.0
+    for day in plan.get("itinerary", []):
+        stops = [e["poi"] for e in day.get("activities", []) if e.get("poi", {}).get("lat") is not None]
+        if len(stops) > 1:
+            dist = haversine_matrix([s["lat"] for s in stops], [s["lng"] for s in stops])
+            total += float(sum(dist[i, i + 1] for i in range(len(stops) - 1)))
+    return round(total, 2)
+
+
+def bench_algorithmic(repeat: int) -> None:
+    print(f"{'activities':>10} {'restaurants':>11} {'days':>5} {'best_ms':>9} {'km':>9}")
+    for n_act, n_res, days in SIZES:
+        pois = synthetic_pois(n_act, n_res)
+        summary = {"theme": "Culture", "location": "Tokyo", "days": days, "start": "2025-08-01", "mbti": "INFP"}
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            plan = build_itinerary(summary, pois)
+            timings.append(time.perf_counter() - start)
+        print(f"{n_act:>10} {n_res:>11} {days:>5} {min(timings) * 1000:>9.1f} {itinerary_km(plan):>9}")
+
+
+async def bench_llm(days: int) -> None:
+    from agents.plan_agent import get_plan_agent
+    from autogen_itinerary import extract_final_output
+    from benchmarks.compare_engines import meter_llm_calls
+
+    pois = synthetic_pois(days * 4, days * 2)
+    summary = {"theme": "Culture", "location": "Tokyo", "days": days, "start": "2025-08-01", "mbti": "INFP"}
+    task = json.dumps({**summary, "pois": pois}) + "\n\nPlan the itinerary from these POIs based on the criteria described in your system instructions."
+
+    start = time.perf_counter()
+    plan = build_itinerary(summary, pois)
+    algo_ms = (time.perf_counter() - start) * 1000
+
+    with meter_llm_calls() as usage:
+        start = time.perf_counter()
+        result = await get_plan_agent().run(task=task)
+        llm_s = time.perf_counter() - start
+    output = extract_final_output(result.messages, {}) or {}
+    llm_plan = output.get("itinerary") or {}
+
+    print(f"\nSame input ({len(pois)} POIs, {days} days):")
+    print(f"  algorithmic: {algo_ms:.1f} ms, {itinerary_km(plan)} km, 0 tokens")
+    print(
+        f"  plan_agent:  {llm_s * 1000:.0f} ms, {itinerary_km(llm_plan) if isinstance(llm_plan, dict) else 'n/a'} km, "
+        f"{usage.prompt_tokens + usage.completion_tokens} tokens in {usage.calls} call(s)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--llm", action="store_true", help="Also time plan_agent on a small input (uses the OpenAI API)")
+    parser.add_argument("--llm-days", type=int, default=3)
+    args = parser.parse_args()
+
+    bench_algorithmic(args.repeat)
+    if args.llm:
+        asyncio.run(bench_llm(args.llm_days))
+
+
+if __name__ == "__main__":
+    main()
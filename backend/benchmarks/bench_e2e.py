@@ -0,0 +1,312 @@
+"""
+End-to-end /plan benchmark against local stand-ins, without spending API quota.
+
+Starts benchmarks/fake_services.py (Places, Tavily, OpenAI-compatible chat) and the FastAPI
+app from app.py (with the in-memory MongoDB stand-in from benchmarks/fake_mongo.py unless
+--mongo-uri is given) as subprocesses, drives concurrent POST /plan load and reports
+  - latency p50 / p95 / p99 and requests/sec
+  - external calls per plan (Places text / nearby, Tavily, OpenAI) and LLM tokens per plan
+  - app memory: RSS growth per request and peak RSS (Linux /proc)
+
+Results are compared with the stored baseline for the same scenario in
+benchmarks/baselines/e2e.json; --save-baseline replaces it. Baselines are machine
+dependent, so refresh them on the machine you compare on.
+
+Usage (from backend/):
+    python benchmarks/bench_e2e.py
+    python benchmarks/bench_e2e.py --engine magentic --requests 40 --concurrency 8
+    python benchmarks/bench_e2e.py --planner-mode algorithmic --llm-latency-ms 800 --save-baseline
+    python benchmarks/bench_e2e.py --batch-size 50 --requests 50   # one POST /plan/batch instead of 50 /plan
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "e2e.json"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.fake_services import FakeConfig  # noqa: E402
+
+QUERIES = [
+    "Plan a 3-day trip to Tokyo focused on technology and culture.",
+    "2 days in Paris, I love quiet museums and cafes.",
+    "3-day trip to Rome with history and food.",
+    "2 days in London, parks and galleries.",
+    "4-day trip to New York, art and pizza.",
+    "2 days in Los Angeles, beaches and film.",
+]
+MBTIS = ["ENFJ", "INFP", "ISTJ", "ESTP"]
+SERVICE_KEYS = ["places_text", "places_nearby", "tavily", "web_page", "openai"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_kb(pid: int, field: str = "VmRSS") -> Optional[int]:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+async def wait_until_up(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url, timeout=1.0)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def serve_app(port: int) -> None:
+    """Subprocess entry point: run app.py with uvicorn (MongoDB stand-in unless MONGODB_URI is real)"""
+    import uvicorn
+    if os.environ.get("MONGODB_URI", "").startswith("mongodb://stand-in"):
+        from benchmarks.fake_mongo import install
+        install()
+    import app
+    uvicorn.run(app.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def scenario_name(args: argparse.Namespace) -> str:
+    if args.batch_size:
+        return f"batch{args.batch_size}-{args.planner_mode}" + ("-warm" if args.warm_caches else "")
+    return f"{args.engine}-{args.planner_mode}-c{args.concurrency}" + ("-warm" if args.warm_caches else "")
+
+
+def start_processes(args: argparse.Namespace, fake_port: int, app_port: int, log) -> List[subprocess.Popen]:
+    fake_cmd = [sys.executable, str(BACKEND_DIR / "benchmarks" / "fake_services.py"), "--port", str(fake_port)]
+    for name in vars(FakeConfig()):
+        fake_cmd += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+
+    fake_base = f"http://127.0.0.1:{fake_port}"
+    env = {
+        **os.environ,
+        "GOOGLE_PLACES_BASE_URL": f"{fake_base}/maps/api/place",
+        "TAVILY_BASE_URL": fake_base,
+        "OPENAI_BASE_URL": f"{fake_base}/v1",
+        "OPENAI_API_KEY": "bench",
+        "GOOGLE_PLACES_API_KEY": "bench",
+        "TAVILY_API_KEY": "bench",
+        "MONGODB_URI": args.mongo_uri or "mongodb://stand-in",
+        "MONGODB_DB": "trip_agent_bench",
+        "PLAN_ENGINE": args.engine,
+        "PLANNER_MODE": args.planner_mode,
+        # Nothing is read from or written to the persistent caches; by default no cache at all,
+        # so external calls per plan are the full cost of a plan
+        "PLACES_CACHE_PATH": "",
+        "POI_STORE_PATH": ":memory:",
+        "PLACES_CACHE_ENABLED": "true" if args.warm_caches else "false",
+        "POI_STORE_ENABLED": "true" if args.warm_caches else "false",
+        "LLM_CACHE_ENABLED": "true" if args.warm_caches else "false",
+        "LLM_CACHE_PATH": "",
+        "PYTHONPATH": str(BACKEND_DIR),
+    }
+    app_cmd = [sys.executable, str(Path(__file__).resolve()), "--serve-app", str(app_port)]
+    return [
+        subprocess.Popen(fake_cmd, cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT),
+        subprocess.Popen(app_cmd, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT),
+    ]
+
+
+def request_body(index: int, unique: bool) -> Dict[str, Any]:
+    query = QUERIES[index % len(QUERIES)]
+    if unique:
+        # Different wording per request so coalescing / plan reuse never kick in
+        query = f"{query} (variant {index})"
+    return {"mbti": MBTIS[index % len(MBTIS)], "budget": 1000 + 100 * (index % 10), "query": query}
+
+
+async def drive_load(app_url: str, n: int, concurrency: int, unique: bool, timeout: float) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    async def one(client: httpx.AsyncClient, index: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{app_url}/plan", json=request_body(index, unique), timeout=timeout)
+                ok = response.status_code == 200 and (response.json().get("data") or {}).get("itinerary")
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors.append(f"{response.status_code}: {response.text[:120]}")
+            except httpx.HTTPError as e:
+                errors.append(repr(e))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(n)))
+        wall = time.perf_counter() - start
+    return {"latencies": latencies, "errors": errors, "wall": wall}
+
+
+async def drive_batch_load(app_url: str, n: int, batch_size: int, unique: bool, timeout: float) -> Dict[str, Any]:
+    """POST /plan/batch with batch_size items per request; an item's latency is until its SSE event"""
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    async def one_batch(client: httpx.AsyncClient, indices: List[int]) -> None:
+        start = time.perf_counter()
+        body = {"items": [request_body(i, unique) for i in indices]}
+        try:
+            async with client.stream("POST", f"{app_url}/plan/batch", json=body, timeout=timeout) as response:
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                    elif line.startswith("data: ") and event in ("item", "error"):
+                        payload = json.loads(line[len("data: "):])
+                        if event == "item" and (payload.get("data") or {}).get("itinerary"):
+                            latencies.append(time.perf_counter() - start)
+                        else:
+                            errors.append(f"{payload.get('status_code')}: {str(payload.get('detail'))[:120]}")
+        except httpx.HTTPError as e:
+            errors.append(repr(e))
+
+    batches = [list(range(i, min(n, i + batch_size))) for i in range(0, n, batch_size)]
+    async with httpx.AsyncClient() as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one_batch(client, indices) for indices in batches))
+        wall = time.perf_counter() - start
+    return {"latencies": latencies, "errors": errors, "wall": wall}
+
+
+def summarize(load: Dict[str, Any], stats: Dict[str, int], n: int, rss_before: Optional[int], rss_after: Optional[int], peak: Optional[int]) -> Dict[str, Any]:
+    latencies = np.array(load["latencies"]) * 1000
+    ok = len(latencies)
+    per_plan = max(ok, 1)
+    result = {
+        "requests": n,
+        "ok": ok,
+        "errors": len(load["errors"]),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1) if ok else None,
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1) if ok else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1) if ok else None,
+        "rps": round(ok / load["wall"], 2) if load["wall"] else 0.0,
+        "calls_per_plan": {key: round(stats.get(key, 0) / per_plan, 2) for key in SERVICE_KEYS},
+        "llm_calls_by_role": {k.split(":", 1)[1]: round(v / per_plan, 2) for k, v in sorted(stats.items()) if k.startswith("openai:")},
+        "llm_calls_by_model": {k.split(":", 1)[1]: round(v / per_plan, 2) for k, v in sorted(stats.items()) if k.startswith("openai_model:")},
+        "tokens_per_plan": round((stats.get("prompt_tokens", 0) + stats.get("completion_tokens", 0)) / per_plan),
+    }
+    if rss_before is not None and rss_after is not None:
+        result["rss_growth_kb_per_request"] = round((rss_after - rss_before) / n, 1)
+        result["peak_rss_mb"] = round((peak or rss_after) / 1024, 1)
+    return result
+
+
+def print_report(name: str, result: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"\nScenario {name}: {result['ok']}/{result['requests']} ok, {result['errors']} errors")
+    rows = [("p50_ms", result["p50_ms"]), ("p95_ms", result["p95_ms"]), ("p99_ms", result["p99_ms"]), ("rps", result["rps"]),
+            ("tokens_per_plan", result["tokens_per_plan"])]
+    rows += [(f"calls/{k}", v) for k, v in result["calls_per_plan"].items()]
+    rows += [(k, result[k]) for k in ("rss_growth_kb_per_request", "peak_rss_mb") if k in result]
+    print(f"  {'metric':<28} {'value':>10} {'baseline':>10} {'change':>8}")
+    for key, value in rows:
+        base = None
+        if baseline:
+            base = baseline["calls_per_plan"].get(key.split("/", 1)[1]) if key.startswith("calls/") else baseline.get(key)
+        change = f"{(value - base) / base:+.0%}" if isinstance(value, (int, float)) and isinstance(base, (int, float)) and base else ""
+        print(f"  {key:<28} {value if value is not None else '-':>10} {base if base is not None else '-':>10} {change:>8}")
+    print(f"  LLM calls per plan by role: {result['llm_calls_by_role']}")
+    print(f"  LLM calls per plan by model: {result['llm_calls_by_model']}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fake_port, app_port = free_port(), free_port()
+    log = open(args.log, "w") if args.log else subprocess.DEVNULL
+    processes = start_processes(args, fake_port, app_port, log)
+    fake_url, app_url = f"http://127.0.0.1:{fake_port}", f"http://127.0.0.1:{app_port}"
+    try:
+        await wait_until_up(f"{fake_url}/_stats")
+        await wait_until_up(f"{app_url}/health")
+        if args.warmup:
+            await drive_load(app_url, args.warmup, min(args.concurrency, args.warmup), True, args.timeout)
+        async with httpx.AsyncClient() as client:
+            await client.post(f"{fake_url}/_reset")
+        app_pid = processes[1].pid
+        rss_before = rss_kb(app_pid)
+        if args.batch_size:
+            load = await drive_batch_load(app_url, args.requests, args.batch_size, not args.repeat_queries, args.timeout)
+        else:
+            load = await drive_load(app_url, args.requests, args.concurrency, not args.repeat_queries, args.timeout)
+        rss_after, peak = rss_kb(app_pid), rss_kb(app_pid, "VmHWM")
+        async with httpx.AsyncClient() as client:
+            stats = (await client.get(f"{fake_url}/_stats")).json()
+        for error in load["errors"][:5]:
+            print(f"  error: {error}")
+        return summarize(load, stats, args.requests, rss_before, rss_after, peak)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if log is not subprocess.DEVNULL:
+            log.close()
+
+
+def main() -> None:
+    if len(sys.argv) == 3 and sys.argv[1] == "--serve-app":
+        serve_app(int(sys.argv[2]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=["magentic", "pipeline"], default="pipeline")
+    parser.add_argument("--planner-mode", choices=["llm", "algorithmic"], default="llm")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=6)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=0, help="Send the requests as POST /plan/batch of this many items (pipeline stages, PLAN_BATCH_CONCURRENCY)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--repeat-queries", action="store_true", help="Reuse the same few queries (lets coalescing and caches help)")
+    parser.add_argument("--warm-caches", action="store_true", help="Keep the places cache, POI store and LLM completion cache enabled")
+    parser.add_argument("--mongo-uri", help="Use a real MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--log", help="Write fake service and app output to this file")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="Write the result JSON to this path")
+    for name, value in vars(FakeConfig()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    name = scenario_name(args)
+    baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    print_report(name, result, baselines.get(name))
+
+    if args.save_baseline:
+        baselines[name] = {**result, "settings": {k: getattr(args, k) for k in ("requests", "concurrency", *vars(FakeConfig()))}}
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"\nSaved baseline '{name}' to {BASELINE_PATH}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Micro-benchmark of the step after the workflow: plan_agent reply -> /plan response bytes.
+
+  legacy  print the raw reply, strip fences, regex, json.loads, deep-copy the input through
+          json.dumps/loads, json.dumps(indent=2) for a 500-char log line, then let the
+          response model validate and serialize the body (pydantic, data: Any)
+  fast    utils.extract_json_text + orjson + ItineraryPlan validation (plan_schema.parse_plan_output),
+          PlanJSONResponse rendering with orjson
+
+Itineraries are generated with compact POI references in the agent reply (as plan_agent writes
+them) and full POI details in the response body (as after rehydration), for several trip lengths.
+
+Usage (from backend/):
+    python benchmarks/bench_plan_output.py
+    python benchmarks/bench_plan_output.py --days 3 14 30 60 --repeat 200
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from pydantic import BaseModel, Field
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from plan_schema import PlanJSONResponse, parse_plan_output  # noqa: E402
+from utils import orjson  # noqa: E402
+
+INPUT = {"mbti": "INFP", "Budget": 2000, "Query": "Plan a relaxed trip to Tokyo with museums and ramen"}
+
+
+class ItineraryResponse(BaseModel):
+    """Same as app.ItineraryResponse (app.py is not imported: it connects to MongoDB)"""
+    session_id: str
+    data: Any = Field(..., description="Original itinerary JSON data")
+
+
+def full_poi(rng: random.Random, i: int) -> Dict[str, Any]:
+    return {
+        "name": f"Example Place {i}",
+        "address": f"{rng.randint(1, 9)} Chome-{rng.randint(1, 30)}-{rng.randint(1, 20)} Shibuya, Shibuya City, Tokyo, Japan",
+        "lat": 35.6 + rng.random() * 0.15, "lng": 139.6 + rng.random() * 0.2,
+        "rating": round(3.5 + rng.random() * 1.5, 1), "price_level": rng.choice([None, 1, 2]),
+        "types": ["museum", "tourist_attraction", "point_of_interest", "establishment"],
+        "place_id": f"ChIJ{rng.getrandbits(96):024x}", "source_query": "quiet museum experience in Tokyo",
+        "source": "api", "score": round(60 + rng.random() * 40, 2),
+    }
+
+
+def make_plan(days: int, per_day: int = 6, seed: int = 7) -> Tuple[str, Dict[str, Any]]:
+    """(plan_agent reply with compact POIs, rehydrated plan with full POIs)"""
+    rng = random.Random(seed)
+    header = {"theme": "Culture", "location": "Tokyo", "days": days, "start": "2025-08-01", "end": "2025-08-30",
+              "mbti": "INFP", "inclusion": [], "exclusion": []}
+    compact_days, full_days = [], []
+    for d in range(days):
+        pois = [full_poi(rng, d * per_day + k) for k in range(per_day)]
+        times = [f"{9 + k * 2}:00" for k in range(per_day)]
+        compact_days.append({"day": f"Day {d + 1}", "activities": [
+            {"time": t, "poi": {"id": p["place_id"], "n": p["name"]}} for t, p in zip(times, pois)]})
+        full_days.append({"day": f"Day {d + 1}", "activities": [{"time": t, "poi": p} for t, p in zip(times, pois)]})
+    reply = "```json\n" + json.dumps({**header, "itinerary": compact_days}, indent=2) + "\n```\nTERMINATE"
+    return reply, {**header, "itinerary": full_days}
+
+
+def legacy(reply: str, full_plan: Dict[str, Any]) -> bytes:
+    print(reply)
+    raw = reply.split("TERMINATE")[0].strip()
+    if raw.startswith("```json"):
+        raw = raw[len("```json"):].strip()
+    if raw.endswith("```"):
+        raw = raw[:-3].strip()
+    match = re.search(r'```json\s*\n(.*?)\n```', raw, re.DOTALL)
+    json.loads(match.group(1).strip() if match else raw)
+    plan = full_plan  # rehydration is the same in both paths and left out
+    original_input = json.loads(json.dumps(INPUT))
+    body = {"session_id": "bench", "data": {"success": True, "itinerary": plan, "original_request": original_input}}
+    print(f"Plan agent output structure: {json.dumps(plan, indent=2)[:500]}...")
+    return ItineraryResponse.model_validate(body).model_dump_json().encode("utf-8")
+
+
+def fast(reply: str, full_plan: Dict[str, Any]) -> bytes:
+    parse_plan_output(reply)
+    plan = full_plan
+    body = {"session_id": "bench", "data": {"success": True, "itinerary": plan, "original_request": dict(INPUT)}}
+    print(f"Successfully formatted itinerary: {len(plan['itinerary'])} days")
+    return PlanJSONResponse(body).body
+
+
+def time_per_call(fn: Callable[[], Any], repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[3, 14, 30, 60])
+    parser.add_argument("--per-day", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"JSON backend: {'orjson ' + orjson.__version__ if orjson else 'json (orjson not installed)'}\n")
+    print(f"{'days':>5} {'reply KB':>9} {'body KB':>8} {'legacy ms':>10} {'fast ms':>8} {'speedup':>8}")
+    rows: List[Tuple[int, float, float, float, float]] = []
+    with open(os.devnull, "w") as devnull:
+        for days in args.days:
+            reply, full_plan = make_plan(days, args.per_day)
+            with contextlib.redirect_stdout(devnull):
+                assert json.loads(legacy(reply, full_plan)) == json.loads(fast(reply, full_plan))
+                legacy_s = time_per_call(lambda: legacy(reply, full_plan), args.repeat)
+                fast_s = time_per_call(lambda: fast(reply, full_plan), args.repeat)
+                body_kb = len(fast(reply, full_plan)) / 1024
+            rows.append((days, len(reply) / 1024, body_kb, legacy_s * 1000, fast_s * 1000))
+    for days, reply_kb, body_kb, legacy_ms, fast_ms in rows:
+        print(f"{days:>5} {reply_kb:>9.1f} {body_kb:>8.1f} {legacy_ms:>10.2f} {fast_ms:>8.2f} {legacy_ms / fast_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
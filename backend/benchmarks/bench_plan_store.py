@@ -0,0 +1,192 @@
+"""
+Storage size and read latency of stored plans: embedded POIs (the old format) vs plan_store.py.
+
+Plans are built with tools/day_planner.py from a pool of Places-like POIs per city, so popular
+places recur across plans the way they do in production. Both formats are written to their
+own collections, then
+  - size: BSON bytes of the plan records (plus the shared "pois" collection for the new format)
+  - read: find_one by session_id (one plan) and find of the latest --page plans, each
+    returning fully rehydrated itineraries
+  - listing: GET /trips pages (summaries only) for one location, first and last page; with a
+    real MongoDB the winning plan of the filtered listing query is printed as well
+
+Without --mongodb-uri the in-memory stand-in (benchmarks/fake_mongo.py) is used: sizes are
+exact BSON sizes, latencies are only indicative (the stand-in scans and copies every matching
+document and has no network). With a URI the collections are created
+in a scratch database (--db) that is dropped afterwards, and collStats sizes are reported too.
+
+Usage (from backend/):
+    python benchmarks/bench_plan_store.py --plans 2000
+    python benchmarks/bench_plan_store.py --plans 5000 --mongodb-uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+import bson
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_poi_tokens import synthetic_pois  # noqa: E402
+from plan_store import LISTING_ORDER, PLAN_STORE_COMPRESS_MIN_BYTES, PlanStore  # noqa: E402
+from tools.day_planner import build_itinerary  # noqa: E402
+
+CITIES = ["Tokyo", "Paris", "London", "New York", "Seoul", "Barcelona"]
+MBTIS = ["INTJ", "INFP", "ESTP", "ESFJ", "ENFP", "ISTJ"]
+
+
+def synthetic_records(n_plans: int, seed: int = 11) -> List[Dict[str, Any]]:
+    """Plan records as app.save_plan_record writes them"""
+    rng = random.Random(seed)
+    pools = {city: synthetic_pois(40, 20, seed=i) for i, city in enumerate(CITIES)}
+    now = datetime.now(timezone.utc)
+    records = []
+    for i in range(n_plans):
+        city, mbti, days = rng.choice(CITIES), rng.choice(MBTIS), rng.randint(2, 6)
+        pois = rng.sample(pools[city], 30)
+        summary = {"theme": "Culture", "location": city, "days": days, "start": "2025-08-01", "mbti": mbti}
+        query = f"{days} days in {city}, museums and local food"
+        user_input = {"mbti": mbti, "budget": 2000, "query": query, "current_itinerary": None, "session_id": None}
+        data = {
+            "success": True,
+            "itinerary": build_itinerary(summary, pois),
+            "original_request": {"mbti": mbti, "Budget": 2000, "Query": query},
+            "extracted_metadata": {"query": query, "mbti": mbti, "budget": 2000},
+        }
+        created = now - timedelta(seconds=n_plans - i)
+        records.append({"session_id": str(uuid.uuid4()), "input_hash": uuid.uuid4().hex, "user_input": user_input,
+                        "data": data, "created_at": created, "updated_at": created})
+    return records
+
+
+async def timed(fn: Callable[[], Awaitable[Any]], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {"p50_ms": statistics.median(timings), "p95_ms": timings[int(len(timings) * 0.95) - 1]}
+
+
+async def collection_bytes(db: Any, name: str, real: bool) -> Dict[str, int]:
+    collection = db.get_collection(name)
+    if real:
+        stats = await db.command("collStats", name)
+        return {"bson": stats.get("size", 0), "storage": stats.get("storageSize", 0)}
+    return {"bson": sum(len(bson.encode(doc)) for doc in collection.docs)}
+
+
+async def run(args: argparse.Namespace) -> None:
+    real = bool(args.mongodb_uri)
+    if real:
+        import motor.motor_asyncio
+        client = motor.motor_asyncio.AsyncIOMotorClient(args.mongodb_uri)
+    else:
+        from benchmarks.fake_mongo import FakeMotorClient
+        client = FakeMotorClient()
+    db = client[args.db]
+    legacy = db.get_collection("conversations_embedded")
+    store = PlanStore(db.get_collection("conversations"), db.get_collection("pois"), args.compress_min_bytes)
+
+    records = synthetic_records(args.plans)
+    try:
+        await legacy.create_index("session_id", unique=True)
+        await legacy.create_index("updated_at")
+        await store.create_indexes()
+        start = time.perf_counter()
+        for record in records:
+            await legacy.insert_one(dict(record))
+        legacy_write = time.perf_counter() - start
+        start = time.perf_counter()
+        for record in records:
+            await store.save(record)
+        store_write = time.perf_counter() - start
+
+        sizes = {
+            "embedded": await collection_bytes(db, "conversations_embedded", real),
+            "plans": await collection_bytes(db, "conversations", real),
+            "pois": await collection_bytes(db, "pois", real),
+        }
+        rng = random.Random(3)
+        sessions = [rng.choice(records)["session_id"] for _ in range(args.repeat)]
+        fields = ["session_id", "user_input", "data"]
+        projection = {"_id": 0, **{f: 1 for f in fields}}
+        picks = iter(sessions * 2)
+
+        reads = {
+            "one plan (embedded)": await timed(lambda: legacy.find_one({"session_id": next(picks)}, projection=projection), args.repeat),
+            "one plan (plan_store)": await timed(lambda: store.find_one({"session_id": next(picks)}, fields=fields), args.repeat),
+            f"latest {args.page} (embedded)": await timed(
+                lambda: legacy.find({}, projection, sort=[("updated_at", -1)], limit=args.page).to_list(None), args.repeat),
+            f"latest {args.page} (plan_store)": await timed(
+                lambda: store.find({}, fields=fields, sort=[("updated_at", -1)], limit=args.page), args.repeat),
+        }
+        # Cursor of the last page: follow next_cursor to the end
+        cursor = None
+        while True:
+            next_cursor = (await store.list_trips({"location": "tokyo"}, args.page, cursor))["next_cursor"]
+            if next_cursor is None:
+                break
+            cursor = next_cursor
+        reads[f"trips page {args.page} (first)"] = await timed(lambda: store.list_trips({"location": "tokyo"}, args.page), args.repeat)
+        reads[f"trips page {args.page} (last)"] = await timed(lambda: store.list_trips({"location": "tokyo"}, args.page, cursor), args.repeat)
+        if real:
+            explain = await store.plans.find(
+                {"has_itinerary": True, "trip.location_key": "tokyo"}, sort=LISTING_ORDER, limit=args.page
+            ).explain()
+            winning = explain["queryPlanner"]["winningPlan"]
+            stages = []
+            while winning:
+                stages.append(winning.get("stage") + (f"({winning['indexName']})" if winning.get("indexName") else ""))
+                winning = winning.get("inputStage")
+        # The new format must read back exactly what was saved
+        check = await store.find_one({"session_id": records[0]["session_id"]}, fields=["data"])
+        assert check["data"] == records[0]["data"], "rehydrated plan differs from the saved one"
+    finally:
+        if real:
+            await client.drop_database(args.db)
+            client.close()
+
+    embedded = sizes["embedded"]["bson"]
+    normalized = sizes["plans"]["bson"] + sizes["pois"]["bson"]
+    print(f"{args.plans} plans, {len(unique_places(records))} distinct places, compression from {args.compress_min_bytes} bytes"
+          f" ({'MongoDB' if real else 'in-memory stand-in'})\n")
+    print(f"{'storage':<24} {'bytes':>12} {'per plan':>10}")
+    print(f"{'embedded POIs':<24} {embedded:>12} {embedded // args.plans:>10}")
+    print(f"{'plans + pois':<24} {normalized:>12} {normalized // args.plans:>10}   ({1 - normalized / embedded:.0%} smaller)")
+    if real:
+        print(f"{'storageSize embedded':<24} {sizes['embedded']['storage']:>12}")
+        print(f"{'storageSize plans+pois':<24} {sizes['plans']['storage'] + sizes['pois']['storage']:>12}")
+    print(f"\nwrites: embedded {legacy_write / args.plans * 1000:.2f} ms/plan, plan_store {store_write / args.plans * 1000:.2f} ms/plan\n")
+    print(f"{'read':<28} {'p50_ms':>8} {'p95_ms':>8}")
+    for name, t in reads.items():
+        print(f"{name:<28} {t['p50_ms']:>8.2f} {t['p95_ms']:>8.2f}")
+    if real:
+        print(f"\nlisting plan: {' <- '.join(stages)}")
+
+
+def unique_places(records: List[Dict[str, Any]]) -> set:
+    return {e["poi"]["place_id"] for r in records for d in r["data"]["itinerary"]["itinerary"] for e in d["activities"]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=20, help="Plans per list read")
+    parser.add_argument("--repeat", type=int, default=200, help="Reads per measurement")
+    parser.add_argument("--compress-min-bytes", type=int, default=PLAN_STORE_COMPRESS_MIN_BYTES)
+    parser.add_argument("--mongodb-uri", default="", help="Benchmark against a real MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--db", default="bench_plan_store", help="Scratch database (dropped afterwards)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
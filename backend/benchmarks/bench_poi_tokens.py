@@ -0,0 +1,108 @@
+"""
+Token cost of handing POIs to agents: full dicts vs the compact wire format (tools/poi_model.py).
+
+Measures
+  - the gather_activity_pois tool result as the group chat sees it (str() of the list vs dumps_wire)
+  - the plan_agent task built by pipeline.build_plan_task
+  - one itinerary entry as plan_agent writes it back (full poi vs {"id", "n"})
+
+Input is a tests/sample_poi_list.json-style file (a JSON list of POI dicts); without one,
+Places-like POIs are generated. Tokens are counted with tiktoken when its encoding is
+available, otherwise estimated as characters / 4.
+
+Usage (from backend/):
+    python benchmarks/bench_poi_tokens.py
+    python benchmarks/bench_poi_tokens.py --input tests/sample_poi_list.json
+"""
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.poi_model import dumps_wire, to_wire  # noqa: E402
+
+SAMPLE_PATH = Path(__file__).resolve().parents[1] / "tests" / "sample_poi_list.json"
+
+
+def token_counter(encoding: str) -> Tuple[str, Callable[[str], int]]:
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding(encoding)
+        return f"tiktoken/{encoding}", lambda text: len(enc.encode(text))
+    except Exception:
+        return "estimate (chars/4)", lambda text: (len(text) + 3) // 4
+
+
+def synthetic_pois(n_activities: int = 24, n_restaurants: int = 12, seed: int = 7) -> List[Dict[str, Any]]:
+    """POIs shaped like gather_activity_pois output for a Tokyo trip"""
+    rng = random.Random(seed)
+    activity_types = [
+        ["museum", "tourist_attraction", "point_of_interest", "establishment"],
+        ["park", "tourist_attraction", "point_of_interest", "establishment"],
+        ["movie_theater", "shopping_mall", "cafe", "restaurant", "food", "point_of_interest", "store", "establishment"],
+        ["place_of_worship", "tourist_attraction", "point_of_interest", "establishment"],
+    ]
+    pois = []
+    for i in range(n_activities):
+        pois.append({
+            "name": f"Example Attraction {i}",
+            "address": f"{rng.randint(1, 9)} Chome-{rng.randint(1, 30)}-{rng.randint(1, 20)} Shibuya, Shibuya City, Tokyo 150-00{rng.randint(10, 99)}, Japan",
+            "lat": 35.6 + rng.random() * 0.15, "lng": 139.6 + rng.random() * 0.2,
+            "rating": round(3.5 + rng.random() * 1.5, 1), "price_level": None,
+            "types": rng.choice(activity_types),
+            "place_id": "ChIJ" + "".join(rng.choice("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-") for _ in range(23)),
+            "source_query": "quiet museum experience for INFP in Tokyo", "source": "api",
+            "score": round(60 + rng.random() * 40, 2),
+        })
+    for i in range(n_restaurants):
+        pois.append({
+            "name": f"Example Ramen {i}", "address": f"{rng.randint(1, 9)}-{rng.randint(1, 30)} Dogenzaka, Shibuya City",
+            "lat": 35.6 + rng.random() * 0.15, "lng": 139.6 + rng.random() * 0.2,
+            "rating": round(4.0 + rng.random(), 1), "price_level": rng.choice([1, 2, None]),
+            "types": ["restaurant", "food", "point_of_interest", "establishment"],
+            "place_id": "ChIJ" + "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(23)),
+            "source": "nearby_api", "matched_keyword": "ramen", "category": "restaurant", "score": 79.0,
+        })
+    return pois
+
+
+def load_pois(path: str) -> List[Dict[str, Any]]:
+    source = Path(path) if path else SAMPLE_PATH
+    if source.exists() and source.stat().st_size > 0:
+        data = json.loads(source.read_text())
+        return data.get("pois", data) if isinstance(data, dict) else data
+    return synthetic_pois()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default="", help="JSON list of POI dicts (default: tests/sample_poi_list.json if non-empty)")
+    parser.add_argument("--encoding", default="o200k_base")
+    args = parser.parse_args()
+
+    pois = load_pois(args.input)
+    counter_name, count = token_counter(args.encoding)
+    summary = {"theme": "Culture", "location": "Tokyo", "days": 3, "start": "2025-08-01", "end": "2025-08-03", "mbti": "INFP"}
+
+    before_task = json.dumps({**summary, "budget": 2000, "pois": pois}, ensure_ascii=False)
+    after_task = json.dumps({**summary, "budget": 2000, "pois": json.loads(dumps_wire(pois))}, ensure_ascii=False, separators=(",", ":"))
+    entry_before = json.dumps({"time": "10:00 AM (2h)", "poi": pois[0]}, ensure_ascii=False)
+    entry_after = json.dumps({"time": "10:00 AM (2h)", "poi": {"id": to_wire(pois[0])["id"], "n": pois[0]["name"]}}, ensure_ascii=False)
+
+    rows = [
+        ("tool result (group chat)", count(str(pois)), count(dumps_wire(pois))),
+        ("plan_agent task (pipeline)", count(before_task), count(after_task)),
+        ("itinerary entry (output)", count(entry_before), count(entry_after)),
+    ]
+    print(f"{len(pois)} POIs, tokens counted with {counter_name}\n")
+    print(f"{'payload':<28} {'before':>8} {'after':>8} {'saved':>7}")
+    for name, before, after in rows:
+        print(f"{name:<28} {before:>8} {after:>8} {1 - after / before:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compare the Magentic-One engine with the direct pipeline engine on the same inputs.
+
+Reports, per engine and input: LLM calls, prompt/completion tokens and wall-clock latency.
+Uses the real OpenAI / Google Places APIs configured in .env, so every run costs quota.
+
+Usage (from backend/):
+    python benchmarks/compare_engines.py
+    python benchmarks/compare_engines.py --engines pipeline --repeat 3 --inputs my_inputs.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from observability import Trace, start_trace  # noqa: E402
+
+DEFAULT_INPUTS = [
+    {
+        "mbti": "ENFJ",
+        "Budget": 2000,
+        "Query": "Plan a 3-day trip to Tokyo, Japan focused on technology and culture. Include tech hubs and traditional temples.",
+    },
+    {
+        "mbti": "INFP",
+        "Budget": 1500,
+        "Query": "2 days in Paris, I love quiet museums and cafes. No nightlife.",
+    },
+]
+
+
+@dataclass
+class LLMUsage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @classmethod
+    def from_trace(cls, trace: Trace) -> "LLMUsage":
+        """
+        Every model call of the run, whichever agent or the orchestrator made it: each agent's client
+        is a MeteredChatCompletionClient, which opens an llm:<agent> span with the call's token usage
+        """
+        usage = cls()
+        for record in trace.spans:
+            if record.name.startswith("llm:"):
+                usage.calls += 1
+                usage.prompt_tokens += record.attributes.get("prompt_tokens", 0)
+                usage.completion_tokens += record.attributes.get("completion_tokens", 0)
+        return usage
+
+
+async def run_once(engine: str, workflow_input: Dict[str, Any]) -> Dict[str, Any]:
+    from autogen_itinerary import run_autogen_workflow
+
+    with start_trace(f"compare:{engine}") as trace:
+        start = time.perf_counter()
+        try:
+            output = await run_autogen_workflow(dict(workflow_input), engine=engine)
+            ok = bool(output and output.get("itinerary"))
+        except Exception as e:
+            print(f"❌ {engine} failed: {e}")
+            ok = False
+        latency = time.perf_counter() - start
+    usage = LLMUsage.from_trace(trace)
+
+    return {
+        "engine": engine,
+        "ok": ok,
+        "latency_s": round(latency, 2),
+        "llm_calls": usage.calls,
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+    }
+
+
+def print_report(rows: List[Dict[str, Any]]) -> None:
+    header = f"{'engine':<10} {'input':>5} {'ok':>3} {'latency_s':>10} {'llm_calls':>9} {'prompt_tok':>11} {'compl_tok':>10}"
+    print("\n" + header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['engine']:<10} {row['input']:>5} {'y' if row['ok'] else 'n':>3} {row['latency_s']:>10} "
+            f"{row['llm_calls']:>9} {row['prompt_tokens']:>11} {row['completion_tokens']:>10}"
+        )
+
+    print("\nMeans per engine:")
+    for engine in sorted({row["engine"] for row in rows}):
+        subset = [row for row in rows if row["engine"] == engine]
+        n = len(subset)
+        print(
+            f"  {engine:<10} latency={sum(r['latency_s'] for r in subset) / n:.2f}s "
+            f"calls={sum(r['llm_calls'] for r in subset) / n:.1f} "
+            f"tokens={sum(r['prompt_tokens'] + r['completion_tokens'] for r in subset) / n:.0f} "
+            f"success={sum(r['ok'] for r in subset)}/{n}"
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["magentic", "pipeline"])
+    parser.add_argument("--inputs", help="JSON file with a list of workflow inputs (mbti, Budget, Query)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="Write raw results as JSON to this path")
+    args = parser.parse_args()
+
+    inputs = json.loads(Path(args.inputs).read_text()) if args.inputs else DEFAULT_INPUTS
+    rows = []
+    for index, workflow_input in enumerate(inputs):
+        for _ in range(args.repeat):
+            # Alternate engines so neither one always runs against a warmer cache
+            for engine in args.engines:
+                row = await run_once(engine, workflow_input)
+                row["input"] = index
+                rows.append(row)
+
+    print_report(rows)
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,217 @@
+"""
+In-memory stand-in for the motor client, enough for what app.py does with MongoDB
+(ping, create_index, insert_one, find_one with simple filters/sort/projection, update_one,
+replace_one, bulk_write of UpdateOne upserts, find_one_and_update, count_documents).
+
+    from benchmarks.fake_mongo import install
+    install()      # before importing app
+"""
+import copy
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+
+def _get_path(doc: Dict[str, Any], path: str) -> Tuple[bool, Any]:
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in condition):
+                return False
+            continue
+        found, value = _get_path(doc, key)
+        if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            for op, expected in condition.items():
+                if op == "$exists" and found != bool(expected):
+                    return False
+                if op == "$in" and value not in expected:
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte") and not found:
+                    return False
+                if op == "$gt" and not value > expected:
+                    return False
+                if op == "$gte" and not value >= expected:
+                    return False
+                if op == "$lt" and not value < expected:
+                    return False
+                if op == "$lte" and not value <= expected:
+                    return False
+                if op == "$ne" and value == expected:
+                    return False
+        elif not found or value != condition:
+            return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {k: doc[k] for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id: Any):
+        self.inserted_id = inserted_id
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id: Any = None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self._docs = docs
+
+    def sort(self, key: Union[str, Sequence[Tuple[str, int]]], direction: int = 1) -> "FakeCursor":
+        keys = [(key, direction)] if isinstance(key, str) else list(key)
+        for field, order in reversed(keys):
+            self._docs.sort(key=lambda d: self._sort_key(d, field), reverse=order < 0)
+        return self
+
+    @staticmethod
+    def _sort_key(doc: Dict[str, Any], field: str) -> Tuple[bool, Any]:
+        value = _get_path(doc, field)[1]
+        return (value is not None, value if value is not None else 0)
+
+    def limit(self, n: int) -> "FakeCursor":
+        if n:
+            self._docs = self._docs[:n]
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._docs[:length] if length else list(self._docs)
+
+    def __aiter__(self):
+        self._iter = iter(self._docs)
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self.docs: List[Dict[str, Any]] = []
+        self._next_id = 0
+
+    async def create_index(self, keys: Any, **kwargs: Any) -> str:
+        return str(keys)
+
+    async def insert_one(self, document: Dict[str, Any]) -> InsertOneResult:
+        if "_id" not in document:
+            self._next_id += 1
+            document["_id"] = self._next_id
+        self.docs.append(copy.deepcopy(document))
+        return InsertOneResult(document["_id"])
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+             sort: Optional[Sequence[Tuple[str, int]]] = None, limit: int = 0, batch_size: int = 0) -> FakeCursor:
+        cursor = FakeCursor([_project(d, projection) for d in self.docs if _matches(d, query or {})])
+        if sort:
+            cursor.sort(sort)
+        return cursor.limit(limit)
+
+    async def find_one(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+                       sort: Optional[Sequence[Tuple[str, int]]] = None) -> Optional[Dict[str, Any]]:
+        docs = await self.find(query, projection, sort=sort, limit=1).to_list()
+        return docs[0] if docs else None
+
+    @staticmethod
+    def _apply(doc: Dict[str, Any], update: Dict[str, Any]) -> None:
+        for key, value in update.get("$set", {}).items():
+            doc[key] = copy.deepcopy(value)
+        for key, value in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + value
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        for doc in self.docs:
+            if _matches(doc, query):
+                self._apply(doc, update)
+                return UpdateResult(1, 1)
+        if upsert:
+            doc = {k: v for k, v in query.items() if not k.startswith("$")}
+            doc.update(update.get("$setOnInsert", {}))
+            doc.update(update.get("$set", {}))
+            result = await self.insert_one(doc)
+            return UpdateResult(0, 0, result.inserted_id)
+        return UpdateResult(0, 0)
+
+    async def replace_one(self, query: Dict[str, Any], replacement: Dict[str, Any]) -> UpdateResult:
+        for i, doc in enumerate(self.docs):
+            if _matches(doc, query):
+                self.docs[i] = {"_id": doc["_id"], **copy.deepcopy(replacement)}
+                return UpdateResult(1, 1)
+        return UpdateResult(0, 0)
+
+    async def bulk_write(self, requests: Sequence[Any], ordered: bool = True) -> None:
+        # pymongo.UpdateOne keeps its arguments in _filter/_doc/_upsert
+        for request in requests:
+            await self.update_one(request._filter, request._doc, upsert=bool(request._upsert))
+
+    async def find_one_and_update(self, query: Dict[str, Any], update: Dict[str, Any], projection: Optional[Dict[str, Any]] = None,
+                                  sort: Optional[Sequence[Tuple[str, int]]] = None, return_document: bool = False) -> Optional[Dict[str, Any]]:
+        matches = FakeCursor([d for d in self.docs if _matches(d, query)])
+        if sort:
+            matches.sort(sort)
+        docs = await matches.limit(1).to_list()
+        if not docs:
+            return None
+        before = _project(docs[0], projection)
+        self._apply(docs[0], update)
+        return _project(docs[0], projection) if return_document else before
+
+    async def count_documents(self, query: Dict[str, Any]) -> int:
+        return sum(1 for d in self.docs if _matches(d, query))
+
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def get_collection(self, name: str) -> FakeCollection:
+        return self._collections.setdefault(name, FakeCollection(name))
+
+    __getitem__ = get_collection
+
+    async def command(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        return {"ok": 1.0}
+
+
+class FakeMotorClient:
+    def __init__(self, *args: Any, **kwargs: Any):
+        self._databases: Dict[str, FakeDatabase] = {}
+        self.admin = FakeDatabase()
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        return self._databases.setdefault(name, FakeDatabase())
+
+    get_database = __getitem__
+
+    def close(self) -> None:
+        pass
+
+
+def install() -> None:
+    """Make motor.motor_asyncio.AsyncIOMotorClient return the in-memory client"""
+    import motor.motor_asyncio
+    motor.motor_asyncio.AsyncIOMotorClient = FakeMotorClient
@@ -0,0 +1,375 @@
+"""
+Local stand-ins for the external APIs the backend calls, for benchmarks and offline runs.
+
+  GET  /maps/api/place/textsearch/json     Google Places Text Search
+  GET  /maps/api/place/nearbysearch/json   Google Places Nearby Search
+  POST /search                             Tavily search (result URLs point at /guide/{id})
+  GET  /guide/{id}                         travel article HTML for the web-discovery stage
+  POST /v1/chat/completions                OpenAI-compatible chat (plain and streamed)
+  GET  /_stats, POST /_reset               call counters per service
+
+Responses are deterministic for a given request. The chat endpoint recognises the agents by
+their system prompt and answers each one with a plausible reply, so both engines run end to
+end: summarize_agent gets a trip summary, poi_activity_agent a gather_activity_pois tool call,
+plan_agent an itinerary over the POI ids it was given, itinerary_writer_agent day titles,
+and the Magentic-One orchestrator a progress ledger that walks through the three agents.
+
+Point the backend at it with
+    GOOGLE_PLACES_BASE_URL=http://127.0.0.1:8765/maps/api/place
+    TAVILY_BASE_URL=http://127.0.0.1:8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+
+Usage (from backend/):
+    python benchmarks/fake_services.py --port 8765 --places-latency-ms 80 --llm-latency-ms 400
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+CITY_CENTERS = {
+    "tokyo": (35.6812, 139.7671), "paris": (48.8566, 2.3522), "london": (51.5072, -0.1276),
+    "rome": (41.9028, 12.4964), "new york": (40.7128, -74.0060), "los angeles": (34.0522, -118.2437),
+}
+ACTIVITY_TYPES = [
+    ["museum", "tourist_attraction", "point_of_interest", "establishment"],
+    ["park", "tourist_attraction", "point_of_interest", "establishment"],
+    ["art_gallery", "point_of_interest", "establishment"],
+    ["place_of_worship", "tourist_attraction", "point_of_interest", "establishment"],
+    ["shopping_mall", "point_of_interest", "establishment"],
+]
+
+
+@dataclass
+class FakeConfig:
+    places_latency_ms: float = 80
+    places_results: int = 20
+    tavily_latency_ms: float = 300
+    tavily_results: int = 5
+    tavily_content_bytes: int = 1500
+    web_page_latency_ms: float = 150
+    web_page_bytes: int = 60000
+    llm_latency_ms: float = 400
+    llm_chunk_latency_ms: float = 2
+    llm_padding_chars: int = 0
+    # Model routing scenarios: one model answers slowly, another only with 503s
+    llm_slow_model: str = ""
+    llm_slow_latency_ms: float = 5000
+    llm_failing_model: str = ""
+
+
+def _rng(*parts: Any) -> random.Random:
+    seed = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+    return random.Random(int(seed[:16], 16))
+
+
+def _city(text: str) -> str:
+    text = (text or "").lower()
+    return next((city for city in CITY_CENTERS if city in text), "tokyo")
+
+
+def _place(rng: random.Random, place_id: str, name: str, lat: float, lng: float, types: List[str], address_key: str) -> Dict[str, Any]:
+    return {
+        "place_id": place_id,
+        "name": name,
+        address_key: f"{rng.randint(1, 9)} Chome-{rng.randint(1, 30)}-{rng.randint(1, 20)}, Example Ward",
+        "geometry": {"location": {"lat": round(lat, 7), "lng": round(lng, 7)},
+                     "viewport": {"northeast": {"lat": lat + 0.001, "lng": lng + 0.001},
+                                  "southwest": {"lat": lat - 0.001, "lng": lng - 0.001}}},
+        "rating": round(3.6 + rng.random() * 1.4, 1),
+        "user_ratings_total": rng.randint(50, 20000),
+        "price_level": rng.choice([None, 1, 2, 3]),
+        "types": types,
+        "business_status": "OPERATIONAL",
+        "icon": "https://maps.gstatic.com/mapfiles/place_api/icons/v1/png_71/generic_business-71.png",
+    }
+
+
+def text_search_results(query: str, count: int) -> List[Dict[str, Any]]:
+    lat0, lng0 = CITY_CENTERS[_city(query)]
+    results = []
+    for i in range(count):
+        rng = _rng("text", query, i)
+        # A small shared id space per city, so different queries overlap like real results do
+        pool_index = rng.randint(0, 199)
+        place_rng = _rng("place", _city(query), pool_index)
+        results.append(_place(
+            place_rng, f"fake-{_city(query)[:3]}-{pool_index}", f"{query.split(' in ')[0].title()} Spot {pool_index}",
+            lat0 + (place_rng.random() - 0.5) * 0.16, lng0 + (place_rng.random() - 0.5) * 0.2,
+            place_rng.choice(ACTIVITY_TYPES), "formatted_address",
+        ))
+    return results
+
+
+def nearby_results(lat: float, lng: float, radius: float, keyword: str, count: int) -> List[Dict[str, Any]]:
+    results = []
+    for i in range(count):
+        rng = _rng("nearby", round(lat, 3), round(lng, 3), keyword, i)
+        offset = radius / 111000
+        results.append(_place(
+            rng, f"fake-r-{round(lat, 3)}-{round(lng, 3)}-{keyword}-{i}", f"{(keyword or 'Local').title()} House {i}",
+            lat + (rng.random() - 0.5) * offset, lng + (rng.random() - 0.5) * offset,
+            ["restaurant", "food", "point_of_interest", "establishment"], "vicinity",
+        ))
+    return results
+
+
+def _find_json(text: str, start_pattern: str) -> Optional[Any]:
+    """First JSON value in text starting at start_pattern"""
+    decoder = json.JSONDecoder()
+    for match in re.finditer(start_pattern, text):
+        try:
+            return decoder.raw_decode(text, match.start())[0]
+        except ValueError:
+            continue
+    return None
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+class ChatResponder:
+    """Builds a plausible reply for whichever agent sent the request"""
+
+    AGENTS = ("summarize_agent", "poi_activity_agent", "plan_agent")
+
+    def __init__(self, config: FakeConfig):
+        self.config = config
+
+    def role(self, messages: List[Dict[str, Any]]) -> str:
+        system = next((_message_text(m) for m in messages if m.get("role") == "system"), "")
+        last = _message_text(messages[-1]) if messages else ""
+        if "is_request_satisfied" in last:
+            return "ledger"
+        if system.startswith("You create daily itineraries"):
+            return "plan_agent"
+        if system.startswith("Find activities and restaurants"):
+            return "poi_activity_agent"
+        if system.startswith("You write short, friendly descriptions"):
+            return "itinerary_writer_agent"
+        if system.startswith("You are a summarization agent"):
+            return "summarize_agent"
+        return "orchestrator"
+
+    def _all_text(self, messages: List[Dict[str, Any]]) -> str:
+        return "\n".join(_message_text(m) for m in messages if m.get("role") != "system")
+
+    def summary(self, messages: List[Dict[str, Any]]) -> str:
+        # Only the latest request: agents may carry earlier runs in their context
+        text = _message_text(next((m for m in reversed(messages) if m.get("role") == "user"), {}))
+        days = re.search(r"(\d+)[- ]day", text)
+        return json.dumps({
+            "theme": "Culture", "location": _city(text).title(), "days": int(days.group(1)) if days else 3,
+            "start": "2025-08-01", "end": None, "mbti": (re.search(r"\b([EI][SN][TF][JP])\b", text) or [None, ""])[1],
+            "inclusion": [], "exclusion": [],
+        })
+
+    def itinerary(self, messages: List[Dict[str, Any]]) -> str:
+        text = self._all_text(messages)
+        pois = None
+        for message in reversed(messages):
+            pois = _find_json(_message_text(message), r'\[\{"id"')
+            if pois:
+                break
+        pois = pois or []
+        days = re.search(r'"days":\s*(\d+)', text)
+        n_days = int(days.group(1)) if days else 3
+        activities = [p for p in pois if p.get("c") != "r"]
+        restaurants = [p for p in pois if p.get("c") == "r"]
+        itinerary = []
+        for d in range(n_days):
+            entries = [{"time": t, "poi": {"id": p["id"], "n": p.get("n")}}
+                       for t, p in zip(["10:00 AM (2h)", "1:30 PM (2h)"], activities[d * 2:d * 2 + 2])]
+            for slot, meal, offset in (("12:00 PM (1h)", "lunch", 0), ("6:00 PM (1h)", "dinner", 1)):
+                if restaurants:
+                    r = restaurants[(d * 2 + offset) % len(restaurants)]
+                    entries.append({"time": slot, "poi": {"id": r["id"], "n": r.get("n"), "m": meal}})
+            itinerary.append({"day": f"Day {d + 1}", "activities": entries})
+        plan = {"theme": "Culture", "location": _city(text).title(), "days": n_days, "start": "2025-08-01",
+                "end": "2025-08-03", "mbti": "", "inclusion": [], "exclusion": [], "itinerary": itinerary}
+        if self.config.llm_padding_chars:
+            plan["notes"] = "x" * self.config.llm_padding_chars
+        return json.dumps(plan)
+
+    def day_descriptions(self, messages: List[Dict[str, Any]]) -> str:
+        days = re.findall(r'"day":\s*"(Day \d+)"', self._all_text(messages))
+        return json.dumps({d: {"title": f"{d} highlights", "description": "A relaxed day between nearby sights."} for d in days})
+
+    def ledger(self, messages: List[Dict[str, Any]]) -> str:
+        # Agent turns reach the orchestrator as messages named after the agent
+        speakers = {m.get("name") for m in messages}
+        spoken = [agent for agent in self.AGENTS if agent in speakers]
+        pending = [agent for agent in self.AGENTS if agent not in spoken]
+        done = not pending
+        next_speaker = pending[0] if pending else "plan_agent"
+        return json.dumps({
+            "is_request_satisfied": {"reason": "stand-in", "answer": done},
+            "is_in_loop": {"reason": "stand-in", "answer": False},
+            "is_progress_being_made": {"reason": "stand-in", "answer": True},
+            "next_speaker": {"reason": "stand-in", "answer": next_speaker},
+            "instruction_or_question": {"reason": "stand-in", "answer": f"{next_speaker}, please continue with the trip."},
+        })
+
+    def reply(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """{'content': str} or {'tool_calls': [...]}"""
+        role = self.role(messages)
+        if role == "summarize_agent":
+            return {"role": role, "content": self.summary(messages)}
+        if role == "poi_activity_agent":
+            summary = _find_json(self._all_text(messages), r'\{"theme"') or {}
+            arguments = {"location": summary.get("location") or _city(self._all_text(messages)).title(),
+                         "mbti": summary.get("mbti", ""), "theme": summary.get("theme", "culture")}
+            return {"role": role, "tool_calls": [{
+                "id": f"call_{hashlib.sha1(json.dumps(arguments).encode()).hexdigest()[:12]}", "type": "function",
+                "function": {"name": "gather_activity_pois", "arguments": json.dumps(arguments)},
+            }]}
+        if role == "plan_agent":
+            return {"role": role, "content": self.itinerary(messages)}
+        if role == "itinerary_writer_agent":
+            return {"role": role, "content": self.day_descriptions(messages)}
+        if role == "ledger":
+            return {"role": role, "content": self.ledger(messages)}
+        return {"role": role, "content": "Plan: summarize the request, gather POIs, then build the itinerary."}
+
+
+def create_app(config: Optional[FakeConfig] = None) -> FastAPI:
+    config = config or FakeConfig()
+    responder = ChatResponder(config)
+    stats: Counter = Counter()
+    app = FastAPI(title="Trip-sonality fake external services")
+
+    async def delay(ms: float) -> None:
+        if ms > 0:
+            await asyncio.sleep(ms / 1000)
+
+    @app.get("/maps/api/place/textsearch/json")
+    async def places_text(query: str = ""):
+        stats["places_text"] += 1
+        await delay(config.places_latency_ms)
+        return {"status": "OK", "results": text_search_results(query, config.places_results)}
+
+    @app.get("/maps/api/place/nearbysearch/json")
+    async def places_nearby(location: str = "0,0", radius: float = 1000, keyword: str = ""):
+        stats["places_nearby"] += 1
+        await delay(config.places_latency_ms)
+        lat, lng = (float(v) for v in location.split(","))
+        return {"status": "OK", "results": nearby_results(lat, lng, radius, keyword, config.places_results)}
+
+    @app.post("/search")
+    async def tavily_search(request: Request):
+        stats["tavily"] += 1
+        body = await request.json()
+        await delay(config.tavily_latency_ms)
+        rng = _rng("tavily", body.get("query"))
+        city = _city(body.get("query"))
+        return {"results": [
+            {"title": f"Top things to do {i}", "url": f"{str(request.base_url).rstrip('/')}/guide/{city}-{rng.randint(0, 10**6)}",
+             "content": ("Visit the old town museum and the riverside park. " * 64)[:config.tavily_content_bytes]}
+            for i in range(min(body.get("max_results", 5), config.tavily_results))
+        ]}
+
+    @app.get("/guide/{guide_id}")
+    async def guide_page(guide_id: str):
+        stats["web_page"] += 1
+        await delay(config.web_page_latency_ms)
+        rng = _rng("guide", guide_id)
+        city = guide_id.rsplit("-", 1)[0].title()
+        names = [f"{city} {kind}" for kind in ("Art Museum", "Botanical Garden", "Old Market", "Harbour View", "Castle Park", "Riverside Temple")]
+        rng.shuffle(names)
+        items = "".join(f"<h2>{i + 1}. {name}</h2><p>{'Lovely spot for an afternoon. ' * 20}</p>" for i, name in enumerate(names))
+        padding = "<p>" + "Filler text for page weight. " * (config.web_page_bytes // 30) + "</p>"
+        html = f"<html><head><title>Guide</title><style>h2 {{color: red}}</style></head><body>{items}{padding}</body></html>"
+        return Response(content=html, media_type="text/html")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "fake-model")
+        stats[f"openai_model:{model}"] += 1
+        if model == config.llm_failing_model:
+            await delay(config.llm_latency_ms / 4)
+            return JSONResponse({"error": {"message": "The server is overloaded", "type": "server_error"}}, status_code=503)
+        reply = responder.reply(messages)
+        stats["openai"] += 1
+        stats[f"openai:{reply['role']}"] += 1
+        prompt_tokens = sum(len(json.dumps(m)) for m in messages) // 4
+        content = reply.get("content")
+        completion_tokens = max(1, len(content or json.dumps(reply.get("tool_calls"))) // 4)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        await delay(config.llm_slow_latency_ms if model == config.llm_slow_model else config.llm_latency_ms)
+        created = int(time.time())
+        finish_reason = "tool_calls" if reply.get("tool_calls") else "stop"
+        message = {"role": "assistant", "content": content}
+        if reply.get("tool_calls"):
+            message["tool_calls"] = reply["tool_calls"]
+
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": f"chatcmpl-{created}", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+                "usage": usage,
+            })
+
+        async def chunks():
+            def chunk(delta: Dict[str, Any], finish: Optional[str] = None, with_usage: bool = False) -> str:
+                payload = {"id": f"chatcmpl-{created}", "object": "chat.completion.chunk", "created": created, "model": model,
+                           "choices": [] if with_usage else [{"index": 0, "delta": delta, "finish_reason": finish, "logprobs": None}]}
+                if with_usage:
+                    payload["usage"] = usage
+                return f"data: {json.dumps(payload)}\n\n"
+
+            if reply.get("tool_calls"):
+                yield chunk({"role": "assistant", "tool_calls": [{**call, "index": i} for i, call in enumerate(reply["tool_calls"])]})
+            else:
+                for i in range(0, len(content), 24):
+                    yield chunk({"role": "assistant", "content": content[i:i + 24]} if i == 0 else {"content": content[i:i + 24]})
+                    await delay(config.llm_chunk_latency_ms)
+            yield chunk({}, finish_reason)
+            yield chunk({}, with_usage=True)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/_stats")
+    async def get_stats():
+        return dict(stats)
+
+    @app.post("/_reset")
+    async def reset_stats():
+        stats.clear()
+        return {"ok": True}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    for name, value in vars(FakeConfig()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+    config = FakeConfig(**{name: getattr(args, name) for name in vars(FakeConfig())})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
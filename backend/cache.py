@@ -0,0 +1,270 @@
+"""
+Two-tier response cache used by the tools.
+
+  - Tier 1: in-process LRU with a per-entry TTL (TTLCache)
+  - Tier 2: optional persistent store on local disk (DiskStore, SQLite)
+
+TieredCache.get_or_fetch() serves fresh entries directly, serves stale entries while
+refreshing them in the background (stale-while-revalidate), coalesces concurrent
+misses for the same key and keeps hit/miss counters for monitoring. Inside
+refresh_expiring(seconds) entries that stop being fresh within that time are fetched again
+right away (warm_cache.py uses this to refresh the persistent tier ahead of expiry).
+Values must be JSON-serializable so they can be written to the persistent tier.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+from coalesce import SingleFlight
+
+
+_min_fresh: ContextVar[float] = ContextVar("cache_min_fresh", default=0.0)
+
+
+@contextmanager
+def refresh_expiring(seconds: float) -> Iterator[None]:
+    """Lookups inside this block treat entries that expire within `seconds` as misses"""
+    token = _min_fresh.set(max(0.0, seconds))
+    try:
+        yield
+    finally:
+        _min_fresh.reset(token)
+
+
+def min_freshness() -> float:
+    """Seconds an entry must stay fresh to be served in the current context (0 outside refresh_expiring)"""
+    return _min_fresh.get()
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+    fresh_until: float
+    stale_until: float
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.fresh_until
+
+    def is_usable(self, now: float) -> bool:
+        return now < self.stale_until
+
+
+class TTLCache:
+    """In-process LRU; entries are dropped once their stale window has passed"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not entry.is_usable(time.time()):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskStore:
+    """Persistent tier backed by a local SQLite file, shared by every cache namespace"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, fresh_until REAL NOT NULL, stale_until REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._conn.commit()
+
+    def get(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at, fresh_until, stale_until FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(json.loads(row[0]), row[1], row[2], row[3])
+        if not entry.is_usable(time.time()):
+            return None
+        return entry
+
+    def set(self, namespace: str, key: str, entry: CacheEntry) -> None:
+        payload = json.dumps(entry.value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, stored_at, fresh_until, stale_until)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, payload, entry.stored_at, entry.fresh_until, entry.stale_until),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM cache WHERE stale_until < ?", (time.time(),))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_disk_stores: Dict[str, DiskStore] = {}
+
+
+def get_disk_store(path: Optional[str]) -> Optional[DiskStore]:
+    """One DiskStore per file path, so namespaces can share a single SQLite file"""
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    if path not in _disk_stores:
+        _disk_stores[path] = DiskStore(path)
+    return _disk_stores[path]
+
+
+class TieredCache:
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        stale_ttl: float = 0,
+        max_entries: int = 1024,
+        persistent: Optional[DiskStore] = None,
+        enabled: bool = True,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.enabled = enabled
+        self.memory = TTLCache(max_entries)
+        self.persistent = persistent
+        self._inflight = SingleFlight(f"{namespace} cache", log_joins=False)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.counters = {
+            "hits": 0,
+            "persistent_hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+        }
+
+    def _new_entry(self, value: Any) -> CacheEntry:
+        now = time.time()
+        return CacheEntry(value, now, now + self.ttl, now + self.ttl + self.stale_ttl)
+
+    async def _lookup(self, key: str) -> Optional[CacheEntry]:
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+        if self.persistent is None:
+            return None
+        entry = await asyncio.to_thread(self.persistent.get, self.namespace, key)
+        if entry is not None:
+            self.counters["persistent_hits"] += 1
+            self.memory.set(key, entry)
+        return entry
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Cached value regardless of freshness, without fetching"""
+        entry = await self._lookup(key)
+        return entry.value if entry is not None else None
+
+    async def set(self, key: str, value: Any) -> None:
+        entry = self._new_entry(value)
+        self.memory.set(key, entry)
+        if self.persistent is not None:
+            await asyncio.to_thread(self.persistent.set, self.namespace, key, entry)
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        await self.set(key, value)
+        return value
+
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await self._fetch_and_store(key, fetch)
+            self.counters["refreshes"] += 1
+        except Exception as e:
+            self.counters["refresh_errors"] += 1
+            print(f"[{self.namespace} cache] background refresh failed for {key}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, calling fetch() on a miss. Exceptions from fetch are not cached."""
+        if not self.enabled:
+            return await fetch()
+
+        entry = await self._lookup(key)
+        now = time.time()
+        min_fresh = min_freshness()
+        if entry is not None and min_fresh and not entry.is_fresh(now + min_fresh):
+            entry = None  # refresh_expiring(): fetch it again now instead of serving it
+        if entry is not None and entry.is_fresh(now):
+            self.counters["hits"] += 1
+            return entry.value
+        if entry is not None and entry.is_usable(now):
+            # Serve stale now, revalidate once in the background
+            self.counters["stale_hits"] += 1
+            if key not in self._refreshing:
+                self._refreshing[key] = asyncio.create_task(self._refresh(key, fetch))
+            return entry.value
+
+        self.counters["misses"] += 1
+        # Coalesce concurrent misses so one key costs one upstream call
+        return await self._inflight.do(key, lambda: self._fetch_and_store(key, fetch))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+        served = self.counters["hits"] + self.counters["stale_hits"]
+        return {
+            "namespace": self.namespace,
+            **self.counters,
+            "hit_rate": round(served / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+    def clear(self) -> None:
+        self.memory.clear()
+        for key in self.counters:
+            self.counters[key] = 0
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Case- and whitespace-insensitive form of free text used in cache keys"""
+    return " ".join((text or "").lower().split())
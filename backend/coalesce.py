@@ -0,0 +1,40 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time; concurrent callers with the same key
+    await the in-flight call instead of starting their own.
+
+    The shared call is shielded, so a caller that disconnects (is cancelled) does not
+    cancel the work for everybody else.
+    """
+
+    def __init__(self, name: str = "singleflight", log_joins: bool = True):
+        self.name = name
+        self.log_joins = log_joins
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._finish(key, f))
+        else:
+            self.coalesced += 1
+            if self.log_joins:
+                print(f"[{self.name}] joining in-flight call for {key[:16]}...")
+        return await asyncio.shield(future)
+
+    def _finish(self, key: str, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not future.cancelled():
+            future.exception()
+
+    def inflight(self) -> int:
+        return len(self._calls)
@@ -1,16 +1,74 @@
+"""
+Model client configuration.
+
+The OpenAI client (and autogen_ext/openai behind it, the slowest imports in the backend) is
+built on first use by get_model_client(), not when this module is imported, so app.py can
+start serving /health before any agent is needed. `from config import client` still works
+and returns the shared client.
+
+Each agent (and the Magentic-One orchestrator) can use its own model: <AGENT>_MODEL, e.g.
+SUMMARIZE_AGENT_MODEL=gpt-4o-mini or ORCHESTRATOR_MODEL=gpt-4o, with OPENAI_MODEL as the
+default, and a fallback model from <AGENT>_FALLBACK_MODEL / OPENAI_FALLBACK_MODEL that
+model_router.py switches to while the primary is slow or failing.
+"""
 import os
-from dotenv import load_dotenv
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+import threading
 from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:  # pragma: no cover
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
 
 load_dotenv(dotenv_path=Path(__file__).resolve().parent / ".env")
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Please set OPENAI_API_KE in .env file")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+# Used when an agent's model is slow or failing; empty = no fallback
+OPENAI_FALLBACK_MODEL = os.getenv("OPENAI_FALLBACK_MODEL", "")
+
+_clients: Dict[str, "OpenAIChatCompletionClient"] = {}
+# PRELOAD_AGENTS builds the client in a worker thread while requests may already need it
+_client_lock = threading.Lock()
+
+
+def get_model_client(model: Optional[str] = None) -> "OpenAIChatCompletionClient":
+    """The shared OpenAI chat client for model (default OPENAI_MODEL), created on first call"""
+    model = model or OPENAI_MODEL
+    if model not in _clients:
+        with _client_lock:
+            if model not in _clients:
+                api_key = os.getenv("OPENAI_API_KEY")
+                if not api_key:
+                    raise RuntimeError("Please set OPENAI_API_KEY in .env file")
+                from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+                _clients[model] = OpenAIChatCompletionClient(model=model, api_key=api_key, base_url=OPENAI_BASE_URL)
+    return _clients[model]
+
+
+def agent_models(agent: str) -> Tuple[str, Optional[str]]:
+    """(primary, fallback) model of an agent from <AGENT>_MODEL and <AGENT>_FALLBACK_MODEL"""
+    prefix = agent.upper()
+    primary = os.getenv(f"{prefix}_MODEL") or OPENAI_MODEL
+    fallback = os.getenv(f"{prefix}_FALLBACK_MODEL", OPENAI_FALLBACK_MODEL) or None
+    return primary, (fallback if fallback != primary else None)
+
+
+def get_agent_model_client(agent: str) -> "OpenAIChatCompletionClient":
+    """The client one agent uses: routed between its models, metered, and cached where llm_cache.py enables it"""
+    from llm_cache import cached
+    from model_router import routed
+    from observability import metered
+
+    primary, fallback = agent_models(agent)
+    clients = {model: get_model_client(model) for model in (primary, fallback) if model}
+    return cached(metered(routed(agent, clients, primary, fallback), agent), agent, model=primary)
+
 
-client = OpenAIChatCompletionClient(
-    model=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
-    api_key=OPENAI_API_KEY,
-    base_url="https://api.openai.com/v1"
-)
+def __getattr__(name: str):
+    # Lazy module attribute for the existing `from config import client` imports
+    if name == "client":
+        return get_model_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
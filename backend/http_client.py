@@ -0,0 +1,74 @@
+"""
+Application-scoped pooled HTTP client shared by the Places and Tavily tools.
+
+app.py creates it in the FastAPI startup hook and closes it on shutdown. When the
+tools run outside the app (tests/, scripts) get_http_client() falls back to a
+short-lived standalone client, so callers never need to care which one they got.
+"""
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_ENABLE_HTTP2 = os.getenv("HTTP_ENABLE_HTTP2", "false").lower() == "true"
+HTTP_DEFAULT_TIMEOUT = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "15"))
+
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build a keep-alive client with the configured pool limits"""
+    http2 = HTTP_ENABLE_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("HTTP_ENABLE_HTTP2 is set but the 'h2' package is missing, falling back to HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        http2=http2,
+        timeout=HTTP_DEFAULT_TIMEOUT,
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Create the shared client (called from the FastAPI startup hook)"""
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = create_http_client()
+        print(f"Shared HTTP client ready (max_connections={HTTP_MAX_CONNECTIONS}, http2={HTTP_ENABLE_HTTP2})")
+    return _shared_client
+
+
+async def close_http_client() -> None:
+    """Close the shared client (called from the FastAPI shutdown hook)"""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
+
+
+def set_http_client(client: Optional[httpx.AsyncClient]) -> None:
+    """Inject a client for the tools to use, e.g. one with a mock transport"""
+    global _shared_client
+    _shared_client = client
+
+
+@asynccontextmanager
+async def get_http_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the shared client, or a standalone one that is closed on exit"""
+    if _shared_client is not None and not _shared_client.is_closed:
+        yield _shared_client
+        return
+    async with create_http_client() as client:
+        yield client
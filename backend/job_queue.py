@@ -0,0 +1,188 @@
+"""
+MongoDB-backed job queue for /plan/jobs.
+
+POST /plan/jobs stores a job document and returns its id straight away; a fixed pool of
+worker tasks claims queued jobs (highest priority first, then oldest) and runs them, so
+at most PLAN_JOB_WORKERS workflows run at once no matter how many requests arrive.
+
+Job documents (collection "plan_jobs"):
+    job_id, status (queued | running | done | failed), priority, attempts, max_attempts,
+    payload, result, error, created_at, updated_at, available_at, lease_until, finished_at
+
+A failed run is re-queued with exponential backoff until max_attempts is reached. A job
+whose worker died (its lease ran out while "running") is claimed again by another worker.
+enqueue() raises QueueFull once PLAN_JOB_QUEUE_MAX jobs are waiting; app.py answers 429.
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+# Worker tasks per process, i.e. the max number of concurrently running jobs (0 = no workers)
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "2"))
+# Jobs allowed to wait in the queue before new submissions are rejected
+PLAN_JOB_QUEUE_MAX = int(os.getenv("PLAN_JOB_QUEUE_MAX", "100"))
+PLAN_JOB_MAX_ATTEMPTS = int(os.getenv("PLAN_JOB_MAX_ATTEMPTS", "3"))
+# Delay before the first retry; doubled for every further attempt
+PLAN_JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("PLAN_JOB_RETRY_BACKOFF_SECONDS", "5"))
+# A running job whose worker has not finished it within this many seconds is handed to another worker
+PLAN_JOB_LEASE_SECONDS = float(os.getenv("PLAN_JOB_LEASE_SECONDS", "900"))
+# How often idle workers look for jobs submitted by other processes
+PLAN_JOB_POLL_SECONDS = float(os.getenv("PLAN_JOB_POLL_SECONDS", "1"))
+# Finished jobs are removed by a TTL index after this many seconds
+PLAN_JOB_RETENTION_SECONDS = int(os.getenv("PLAN_JOB_RETENTION_SECONDS", "86400"))
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class QueueFull(Exception):
+    """Raised by enqueue() when PLAN_JOB_QUEUE_MAX jobs are already waiting"""
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures that retrying cannot fix (e.g. invalid input)"""
+
+
+class JobQueue:
+    def __init__(
+        self,
+        collection: Any,
+        handler: JobHandler,
+        workers: int = PLAN_JOB_WORKERS,
+        max_queued: int = PLAN_JOB_QUEUE_MAX,
+        max_attempts: int = PLAN_JOB_MAX_ATTEMPTS,
+        retry_backoff: float = PLAN_JOB_RETRY_BACKOFF_SECONDS,
+        lease_seconds: float = PLAN_JOB_LEASE_SECONDS,
+        poll_interval: float = PLAN_JOB_POLL_SECONDS,
+        name: str = "plan_jobs",
+    ):
+        self.collection = collection
+        self.handler = handler
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.name = name
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def create_indexes(self) -> None:
+        await self.collection.create_index("job_id", unique=True)
+        await self.collection.create_index([("status", 1), ("priority", -1), ("created_at", 1)])
+        await self.collection.create_index("finished_at", expireAfterSeconds=PLAN_JOB_RETENTION_SECONDS)
+
+    async def queued_count(self) -> int:
+        return await self.collection.count_documents({"status": "queued"})
+
+    async def enqueue(self, payload: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        """Store a new job and wake an idle worker; returns the job document"""
+        if await self.queued_count() >= self.max_queued:
+            raise QueueFull(f"{self.max_queued} jobs are already waiting")
+        now = datetime.now(timezone.utc)
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "status": "queued",
+            "priority": priority,
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "available_at": now,
+        }
+        await self.collection.insert_one(dict(job))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"job_id": job_id}, projection={"_id": 0})
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the next runnable job, or a running job whose lease has expired"""
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "available_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {"status": "running", "updated_at": now, "lease_until": now + timedelta(seconds=self.lease_seconds)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("priority", -1), ("created_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def run_job(self, job: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+        if job["attempts"] > job.get("max_attempts", self.max_attempts):
+            # Reclaimed after its worker died on the last allowed attempt
+            await self._fail(job, RuntimeError("worker lease expired"))
+            return
+        try:
+            result = await self.handler(job)
+        except Exception as e:
+            await self._fail(job, e)
+            return
+        now = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"job_id": job_id},
+            {"$set": {"status": "done", "result": result, "error": None, "updated_at": now, "finished_at": now}},
+        )
+        print(f"[{self.name}] job {job_id} done after {job['attempts']} attempt(s)")
+
+    async def _fail(self, job: Dict[str, Any], error: Exception) -> None:
+        job_id = job["job_id"]
+        attempts = job["attempts"]
+        now = datetime.now(timezone.utc)
+        message = str(getattr(error, "detail", None) or error)
+        if attempts < job.get("max_attempts", self.max_attempts) and not isinstance(error, PermanentJobError):
+            delay = self.retry_backoff * (2 ** (attempts - 1))
+            print(f"[{self.name}] job {job_id} attempt {attempts} failed ({message}); retrying in {delay:.0f}s")
+            update = {"status": "queued", "error": message, "updated_at": now, "available_at": now + timedelta(seconds=delay)}
+        else:
+            print(f"[{self.name}] job {job_id} failed after {attempts} attempt(s): {message}")
+            update = {"status": "failed", "error": message, "updated_at": now, "finished_at": now}
+        await self.collection.update_one({"job_id": job_id}, {"$set": update})
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            try:
+                job = await self.claim()
+            except Exception as e:
+                print(f"[{self.name}] worker {index} could not claim a job: {e}")
+                job = None
+            if job is not None:
+                try:
+                    await self.run_job(job)
+                except Exception as e:
+                    print(f"[{self.name}] worker {index} could not record job {job['job_id']}: {e}")
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        print(f"[{self.name}] started {self.workers} worker(s), queue limit {self.max_queued}")
+
+    async def stop(self) -> None:
+        """Cancel the workers; jobs they were running are picked up again once their lease expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
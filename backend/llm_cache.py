@@ -0,0 +1,229 @@
+"""
+Exact-match cache for LLM completions of deterministic agent steps.
+
+summarize_agent turns the same popular queries into the same structured JSON over and over;
+cached(client, agent) answers a repeated request from the cache instead of the model:
+
+    key = sha256(model + normalized messages + tool schemas + json_output + extra create args)
+
+Entries live in a TieredCache (in-process LRU, plus the SQLite disk tier when LLM_CACHE_PATH
+is set) for LLM_CACHE_TTL seconds and concurrent identical requests share one model call.
+Only agents listed in LLM_CACHE_AGENTS are wrapped; code running under bypass_llm_cache()
+always goes to the model (for stages whose output should vary between runs). Hits are counted
+as trip_llm_calls_total{outcome="cache_hit"} and in trip_cache_events{cache="llm_completions"};
+requests that waited for an identical in-flight call are counted as outcome="coalesced" instead
+and get that call's reply with its usage (the model call was made for them too). Replies from a
+fallback model (model_router) are passed through but not cached under the primary model's key.
+"""
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, Iterator, List, Mapping, Optional, Sequence, Union
+
+from dotenv import load_dotenv
+
+from cache import TieredCache, get_disk_store
+from model_router import answered_by
+from observability import LLM_CALLS, register_cache_stats
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+# Comma-separated agent names whose completions are cached; the others always call the model
+LLM_CACHE_AGENTS = {a.strip() for a in os.getenv("LLM_CACHE_AGENTS", "summarize_agent").split(",") if a.strip()}
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.getenv("PLACES_CACHE_PATH"))
+
+# Replies cut short (length, content filter, unknown) are passed through but not cached
+_CACHEABLE_FINISH_REASONS = ("stop", "function_calls")
+
+llm_cache = TieredCache(
+    "llm_completions",
+    ttl=LLM_CACHE_TTL,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    persistent=get_disk_store(LLM_CACHE_PATH),
+    enabled=LLM_CACHE_ENABLED,
+)
+register_cache_stats("llm_completions", llm_cache)
+
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_llm_cache() -> Iterator[None]:
+    """Model calls made inside this block skip the cache (neither read nor written)"""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def cache_enabled_for(agent: str) -> bool:
+    return LLM_CACHE_ENABLED and agent in LLM_CACHE_AGENTS
+
+
+def _normalize(value: Any) -> Any:
+    """Whitespace-insensitive form of message content; everything else is kept as is"""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def _dump(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if hasattr(value, "schema") and not isinstance(value, Mapping):  # autogen Tool
+        return value.schema
+    return value
+
+
+def completion_key(
+    model: str,
+    messages: Sequence[Any],
+    tools: Sequence[Any] = (),
+    json_output: Any = None,
+    extra_create_args: Optional[Mapping[str, Any]] = None,
+) -> str:
+    if isinstance(json_output, type):  # a pydantic response format
+        json_output = json_output.model_json_schema()
+    payload = {
+        "model": model,
+        "messages": [{"type": type(m).__name__, **_normalize(_dump(m))} for m in messages],
+        "tools": sorted((_dump(t) for t in tools), key=lambda t: json.dumps(t, sort_keys=True, default=str)),
+        "json_output": json_output,
+        "extra": dict(extra_create_args or {}),
+    }
+    # The message source (agent name) does not change what the model sees
+    for message in payload["messages"]:
+        message.pop("source", None)
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{model}:{hashlib.sha256(body.encode()).hexdigest()}"
+
+
+class _NotCacheable(Exception):
+    """Carries a reply that must not be stored out of TieredCache.get_or_fetch"""
+
+    def __init__(self, result: Any):
+        super().__init__("completion not cacheable")
+        self.result = result
+
+
+@lru_cache(maxsize=None)
+def _cached_client_class() -> type:
+    # Defined on first use for the same reason as observability._metered_client_class
+    from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelCapabilities, ModelInfo, RequestUsage
+
+    def from_cache(data: Dict[str, Any]) -> CreateResult:
+        result = CreateResult.model_validate(data)
+        # No tokens were spent on a cached reply
+        return result.model_copy(update={"cached": True, "usage": RequestUsage(prompt_tokens=0, completion_tokens=0)})
+
+    class CachedChatCompletionClient(ChatCompletionClient):
+        """Serves repeated requests of one agent from llm_cache; everything else is delegated"""
+
+        def __init__(self, inner: ChatCompletionClient, agent: str, model: str):
+            self._inner = inner
+            self.agent = agent
+            self.model = model
+
+        def _key(self, messages: Sequence[LLMMessage], kwargs: Dict[str, Any]) -> str:
+            return completion_key(self.model, messages, kwargs.get("tools", ()), kwargs.get("json_output"), kwargs.get("extra_create_args"))
+
+        def _cacheable(self, result: CreateResult) -> bool:
+            # The key names self.model: a reply from a routed client's fallback model must not be replayed as its answer
+            model = answered_by.get()
+            return result.finish_reason in _CACHEABLE_FINISH_REASONS and (model is None or model == self.model)
+
+        async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+            if _bypass.get():
+                return await self._inner.create(messages, **kwargs)
+            key = self._key(messages, kwargs)
+            if llm_cache.enabled:
+                data = await llm_cache.get(key)
+                if data is not None:
+                    llm_cache.counters["hits"] += 1
+                    LLM_CALLS.labels(agent=self.agent, outcome="cache_hit").inc()
+                    return from_cache(data)
+            fetched: List[CreateResult] = []
+
+            async def fetch() -> Dict[str, Any]:
+                answered_by.set(None)
+                result = await self._inner.create(messages, **kwargs)
+                fetched.append(result)
+                if not self._cacheable(result):
+                    raise _NotCacheable(result)
+                return result.model_dump(mode="json")
+
+            try:
+                data = await llm_cache.get_or_fetch(key, fetch)
+            except _NotCacheable as e:
+                return e.result
+            if fetched:
+                return fetched[0]
+            # Joined an identical request's model call instead of making one
+            LLM_CALLS.labels(agent=self.agent, outcome="coalesced").inc()
+            return CreateResult.model_validate(data)
+
+        async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[Union[str, CreateResult], None]:
+            if _bypass.get() or not llm_cache.enabled:
+                async for item in self._inner.create_stream(messages, **kwargs):
+                    yield item
+                return
+            key = self._key(messages, kwargs)
+            data = await llm_cache.get(key)
+            if data is not None:
+                llm_cache.counters["hits"] += 1
+                LLM_CALLS.labels(agent=self.agent, outcome="cache_hit").inc()
+                result = from_cache(data)
+                if isinstance(result.content, str):
+                    yield result.content
+                yield result
+                return
+            llm_cache.counters["misses"] += 1
+            answered_by.set(None)
+            async for item in self._inner.create_stream(messages, **kwargs):
+                if isinstance(item, CreateResult) and self._cacheable(item):
+                    await llm_cache.set(key, item.model_dump(mode="json"))
+                yield item
+
+        async def close(self) -> None:
+            # The wrapped client is shared between agents and closed by its owner
+            pass
+
+        def actual_usage(self) -> RequestUsage:
+            return self._inner.actual_usage()
+
+        def total_usage(self) -> RequestUsage:
+            return self._inner.total_usage()
+
+        def count_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+            return self._inner.count_tokens(messages, **kwargs)
+
+        def remaining_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+            return self._inner.remaining_tokens(messages, **kwargs)
+
+        @property
+        def capabilities(self) -> ModelCapabilities:  # type: ignore[override]
+            return self._inner.capabilities
+
+        @property
+        def model_info(self) -> ModelInfo:
+            return self._inner.model_info
+
+    return CachedChatCompletionClient
+
+
+def cached(client: Any, agent: str, model: str) -> Any:
+    """client wrapped with the completion cache when it is enabled for agent, otherwise client itself"""
+    if not cache_enabled_for(agent):
+        return client
+    return _cached_client_class()(client, agent, model)
@@ -0,0 +1,87 @@
+"""
+Rewrite stored plans into the normalized format of plan_store.py.
+
+Records in "conversations" without storage_version embed their POIs; each is rewritten in
+place (same _id and session_id) with POI references, its places upserted into "pois" first.
+Records of an older storage_version are decoded and written again in the current one.
+Migrated records no longer match the filter, so an interrupted run just continues where it
+stopped when started again. Reads handle every format, so the app can keep running meanwhile;
+GET /trips only lists migrated records, as older ones have no trip summary to filter on.
+
+Usage (from backend/, with MONGODB_URI / MONGODB_DB set as for the app):
+    python migrate_plans.py --dry-run          # count records and the size they would save
+    python migrate_plans.py --batch-size 200
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict
+
+import bson
+import motor.motor_asyncio
+from dotenv import load_dotenv
+
+from plan_store import PLAN_STORE_COMPRESS_MIN_BYTES, STORAGE_VERSION, PlanStore, encode_record
+
+load_dotenv()
+
+OUTDATED = {"$or": [{"storage_version": {"$exists": False}}, {"storage_version": {"$lt": STORAGE_VERSION}}]}
+
+
+async def migrate(store: PlanStore, batch_size: int, limit: int, dry_run: bool) -> Dict[str, Any]:
+    stats = {"records": 0, "bytes_before": 0, "bytes_after": 0, "places": 0}
+    places_seen = set()
+    start = time.perf_counter()
+    cursor = store.plans.find(OUTDATED, sort=[("_id", 1)], batch_size=batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    async for stored in cursor:
+        stats["records"] += 1
+        stats["bytes_before"] += len(bson.encode(stored))
+        record = (await store.decode([dict(stored)]))[0] if stored.get("storage_version") else stored
+        doc, places = encode_record(record, store.compress_min_bytes)
+        stats["bytes_after"] += len(bson.encode(doc))
+        new_places = places.keys() - places_seen
+        places_seen.update(new_places)
+        # Each place is stored once however many plans reference it
+        stats["bytes_after"] += sum(len(bson.encode({"_id": pid, **places[pid]})) for pid in new_places)
+        if not dry_run:
+            await store.upsert_places(places)
+            await store.plans.replace_one({"_id": record["_id"]}, {k: v for k, v in doc.items() if k != "_id"})
+        if stats["records"] % batch_size == 0:
+            print(f"  {stats['records']} records, {time.perf_counter() - start:.1f}s")
+    stats["places"] = len(places_seen)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=200, help="Records fetched per round trip")
+    parser.add_argument("--limit", type=int, default=0, help="Migrate at most this many records (0 = all)")
+    parser.add_argument("--compress-min-bytes", type=int, default=PLAN_STORE_COMPRESS_MIN_BYTES)
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+
+    uri = os.getenv("MONGODB_URI")
+    if not uri:
+        raise SystemExit("Please set the MONGODB_URI environment variable in your .env file")
+    client = motor.motor_asyncio.AsyncIOMotorClient(uri)
+    db = client[os.getenv("MONGODB_DB", "trip_agent")]
+    store = PlanStore(db.get_collection("conversations"), db.get_collection("pois"), args.compress_min_bytes)
+
+    async def run() -> Dict[str, Any]:
+        try:
+            return await migrate(store, max(1, args.batch_size), args.limit, args.dry_run)
+        finally:
+            client.close()
+
+    stats = asyncio.run(run())
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    verb = "would save" if args.dry_run else "saved"
+    print(f"{'Checked' if args.dry_run else 'Migrated'} {stats['records']} records referencing {stats['places']} places:"
+          f" {stats['bytes_before'] / 1e6:.2f} MB -> {stats['bytes_after'] / 1e6:.2f} MB (BSON), {verb} {saved / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Per-agent models and latency-aware routing between a primary and a fallback model.
+
+Which models an agent uses (config.agent_models):
+    <AGENT>_MODEL            e.g. SUMMARIZE_AGENT_MODEL=gpt-4o-mini, ORCHESTRATOR_MODEL   (default OPENAI_MODEL)
+    <AGENT>_FALLBACK_MODEL   default OPENAI_FALLBACK_MODEL; empty = no fallback
+
+routed(agent, clients, primary, fallback) returns a client that picks the model per call:
+  - the primary, unless its circuit is open (LLM_CIRCUIT_FAILURES failed calls in a row), its
+    average latency for this agent is above LLM_SLOW_SECONDS, or the prompt does not fit its
+    context window; then the fallback
+  - while the primary is avoided, one call per LLM_ROUTE_PROBE_SECONDS still goes to it (a
+    "probe"), so traffic returns once it recovers
+  - a call that fails with an upstream error (429, 5xx, timeout, connection) is retried once on
+    the other model, as long as nothing has been streamed yet
+
+Every call is priced from its token usage (LLM_PRICES, USD per million prompt/completion
+tokens) and reported as trip_llm_cost_usd_total{agent,model}; trip_llm_routes_total{agent,model,
+reason} counts the routing decisions. Latency per agent is trip_llm_call_duration_seconds.
+"""
+import asyncio
+import json
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from observability import LLM_COST, LLM_ROUTES
+from resilience import CircuitBreaker
+
+# Average call latency above which the primary is treated as slow (per agent, seconds)
+LLM_SLOW_SECONDS = float(os.getenv("LLM_SLOW_SECONDS", "45"))
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "3"))
+LLM_ROUTE_PROBE_SECONDS = float(os.getenv("LLM_ROUTE_PROBE_SECONDS", "30"))
+# Weight of the newest call in the latency average
+LLM_LATENCY_EWMA_ALPHA = float(os.getenv("LLM_LATENCY_EWMA_ALPHA", "0.3"))
+# Room left for the reply when checking whether a prompt fits a model's context window
+LLM_COMPLETION_RESERVE_TOKENS = int(os.getenv("LLM_COMPLETION_RESERVE_TOKENS", "2000"))
+
+# USD per million tokens (prompt, completion); LLM_PRICES='{"my-model": [1.0, 2.0]}' adds or overrides
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4.1": (2.0, 8.0),
+    "gpt-4.1-mini": (0.4, 1.6),
+    "gpt-4.1-nano": (0.1, 0.4),
+}
+LLM_PRICES = {**DEFAULT_PRICES, **{k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "{}")).items()}}
+
+# Context windows (tokens) used when autogen_ext's model table is unavailable or does not know the
+# model; LLM_CONTEXT_WINDOWS='{"my-model": 128000}' takes precedence over both
+DEFAULT_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4.1-mini": 1047576,
+    "gpt-4.1-nano": 1047576,
+}
+LLM_CONTEXT_WINDOWS: Dict[str, int] = {k: int(v) for k, v in json.loads(os.getenv("LLM_CONTEXT_WINDOWS", "{}")).items()}
+
+# The model that answered the latest routed call in this context (set by RoutingChatCompletionClient)
+answered_by: ContextVar[Optional[str]] = ContextVar("llm_answered_by", default=None)
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost of one call; 0 for models without a price"""
+    prompt_price, completion_price = LLM_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def estimate_prompt_tokens(messages: Sequence[Any]) -> int:
+    """Rough count (4 characters per token), enough to compare against a context window"""
+    return sum(len(str(getattr(m, "content", m))) for m in messages) // 4
+
+
+@lru_cache(maxsize=None)
+def _autogen_token_limit() -> Optional[Callable[[str], int]]:
+    try:
+        # A private module of autogen_ext (its own model table), so it may move between releases
+        from autogen_ext.models.openai._model_info import get_token_limit
+    except ImportError as e:
+        print(f"[model_router] autogen_ext model table unavailable ({e}), using the built-in context windows")
+        return None
+    return get_token_limit
+
+
+def context_window(model: str) -> Optional[int]:
+    if model in LLM_CONTEXT_WINDOWS:
+        return LLM_CONTEXT_WINDOWS[model]
+    get_token_limit = _autogen_token_limit()
+    if get_token_limit is not None:
+        try:
+            return get_token_limit(model)
+        except Exception:
+            pass  # a model autogen does not know
+    return DEFAULT_CONTEXT_WINDOWS.get(model)  # None: unknown model, assume the prompt fits
+
+
+@dataclass
+class ModelHealth:
+    """Shared by every agent using the model: circuit breaker plus per-agent latency averages"""
+    breaker: CircuitBreaker = field(default_factory=lambda: CircuitBreaker(LLM_CIRCUIT_FAILURES, LLM_ROUTE_PROBE_SECONDS))
+    latency: Dict[str, float] = field(default_factory=dict)
+    last_probe: float = 0.0
+
+    def observe(self, agent: str, seconds: float) -> None:
+        previous = self.latency.get(agent)
+        self.latency[agent] = seconds if previous is None else previous + LLM_LATENCY_EWMA_ALPHA * (seconds - previous)
+
+    def slow_for(self, agent: str) -> bool:
+        return self.latency.get(agent, 0.0) > LLM_SLOW_SECONDS
+
+
+_health: Dict[str, ModelHealth] = {}
+
+
+def model_health(model: str) -> ModelHealth:
+    if model not in _health:
+        _health[model] = ModelHealth()
+    return _health[model]
+
+
+def route(agent: str, primary: str, fallback: Optional[str], prompt_tokens: int) -> List[Tuple[str, str]]:
+    """(model, reason) in the order to try them for one call"""
+    if not fallback or fallback == primary:
+        return [(primary, "primary")]
+    limit = context_window(primary)
+    if limit is not None and prompt_tokens + LLM_COMPLETION_RESERVE_TOKENS > limit:
+        return [(fallback, "fallback_context")]
+
+    health = model_health(primary)
+    if health.breaker.state != "closed":
+        # The breaker lets one probe through every LLM_ROUTE_PROBE_SECONDS while open
+        if health.breaker.allow():
+            return [(primary, "probe"), (fallback, "retry")]
+        return [(fallback, "fallback_failing")]
+    if health.slow_for(agent):
+        now = time.monotonic()
+        if now - health.last_probe >= LLM_ROUTE_PROBE_SECONDS:
+            health.last_probe = now
+            return [(primary, "probe"), (fallback, "retry")]
+        return [(fallback, "fallback_slow"), (primary, "retry")]
+    return [(primary, "primary"), (fallback, "retry")]
+
+
+def is_model_failure(error: BaseException) -> bool:
+    """Upstream trouble worth another model: throttling, 5xx, timeouts and connection errors"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    try:
+        import openai
+    except ImportError:  # pragma: no cover
+        return False
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (openai.APIConnectionError, openai.APITimeoutError))
+
+
+def _record_result(agent: str, model: str, start: float, usage: Any) -> None:
+    health = model_health(model)
+    health.breaker.record_success()
+    health.observe(agent, time.monotonic() - start)
+    if usage is not None:
+        LLM_COST.labels(agent=agent, model=model).inc(call_cost(model, usage.prompt_tokens, usage.completion_tokens))
+
+
+def _record_error(model: str, error: BaseException) -> bool:
+    """Count the failure; True when the call should be retried on the next model"""
+    health = model_health(model)
+    if is_model_failure(error):
+        health.breaker.record_failure()
+        return True
+    health.breaker.release_probe()
+    return False
+
+
+@lru_cache(maxsize=None)
+def _routing_client_class() -> type:
+    # Defined on first use, like the other model client wrappers (observability.py, llm_cache.py)
+    from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelCapabilities, ModelInfo, RequestUsage
+
+    class RoutingChatCompletionClient(ChatCompletionClient):
+        """One agent's view of its primary and fallback model clients"""
+
+        def __init__(self, agent: str, clients: Dict[str, ChatCompletionClient], primary: str, fallback: Optional[str]):
+            self.agent = agent
+            self.clients = clients
+            self.primary = primary
+            self.fallback = fallback
+            self.last_model: Optional[str] = None
+
+        def _plan(self, messages: Sequence[LLMMessage]) -> List[Tuple[str, str]]:
+            return route(self.agent, self.primary, self.fallback, estimate_prompt_tokens(messages))
+
+        async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+            attempts = self._plan(messages)
+            for index, (model, reason) in enumerate(attempts):
+                LLM_ROUTES.labels(agent=self.agent, model=model, reason=reason).inc()
+                start = time.monotonic()
+                try:
+                    result = await self.clients[model].create(messages, **kwargs)
+                except Exception as e:
+                    if _record_error(model, e) and index + 1 < len(attempts):
+                        print(f"[model_router] {self.agent}: {model} failed ({type(e).__name__}), retrying on {attempts[index + 1][0]}")
+                        continue
+                    raise
+                except BaseException:
+                    # Cancelled: nothing learnt about the model, but a probe must not stay reserved
+                    model_health(model).breaker.release_probe()
+                    raise
+                _record_result(self.agent, model, start, result.usage)
+                self.last_model = model
+                answered_by.set(model)
+                return result
+            raise RuntimeError("no model to route to")  # pragma: no cover - attempts is never empty
+
+        async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[Union[str, CreateResult], None]:
+            attempts = self._plan(messages)
+            for index, (model, reason) in enumerate(attempts):
+                LLM_ROUTES.labels(agent=self.agent, model=model, reason=reason).inc()
+                start = time.monotonic()
+                streamed = False
+                try:
+                    async for item in self.clients[model].create_stream(messages, **kwargs):
+                        if isinstance(item, CreateResult):
+                            _record_result(self.agent, model, start, item.usage)
+                            self.last_model = model
+                            answered_by.set(model)
+                        streamed = True
+                        yield item
+                    return
+                except Exception as e:
+                    if _record_error(model, e) and not streamed and index + 1 < len(attempts):
+                        print(f"[model_router] {self.agent}: {model} failed ({type(e).__name__}), retrying on {attempts[index + 1][0]}")
+                        continue
+                    raise
+                except BaseException:
+                    # Cancelled, or the consumer stopped reading (GeneratorExit) before the final result
+                    model_health(model).breaker.release_probe()
+                    raise
+
+        def _current(self) -> ChatCompletionClient:
+            return self.clients[self.last_model or self.primary]
+
+        async def close(self) -> None:
+            # The model clients are shared between agents and closed by their owner
+            pass
+
+        def actual_usage(self) -> RequestUsage:
+            return self._current().actual_usage()
+
+        def total_usage(self) -> RequestUsage:
+            return self._current().total_usage()
+
+        def count_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+            return self.clients[self.primary].count_tokens(messages, **kwargs)
+
+        def remaining_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+            return self.clients[self.primary].remaining_tokens(messages, **kwargs)
+
+        @property
+        def capabilities(self) -> ModelCapabilities:  # type: ignore[override]
+            return self.clients[self.primary].capabilities
+
+        @property
+        def model_info(self) -> ModelInfo:
+            return self.clients[self.primary].model_info
+
+    return RoutingChatCompletionClient
+
+
+def routed(agent: str, clients: Dict[str, Any], primary: str, fallback: Optional[str] = None) -> Any:
+    """Client for one agent that routes between clients[primary] and clients[fallback]"""
+    return _routing_client_class()(agent, clients, primary, fallback)
+
+
+def routing_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        model: {"circuit": health.breaker.state, "latency_s": {a: round(s, 3) for a, s in health.latency.items()}}
+        for model, health in _health.items()
+    }
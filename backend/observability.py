@@ -0,0 +1,328 @@
+"""
+Metrics and tracing for the itinerary workflow.
+
+  - Prometheus metrics (prometheus_client, optional) served by GET /metrics:
+      trip_stage_duration_seconds{stage}                  every span below
+      trip_external_requests_total{service,outcome}       Places / Tavily calls: ok | error | timeout
+      trip_external_request_duration_seconds{service}
+      trip_external_resilience_events_total{service,event}  retries, throttling, circuit breaker, rate limit (resilience.py)
+      trip_external_concurrency_limit{service}, trip_circuit_state{service,endpoint}  0 closed, 1 half-open, 2 open
+      trip_llm_calls_total{agent,outcome}, trip_llm_tokens_total{agent,kind}, trip_llm_call_duration_seconds{agent}
+      trip_llm_cost_usd_total{agent,model}, trip_llm_routes_total{agent,model,reason}   model_router.py
+      trip_plans_total{endpoint,outcome}, trip_plan_duration_seconds{endpoint}
+      trip_agent_pool{agent,state}                        agents/pool.py: created | leased | waiting
+      trip_cache_events_total{cache,event}, trip_cache_hit_ratio{cache}   read from the caches at scrape time
+  - Spans: span("summarize") etc. nest per request (ContextVar), are forwarded to OpenTelemetry
+    when opentelemetry-api is installed (exported if an SDK is configured), and are collected
+    into a per-request trace. /plan returns the top-level stages as a Server-Timing header and
+    prints the whole span tree when a plan takes longer than TRACE_SLOW_PLAN_SECONDS.
+
+Without prometheus_client the metric objects are no-ops and /metrics answers 503.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, Iterator, List, Optional, Sequence, Union
+
+import httpx
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    PROMETHEUS_AVAILABLE = False
+
+try:
+    from opentelemetry import trace as otel_trace
+    _tracer = otel_trace.get_tracer("trip-sonality")
+except ImportError:  # pragma: no cover - optional dependency
+    _tracer = None
+
+# Print the span tree of plans slower than this (seconds, 0 = never)
+TRACE_SLOW_PLAN_SECONDS = float(os.getenv("TRACE_SLOW_PLAN_SECONDS", "30"))
+
+_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 40, 60, 120, 300)
+
+
+class _NoopMetric:
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_DURATION = Histogram("trip_stage_duration_seconds", "Duration of workflow stages and spans", ["stage"], buckets=_LATENCY_BUCKETS)
+    EXTERNAL_REQUESTS = Counter("trip_external_requests_total", "Outbound API requests", ["service", "outcome"])
+    EXTERNAL_DURATION = Histogram("trip_external_request_duration_seconds", "Outbound API request duration", ["service"], buckets=_LATENCY_BUCKETS)
+    RESILIENCE_EVENTS = Counter("trip_external_resilience_events_total", "Retries, throttling, circuit breaker and rate limit events", ["service", "event"])
+    CONCURRENCY_LIMIT = Gauge("trip_external_concurrency_limit", "Current adaptive concurrency limit", ["service"])
+    CIRCUIT_STATE = Gauge("trip_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", ["service", "endpoint"])
+    LLM_CALLS = Counter("trip_llm_calls_total", "Model client calls", ["agent", "outcome"])
+    LLM_TOKENS = Counter("trip_llm_tokens_total", "Model tokens", ["agent", "kind"])
+    LLM_DURATION = Histogram("trip_llm_call_duration_seconds", "Model call duration", ["agent"], buckets=_LATENCY_BUCKETS)
+    PLANS = Counter("trip_plans_total", "Plan requests", ["endpoint", "outcome"])
+    PLAN_DURATION = Histogram("trip_plan_duration_seconds", "End-to-end plan duration", ["endpoint"], buckets=_LATENCY_BUCKETS)
+    LLM_COST = Counter("trip_llm_cost_usd_total", "Estimated model spend in USD", ["agent", "model"])
+    LLM_ROUTES = Counter("trip_llm_routes_total", "Model calls by chosen model and routing reason", ["agent", "model", "reason"])
+    AGENT_POOL = Gauge("trip_agent_pool", "Agent instances per pool (created, leased) and runs waiting for one", ["agent", "state"])
+else:
+    STAGE_DURATION = EXTERNAL_REQUESTS = EXTERNAL_DURATION = LLM_CALLS = LLM_TOKENS = LLM_DURATION = PLANS = PLAN_DURATION = _NoopMetric()
+    RESILIENCE_EVENTS = CONCURRENCY_LIMIT = CIRCUIT_STATE = AGENT_POOL = LLM_COST = LLM_ROUTES = _NoopMetric()
+
+
+# --- cache statistics -------------------------------------------------------------------
+
+_caches: Dict[str, Any] = {}
+
+
+def register_cache_stats(name: str, cache: Any) -> None:
+    """Expose a cache's counters dict and the *_rate values of its stats() on /metrics"""
+    _caches[name] = cache
+
+
+if PROMETHEUS_AVAILABLE:
+    class _CacheStatsCollector:
+        def collect(self):
+            events = CounterMetricFamily("trip_cache_events", "Cache lookups and refreshes", labels=["cache", "event"])
+            ratio = GaugeMetricFamily("trip_cache_hit_ratio", "Share of lookups served from the cache", labels=["cache"])
+            for name, cache in list(_caches.items()):
+                try:
+                    stats = cache.stats()
+                except Exception:
+                    continue
+                for event, value in cache.counters.items():
+                    events.add_metric([name, event], value)
+                for key, value in stats.items():
+                    if key.endswith("_rate"):
+                        ratio.add_metric([name], float(value))
+            yield events
+            yield ratio
+
+    REGISTRY.register(_CacheStatsCollector())
+
+
+# --- spans and traces -------------------------------------------------------------------
+
+@dataclass
+class SpanRecord:
+    name: str
+    start: float
+    depth: int
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    duration: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class Trace:
+    name: str
+    start: float = field(default_factory=time.perf_counter)
+    spans: List[SpanRecord] = field(default_factory=list)
+
+    def stage_totals(self, depth: int = 0) -> Dict[str, float]:
+        """Summed duration per span name at the given depth (0 = top-level stages)"""
+        totals: Dict[str, float] = {}
+        for s in self.spans:
+            if s.depth == depth and s.duration is not None:
+                totals[s.name] = totals.get(s.name, 0.0) + s.duration
+        return totals
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name.replace(':', '-')};dur={seconds * 1000:.1f}" for name, seconds in self.stage_totals().items())
+
+    def format_tree(self) -> str:
+        lines = [f"trace {self.name}: {time.perf_counter() - self.start:.2f}s"]
+        for s in sorted(self.spans, key=lambda s: s.start):
+            offset = s.start - self.start
+            duration = f"{s.duration:.3f}s" if s.duration is not None else "running"
+            suffix = f" ERROR {s.error}" if s.error else ""
+            lines.append(f"{'  ' * (s.depth + 1)}{s.name} +{offset:.3f}s {duration}{suffix}")
+        return "\n".join(lines)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("_current_trace", default=None)
+_span_depth: ContextVar[int] = ContextVar("_span_depth", default=0)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[SpanRecord]:
+    """Time a stage: Prometheus histogram, OpenTelemetry span (if available) and the request trace"""
+    depth = _span_depth.get()
+    record = SpanRecord(name=name, start=time.perf_counter(), depth=depth, attributes=attributes)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append(record)
+    depth_token = _span_depth.set(depth + 1)
+    otel_cm = _tracer.start_as_current_span(name, attributes={k: str(v) for k, v in attributes.items()}) if _tracer else None
+    otel_span = otel_cm.__enter__() if otel_cm else None
+    try:
+        yield record
+    except BaseException as e:
+        record.error = type(e).__name__
+        if otel_span is not None:
+            otel_span.record_exception(e)
+        raise
+    finally:
+        record.duration = time.perf_counter() - record.start
+        _span_depth.reset(depth_token)
+        if otel_cm is not None:
+            otel_cm.__exit__(None, None, None)
+        STAGE_DURATION.labels(stage=name).observe(record.duration)
+
+
+@contextmanager
+def start_trace(name: str) -> Iterator[Trace]:
+    """Collect every span opened inside the block (including in tasks started from it)"""
+    trace = Trace(name=name)
+    trace_token = _current_trace.set(trace)
+    depth_token = _span_depth.set(0)
+    try:
+        yield trace
+    finally:
+        _span_depth.reset(depth_token)
+        _current_trace.reset(trace_token)
+        elapsed = time.perf_counter() - trace.start
+        if TRACE_SLOW_PLAN_SECONDS and elapsed >= TRACE_SLOW_PLAN_SECONDS:
+            print(f"🐢 slow {trace.format_tree()}")
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@asynccontextmanager
+async def external_call(service: str, **attributes: Any) -> AsyncGenerator[None, None]:
+    """Span + request/error/timeout counters around one outbound API request"""
+    start = time.perf_counter()
+    outcome = "ok"
+    with span(f"http:{service}", **attributes):
+        try:
+            yield
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            outcome = "timeout"
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            EXTERNAL_REQUESTS.labels(service=service, outcome=outcome).inc()
+            EXTERNAL_DURATION.labels(service=service).observe(time.perf_counter() - start)
+
+
+def metrics_payload() -> Optional[tuple]:
+    """(body, content_type) for /metrics, or None without prometheus_client"""
+    if not PROMETHEUS_AVAILABLE:
+        return None
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+# --- model client instrumentation ------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def _metered_client_class() -> type:
+    # Defined on first use: autogen_core.models is one of the slower imports in the backend and
+    # is only needed once an agent is built, not to start the app
+    from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelCapabilities, ModelInfo, RequestUsage
+
+    class MeteredChatCompletionClient(ChatCompletionClient):
+        """
+        Wraps the shared model client for one agent: call counts, token usage, latency and an
+        llm:<agent> span per call (with prompt_tokens / completion_tokens attributes, so a trace
+        can total a run's usage). Everything else is delegated to the wrapped client.
+        """
+
+        def __init__(self, inner: ChatCompletionClient, agent: str):
+            self._inner = inner
+            self.agent = agent
+
+        def _record(self, record: SpanRecord, start: float, outcome: str, usage: Optional[RequestUsage]) -> None:
+            LLM_CALLS.labels(agent=self.agent, outcome=outcome).inc()
+            LLM_DURATION.labels(agent=self.agent).observe(time.perf_counter() - start)
+            if usage is not None:
+                LLM_TOKENS.labels(agent=self.agent, kind="prompt").inc(usage.prompt_tokens)
+                LLM_TOKENS.labels(agent=self.agent, kind="completion").inc(usage.completion_tokens)
+                record.attributes.update(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+        async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+            start = time.perf_counter()
+            with span(f"llm:{self.agent}") as record:
+                try:
+                    result = await self._inner.create(messages, **kwargs)
+                except Exception:
+                    self._record(record, start, "error", None)
+                    raise
+                self._record(record, start, "ok", result.usage)
+            return result
+
+        async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[Union[str, CreateResult], None]:
+            start = time.perf_counter()
+            usage = None
+            outcome = "ok"
+            # Not a span(): the generator is suspended between chunks, so it is added to the trace directly
+            record = SpanRecord(name=f"llm:{self.agent}", start=start, depth=_span_depth.get())
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.spans.append(record)
+            try:
+                async for item in self._inner.create_stream(messages, **kwargs):
+                    if isinstance(item, CreateResult):
+                        usage = item.usage
+                    yield item
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                self._record(record, start, outcome, usage)
+                record.duration = time.perf_counter() - start
+                record.error = None if outcome == "ok" else outcome
+                STAGE_DURATION.labels(stage=record.name).observe(record.duration)
+
+        async def close(self) -> None:
+            # The wrapped client is shared between agents and closed by its owner
+            pass
+
+        def actual_usage(self) -> RequestUsage:
+            return self._inner.actual_usage()
+
+        def total_usage(self) -> RequestUsage:
+            return self._inner.total_usage()
+
+        def count_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+            return self._inner.count_tokens(messages, **kwargs)
+
+        def remaining_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+            return self._inner.remaining_tokens(messages, **kwargs)
+
+        @property
+        def capabilities(self) -> ModelCapabilities:  # type: ignore[override]
+            return self._inner.capabilities
+
+        @property
+        def model_info(self) -> ModelInfo:
+            return self._inner.model_info
+
+    return MeteredChatCompletionClient
+
+
+def metered(client: Any, agent: str) -> Any:
+    return _metered_client_class()(client, agent)
+
+
+def __getattr__(name: str):
+    # `from observability import MeteredChatCompletionClient` keeps working
+    if name == "MeteredChatCompletionClient":
+        return _metered_client_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
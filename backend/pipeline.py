@@ -0,0 +1,232 @@
+"""
+Direct pipeline engine: runs summarize_agent -> POI tools -> plan_agent in that fixed order,
+without the Magentic-One orchestrator (no ledger, planning or speaker-selection LLM calls).
+
+Each stage hands a typed object to the next one:
+    initial user input --summarize_stage--> TripSummary
+    TripSummary        --poi_stage-------->  PoiHandoff
+    PoiHandoff         --plan_stage------->  final_output (same shape as run_autogen_workflow)
+
+The POI stage calls gather_activity_pois directly: it already searches nearby restaurants for
+the top activities, which is all poi_activity_agent's LLM turn would ask for.
+
+With PLANNER_MODE=algorithmic the plan stage arranges the days with tools/day_planner.py and
+itinerary_writer_agent only writes a title and description per day.
+"""
+import json
+import os
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+from agents.pool import lease_agents
+from tools.poi_activity_tool import gather_activity_pois
+from tools.web_discovery import WEB_DISCOVERY_ENABLED
+from tools.day_planner import build_itinerary, trip_start
+from tools.poi_model import load_places, rehydrate_day, wire_pois
+from observability import span
+from utils import parse_agent_json, ItineraryDayExtractor
+
+# "llm": plan_agent writes the whole itinerary (default)
+# "algorithmic": tools/day_planner.py arranges the days, the LLM only describes them
+PLANNER_MODE = os.getenv("PLANNER_MODE", "llm")
+PLANNER_DESCRIBE_DAYS = os.getenv("PLANNER_DESCRIBE_DAYS", "true").lower() == "true"
+
+
+class TripSummary(BaseModel):
+    """summarize_agent output (see prompts/summarize_agent.txt)"""
+    theme: str = "Culture"
+    location: str
+    days: int = 3
+    start: Optional[str] = None
+    end: Optional[str] = None
+    mbti: str = ""
+    inclusion: List[str] = Field(default_factory=list)
+    exclusion: List[str] = Field(default_factory=list)
+
+
+class PoiHandoff(BaseModel):
+    """What plan_agent needs: the trip parameters plus the scored POI list"""
+    summary: TripSummary
+    pois: List[Dict[str, Any]]
+
+
+def _last_text(messages: List[Any], source: str) -> Optional[str]:
+    for msg in reversed(messages):
+        if getattr(msg, "source", None) == source and isinstance(getattr(msg, "content", None), str):
+            return msg.content
+    return None
+
+
+def parse_summary(content: Optional[str], initial_user_input: Dict[str, Any]) -> TripSummary:
+    data = parse_agent_json(content or "")
+    if not isinstance(data, dict):
+        raise Exception(f"summarize_agent returned no JSON summary: {(content or '')[:200]}")
+    if data.get("error_type") == "invalid_location" or not data.get("location"):
+        raise HTTPException(status_code=400, detail="Could not identify a valid destination city in the query.")
+
+    # The MBTI type is the user's, not something to extract (summarize_task leaves it out)
+    data["mbti"] = initial_user_input.get("mbti") or data.get("mbti") or ""
+    summary = TripSummary(**{k: v for k, v in data.items() if k in TripSummary.model_fields and v is not None})
+    start = trip_start(summary.start)
+    summary.start = str(start)
+    if not summary.end:
+        summary.end = str(start + timedelta(days=summary.days - 1))
+    return summary
+
+
+def summarize_task(initial_user_input: Dict[str, Any]) -> str:
+    """
+    Only the fields the summary is extracted from: the same query from users with a different
+    MBTI type or budget is the same task, so its completion can come from llm_cache.py.
+    """
+    return json.dumps({k: v for k, v in initial_user_input.items() if k in ("Query", "CurrentItinerary")})
+
+
+async def summarize_stage(initial_user_input: Dict[str, Any]) -> TripSummary:
+    async with lease_agents("summarize_agent") as (summarize_agent,):
+        with span("summarize"):
+            result = await summarize_agent.run(task=summarize_task(initial_user_input))
+    summary = parse_summary(_last_text(result.messages, "summarize_agent"), initial_user_input)
+    print(f"📝 summarize_stage: {summary.location}, {summary.days} days, theme={summary.theme}")
+    return summary
+
+
+async def poi_stage(summary: TripSummary, web_places: Optional[List[str]] = None) -> PoiHandoff:
+    with span("poi_gathering", location=summary.location):
+        pois = await gather_activity_pois(
+            location=summary.location,
+            mbti=summary.mbti,
+            theme=summary.theme,
+            inclusion=summary.inclusion or None,
+            web_places=web_places,
+            discover_web=WEB_DISCOVERY_ENABLED,
+        )
+    return PoiHandoff(summary=summary, pois=pois)
+
+
+def build_plan_task(handoff: PoiHandoff, initial_user_input: Dict[str, Any]) -> str:
+    task = {
+        **handoff.summary.model_dump(),
+        "budget": initial_user_input.get("Budget"),
+        # Compact POIs (tools/poi_model.py); extract_final_output rehydrates them by id
+        "pois": wire_pois(handoff.pois),
+    }
+    return f"""{json.dumps(task, ensure_ascii=False, separators=(",", ":"))}
+
+Plan the itinerary from these POIs based on the criteria described in your system instructions.
+"""
+
+
+def build_describe_task(plan: Dict[str, Any]) -> str:
+    """Compact view of the arranged days: just names and meal types, no coordinates"""
+    days = [
+        {
+            "day": day["day"],
+            "stops": [
+                f"{entry['time']} {entry['poi'].get('name')}" + (f" ({entry['poi']['meal_type']})" if entry["poi"].get("meal_type") else "")
+                for entry in day["activities"]
+            ],
+        }
+        for day in plan["itinerary"]
+    ]
+    context = {"theme": plan.get("theme"), "location": plan.get("location"), "mbti": plan.get("mbti"), "days": days}
+    return json.dumps(context, ensure_ascii=False)
+
+
+async def describe_days(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Let itinerary_writer_agent add a title/description to each day; the plan stays valid if it fails"""
+    try:
+        async with lease_agents("itinerary_writer_agent") as (itinerary_writer_agent,):
+            with span("describe_days"):
+                result = await itinerary_writer_agent.run(task=build_describe_task(plan))
+        descriptions = parse_agent_json(_last_text(result.messages, "itinerary_writer_agent") or "")
+    except Exception as e:
+        print(f"itinerary_writer_agent failed, keeping plan without descriptions: {e}")
+        return plan
+    if isinstance(descriptions, dict):
+        for day in plan["itinerary"]:
+            text = descriptions.get(day["day"])
+            if isinstance(text, dict):
+                day["title"] = text.get("title")
+                day["description"] = text.get("description")
+    return plan
+
+
+async def algorithmic_plan_stage(handoff: PoiHandoff, initial_user_input: Dict[str, Any]) -> Dict[str, Any]:
+    from autogen_itinerary import format_final_output
+
+    with span("planning", mode="algorithmic"):
+        plan = build_itinerary(handoff.summary.model_dump(), handoff.pois)
+    print(f"🗺️ day_planner arranged {len(plan['itinerary'])} days from {len(handoff.pois)} POIs")
+    if PLANNER_DESCRIBE_DAYS:
+        plan = await describe_days(plan)
+    return format_final_output(plan, initial_user_input)
+
+
+async def plan_stage(handoff: PoiHandoff, initial_user_input: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # Imported here: autogen_itinerary imports this module to dispatch to it
+    from autogen_itinerary import extract_final_output, load_plan_places
+
+    if PLANNER_MODE == "algorithmic":
+        return await algorithmic_plan_stage(handoff, initial_user_input)
+
+    async with lease_agents("plan_agent") as (plan_agent,):
+        with span("planning", mode="llm"):
+            result = await plan_agent.run(task=build_plan_task(handoff, initial_user_input))
+    await load_plan_places(result.messages)
+    return extract_final_output(result.messages, initial_user_input)
+
+
+async def run_pipeline_workflow(initial_user_input: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    print("--- Starting direct pipeline workflow ---")
+    print(f"Initial User Input: {initial_user_input}")
+    summary = await summarize_stage(initial_user_input)
+    handoff = await poi_stage(summary)
+    final_output = await plan_stage(handoff, initial_user_input)
+    print("--- Direct pipeline workflow completed ---")
+    return final_output
+
+
+async def stream_pipeline_workflow(initial_user_input: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """Streaming variant with the same events as autogen_itinerary.stream_autogen_workflow"""
+    from autogen_itinerary import extract_final_output, load_plan_places
+
+    yield "progress", {"source": "summarize_agent", "type": "StageStarted", "preview": ""}
+    summary = await summarize_stage(initial_user_input)
+    yield "summary", summary.model_dump()
+
+    yield "progress", {"source": "poi_activity_agent", "type": "StageStarted", "preview": ""}
+    yield "tool_call", {"source": "pipeline", "tools": [{"name": "gather_activity_pois", "arguments": summary.model_dump_json()}]}
+    handoff = await poi_stage(summary)
+    yield "tool_result", {"source": "pipeline", "tools": [{"name": "gather_activity_pois", "is_error": False}]}
+    yield "pois", {"source": "gather_activity_pois", "pois": handoff.pois}
+
+    yield "progress", {"source": "plan_agent", "type": "StageStarted", "preview": ""}
+    if PLANNER_MODE == "algorithmic":
+        final_output = await algorithmic_plan_stage(handoff, initial_user_input)
+        for index, day in enumerate(final_output["itinerary"]["itinerary"]):
+            yield "day", {"index": index, "day": day}
+        yield "final", final_output
+        return
+
+    from autogen_agentchat.base import TaskResult
+    from autogen_agentchat.messages import ModelClientStreamingChunkEvent
+
+    day_extractor = ItineraryDayExtractor()
+    async with lease_agents("plan_agent") as (plan_agent,):
+        async for message in plan_agent.run_stream(task=build_plan_task(handoff, initial_user_input)):
+            if isinstance(message, ModelClientStreamingChunkEvent):
+                for index, day in day_extractor.feed(message.content):
+                    await load_places(day)
+                    yield "day", {"index": index, "day": rehydrate_day(day)}
+            elif isinstance(message, TaskResult):
+                if day_extractor.days_emitted == 0:
+                    content = _last_text(message.messages, "plan_agent") or ""
+                    for index, day in day_extractor.feed(content):
+                        await load_places(day)
+                        yield "day", {"index": index, "day": rehydrate_day(day)}
+                await load_plan_places(message.messages)
+                yield "final", extract_final_output(message.messages, initial_user_input)
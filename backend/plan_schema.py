@@ -0,0 +1,72 @@
+"""
+Schema and fast-path handling of the itinerary plan_agent returns.
+
+parse_plan_output goes from the raw agent reply to a validated plan dict in one pass:
+extract_json_text (no regex), orjson (when installed), then a pydantic check of the
+itinerary structure. Extra keys are kept, so agents can add fields without a schema change.
+The check is no stricter than the extraction it replaced: a numeric "day" or an entry without a
+"time" is still a plan.
+PlanJSONResponse renders /plan bodies with orjson instead of going through pydantic `Any`.
+"""
+import json
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+
+from utils import extract_json_text, json_loads, log_sampled, orjson
+
+
+class ItineraryEntry(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    time: Optional[str] = None
+    poi: Dict[str, Any]
+
+
+class ItineraryDay(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    day: Union[str, int]
+    activities: List[ItineraryEntry] = Field(default_factory=list)
+
+
+class ItineraryPlan(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    theme: Optional[str] = None
+    location: Optional[str] = None
+    days: Optional[int] = None
+    itinerary: List[ItineraryDay]
+
+
+def parse_plan_output(content: str) -> Dict[str, Any]:
+    """
+    Parse and validate a plan_agent reply; raises ValueError (json/orjson decode errors and
+    pydantic ValidationError are both ValueErrors) when it is not a usable itinerary.
+    The returned dict is the parsed JSON itself, not a copy dumped from the model.
+    """
+    log_sampled("plan_agent output", lambda: content)
+    plan = json_loads(extract_json_text(content))
+    if not isinstance(plan, dict):
+        raise ValueError(f"expected a JSON object, got {type(plan).__name__}")
+    ItineraryPlan.model_validate(plan)
+    return plan
+
+
+def _json_default(value: Any) -> Any:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def dumps_bytes(content: Any) -> bytes:
+    if orjson is not None:
+        # Datetimes come out as ISO 8601; anything else orjson does not know falls back to str()
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+class PlanJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,301 @@
+"""
+Storage format of the "conversations" collection: POIs normalized out of the itineraries,
+large blobs compressed.
+
+Every itinerary entry used to embed its full POI dict (address, types, coordinates, ...), so
+the same places were written again with every plan. A stored plan now keeps per-plan fields
+inline and references the place:
+
+    data.itinerary.itinerary[].activities[].poi = {"ref": place_id, "score": 91.5, "meal_type": "dinner"}
+
+The place details (PLACE_FIELDS) live once in the "pois" collection, keyed by place_id, and are
+upserted with every save, so a read shows the latest stored details of each place. POIs without
+a place_id or without the full set of place fields stay inline as they are.
+
+    plan record   session_id, input_hash, user_input, data | data_z, user_input_z, poi_ids,
+                  has_itinerary, trip, storage_version, created_at, updated_at
+    pois          _id (place_id), name, address, lat, lng, rating, price_level, types, updated_at
+
+"data" and "user_input" larger than PLAN_STORE_COMPRESS_MIN_BYTES (as JSON, after the POIs are
+taken out) are stored zlib-compressed in "<field>_z" instead. Reads (find_one / find) only
+fetch, decompress and rehydrate the fields asked for; the POIs of all returned plans come
+from one $in query. Records written before this format (no storage_version) are returned as
+stored; migrate_plans.py rewrites them.
+
+"trip" is the summary trip listings filter and show (location, theme, mbti, days, start, end,
+plus normalized location_key/theme_key), kept uncompressed next to the blobs. list_trips pages
+through plans with an itinerary newest first, by keyset on (updated_at, session_id), on
+partial indexes that only cover listable plans.
+"""
+import base64
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pymongo import UpdateOne
+
+from cache import normalize_text
+from plan_schema import dumps_bytes
+from utils import json_loads
+
+# Compress "data"/"user_input" blobs at least this large once the POIs are taken out (0 = never)
+PLAN_STORE_COMPRESS_MIN_BYTES = int(os.getenv("PLAN_STORE_COMPRESS_MIN_BYTES", "4096"))
+PLAN_STORE_COMPRESS_LEVEL = int(os.getenv("PLAN_STORE_COMPRESS_LEVEL", "6"))
+
+# 2: POI references and compressed blobs, 3: trip summary for listings
+STORAGE_VERSION = 3
+# Facts about the place itself (POI.from_places); everything else on a POI is per plan
+PLACE_FIELDS = ("name", "address", "lat", "lng", "rating", "price_level", "types", "place_id")
+BLOB_FIELDS = ("data", "user_input")
+# Bookkeeping fields returned only when asked for
+INTERNAL_FIELDS = ("poi_ids", "has_itinerary", "storage_version") + tuple(f"{field}_z" for field in BLOB_FIELDS)
+# What a trip listing returns per plan (no user input, no itinerary)
+TRIP_SUMMARY_FIELDS = ("session_id", "trip", "created_at", "updated_at")
+# list_trips filters; each has its own (filter, updated_at, session_id) index
+TRIP_FILTER_FIELDS = {"location": "trip.location_key", "theme": "trip.theme_key", "mbti": "trip.mbti", "days": "trip.days"}
+LISTING_ORDER = [("updated_at", -1), ("session_id", -1)]
+
+
+class InvalidCursor(ValueError):
+    """Raised by list_trips for a cursor it did not hand out"""
+
+
+def _entries(data: Any) -> Iterator[Dict[str, Any]]:
+    """Itinerary entries of a /plan "data" payload (or of the itinerary document itself)"""
+    if not isinstance(data, dict):
+        return
+    plan = data["itinerary"] if isinstance(data.get("itinerary"), dict) else data
+    days = plan.get("itinerary")
+    if not isinstance(days, list):
+        return
+    for day in days:
+        activities = day.get("activities") if isinstance(day, dict) else None
+        for entry in activities if isinstance(activities, list) else []:
+            if isinstance(entry, dict) and isinstance(entry.get("poi"), dict):
+                yield entry
+
+
+def _copy_entries(data: Any) -> Any:
+    """Copy of data down to the entry dicts, so rewriting entry["poi"] leaves the caller's plan alone"""
+    if not isinstance(data, dict):
+        return data
+    nested = isinstance(data.get("itinerary"), dict)
+    plan = data["itinerary"] if nested else data
+    if not isinstance(plan.get("itinerary"), list):
+        return data
+    days = [
+        {**day, "activities": [dict(e) if isinstance(e, dict) else e for e in day["activities"]]}
+        if isinstance(day, dict) and isinstance(day.get("activities"), list) else day
+        for day in plan["itinerary"]
+    ]
+    plan = {**plan, "itinerary": days}
+    return {**data, "itinerary": plan} if nested else plan
+
+
+def dehydrate_plan(data: Any) -> Tuple[Any, Dict[str, Dict[str, Any]]]:
+    """(data with POI references, place_id -> place details); the input is not modified"""
+    data = _copy_entries(data)
+    places: Dict[str, Dict[str, Any]] = {}
+    for entry in _entries(data):
+        poi = entry["poi"]
+        place_id = poi.get("place_id")
+        if not place_id or not isinstance(place_id, str) or not all(key in poi for key in PLACE_FIELDS):
+            continue
+        places[place_id] = {key: poi[key] for key in PLACE_FIELDS if key != "place_id"}
+        entry["poi"] = {"ref": place_id, **{k: v for k, v in poi.items() if k not in PLACE_FIELDS}}
+    return data, places
+
+
+def rehydrate_plan(data: Any, places: Dict[str, Dict[str, Any]]) -> Any:
+    """Put the place details back into every referencing entry (in place)"""
+    for entry in _entries(data):
+        poi = entry["poi"]
+        place_id = poi.get("ref")
+        if place_id is None:
+            continue
+        place = places.get(place_id, {})
+        # Same key order as POI.to_dict: place fields first, then what the tools and planner added
+        details = {key: place.get(key) for key in PLACE_FIELDS if key in place}
+        details["place_id"] = place_id
+        entry["poi"] = {**details, **{k: v for k, v in poi.items() if k != "ref"}}
+    return data
+
+
+def decompress_blob(blob: bytes) -> Any:
+    return json_loads(zlib.decompress(blob))
+
+
+def trip_summary(data: Any, user_input: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Listing fields of a plan, None when it has no itinerary"""
+    if not isinstance(data, dict) or "itinerary" not in data:
+        return None
+    plan = data["itinerary"] if isinstance(data.get("itinerary"), dict) else data
+    days = plan.get("days")
+    if not isinstance(days, int) and isinstance(plan.get("itinerary"), list):
+        days = len(plan["itinerary"])
+    mbti = plan.get("mbti") or (user_input or {}).get("mbti") or ""
+    trip = {
+        "location": plan.get("location"),
+        "theme": plan.get("theme"),
+        "mbti": str(mbti).strip().upper() or None,
+        "days": days if isinstance(days, int) else None,
+        "start": plan.get("start"),
+        "end": plan.get("end"),
+    }
+    trip["location_key"] = normalize_text(trip["location"]) or None
+    trip["theme_key"] = normalize_text(trip["theme"]) or None
+    return trip
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Opaque position after doc in LISTING_ORDER"""
+    payload = json.dumps([doc["updated_at"].isoformat(), doc["session_id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        updated_at, session_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(updated_at), str(session_id)
+    except Exception as e:
+        raise InvalidCursor(f"invalid cursor: {cursor!r}") from e
+
+
+def encode_record(record: Dict[str, Any], compress_min_bytes: int = PLAN_STORE_COMPRESS_MIN_BYTES) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """The stored form of a plan record and the places it references"""
+    doc = dict(record)
+    for field in INTERNAL_FIELDS:
+        doc.pop(field, None)
+    data, places = dehydrate_plan(record.get("data"))
+    doc["data"] = data
+    doc["poi_ids"] = list(places)
+    doc["has_itinerary"] = isinstance(data, dict) and "itinerary" in data
+    doc["trip"] = trip_summary(data, record.get("user_input"))
+    doc["storage_version"] = STORAGE_VERSION
+    if compress_min_bytes > 0:
+        for field in BLOB_FIELDS:
+            if doc.get(field) is None:
+                continue
+            payload = dumps_bytes(doc[field])
+            if len(payload) >= compress_min_bytes:
+                del doc[field]
+                doc[f"{field}_z"] = zlib.compress(payload, PLAN_STORE_COMPRESS_LEVEL)
+    return doc, places
+
+
+class PlanStore:
+    def __init__(self, plans: Any, pois: Any, compress_min_bytes: int = PLAN_STORE_COMPRESS_MIN_BYTES):
+        self.plans = plans
+        self.pois = pois
+        self.compress_min_bytes = compress_min_bytes
+
+    async def create_indexes(self) -> None:
+        await self.plans.create_index("session_id", unique=True)
+        await self.plans.create_index("updated_at")
+        await self.plans.create_index([("input_hash", 1), ("updated_at", -1)])
+        # Listings: equality on one filter, then the keyset order; only plans that can be listed are indexed
+        listable = {"partialFilterExpression": {"has_itinerary": True}}
+        await self.plans.create_index(LISTING_ORDER, name="trips_recent", **listable)
+        for name, path in TRIP_FILTER_FIELDS.items():
+            await self.plans.create_index([(path, 1)] + LISTING_ORDER, name=f"trips_by_{name}", **listable)
+
+    async def upsert_places(self, places: Dict[str, Dict[str, Any]]) -> None:
+        if not places:
+            return
+        now = datetime.now(timezone.utc)
+        await self.pois.bulk_write(
+            [UpdateOne({"_id": place_id}, {"$set": {**place, "updated_at": now}}, upsert=True) for place_id, place in places.items()],
+            ordered=False,
+        )
+
+    async def save(self, record: Dict[str, Any]) -> Any:
+        """Store a plan record; returns the inserted _id"""
+        doc, places = encode_record(record, self.compress_min_bytes)
+        # Places first, so a stored plan never references a missing POI
+        await self.upsert_places(places)
+        result = await self.plans.insert_one(doc)
+        return result.inserted_id
+
+    @staticmethod
+    def _projection(fields: Optional[Sequence[str]]) -> Optional[Dict[str, int]]:
+        if fields is None:
+            return {"_id": 0}
+        projection = {"_id": 0}
+        for field in fields:
+            projection[field] = 1
+            if field in BLOB_FIELDS:
+                projection[f"{field}_z"] = 1
+            if field == "data":
+                projection["poi_ids"] = 1
+        projection["storage_version"] = 1
+        return projection
+
+    async def decode(self, docs: List[Dict[str, Any]], fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Stored documents back in the shape they were saved in (in place)"""
+        keep = set(fields or ()) & set(INTERNAL_FIELDS)
+        # poi_ids is only projected along with the data it belongs to
+        place_ids = list({place_id for doc in docs if doc.get("storage_version") for place_id in doc.get("poi_ids") or ()})
+        places: Dict[str, Dict[str, Any]] = {}
+        if place_ids:
+            async for place in self.pois.find({"_id": {"$in": place_ids}}, {"updated_at": 0}):
+                places[place.pop("_id")] = place
+
+        for doc in docs:
+            if doc.get("storage_version"):
+                for field in BLOB_FIELDS:
+                    blob = doc.pop(f"{field}_z", None)
+                    if blob is not None:
+                        doc[field] = decompress_blob(blob)
+                if doc.get("poi_ids") and "data" in doc:
+                    rehydrate_plan(doc["data"], places)
+            for field in INTERNAL_FIELDS:
+                if field not in keep:
+                    doc.pop(field, None)
+        return docs
+
+    async def find_one(self, query: Dict[str, Any], fields: Optional[Sequence[str]] = None,
+                       sort: Optional[Sequence[Tuple[str, int]]] = None) -> Optional[Dict[str, Any]]:
+        """
+        First matching plan record with only the given top-level fields (all when None), in
+        the shape it was saved in
+        """
+        doc = await self.plans.find_one(query, projection=self._projection(fields), sort=sort)
+        if doc is None:
+            return None
+        return (await self.decode([doc], fields))[0]
+
+    async def find(self, query: Dict[str, Any], fields: Optional[Sequence[str]] = None,
+                   sort: Optional[Sequence[Tuple[str, int]]] = None, limit: int = 0) -> List[Dict[str, Any]]:
+        """Matching plan records like find_one; the POIs of all of them are looked up at once"""
+        docs = await self.plans.find(query, self._projection(fields), sort=sort, limit=limit).to_list(None)
+        return await self.decode(docs, fields)
+
+    async def list_trips(self, filters: Dict[str, Any], limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        One page of trip summaries, newest first: {"items": [...], "next_cursor": str | None}.
+        filters: location, theme (matched case-insensitively), mbti, days; None values are ignored.
+        """
+        query: Dict[str, Any] = {"has_itinerary": True}
+        for name, value in filters.items():
+            if value is None or name not in TRIP_FILTER_FIELDS:
+                continue
+            if name in ("location", "theme"):
+                value = normalize_text(value)
+            elif name == "mbti":
+                value = value.strip().upper()
+            query[TRIP_FILTER_FIELDS[name]] = value
+        if cursor:
+            updated_at, session_id = decode_cursor(cursor)
+            # The outer bound is an index range on updated_at; the $or only breaks ties
+            query["updated_at"] = {"$lte": updated_at}
+            query["$or"] = [{"updated_at": {"$lt": updated_at}}, {"session_id": {"$lt": session_id}}]
+        # One extra row tells whether there is a next page
+        docs = await self.find(query, fields=TRIP_SUMMARY_FIELDS, sort=LISTING_ORDER, limit=limit + 1)
+        items = docs[:limit]
+        for item in items:
+            trip = item.get("trip") or {}
+            trip.pop("location_key", None)
+            trip.pop("theme_key", None)
+        return {"items": items, "next_cursor": encode_cursor(docs[limit - 1]) if len(docs) > limit else None}
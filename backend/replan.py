@@ -0,0 +1,365 @@
+"""
+Incremental re-planning: apply an edit such as "swap day 2's dinner" to a stored itinerary
+instead of regenerating the whole trip.
+
+    base plan (stored session or CurrentItinerary) + edit query
+        --parse_edit-->      EditRequest (days, target, action, keyword)
+        --apply_edit-->      only the affected days are changed
+        --describe_days-->   titles/descriptions rewritten for those days only
+
+Replacement candidates come from the same tools the full run used (search_nearby_restaurants,
+fetch_google_places), so they are normally answered by the places cache and the POI store
+without new API calls. Anything parse_edit does not understand with confidence (another city,
+a different trip length, a new MBTI type, an edit that names no day or stop) returns None,
+and the caller runs the full workflow as before.
+"""
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from observability import span
+from tools.critic_meal_tool import search_nearby_restaurants
+from tools.day_planner import haversine_matrix, haversine_to, plan_days, route_length
+from tools.poi_activity_tool import apply_mbti_scoring, build_activity_queries, fetch_google_places
+
+# "incremental": edits to a supplied itinerary only re-plan the affected days (default)
+# "full": every request regenerates the whole itinerary
+REPLAN_MODE = os.getenv("REPLAN_MODE", "incremental")
+# Ranking of replacement activities: score points given up per km away from the rest of the day
+REPLAN_DISTANCE_PENALTY = float(os.getenv("REPLAN_DISTANCE_PENALTY", "5"))
+
+_ORDINALS = {"first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7}
+_DAY_NUMBER = re.compile(r"\bday\s*#?\s*(\d+)\b")
+_DAY_ORDINAL = re.compile(r"\b(first|second|third|fourth|fifth|sixth|seventh|last|final)\s+day\b")
+_ALL_DAYS = re.compile(r"\b(every|each|all)\s+(?:the\s+)?days?\b")
+_REMOVE = re.compile(r"\b(remove|drop|skip|delete|cancel|get rid of|take out|without)\b")
+_TRIP_CHANGE = re.compile(r"\b\d+\s*-?\s*(?:days?|nights?)\b|\b(?:add|extra|another|one more)\s+(?:a\s+)?day\b|\b(?:shorter|longer) trip\b")
+_KEYWORD = re.compile(r"\b(?:for|with|to|into)\s+(?:a|an|the|some)?\s*([a-z][a-z '&-]{1,40})$")
+_VAGUE = re.compile(r"\b(else|different|another|other|new|better|something|somewhere|one)\b")
+_CLOCK = re.compile(r"\s*(\d{1,2})(?::\d{2})?\s*([AaPp][Mm])")
+_TARGETS = [
+    ("lunch", re.compile(r"\blunch\b")),
+    ("dinner", re.compile(r"\b(dinner|supper)\b")),
+    ("meals", re.compile(r"\b(meals?|restaurants?|food|eat(?:ing)?)\b")),
+    ("activities", re.compile(r"\b(activit(?:y|ies)|attractions?|sights?|morning|afternoon)\b")),
+]
+
+
+@dataclass
+class BasePlan:
+    """The itinerary being edited and what it was generated from"""
+    plan: Dict[str, Any]
+    user_input: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = None
+
+
+@dataclass
+class EditRequest:
+    days: List[int]                       # 0-based indices of the days to change
+    target: str                           # lunch | dinner | meals | activities | poi | day
+    action: str = "replace"               # replace | remove
+    keyword: Optional[str] = None         # what to replace it with, e.g. "sushi"
+    poi_ids: List[str] = field(default_factory=list)  # stops named in the query
+
+
+def base_plan_from(data: Any, user_input: Optional[Dict[str, Any]] = None, session_id: Optional[str] = None) -> Optional[BasePlan]:
+    """Accept a /plan response body, its "data" or the itinerary document itself"""
+    if not isinstance(data, dict):
+        return None
+    if isinstance(data.get("data"), dict):
+        session_id = session_id or data.get("session_id")
+        data = data["data"]
+    if isinstance(data.get("itinerary"), dict):
+        data = data["itinerary"]
+    days = data.get("itinerary")
+    if not isinstance(days, list) or not days or not all(isinstance(d, dict) and isinstance(d.get("activities"), list) for d in days):
+        return None
+    return BasePlan(plan=data, user_input=user_input, session_id=session_id)
+
+
+def _is_meal(entry: Dict[str, Any]) -> bool:
+    poi = entry.get("poi") or {}
+    return bool(poi.get("meal_type")) or poi.get("category") == "restaurant"
+
+
+def _meal_type(entry: Dict[str, Any]) -> str:
+    poi = entry.get("poi") or {}
+    if poi.get("meal_type"):
+        return poi["meal_type"]
+    # "6:00 PM (1h)": anything from 4 PM on is dinner
+    match = _CLOCK.match(str(entry.get("time", "")))
+    if not match:
+        return "lunch"
+    hour = int(match.group(1)) % 12 + (12 if match.group(2).upper() == "PM" else 0)
+    return "dinner" if hour >= 16 else "lunch"
+
+
+def _used_ids(plan: Dict[str, Any]) -> Set[str]:
+    return {e["poi"].get("place_id") for d in plan["itinerary"] for e in d["activities"] if e.get("poi", {}).get("place_id")}
+
+
+def _resolve_days(text: str, n_days: int) -> List[int]:
+    if _ALL_DAYS.search(text):
+        return list(range(n_days))
+    days = [int(m) - 1 for m in _DAY_NUMBER.findall(text)]
+    for word in _DAY_ORDINAL.findall(text):
+        days.append(n_days - 1 if word in ("last", "final") else _ORDINALS[word] - 1)
+    return sorted({d for d in days if 0 <= d < n_days})
+
+
+def parse_edit(query: str, plan: Dict[str, Any]) -> Optional[EditRequest]:
+    """Deterministic reading of an edit request; None when it is not a local change"""
+    text = " ".join(query.lower().replace("’", "'").split()).rstrip(".!? ")
+    if not text or _TRIP_CHANGE.search(text):
+        return None
+    location = str(plan.get("location") or "").lower()
+    days_total = len(plan["itinerary"])
+
+    # Stops mentioned by name pin the edit to their day
+    named: Dict[str, int] = {}
+    for index, day in enumerate(plan["itinerary"]):
+        for entry in day["activities"]:
+            name = str(entry.get("poi", {}).get("name") or "").lower()
+            if len(name) >= 4 and name != location and name in text:
+                named[entry["poi"].get("place_id")] = index
+
+    days = _resolve_days(text, days_total)
+    if not days and named:
+        days = sorted(set(named.values()))
+    if not days:
+        return None
+
+    target = "poi" if named else "day"
+    if not named:
+        for name, pattern in _TARGETS:
+            if pattern.search(text):
+                target = name
+                break
+    action = "remove" if _REMOVE.search(text) else "replace"
+    if target == "day" and action == "remove":
+        return None  # dropping a whole day changes the trip length
+
+    keyword = None
+    match = _KEYWORD.search(text)
+    if match and action == "replace":
+        candidate = match.group(1).strip()
+        if not _VAGUE.search(candidate) and not _DAY_NUMBER.search(candidate) and candidate not in ("lunch", "dinner"):
+            keyword = candidate
+    return EditRequest(days=days, target=target, action=action, keyword=keyword, poi_ids=[pid for pid in named if pid])
+
+
+def _day_center(day: Dict[str, Any]) -> Optional[tuple]:
+    points = [(e["poi"]["lat"], e["poi"]["lng"]) for e in day["activities"] if e["poi"].get("lat") is not None and e["poi"].get("lng") is not None]
+    if not points:
+        return None
+    return tuple(np.mean(np.array(points, dtype=np.float64), axis=0))
+
+
+def _anchor(day: Dict[str, Any], meal: str) -> Optional[tuple]:
+    """Where to look for a meal: the first activity for lunch, the last one for dinner"""
+    activities = [e["poi"] for e in day["activities"] if not _is_meal(e) and e["poi"].get("lat") is not None]
+    if not activities:
+        return _day_center(day)
+    poi = activities[0] if meal == "lunch" else activities[-1]
+    return poi["lat"], poi["lng"]
+
+
+def _travel_km(day: Dict[str, Any]) -> float:
+    stops = [e["poi"] for e in day["activities"] if not _is_meal(e) and e["poi"].get("lat") is not None]
+    if len(stops) < 2:
+        return 0.0
+    dist = haversine_matrix([p["lat"] for p in stops], [p["lng"] for p in stops])
+    return round(route_length(list(range(len(stops))), dist), 2)
+
+
+def _pick_nearest_best(candidates: List[Dict[str, Any]], center: Optional[tuple], exclude: Set[str]) -> Optional[Dict[str, Any]]:
+    candidates = [c for c in candidates if c.get("place_id") and c["place_id"] not in exclude and c.get("lat") is not None]
+    if not candidates:
+        return None
+    scores = np.array([c.get("score") or (c.get("rating") or 0) * 20 for c in candidates], dtype=np.float64)
+    if center is not None:
+        scores -= REPLAN_DISTANCE_PENALTY * haversine_to([c["lat"] for c in candidates], [c["lng"] for c in candidates], *center)
+    return candidates[int(np.argmax(scores))]
+
+
+class _Replanner:
+    def __init__(self, plan: Dict[str, Any], edit: EditRequest, mbti: str):
+        self.plan = plan
+        self.edit = edit
+        self.mbti = mbti
+        self.location = plan.get("location") or ""
+        self.used = _used_ids(plan)
+        self._activity_pool: Optional[List[Dict[str, Any]]] = None
+
+    async def restaurants_near(self, point: Optional[tuple]) -> List[Dict[str, Any]]:
+        if point is None:
+            return []
+        keywords = [self.edit.keyword] if self.edit.keyword else None
+        return await search_nearby_restaurants(point[0], point[1], self.location, self.mbti, cuisine_keywords=keywords, max_results=8)
+
+    async def activities(self) -> List[Dict[str, Any]]:
+        """Activity candidates; the same text searches as the original run, so usually cache hits"""
+        if self._activity_pool is None:
+            if self.edit.keyword:
+                queries = [f"{self.edit.keyword} in {self.location}"]
+            else:
+                queries = build_activity_queries(self.location, self.mbti, self.plan.get("theme") or "culture", self.plan.get("inclusion") or None)[:2]
+            pool: Dict[str, Dict[str, Any]] = {}
+            for query in queries:
+                for poi in await fetch_google_places(query, max_results=10):
+                    if poi.get("place_id") and "restaurant" not in (poi.get("types") or []):
+                        pool.setdefault(poi["place_id"], poi)
+            self._activity_pool = apply_mbti_scoring(list(pool.values()), self.mbti)
+        return self._activity_pool
+
+    async def replace_meal(self, day: Dict[str, Any], index: int) -> bool:
+        entry = day["activities"][index]
+        meal = _meal_type(entry)
+        choice = _pick_nearest_best(await self.restaurants_near(_anchor(day, meal)), _anchor(day, meal), self.used)
+        if choice is None:
+            return False
+        self.used.add(choice["place_id"])
+        day["activities"][index] = {**entry, "poi": {**choice, "meal_type": meal}}
+        return True
+
+    async def replace_activity(self, day: Dict[str, Any], index: int) -> bool:
+        others = {**day, "activities": [e for i, e in enumerate(day["activities"]) if i != index]}
+        choice = _pick_nearest_best(await self.activities(), _day_center(others), self.used)
+        if choice is None:
+            return False
+        self.used.add(choice["place_id"])
+        day["activities"][index] = {**day["activities"][index], "poi": choice}
+        return True
+
+    async def replan_day(self, day: Dict[str, Any]) -> bool:
+        """New activities and meals for the whole day, near where the day used to be"""
+        own = {e["poi"].get("place_id") for e in day["activities"]}
+        exclude = self.used - own
+        center = _day_center(day)
+        activities = [a for a in await self.activities() if a["place_id"] not in self.used]
+        if center is not None and activities:
+            distance = haversine_to([a["lat"] for a in activities], [a["lng"] for a in activities], *center)
+            activities = [a for a, km in zip(activities, distance) if km <= 10] or activities
+        restaurants = [r for r in await self.restaurants_near(center) if r.get("place_id") not in exclude]
+        if not activities:
+            return False
+        new_day = plan_days(activities + restaurants, 1)[0]
+        new_ids = {e["poi"].get("place_id") for e in new_day["activities"]}
+        self.used = (self.used - own) | new_ids
+        day["activities"] = new_day["activities"]
+        return True
+
+    async def apply(self) -> List[int]:
+        """Change the requested days in place; returns the indices of the days that changed"""
+        changed = []
+        for day_index in self.edit.days:
+            day = self.plan["itinerary"][day_index]
+            before = [e["poi"].get("place_id") for e in day["activities"]]
+            await self._apply_to_day(day)
+            if [e["poi"].get("place_id") for e in day["activities"]] != before:
+                if "travel_km" in day:
+                    day["travel_km"] = _travel_km(day)
+                changed.append(day_index)
+        return changed
+
+    async def _apply_to_day(self, day: Dict[str, Any]) -> None:
+        edit = self.edit
+        if edit.target == "day":
+            await self.replan_day(day)
+            return
+        indices = []
+        for i, entry in enumerate(day["activities"]):
+            if edit.target == "poi":
+                hit = entry["poi"].get("place_id") in edit.poi_ids
+            elif edit.target in ("lunch", "dinner"):
+                hit = _is_meal(entry) and _meal_type(entry) == edit.target
+            elif edit.target == "meals":
+                hit = _is_meal(entry)
+            else:
+                hit = not _is_meal(entry)
+            if hit:
+                indices.append(i)
+        if edit.action == "remove":
+            removed = {day["activities"][i]["poi"].get("place_id") for i in indices}
+            day["activities"] = [e for i, e in enumerate(day["activities"]) if i not in indices]
+            self.used -= removed
+            return
+        for i in indices:
+            if _is_meal(day["activities"][i]):
+                await self.replace_meal(day, i)
+            else:
+                await self.replace_activity(day, i)
+
+
+async def apply_edit(plan: Dict[str, Any], edit: EditRequest, mbti: str) -> Tuple[Dict[str, Any], List[int]]:
+    """Edited copy of plan (days that are not touched are shared) and the indices of the changed days"""
+    plan = {**plan, "itinerary": [{**day, "activities": list(day["activities"])} for day in plan["itinerary"]]}
+    changed = await _Replanner(plan, edit, mbti).apply()
+    return plan, changed
+
+
+def _changed_inputs(base: BasePlan, initial_user_input: Dict[str, Any]) -> Optional[str]:
+    """Reason a full re-plan is needed because the request differs beyond the edit itself"""
+    mbti = str(initial_user_input.get("mbti") or "").strip().upper()
+    previous_mbti = str((base.user_input or {}).get("mbti") or base.plan.get("mbti") or "").strip().upper()
+    if previous_mbti and mbti and mbti != previous_mbti:
+        return f"MBTI changed ({previous_mbti} -> {mbti})"
+    budget = initial_user_input.get("Budget")
+    previous_budget = (base.user_input or {}).get("budget")
+    if budget is not None and previous_budget is not None and budget != previous_budget:
+        return "budget changed"
+    return None
+
+
+async def incremental_replan(initial_user_input: Dict[str, Any], base: BasePlan) -> Optional[Dict[str, Any]]:
+    """
+    Apply the edit in initial_user_input["Query"] to base.plan; returns the /plan output
+    (same shape as run_autogen_workflow plus a "replan" block) or None to run the full workflow.
+    """
+    if REPLAN_MODE != "incremental":
+        return None
+    reason = _changed_inputs(base, initial_user_input)
+    if reason:
+        print(f"🔁 incremental re-plan skipped: {reason}")
+        return None
+    edit = parse_edit(initial_user_input.get("Query") or "", base.plan)
+    if edit is None:
+        print("🔁 incremental re-plan skipped: the request is not a local edit")
+        return None
+
+    start = time.perf_counter()
+    mbti = str(initial_user_input.get("mbti") or base.plan.get("mbti") or "")
+    try:
+        with span("replan", target=edit.target, days=len(edit.days)):
+            plan, changed = await apply_edit(base.plan, edit, mbti)
+            described = [plan["itinerary"][i] for i in changed if plan["itinerary"][i].get("title") or plan["itinerary"][i].get("description")]
+            if described:
+                # Imported here: pipeline pulls in the agents and the model client
+                from pipeline import describe_days
+                await describe_days({**plan, "itinerary": described})
+    except Exception as e:
+        print(f"🔁 incremental re-plan failed, running the full workflow: {e}")
+        return None
+    if not changed:
+        # Nothing matched (e.g. no sushi nearby, every candidate already in the plan)
+        print(f"🔁 incremental re-plan changed nothing for {edit.action} {edit.target}, running the full workflow")
+        return None
+
+    from autogen_itinerary import format_final_output
+
+    output = format_final_output(plan, initial_user_input)
+    output["replan"] = {
+        "mode": "incremental",
+        "base_session_id": base.session_id,
+        "target": edit.target,
+        "action": edit.action,
+        "keyword": edit.keyword,
+        "changed_days": [plan["itinerary"][i]["day"] for i in changed],
+    }
+    print(f"🔁 incremental re-plan: {edit.action} {edit.target} on days {[d + 1 for d in edit.days]} "
+          f"changed {len(changed)} day(s) in {time.perf_counter() - start:.2f}s")
+    return output
@@ -0,0 +1,378 @@
+"""
+Resilience layer for outbound API calls (Google Places, Tavily).
+
+ResilientService.call(attempt, endpoint) wraps one logical request:
+
+  - CircuitBreaker per endpoint: after CIRCUIT_FAILURE_THRESHOLD consecutive upstream failures
+    the endpoint fails fast with CircuitOpenError for CIRCUIT_RESET_SECONDS, then lets a
+    single probe request through (half-open) to decide whether to close again
+  - TokenBucket per service: caps the request rate across every plan in this process
+  - AdaptiveLimiter per service: AIMD concurrency limit, halved on throttling/timeouts and
+    grown by one slot per `limit` successes, between 1 and <SERVICE>_MAX_CONCURRENCY
+  - quota (optional, set by warm_cache.py --max-requests): once that many requests (retries
+    included) went out, further calls fail with QuotaExhausted
+  - retries: 429, 5xx, Places OVER_QUERY_LIMIT/UNKNOWN_ERROR and connection errors are retried
+    up to RETRY_MAX_ATTEMPTS times with full-jitter exponential backoff (Retry-After is honoured).
+    Read timeouts are not retried, they already cost a full timeout; they count against the breaker.
+
+Every decision is counted in trip_external_resilience_events_total{service,event} and in
+service.counters; the current limit and breaker states are exported as gauges.
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+
+from observability import CIRCUIT_STATE, CONCURRENCY_LIMIT, RESILIENCE_EVENTS
+
+T = TypeVar("T")
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+_CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class UpstreamThrottled(RuntimeError):
+    """The upstream answered but asked us to slow down (e.g. Places OVER_QUERY_LIMIT with HTTP 200)"""
+
+
+class UpstreamUnavailable(RuntimeError):
+    """A transient upstream error reported in the response body (e.g. Places UNKNOWN_ERROR)"""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open"""
+
+
+class QuotaExhausted(RuntimeError):
+    """Raised instead of sending a request once the service's quota is used up"""
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    return None
+
+
+def is_throttle(error: BaseException) -> bool:
+    return isinstance(error, UpstreamThrottled) or _status_code(error) == 429
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Worth another attempt: throttling, 5xx and failures to connect"""
+    if isinstance(error, (UpstreamThrottled, UpstreamUnavailable)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError))
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Counts against the circuit breaker: the upstream is unhealthy, not our request"""
+    return is_retryable(error) or isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError))
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    value = error.response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None  # HTTP-date form, fall back to backoff
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2^attempt)] for attempt 0, 1, ..."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` saved up; acquire() waits for a token (rate <= 0 = unlimited)"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> float:
+        """Take one token; returns the seconds spent waiting for it"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        # Reserve the token now (the balance may go negative) so waiters are served in arrival order
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        wait = -self._tokens / self.rate
+        try:
+            await asyncio.sleep(wait)
+        except BaseException:
+            # Cancelled while waiting: the reserved token was never used
+            self.refund()
+            raise
+        return wait
+
+    def refund(self) -> None:
+        """Give back a token that was taken for a request that did not go out"""
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a request may go out now; in half-open state only one probe at a time"""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True when this failure opened the circuit"""
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            opened = self.state != "open"
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            return opened
+        return False
+
+    def release_probe(self) -> None:
+        """The probe ended without telling us anything about upstream health (e.g. a 4xx)"""
+        self._probing = False
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit: +1 slot per `limit` successes, halved on overload signals"""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: Optional[int] = None):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(initial if initial is not None else self.max_limit)
+        self.in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    async def acquire(self) -> None:
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()  # pass the slot we were woken for to the next waiter
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def give_back(self) -> None:
+        """Return a slot that was not used for a request (no success or overload to learn from)"""
+        self.in_flight -= 1
+        self._wake()
+
+    def release(self, overloaded: bool) -> None:
+        self.in_flight -= 1
+        if overloaded:
+            self.limit = max(self.min_limit, self.limit / 2)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class ResilientService:
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: Optional[float] = None,
+        max_concurrency: int = 32,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_SECONDS,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        # Requests (attempts) allowed since set_quota(); None = unlimited
+        self.quota: Optional[int] = None
+        self.requests = 0
+        self.counters = {
+            "calls": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failures": 0,
+            "circuit_rejected": 0,
+            "circuit_opened": 0,
+            "rate_limited": 0,
+            "limit_decreases": 0,
+            "quota_rejected": 0,
+        }
+        CONCURRENCY_LIMIT.labels(service=name).set(self.limiter.limit)
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        if endpoint not in self.breakers:
+            self.breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self.breakers[endpoint]
+
+    def _count(self, event: str) -> None:
+        self.counters[event] += 1
+        RESILIENCE_EVENTS.labels(service=self.name, event=event).inc()
+
+    def _export_state(self, endpoint: str, breaker: CircuitBreaker) -> None:
+        CIRCUIT_STATE.labels(service=self.name, endpoint=endpoint).set(_CIRCUIT_STATE_VALUES[breaker.state])
+        CONCURRENCY_LIMIT.labels(service=self.name).set(self.limiter.limit)
+
+    def set_quota(self, requests: Optional[int]) -> None:
+        self.quota = requests
+        self.requests = 0
+
+    def quota_left(self) -> Optional[int]:
+        return None if self.quota is None else max(0, self.quota - self.requests)
+
+    def _check_quota(self) -> None:
+        if self.quota is not None and self.requests >= self.quota:
+            self._count("quota_rejected")
+            raise QuotaExhausted(f"{self.name} request quota of {self.quota} is used up")
+
+    async def _attempt(self, attempt_fn: Callable[[], Awaitable[T]], endpoint: str, breaker: CircuitBreaker) -> T:
+        self._check_quota()
+        if not breaker.allow():
+            self._count("circuit_rejected")
+            raise CircuitOpenError(f"{self.name} {endpoint} circuit is open, failing fast")
+        has_token = False
+        try:
+            if await self.bucket.acquire() > 0:
+                self._count("rate_limited")
+            has_token = True
+            await self.limiter.acquire()
+            # Checked again: other requests may have used the quota up while this one waited
+            self._check_quota()
+        except BaseException as e:
+            # Nothing was sent: a half-open probe must not stay reserved, nor the token or slot be used up
+            breaker.release_probe()
+            if has_token:
+                self.bucket.refund()
+            if isinstance(e, QuotaExhausted):
+                self.limiter.give_back()
+            raise
+        # Only requests that really go out count against the quota (not fast-fails or cancelled waits)
+        self.requests += 1
+        overloaded = False
+        try:
+            result = await attempt_fn()
+        except Exception as e:
+            overloaded = is_throttle(e) or isinstance(e, (httpx.TimeoutException, asyncio.TimeoutError))
+            if is_upstream_failure(e):
+                if breaker.record_failure():
+                    self._count("circuit_opened")
+                    print(f"[{self.name}] circuit for {endpoint} opened after {breaker.failures} failures ({e})")
+            else:
+                breaker.release_probe()
+            raise
+        except BaseException:
+            breaker.release_probe()
+            raise
+        else:
+            breaker.record_success()
+            return result
+        finally:
+            self.limiter.release(overloaded)
+            if overloaded:
+                self._count("limit_decreases")
+            self._export_state(endpoint, breaker)
+
+    async def call(self, attempt_fn: Callable[[], Awaitable[T]], endpoint: str = "default") -> T:
+        """Run attempt_fn (one HTTP request) under the rate limit, concurrency limit, breaker and retry policy"""
+        self._count("calls")
+        breaker = self.breaker(endpoint)
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(attempt_fn, endpoint, breaker)
+            except (CircuitOpenError, QuotaExhausted):
+                raise
+            except Exception as e:
+                if is_throttle(e):
+                    self._count("throttled")
+                attempt += 1
+                if attempt >= self.max_attempts or not is_retryable(e):
+                    self._count("failures")
+                    raise
+                delay = backoff_delay(attempt - 1)
+                retry_after = retry_after_seconds(e)
+                if retry_after is not None:
+                    delay = min(max(delay, retry_after), RETRY_MAX_DELAY)
+                self._count("retries")
+                print(f"[{self.name}] {endpoint} attempt {attempt} failed ({e}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "service": self.name,
+            **self.counters,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "circuits": {endpoint: b.state for endpoint, b in self.breakers.items()},
+        }
+
+
+# Requests per second and burst per API; 0 disables the rate limit
+places_api = ResilientService(
+    "places",
+    rate=float(os.getenv("PLACES_RATE_LIMIT", "50")),
+    burst=float(os.getenv("PLACES_RATE_BURST", "50")),
+    max_concurrency=int(os.getenv("PLACES_MAX_CONCURRENCY", "32")),
+)
+tavily_api = ResilientService(
+    "tavily",
+    rate=float(os.getenv("TAVILY_RATE_LIMIT", "5")),
+    burst=float(os.getenv("TAVILY_RATE_BURST", "10")),
+    max_concurrency=int(os.getenv("TAVILY_MAX_CONCURRENCY", "8")),
+)
@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+# The backend modules import each other top-level, as they run from backend/ (app.py, the
+# scripts); the tests import them as backend.X. Modules with process-wide state such as
+# observability are imported top-level only, so they exist once.
+BACKEND_DIR = str(Path(__file__).resolve().parents[1])
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,121 @@
+import asyncio
+import gc
+import tracemalloc
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from backend.agents.pool import AgentPool
+
+
+class _ConstantReplay(ReplayChatCompletionClient):
+    """Answers every call with the same reply and keeps no call history"""
+
+    def __init__(self):
+        super().__init__(["Day 1: Senso-ji. TERMINATE"])
+        self.prompt_tokens = set()
+
+    async def create(self, messages, **kwargs):
+        self._current_index = 0
+        self._create_calls.clear()
+        result = await super().create(messages, **kwargs)
+        self.prompt_tokens.add(result.usage.prompt_tokens)
+        return result
+
+
+def _agent_factory(client):
+    return lambda: AssistantAgent("plan_agent", model_client=client, system_message="Plan a trip.")
+
+
+def test_shared_agent_accumulates_context_between_runs():
+    client = _ConstantReplay()
+    agent = _agent_factory(client)()
+
+    async def run():
+        for _ in range(3):
+            await agent.run(task="3 days in Tokyo")
+
+    asyncio.run(run())
+    assert len(client.prompt_tokens) == 3
+
+
+def test_pooled_agents_are_reset_and_memory_stays_flat():
+    client = _ConstantReplay()
+    pool = AgentPool("plan_agent", _agent_factory(client), size=2)
+
+    async def plans():
+        memory = {}
+        for i in range(1, 1001):
+            agent = await pool.acquire()
+            await agent.run(task="3 days in Tokyo")
+            await pool.release(agent)
+            if i in (500, 1000):
+                # autogen leaves its stream generators unfinished; the loop closes them after collection
+                for _ in range(5):
+                    gc.collect()
+                    await asyncio.sleep(0)
+                memory[i] = tracemalloc.get_traced_memory()[0]
+        return memory
+
+    tracemalloc.start()
+    try:
+        memory = asyncio.run(plans())
+    finally:
+        tracemalloc.stop()
+
+    # 1,000 sequential plans: same prompt every time, one instance, no growth
+    assert len(client.prompt_tokens) == 1
+    assert pool.stats() == {"created": 1, "idle": 1, "leased": 0, "waiting": 0, "resets": 1000}
+    assert memory[1000] - memory[500] < 32 * 1024
+
+
+def test_pool_bounds_instances_and_never_shares_one_between_runs():
+    created = []
+    busy = set()
+    peak = 0
+
+    def factory():
+        created.append(object())
+        return _Resettable(created[-1])
+
+    pool = AgentPool("summarize_agent", factory, size=3)
+
+    async def one_run():
+        nonlocal peak
+        agent = await pool.acquire()
+        assert agent.token not in busy
+        busy.add(agent.token)
+        peak = max(peak, len(busy))
+        await asyncio.sleep(0.001)
+        busy.discard(agent.token)
+        await pool.release(agent)
+
+    async def run():
+        await asyncio.gather(*(one_run() for _ in range(50)))
+
+    asyncio.run(run())
+    assert len(created) == 3 and peak == 3
+    assert pool.stats()["resets"] == 50 and pool.stats()["waiting"] == 0
+
+
+def test_agent_that_cannot_be_reset_is_replaced():
+    pool = AgentPool("plan_agent", lambda: _Resettable(object(), fail=True), size=1)
+
+    async def run():
+        first = await pool.acquire()
+        await pool.release(first)
+        second = await pool.acquire()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is not second and pool.stats()["created"] == 1
+
+
+class _Resettable:
+    def __init__(self, token, fail=False):
+        self.token = token
+        self.fail = fail
+
+    async def on_reset(self, cancellation_token):
+        if self.fail:
+            raise RuntimeError("reset failed")
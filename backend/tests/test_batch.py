@@ -0,0 +1,105 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from backend import batch
+from backend.tools import poi_activity_tool
+
+CITIES = {"tokyo": "Tokyo", "paris": "Paris"}
+
+
+def trip(query, mbti):
+    return {"mbti": mbti, "Query": query}
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Stand-ins for the pipeline stages that record what the batch asked for"""
+    calls = {"gather": [], "plan": [], "in_flight": 0, "max_in_flight": 0}
+
+    async def summarize_stage(user_input):
+        city = next((c for k, c in CITIES.items() if k in user_input["Query"].lower()), None)
+        if city is None:
+            raise batch_error("no city")
+        # batch imports pipeline as a top-level module, so build its TripSummary
+        return batch.TripSummary(location=city, theme="Culture", mbti=user_input["mbti"])
+
+    async def gather(location, mbtis, theme, inclusion, discover_web=False):
+        calls["gather"].append((location, tuple(mbtis)))
+        await asyncio.sleep(0.01)
+        return {mbti: [{"place_id": f"{location}-{mbti}", "score": 90}] for mbti in mbtis}
+
+    async def plan_stage(handoff, user_input):
+        calls["in_flight"] += 1
+        calls["max_in_flight"] = max(calls["max_in_flight"], calls["in_flight"])
+        await asyncio.sleep(0.01)
+        calls["in_flight"] -= 1
+        calls["plan"].append(user_input["mbti"])
+        return {"success": True, "itinerary": {"pois": [p["place_id"] for p in handoff.pois]}}
+
+    monkeypatch.setattr(batch, "summarize_stage", summarize_stage)
+    monkeypatch.setattr(batch, "gather_activity_pois_by_mbti", gather)
+    monkeypatch.setattr(batch, "plan_stage", plan_stage)
+    return calls
+
+
+def batch_error(detail):
+    from fastapi import HTTPException
+    return HTTPException(status_code=400, detail=detail)
+
+
+async def collect(inputs, concurrency=None):
+    return [event async for event in batch.stream_batch_workflow(inputs, concurrency)]
+
+
+def test_one_poi_crawl_per_destination(stages):
+    mbtis = ["INTJ", "ENFP", "ISTP", "ESFJ"]
+    inputs = [trip("3 days in Tokyo", mbtis[i % 4]) for i in range(20)] + [trip("Paris weekend", "INFJ")]
+    events = asyncio.run(collect(inputs, concurrency=4))
+
+    assert sorted(stages["gather"]) == [("Paris", ("INFJ",)), ("Tokyo", tuple(mbtis))]
+    items = {p["index"]: p["data"] for e, p in events if e == "item"}
+    assert len(items) == 21
+    # Every trip is planned with the POIs scored for its own MBTI type
+    assert items[1]["itinerary"]["pois"] == ["Tokyo-ENFP"]
+    assert items[20]["itinerary"]["pois"] == ["Paris-INFJ"]
+    groups = [p for e, p in events if e == "group"]
+    assert sorted(len(g["items"]) for g in groups) == [1, 20]
+    # Planning shares the batch's concurrency limit
+    assert stages["max_in_flight"] <= 4
+
+
+def test_failed_item_does_not_stop_the_batch(stages):
+    events = asyncio.run(collect([trip("Tokyo", "INTJ"), trip("Somewhere unknown", "INTJ"), trip("Tokyo", "ENFP")]))
+    errors = [p for e, p in events if e == "error"]
+    assert [e["index"] for e in errors] == [1] and errors[0]["error"].status_code == 400
+    assert sorted(p["index"] for e, p in events if e == "item") == [0, 2]
+
+
+def test_gather_by_mbti_matches_separate_calls(monkeypatch):
+    searches = Counter()
+
+    async def fake_text_search(query, max_results=5):
+        searches[query] += 1
+        return [{"place_id": f"{query}-{i}", "name": query, "lat": 35.0 + i / 100, "lng": 139.0, "rating": 4.0 + i / 10}
+                for i in range(3)]
+
+    async def fake_restaurants(lat, lng, location, mbti, max_results=3):
+        return [{"place_id": f"food-{lat}", "category": "restaurant", "lat": lat, "lng": lng}]
+
+    async def no_web_places(location, theme):
+        return []
+
+    monkeypatch.setattr(poi_activity_tool, "fetch_google_places", fake_text_search)
+    monkeypatch.setattr(poi_activity_tool, "search_nearby_restaurants", fake_restaurants)
+    monkeypatch.setattr(poi_activity_tool, "discover_web_places", no_web_places)
+
+    shared = asyncio.run(poi_activity_tool.gather_activity_pois_by_mbti("Tokyo", ["INTJ", "ESFP"], "art"))
+    # The three theme queries are shared, only the MBTI query is per type
+    assert len(searches) == 5 and set(searches.values()) == {1}
+
+    for mbti in ("INTJ", "ESFP"):
+        assert shared[mbti] == asyncio.run(poi_activity_tool.gather_activity_pois("Tokyo", mbti, "art"))
+    # Scores are written into per-type copies, not into shared dicts
+    assert shared["INTJ"][0] is not shared["ESFP"][0]
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import tempfile
+import time
+from backend.cache import DiskStore, TieredCache, refresh_expiring
+
+
+async def _counting_fetch(counter: dict, value):
+    counter["calls"] += 1
+    await asyncio.sleep(0.01)
+    return value
+
+
+def test_lru_and_ttl():
+    async def run():
+        counter = {"calls": 0}
+        cache = TieredCache("test", ttl=60, max_entries=2)
+        await cache.get_or_fetch("a", lambda: _counting_fetch(counter, [1]))
+        await cache.get_or_fetch("a", lambda: _counting_fetch(counter, [1]))
+        await cache.get_or_fetch("b", lambda: _counting_fetch(counter, [2]))
+        await cache.get_or_fetch("c", lambda: _counting_fetch(counter, [3]))
+        # "a" was evicted as least recently used
+        await cache.get_or_fetch("a", lambda: _counting_fetch(counter, [1]))
+        assert counter["calls"] == 4
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 4
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_are_coalesced():
+    async def run():
+        counter = {"calls": 0}
+        cache = TieredCache("test", ttl=60)
+        results = await asyncio.gather(*(cache.get_or_fetch("k", lambda: _counting_fetch(counter, "v")) for _ in range(10)))
+        assert results == ["v"] * 10
+        assert counter["calls"] == 1
+
+    asyncio.run(run())
+
+
+def test_stale_while_revalidate():
+    async def run():
+        counter = {"calls": 0}
+        cache = TieredCache("test", ttl=0.05, stale_ttl=60)
+        assert await cache.get_or_fetch("k", lambda: _counting_fetch(counter, "old")) == "old"
+        await asyncio.sleep(0.1)
+        # Stale value is served immediately while a refresh runs in the background
+        assert await cache.get_or_fetch("k", lambda: _counting_fetch(counter, "new")) == "old"
+        await asyncio.sleep(0.05)
+        assert await cache.get_or_fetch("k", lambda: _counting_fetch(counter, "newer")) == "new"
+        stats = cache.stats()
+        assert stats["stale_hits"] == 1 and stats["refreshes"] == 1
+
+    asyncio.run(run())
+
+
+def test_errors_are_not_cached():
+    async def run():
+        cache = TieredCache("test", ttl=60)
+
+        async def failing():
+            raise RuntimeError("boom")
+
+        for _ in range(2):
+            try:
+                await cache.get_or_fetch("k", failing)
+            except RuntimeError:
+                pass
+        assert await cache.get("k") is None
+        assert cache.stats()["misses"] == 2
+
+    asyncio.run(run())
+
+
+def test_persistent_tier_survives_restart():
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite3")
+            counter = {"calls": 0}
+            first = TieredCache("places", ttl=60, persistent=DiskStore(path))
+            await first.get_or_fetch("text:museums in tokyo", lambda: _counting_fetch(counter, [{"place_id": "x"}]))
+
+            second = TieredCache("places", ttl=60, persistent=DiskStore(path))
+            value = await second.get_or_fetch("text:museums in tokyo", lambda: _counting_fetch(counter, []))
+            assert value == [{"place_id": "x"}]
+            assert counter["calls"] == 1
+            assert second.stats()["persistent_hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_refresh_expiring_refetches_entries_about_to_expire():
+    async def run():
+        counter = {"calls": 0}
+        cache = TieredCache("test", ttl=60)
+        await cache.get_or_fetch("k", lambda: _counting_fetch(counter, "old"))
+        with refresh_expiring(30):
+            # Fresh for another 60s: not due yet
+            assert await cache.get_or_fetch("k", lambda: _counting_fetch(counter, "new")) == "old"
+        with refresh_expiring(120):
+            assert await cache.get_or_fetch("k", lambda: _counting_fetch(counter, "new")) == "new"
+        assert counter["calls"] == 2
+        assert await cache.get_or_fetch("k", lambda: _counting_fetch(counter, "newer")) == "new"
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    test_lru_and_ttl()
+    test_concurrent_misses_are_coalesced()
+    test_stale_while_revalidate()
+    test_errors_are_not_cached()
+    test_persistent_tier_survives_restart()
+    test_refresh_expiring_refetches_entries_about_to_expire()
+    print(f"cache tests passed in {time.perf_counter() - start:.2f}s")
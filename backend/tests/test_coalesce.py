@@ -0,0 +1,99 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.benchmarks.fake_mongo import FakeCollection
+from backend.coalesce import SingleFlight
+from backend.plan_store import PlanStore
+
+
+def test_concurrent_identical_calls_share_one_run():
+    flights = SingleFlight("test", log_joins=False)
+    runs = []
+
+    async def work(value):
+        runs.append(value)
+        await asyncio.sleep(0.01)
+        return {"plan": value}
+
+    async def run():
+        results = await asyncio.gather(*[flights.do("same", lambda: work("a")) for _ in range(5)],
+                                       flights.do("other", lambda: work("b")))
+        return results, flights.inflight()
+
+    results, inflight = asyncio.run(run())
+    assert runs == ["a", "b"]
+    assert results[:5] == [{"plan": "a"}] * 5 and results[5] == {"plan": "b"}
+    # Every waiter gets the same object
+    assert all(r is results[0] for r in results[:5])
+    assert flights.coalesced == 4 and inflight == 0
+
+
+def test_errors_reach_every_waiter_and_release_the_key():
+    flights = SingleFlight("test", log_joins=False)
+    calls = {"n": 0}
+
+    async def failing():
+        calls["n"] += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def ok():
+        calls["n"] += 1
+        return "ok"
+
+    async def run():
+        results = await asyncio.gather(*[flights.do("k", failing) for _ in range(3)], return_exceptions=True)
+        assert flights.inflight() == 0
+        # The next call with the same key starts a fresh run
+        return results, await flights.do("k", ok)
+
+    results, after = asyncio.run(run())
+    assert all(isinstance(r, ValueError) and str(r) == "upstream down" for r in results)
+    assert after == "ok" and calls["n"] == 2
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_run():
+    flights = SingleFlight("test", log_joins=False)
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(flights.do("k", slow))
+        second = asyncio.create_task(flights.do("k", slow))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, flights.inflight()
+
+    assert asyncio.run(run()) == ("done", 0)
+
+
+def test_recent_identical_plan_is_reused_within_the_window(monkeypatch):
+    os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+    from backend import app as app_module
+
+    plans = PlanStore(FakeCollection("conversations"), FakeCollection("pois"), compress_min_bytes=0)
+    monkeypatch.setattr(app_module, "plan_store", plans)
+    now = datetime.now(timezone.utc)
+    data = {"success": True, "itinerary": {"location": "Tokyo", "itinerary": []}}
+
+    async def run():
+        await plans.save({"session_id": "old", "input_hash": "h", "data": data, "updated_at": now - timedelta(hours=2)})
+        await plans.save({"session_id": "failed", "input_hash": "h", "data": {"success": False}, "updated_at": now})
+        await plans.save({"session_id": "recent", "input_hash": "h", "data": data, "updated_at": now - timedelta(minutes=5)})
+        monkeypatch.setattr(app_module, "PLAN_REUSE_WINDOW_SECONDS", 3600)
+        reused = await app_module.find_reusable_plan("h")
+        other = await app_module.find_reusable_plan("other-hash")
+        monkeypatch.setattr(app_module, "PLAN_REUSE_WINDOW_SECONDS", 0)
+        return reused, other, await app_module.find_reusable_plan("h")
+
+    reused, other, disabled = asyncio.run(run())
+    # Newest plan with an itinerary inside the window
+    assert reused["session_id"] == "recent" and reused["data"] == data
+    assert other is None and disabled is None
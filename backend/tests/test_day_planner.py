@@ -0,0 +1,87 @@
+import random
+import time
+from datetime import date, timedelta
+
+from backend.tools.day_planner import (
+    build_itinerary,
+    haversine_matrix,
+    order_route,
+    plan_days,
+    route_length,
+)
+
+
+def make_pois(n_activities: int, n_restaurants: int, seed: int = 7):
+    rng = random.Random(seed)
+    activities = [
+        {"name": f"Activity {i}", "lat": 35.60 + rng.random() * 0.2, "lng": 139.60 + rng.random() * 0.3,
+         "score": rng.randint(60, 100), "place_id": f"a{i}", "types": ["museum"]}
+        for i in range(n_activities)
+    ]
+    restaurants = [
+        {"name": f"Restaurant {i}", "lat": 35.60 + rng.random() * 0.2, "lng": 139.60 + rng.random() * 0.3,
+         "rating": 4.3, "place_id": f"r{i}", "category": "restaurant"}
+        for i in range(n_restaurants)
+    ]
+    return activities + restaurants
+
+
+def test_haversine_matches_known_distance():
+    # Tokyo Station -> Osaka Station is roughly 400 km
+    dist = haversine_matrix([35.6812, 34.7025], [139.7671, 135.4959])
+    assert 395 < dist[0, 1] < 410
+    assert dist[0, 0] == 0 and dist[1, 0] == dist[0, 1]
+
+
+def test_days_respect_capacity_and_use_each_poi_once():
+    itinerary = plan_days(make_pois(40, 20), days=5)
+    assert len(itinerary) == 5
+    seen = set()
+    for day in itinerary:
+        activities = [e for e in day["activities"] if e["poi"].get("category") != "restaurant"]
+        meals = [e["poi"]["meal_type"] for e in day["activities"] if e["poi"].get("category") == "restaurant"]
+        assert 2 <= len(activities) <= 3
+        assert meals == ["lunch", "dinner"]
+        for entry in day["activities"]:
+            assert entry["poi"]["place_id"] not in seen
+            seen.add(entry["poi"]["place_id"])
+
+
+def test_route_ordering_beats_input_order():
+    pois = make_pois(30, 0)
+    lat = [p["lat"] for p in pois]
+    lng = [p["lng"] for p in pois]
+    dist = haversine_matrix(lat, lng)
+    points = list(range(len(pois)))
+    assert route_length(order_route(points, dist), dist) < route_length(points, dist)
+
+
+def test_build_itinerary_matches_plan_agent_format():
+    summary = {"theme": "Culture", "location": "Tokyo", "days": 2, "start": "2025-08-02", "mbti": "INFP"}
+    plan = build_itinerary(summary, make_pois(6, 4))
+    assert plan["end"] == "2025-08-03"
+    assert [day["day"] for day in plan["itinerary"]] == ["Day 1", "Day 2"]
+    first = plan["itinerary"][0]["activities"][0]
+    assert first["time"] == "10:00 AM (2h)" and "place_id" in first["poi"]
+
+
+def test_non_iso_start_date_falls_back_to_today():
+    plan = build_itinerary({"location": "Tokyo", "days": 3, "start": "Aug 3"}, make_pois(6, 4))
+    today = date.today()
+    assert plan["start"] == str(today) and plan["end"] == str(today + timedelta(days=2))
+
+
+def test_scales_to_long_trips():
+    start = time.perf_counter()
+    itinerary = plan_days(make_pois(600, 200), days=60)
+    assert len(itinerary) == 60
+    assert time.perf_counter() - start < 2.0
+
+
+if __name__ == "__main__":
+    test_haversine_matches_known_distance()
+    test_days_respect_capacity_and_use_each_poi_once()
+    test_route_ordering_beats_input_order()
+    test_build_itinerary_matches_plan_agent_format()
+    test_scales_to_long_trips()
+    print("day planner tests passed")
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.benchmarks.fake_mongo import FakeCollection
+from backend.job_queue import JobQueue, PermanentJobError, QueueFull
+
+
+async def _wait_for(queue: JobQueue, job_id: str, statuses=("done", "failed"), timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        job = await queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_jobs_run_by_priority_with_bounded_concurrency():
+    async def run():
+        order, running, peak = [], [0], [0]
+
+        async def handler(job):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            order.append(job["payload"]["name"])
+            await asyncio.sleep(0.02)
+            running[0] -= 1
+            return {"name": job["payload"]["name"]}
+
+        queue = JobQueue(FakeCollection("jobs"), handler, workers=2, poll_interval=0.01)
+        jobs = [await queue.enqueue({"name": f"low{i}"}) for i in range(3)]
+        jobs.append(await queue.enqueue({"name": "high"}, priority=5))
+        queue.start()
+        try:
+            results = [await _wait_for(queue, job["job_id"]) for job in jobs]
+        finally:
+            await queue.stop()
+        assert order[0] == "high"
+        assert peak[0] == 2
+        assert all(r["status"] == "done" for r in results)
+        assert results[-1]["result"] == {"name": "high"}
+
+    asyncio.run(run())
+
+
+def test_enqueue_rejects_when_queue_is_full():
+    async def run():
+        async def handler(job):
+            return None
+
+        queue = JobQueue(FakeCollection("jobs"), handler, workers=0, max_queued=2)
+        await queue.enqueue({})
+        await queue.enqueue({})
+        with pytest.raises(QueueFull):
+            await queue.enqueue({})
+
+    asyncio.run(run())
+
+
+def test_failed_jobs_are_retried_then_marked_failed():
+    async def run():
+        calls = {"flaky": 0, "broken": 0, "invalid": 0}
+
+        async def handler(job):
+            name = job["payload"]["name"]
+            calls[name] += 1
+            if name == "flaky" and calls[name] < 2:
+                raise RuntimeError("upstream timeout")
+            if name == "broken":
+                raise RuntimeError("always fails")
+            if name == "invalid":
+                raise PermanentJobError("bad input")
+            return "ok"
+
+        queue = JobQueue(FakeCollection("jobs"), handler, workers=1, max_attempts=3, retry_backoff=0.01, poll_interval=0.01)
+        flaky = await queue.enqueue({"name": "flaky"})
+        broken = await queue.enqueue({"name": "broken"})
+        invalid = await queue.enqueue({"name": "invalid"})
+        queue.start()
+        try:
+            flaky = await _wait_for(queue, flaky["job_id"])
+            broken = await _wait_for(queue, broken["job_id"])
+            invalid = await _wait_for(queue, invalid["job_id"])
+        finally:
+            await queue.stop()
+        assert flaky["status"] == "done" and flaky["attempts"] == 2
+        assert broken["status"] == "failed" and broken["attempts"] == 3 and broken["error"] == "always fails"
+        assert invalid["status"] == "failed" and invalid["attempts"] == 1
+
+    asyncio.run(run())
+
+
+def test_running_job_with_expired_lease_is_reclaimed():
+    async def run():
+        async def handler(job):
+            return "recovered"
+
+        collection = FakeCollection("jobs")
+        queue = JobQueue(collection, handler, workers=0)
+        job = await queue.enqueue({})
+        claimed = await queue.claim()
+        assert claimed["job_id"] == job["job_id"] and claimed["status"] == "running"
+        # Still leased: nobody else may take it
+        assert await queue.claim() is None
+
+        # Simulate a worker that died an hour ago
+        await collection.update_one({"job_id": job["job_id"]}, {"$set": {"lease_until": datetime.now(timezone.utc) - timedelta(hours=1)}})
+        reclaimed = await queue.claim()
+        assert reclaimed["attempts"] == 2
+        await queue.run_job(reclaimed)
+        assert (await queue.get(job["job_id"]))["result"] == "recovered"
+
+    asyncio.run(run())
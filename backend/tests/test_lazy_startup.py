@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from backend import utils
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_load_prompt_does_not_depend_on_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    utils.load_prompt.cache_clear()
+    prompt = utils.load_prompt("plan_agent")
+    assert prompt == (BACKEND_DIR / "prompts" / "plan_agent.txt").read_text(encoding="utf-8")
+    assert utils.load_prompt("plan_agent") is prompt
+
+
+def test_workflow_modules_import_without_autogen_or_api_key():
+    code = (
+        "import sys, autogen_itinerary, pipeline, replan\n"
+        "loaded = sorted(m for m in sys.modules if m.split('.')[0] in ('autogen_agentchat', 'autogen_core', 'autogen_ext'))\n"
+        "assert not loaded, loaded\n"
+    )
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    env["PYTHONPATH"] = str(BACKEND_DIR)
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR.parent, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
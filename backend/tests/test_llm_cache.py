@@ -0,0 +1,146 @@
+import asyncio
+
+import httpx
+import model_router
+import openai
+import pytest
+from autogen_core.models import CreateResult, RequestUsage, SystemMessage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from backend import llm_cache
+from backend.cache import TieredCache, get_disk_store
+from backend.llm_cache import bypass_llm_cache, cached, completion_key
+
+SUMMARY = '{"location": "Tokyo", "days": 3, "theme": "Culture"}'
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    store = TieredCache("llm_completions", ttl=60, persistent=get_disk_store(str(tmp_path / "llm.sqlite3")))
+    monkeypatch.setattr(llm_cache, "llm_cache", store)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_AGENTS", {"summarize_agent"})
+    return store
+
+
+def messages(query="3-day trip to Tokyo, culture"):
+    return [SystemMessage(content="Summarize the trip request."), UserMessage(content=query, source="user")]
+
+
+def test_repeated_request_is_served_from_cache(cache):
+    inner = ReplayChatCompletionClient([SUMMARY, "a different answer"])
+    client = cached(inner, "summarize_agent", model="gpt-test")
+
+    async def run():
+        first = await client.create(messages())
+        # Whitespace differences do not change the key
+        second = await client.create(messages("3-day trip to  Tokyo,\nculture "))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.content == second.content == SUMMARY
+    assert len(inner.create_calls) == 1
+    assert second.cached and second.usage.prompt_tokens == 0 and first.usage.prompt_tokens > 0
+    assert cache.counters["hits"] == 1 and cache.counters["misses"] == 1
+
+    # The disk tier survives a restart of the in-process tier
+    cache.memory.clear()
+    third = asyncio.run(client.create(messages()))
+    assert third.content == SUMMARY and cache.counters["persistent_hits"] == 1
+
+
+def test_joined_calls_are_not_counted_as_cache_hits(cache, monkeypatch):
+    outcomes = []
+
+    class Recorder:
+        def labels(self, agent, outcome):
+            outcomes.append(outcome)
+            return self
+
+        def inc(self, amount=1):
+            pass
+
+    class SlowClient(ReplayChatCompletionClient):
+        async def create(self, messages, **kwargs):
+            await asyncio.sleep(0.01)
+            return await super().create(messages, **kwargs)
+
+    monkeypatch.setattr(llm_cache, "LLM_CALLS", Recorder())
+    inner = SlowClient([SUMMARY, "a different answer"])
+    client = cached(inner, "summarize_agent", model="gpt-test")
+
+    async def run():
+        together = await asyncio.gather(*[client.create(messages()) for _ in range(3)])
+        return together, await client.create(messages())
+
+    together, later = asyncio.run(run())
+    assert len(inner.create_calls) == 1
+    assert [r.content for r in together] == [SUMMARY] * 3
+    # The joiners waited for a real model call: they report its usage, not a cache hit's zero
+    assert all(r.usage.prompt_tokens > 0 for r in together)
+    assert outcomes == ["coalesced", "coalesced", "cache_hit"]
+    assert later.usage.prompt_tokens == 0 and cache.counters["hits"] == 1
+
+
+def test_key_covers_model_messages_and_tools():
+    tool = {"name": "gather_activity_pois", "parameters": {"type": "object", "properties": {}}}
+    base = completion_key("gpt-a", messages())
+    assert base == completion_key("gpt-a", messages(" 3-day trip to Tokyo, culture"))
+    assert base != completion_key("gpt-b", messages())
+    assert base != completion_key("gpt-a", messages("3-day trip to Kyoto, culture"))
+    assert base != completion_key("gpt-a", messages(), tools=[tool])
+    assert base != completion_key("gpt-a", messages(), json_output=True)
+
+
+def test_bypass_disabled_agents_and_truncated_replies_skip_the_cache(cache):
+    inner = ReplayChatCompletionClient([SUMMARY, SUMMARY, SUMMARY])
+    assert cached(inner, "plan_agent", model="gpt-test") is inner
+
+    client = cached(inner, "summarize_agent", model="gpt-test")
+
+    async def run():
+        with bypass_llm_cache():
+            await client.create(messages())
+            await client.create(messages())
+
+    asyncio.run(run())
+    assert len(inner.create_calls) == 2 and cache.counters["misses"] == 0
+
+    truncated = CreateResult(finish_reason="length", content='{"location": "Tok', usage=RequestUsage(prompt_tokens=5, completion_tokens=5), cached=False)
+    inner = ReplayChatCompletionClient([truncated, SUMMARY])
+    client = cached(inner, "summarize_agent", model="gpt-test")
+    asyncio.run(client.create(messages("2 days in Paris")))
+    second = asyncio.run(client.create(messages("2 days in Paris")))
+    assert second.content == SUMMARY and len(inner.create_calls) == 2
+
+
+def test_streamed_reply_is_cached_and_replayed(cache):
+    inner = ReplayChatCompletionClient([SUMMARY])
+    client = cached(inner, "summarize_agent", model="gpt-test")
+
+    async def collect():
+        return [item async for item in client.create_stream(messages())]
+
+    first = asyncio.run(collect())
+    second = asyncio.run(collect())
+    assert first[-1].content == SUMMARY
+    assert second[0] == SUMMARY and second[-1].cached
+    assert cache.counters["hits"] == 1
+
+
+def test_fallback_model_replies_are_not_cached_under_the_primary(cache, monkeypatch):
+    class FailingPrimary(ReplayChatCompletionClient):
+        async def create(self, messages, **kwargs):
+            response = httpx.Response(503, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+            raise openai.InternalServerError("overloaded", response=response, body=None)
+
+    monkeypatch.setattr(model_router, "_health", {})
+    fallback = ReplayChatCompletionClient(["fallback answer", SUMMARY])
+    clients = {"gpt-4o": FailingPrimary([]), "gpt-4o-mini": fallback}
+    client = cached(model_router.routed("summarize_agent", clients, "gpt-4o", "gpt-4o-mini"), "summarize_agent", model="gpt-4o")
+
+    async def run():
+        return [await client.create(messages()) for _ in range(2)]
+
+    first, second = asyncio.run(run())
+    assert (first.content, second.content) == ("fallback answer", SUMMARY)
+    assert len(fallback.create_calls) == 2 and cache.counters["hits"] == 0
@@ -0,0 +1,95 @@
+import json
+import random
+from pathlib import Path
+from backend.tools.mbti_scoring import MBTI_TYPES, MBTIScoringEngine, top_k
+
+RULES_PATH = Path(__file__).resolve().parents[1] / "tools" / "mbti_rules.json"
+TYPES = ["museum", "park", "garden", "library", "shopping_mall", "amusement_park", "night_club", "restaurant",
+         "store", "food", "art_gallery", "university", "zoo", "aquarium", "place_of_worship", "bar", "cafe",
+         "bakery", "tourist_attraction", "point_of_interest", "establishment"]
+
+
+def legacy_activity_score(poi, mbti):
+    """The per-POI rules apply_mbti_scoring used before the table-driven engine"""
+    rating = poi.get('rating') or 4.0
+    base_score = (rating - 1) * 20
+    poi_types = [t.lower() for t in poi.get('types', [])]
+    mbti_bonus = 0
+    if 'E' in mbti:
+        if any(t in poi_types for t in ['shopping_mall', 'amusement_park', 'night_club']):
+            mbti_bonus += 10
+    else:
+        if any(t in poi_types for t in ['library', 'museum', 'park', 'garden']):
+            mbti_bonus += 10
+    if 'S' in mbti:
+        if any(t in poi_types for t in ['restaurant', 'store', 'market', 'food']):
+            mbti_bonus += 5
+    else:
+        if any(t in poi_types for t in ['museum', 'art_gallery', 'university']):
+            mbti_bonus += 5
+    if 'F' in mbti:
+        if any(t in poi_types for t in ['zoo', 'aquarium', 'park', 'place_of_worship']):
+            mbti_bonus += 5
+    return min(100, max(60, base_score + mbti_bonus + 10))
+
+
+def legacy_restaurant_score(restaurant, mbti):
+    base_score = (restaurant.get('rating', 4.0) - 1) * 20
+    restaurant_types = [t.lower() for t in restaurant.get('types', [])]
+    mbti_bonus = 0
+    if mbti and len(mbti) >= 4:
+        if 'E' in mbti:
+            if any(t in restaurant_types for t in ['bar', 'night_club']):
+                mbti_bonus += 5
+        else:
+            if any(t in restaurant_types for t in ['cafe', 'bakery']):
+                mbti_bonus += 5
+        if 'S' in mbti:
+            mbti_bonus += 3
+    return min(100, max(60, base_score + mbti_bonus + 10))
+
+
+def random_pois(n, seed=3):
+    rng = random.Random(seed)
+    return [
+        {"place_id": f"p{i}", "rating": rng.choice([None, 3.2, 4.0, 4.4, 4.7, 5]),
+         "types": rng.sample(TYPES, rng.randint(0, 4))}
+        for i in range(n)
+    ]
+
+
+def test_engine_matches_legacy_rules_for_all_types():
+    engine = MBTIScoringEngine(json.loads(RULES_PATH.read_text()))
+    pois = random_pois(300)
+    restaurants = [p for p in random_pois(100, seed=4) if p["rating"] is not None]
+    for mbti in MBTI_TYPES + ["", "enfp"]:
+        scores = engine.score_batch(pois, mbti, "activity")
+        for poi, score in zip(pois, scores):
+            assert abs(score - legacy_activity_score(poi, mbti)) < 1e-9, (mbti, poi)
+        scores = engine.score_batch(restaurants, mbti, "restaurant")
+        for poi, score in zip(restaurants, scores):
+            assert abs(score - legacy_restaurant_score(poi, mbti)) < 1e-9, (mbti, poi)
+
+
+def test_top_k_matches_stable_sort():
+    engine = MBTIScoringEngine(json.loads(RULES_PATH.read_text()))
+    pois = engine.apply(random_pois(500), "INFP")
+    for k in (1, 4, 10, 499, 500, 600):
+        expected = sorted(pois, key=lambda x: x.get('score', 0), reverse=True)[:k]
+        assert [p["place_id"] for p in top_k(pois, k)] == [p["place_id"] for p in expected]
+
+
+def test_rules_are_tunable_from_config():
+    rules = json.loads(RULES_PATH.read_text())
+    rules["activity"]["rules"].append({"when": "N", "types": ["tourist_attraction"], "bonus": 7})
+    engine = MBTIScoringEngine(rules)
+    poi = {"rating": 4.0, "types": ["tourist_attraction"]}
+    assert engine.score_batch([poi], "INTJ")[0] == 77
+    assert engine.score_batch([poi], "ISTJ")[0] == 70
+
+
+if __name__ == "__main__":
+    test_engine_matches_legacy_rules_for_all_types()
+    test_top_k_matches_stable_sort()
+    test_rules_are_tunable_from_config()
+    print("MBTI scoring tests passed")
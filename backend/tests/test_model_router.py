@@ -0,0 +1,169 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+from autogen_core.models import CreateResult, SystemMessage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from backend import config, model_router
+from backend.model_router import ModelHealth, call_cost, route, routed
+
+PRIMARY, FALLBACK = "gpt-3.5-turbo", "gpt-4o-mini"
+
+
+class FailingClient(ReplayChatCompletionClient):
+    """Answers every call with a 503 from the API"""
+
+    def __init__(self):
+        super().__init__([])
+        self.calls = 0
+
+    def _error(self):
+        self.calls += 1
+        response = httpx.Response(503, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        return openai.InternalServerError("overloaded", response=response, body=None)
+
+    async def create(self, messages, **kwargs):
+        raise self._error()
+
+    async def create_stream(self, messages, **kwargs):
+        raise self._error()
+        yield  # pragma: no cover
+
+
+@pytest.fixture(autouse=True)
+def fresh_health(monkeypatch):
+    monkeypatch.setattr(model_router, "_health", {})
+    monkeypatch.setattr(model_router, "LLM_CIRCUIT_FAILURES", 2)
+
+
+def messages(text="Plan 3 days in Tokyo"):
+    return [SystemMessage(content="You plan trips."), UserMessage(content=text, source="user")]
+
+
+def test_failing_primary_falls_back_and_opens_circuit():
+    primary, fallback = FailingClient(), ReplayChatCompletionClient(["plan"] * 5)
+    client = routed("plan_agent", {PRIMARY: primary, FALLBACK: fallback}, PRIMARY, FALLBACK)
+
+    async def run():
+        return [await client.create(messages()) for _ in range(4)]
+
+    results = asyncio.run(run())
+    assert [r.content for r in results] == ["plan"] * 4
+    # Two failures open the circuit; later calls go straight to the fallback
+    assert primary.calls == 2
+    assert model_router.model_health(PRIMARY).breaker.state == "open"
+    assert route("plan_agent", PRIMARY, FALLBACK, 10) == [(FALLBACK, "fallback_failing")]
+
+
+def test_stream_falls_back_before_first_chunk():
+    fallback = ReplayChatCompletionClient(["streamed plan"])
+    client = routed("plan_agent", {PRIMARY: FailingClient(), FALLBACK: fallback}, PRIMARY, FALLBACK)
+
+    async def run():
+        return [item async for item in client.create_stream(messages())]
+
+    items = asyncio.run(run())
+    assert isinstance(items[-1], CreateResult) and items[-1].content == "streamed plan"
+    assert client.last_model == FALLBACK
+
+
+def test_cancelled_or_abandoned_probe_does_not_block_the_primary(monkeypatch):
+    monkeypatch.setattr(model_router, "LLM_ROUTE_PROBE_SECONDS", 0)
+
+    class HangingClient(ReplayChatCompletionClient):
+        async def create(self, messages, **kwargs):
+            await asyncio.sleep(10)
+
+    async def run():
+        client = routed("plan_agent", {PRIMARY: FailingClient(), FALLBACK: ReplayChatCompletionClient(["plan"] * 2)}, PRIMARY, FALLBACK)
+        for _ in range(2):
+            await client.create(messages())
+        assert model_router.model_health(PRIMARY).breaker.state == "open"
+
+        client.clients[PRIMARY] = HangingClient([])
+        probe = asyncio.create_task(client.create(messages()))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert route("plan_agent", PRIMARY, FALLBACK, 10)[0] == (PRIMARY, "probe")
+        model_router.model_health(PRIMARY).breaker.release_probe()
+
+        # A consumer that stops reading the probe's stream early
+        client.clients[PRIMARY] = ReplayChatCompletionClient(["a streamed plan"])
+        stream = client.create_stream(messages())
+        await stream.__anext__()
+        await stream.aclose()
+        assert route("plan_agent", PRIMARY, FALLBACK, 10)[0] == (PRIMARY, "probe")
+
+    asyncio.run(run())
+
+
+def test_slow_primary_is_avoided_except_for_probes(monkeypatch):
+    monkeypatch.setattr(model_router, "LLM_SLOW_SECONDS", 10)
+    health = model_router.model_health(PRIMARY)
+    health.observe("plan_agent", 30)
+
+    first = route("plan_agent", PRIMARY, FALLBACK, 10)
+    second = route("plan_agent", PRIMARY, FALLBACK, 10)
+    assert first[0] == (PRIMARY, "probe")
+    assert second[0] == (FALLBACK, "fallback_slow")
+    # Latency is tracked per agent: another agent on the same model is not affected
+    assert route("summarize_agent", PRIMARY, FALLBACK, 10)[0] == (PRIMARY, "primary")
+
+
+def test_latency_average_recovers():
+    health = ModelHealth()
+    health.observe("plan_agent", 60)
+    for _ in range(10):
+        health.observe("plan_agent", 2)
+    assert not health.slow_for("plan_agent")
+
+
+def test_prompt_too_large_for_primary_goes_to_larger_context_model():
+    tokens = 20_000  # gpt-3.5-turbo has a 16k context window
+    assert route("itinerary_writer_agent", PRIMARY, FALLBACK, tokens) == [(FALLBACK, "fallback_context")]
+    assert route("itinerary_writer_agent", PRIMARY, None, tokens) == [(PRIMARY, "primary")]
+
+
+def test_non_upstream_errors_are_not_retried():
+    class BrokenClient(FailingClient):
+        async def create(self, messages, **kwargs):
+            raise ValueError("bad request payload")
+
+    fallback = ReplayChatCompletionClient(["plan"])
+    client = routed("plan_agent", {PRIMARY: BrokenClient(), FALLBACK: fallback}, PRIMARY, FALLBACK)
+    with pytest.raises(ValueError):
+        asyncio.run(client.create(messages()))
+    assert model_router.model_health(PRIMARY).breaker.state == "closed"
+
+
+def test_context_window_without_autogen_model_table(monkeypatch):
+    monkeypatch.setattr(model_router, "_autogen_token_limit", lambda: None)
+    monkeypatch.setattr(model_router, "LLM_CONTEXT_WINDOWS", {"my-model": 32000})
+    assert model_router.context_window("gpt-3.5-turbo") == 16385
+    assert model_router.context_window("my-model") == 32000
+    assert model_router.context_window("unknown-model") is None
+
+
+def test_call_cost():
+    assert call_cost("gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+    assert call_cost("unknown-model", 1000, 1000) == 0
+
+
+def test_agent_models_from_env(monkeypatch):
+    monkeypatch.setattr(config, "OPENAI_MODEL", "gpt-4o")
+    monkeypatch.setattr(config, "OPENAI_FALLBACK_MODEL", "gpt-4o-mini")
+    monkeypatch.setenv("SUMMARIZE_AGENT_MODEL", "gpt-4.1-nano")
+    monkeypatch.setenv("PLAN_AGENT_FALLBACK_MODEL", "")
+    monkeypatch.delenv("PLAN_AGENT_MODEL", raising=False)
+    monkeypatch.delenv("SUMMARIZE_AGENT_FALLBACK_MODEL", raising=False)
+    monkeypatch.setenv("ORCHESTRATOR_MODEL", "gpt-4o-mini")
+    monkeypatch.delenv("ORCHESTRATOR_FALLBACK_MODEL", raising=False)
+
+    assert config.agent_models("summarize_agent") == ("gpt-4.1-nano", "gpt-4o-mini")
+    assert config.agent_models("plan_agent") == ("gpt-4o", None)
+    # A fallback equal to the primary is no fallback
+    assert config.agent_models("orchestrator") == ("gpt-4o-mini", None)
@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+import pytest
+from autogen_core.models import UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+# Top-level, as the backend modules import it (see conftest.py)
+from observability import (
+    EXTERNAL_REQUESTS, LLM_CALLS, PROMETHEUS_AVAILABLE, MeteredChatCompletionClient, external_call, metrics_payload, span, start_trace,
+)
+
+
+def _value(metric, **labels) -> float:
+    return metric.labels(**labels)._value.get()
+
+
+def test_spans_nest_into_the_request_trace():
+    async def run():
+        with start_trace("plan") as trace:
+            with span("summarize"):
+                await asyncio.sleep(0.01)
+            with span("poi_gathering"):
+                # Spans opened in child tasks land in the same trace
+                async def child(i):
+                    with span("http:places_text_search", query=i):
+                        await asyncio.sleep(0.01)
+                await asyncio.gather(*(child(i) for i in range(3)))
+        return trace
+
+    trace = asyncio.run(run())
+    assert set(trace.stage_totals()) == {"summarize", "poi_gathering"}
+    assert len([s for s in trace.spans if s.name == "http:places_text_search" and s.depth == 1]) == 3
+    assert "summarize;dur=" in trace.server_timing()
+    assert "http:places_text_search" in trace.format_tree()
+
+
+@pytest.mark.skipif(not PROMETHEUS_AVAILABLE, reason="prometheus_client not installed")
+def test_external_call_counts_timeouts_and_errors():
+    def handler(request):
+        if request.url.path == "/slow":
+            raise httpx.ReadTimeout("timed out", request=request)
+        return httpx.Response(500 if request.url.path == "/broken" else 200, json={})
+
+    async def call(path):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            async with external_call("test_service"):
+                response = await client.get(path)
+                response.raise_for_status()
+
+    before = {o: _value(EXTERNAL_REQUESTS, service="test_service", outcome=o) for o in ("ok", "error", "timeout")}
+    asyncio.run(call("/ok"))
+    for path in ("/broken", "/slow"):
+        with pytest.raises(httpx.HTTPError):
+            asyncio.run(call(path))
+    for outcome in ("ok", "error", "timeout"):
+        assert _value(EXTERNAL_REQUESTS, service="test_service", outcome=outcome) == before[outcome] + 1
+    body, _ = metrics_payload()
+    assert b'trip_external_requests_total{outcome="timeout",service="test_service"}' in body
+
+
+@pytest.mark.skipif(not PROMETHEUS_AVAILABLE, reason="prometheus_client not installed")
+def test_metered_client_counts_calls_per_agent():
+    client = MeteredChatCompletionClient(ReplayChatCompletionClient(["first", "second"]), "test_agent")
+    before = _value(LLM_CALLS, agent="test_agent", outcome="ok")
+
+    async def run():
+        result = await client.create([UserMessage(content="hi", source="user")])
+        chunks = [c async for c in client.create_stream([UserMessage(content="again", source="user")])]
+        return result, chunks
+
+    result, chunks = asyncio.run(run())
+    assert result.content == "first"
+    assert chunks[-1].content == "second"
+    assert _value(LLM_CALLS, agent="test_agent", outcome="ok") == before + 2
+    assert client.model_info == client._inner.model_info
+
+
+def test_metered_calls_put_their_token_usage_on_the_trace():
+    client = MeteredChatCompletionClient(ReplayChatCompletionClient(["first", "second"]), "test_agent")
+
+    async def run():
+        with start_trace("usage") as trace:
+            await client.create([UserMessage(content="hi", source="user")])
+            [c async for c in client.create_stream([UserMessage(content="again", source="user")])]
+        return trace
+
+    calls = [s for s in asyncio.run(run()).spans if s.name == "llm:test_agent"]
+    assert len(calls) == 2
+    assert all(s.attributes["prompt_tokens"] > 0 and "completion_tokens" in s.attributes for s in calls)
@@ -0,0 +1,157 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+
+import pytest
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import TextMessage
+from fastapi import HTTPException
+
+from backend import pipeline
+from backend.pipeline import parse_summary
+
+USER_INPUT = {"mbti": "INFP", "Budget": 1200, "Query": "2 days in Kyoto, tea and gardens"}
+SUMMARY = {"location": "Kyoto", "days": 2, "theme": "Food", "start": "2025-09-01", "inclusion": ["tea houses"]}
+POIS = [
+    {"place_id": f"a{i}", "name": f"Garden {i}", "address": f"{i} Garden St", "lat": 35.00 + i / 100,
+     "lng": 135.75 + i / 100, "rating": 4.5, "types": ["park"], "category": "activity", "score": 90 - i}
+    for i in range(5)
+] + [
+    {"place_id": f"r{i}", "name": f"Tea House {i}", "lat": 35.00 + i / 100, "lng": 135.75 + i / 100,
+     "rating": 4.4, "types": ["cafe"], "category": "restaurant", "score": 70}
+    for i in range(4)
+]
+PLAN = {"location": "Kyoto", "itinerary": [
+    {"day": "Day 1", "activities": [{"time": "10:00 AM (2h)", "poi": {"id": "a0", "s": 90}},
+                                    {"time": "12:00 PM (1h)", "poi": {"id": "r0", "c": "r", "m": "lunch"}}]},
+    {"day": "Day 2", "activities": [{"time": "10:00 AM (2h)", "poi": {"id": "a1", "s": 89}}]},
+]}
+
+
+class FakeAgent:
+    def __init__(self, name, reply):
+        self.name, self.reply, self.tasks = name, reply, []
+
+    def _result(self, task):
+        self.tasks.append(task)
+        return TaskResult(messages=[TextMessage(source=self.name, content=self.reply)])
+
+    async def run(self, task):
+        return self._result(task)
+
+    async def run_stream(self, task):
+        yield self._result(task)
+
+
+@pytest.fixture
+def agents(monkeypatch):
+    """Stubbed agents and POI search; records which agents were leased and what the POI stage was asked"""
+    fakes = {
+        "summarize_agent": FakeAgent("summarize_agent", f"```json\n{json.dumps(SUMMARY)}\n```"),
+        "plan_agent": FakeAgent("plan_agent", json.dumps(PLAN) + "\nTERMINATE"),
+        "itinerary_writer_agent": FakeAgent("itinerary_writer_agent", json.dumps(
+            {"Day 1": {"title": "Gardens", "description": "East side"}, "Day 2": {"title": "Tea", "description": "West"}})),
+    }
+    calls = {"leased": [], "gather": []}
+
+    @asynccontextmanager
+    async def lease_agents(*names):
+        calls["leased"].extend(names)
+        yield tuple(fakes[name] for name in names)
+
+    async def gather_activity_pois(**kwargs):
+        calls["gather"].append(kwargs)
+        return [dict(poi) for poi in POIS]
+
+    monkeypatch.setattr(pipeline, "lease_agents", lease_agents)
+    monkeypatch.setattr(pipeline, "gather_activity_pois", gather_activity_pois)
+    monkeypatch.setattr(pipeline, "PLANNER_MODE", "llm")
+    monkeypatch.setattr(pipeline, "PLANNER_DESCRIBE_DAYS", True)
+    return fakes, calls
+
+
+def test_parse_summary_tolerates_a_non_iso_start_date():
+    summary = parse_summary('{"location": "Tokyo", "days": 2, "start": "next Friday"}', {"mbti": "INFP"})
+    assert summary.start == str(date.today()) and summary.end == str(date.today() + timedelta(days=1))
+    assert summary.mbti == "INFP"
+
+    dated = parse_summary('```json\n{"location": "Tokyo", "days": 3, "start": "2025-08-01"}\n```', {})
+    assert (dated.start, dated.end) == ("2025-08-01", "2025-08-03")
+
+
+def test_llm_mode_hands_each_stage_the_previous_output(agents):
+    fakes, calls = agents
+    output = asyncio.run(pipeline.run_pipeline_workflow(dict(USER_INPUT)))
+
+    # summarize_stage -> TripSummary -> poi_stage
+    assert calls["gather"] == [{"location": "Kyoto", "mbti": "INFP", "theme": "Food", "inclusion": ["tea houses"],
+                                "web_places": None, "discover_web": pipeline.WEB_DISCOVERY_ENABLED}]
+    assert json.loads(fakes["summarize_agent"].tasks[0]) == {"Query": USER_INPUT["Query"]}
+
+    # PoiHandoff -> plan_stage: trip parameters, budget and the compact POIs
+    task = json.loads(fakes["plan_agent"].tasks[0].split("\n", 1)[0])
+    assert (task["location"], task["mbti"], task["days"], task["end"], task["budget"]) == ("Kyoto", "INFP", 2, "2025-09-02", 1200)
+    assert [poi["id"] for poi in task["pois"]] == [poi["place_id"] for poi in POIS]
+
+    # plan_agent's {"id": ...} references come back as full POIs
+    assert output["success"] and output["original_request"] == USER_INPUT
+    day_one = output["itinerary"]["itinerary"][0]["activities"]
+    assert day_one[0]["poi"]["name"] == "Garden 0" and day_one[0]["poi"]["lat"] == POIS[0]["lat"]
+    assert (day_one[1]["poi"]["name"], day_one[1]["poi"]["meal_type"]) == ("Tea House 0", "lunch")
+    assert calls["leased"] == ["summarize_agent", "plan_agent"]
+
+
+def test_algorithmic_mode_arranges_days_without_plan_agent(agents, monkeypatch):
+    fakes, calls = agents
+    monkeypatch.setattr(pipeline, "PLANNER_MODE", "algorithmic")
+    output = asyncio.run(pipeline.run_pipeline_workflow(dict(USER_INPUT)))
+
+    plan = output["itinerary"]
+    assert "plan_agent" not in calls["leased"] and calls["leased"][-1] == "itinerary_writer_agent"
+    assert (plan["location"], plan["start"], plan["end"]) == ("Kyoto", "2025-09-01", "2025-09-02")
+    assert [day["day"] for day in plan["itinerary"]] == ["Day 1", "Day 2"]
+    assert [day["title"] for day in plan["itinerary"]] == ["Gardens", "Tea"]
+    place_ids = [entry["poi"]["place_id"] for day in plan["itinerary"] for entry in day["activities"]]
+    assert len(place_ids) == len(set(place_ids)) and set(place_ids) <= {poi["place_id"] for poi in POIS}
+    # The writer only sees names and meal types, not the POI details
+    assert "lat" not in fakes["itinerary_writer_agent"].tasks[0]
+
+
+def test_algorithmic_mode_keeps_the_plan_when_the_writer_fails(agents, monkeypatch):
+    fakes, _ = agents
+    monkeypatch.setattr(pipeline, "PLANNER_MODE", "algorithmic")
+    fakes["itinerary_writer_agent"].reply = "no JSON here"
+    output = asyncio.run(pipeline.run_pipeline_workflow(dict(USER_INPUT)))
+    assert len(output["itinerary"]["itinerary"]) == 2
+    assert all("title" not in day for day in output["itinerary"]["itinerary"])
+
+
+@pytest.mark.parametrize("reply, status", [('{"error_type": "invalid_location"}', 400), ("I cannot help with that.", None)])
+def test_summarize_failure_stops_before_the_poi_stage(agents, reply, status):
+    fakes, calls = agents
+    fakes["summarize_agent"].reply = reply
+    with pytest.raises(Exception) as error:
+        asyncio.run(pipeline.run_pipeline_workflow(dict(USER_INPUT)))
+    if status is not None:
+        assert isinstance(error.value, HTTPException) and error.value.status_code == status
+    assert calls["gather"] == [] and calls["leased"] == ["summarize_agent"]
+
+
+@pytest.mark.parametrize("mode", ["llm", "algorithmic"])
+def test_stream_emits_stage_events_in_order(agents, monkeypatch, mode):
+    monkeypatch.setattr(pipeline, "PLANNER_MODE", mode)
+
+    async def run():
+        return [event async for event in pipeline.stream_pipeline_workflow(dict(USER_INPUT))]
+
+    events = asyncio.run(run())
+    names = [name for name, _ in events]
+    assert [name for name in names if name != "progress"][:4] == ["summary", "tool_call", "tool_result", "pois"]
+    assert names[-1] == "final" and names.count("day") == 2
+    summary, final = events[names.index("summary")][1], events[-1][1]
+    assert summary["location"] == "Kyoto" and summary["mbti"] == "INFP"
+    days = [payload for name, payload in events if name == "day"]
+    assert [day["index"] for day in days] == [0, 1]
+    # Streamed days are the days of the final plan
+    assert [day["day"] for day in days] == final["itinerary"]["itinerary"]
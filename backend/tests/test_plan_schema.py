@@ -0,0 +1,53 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from backend.plan_schema import PlanJSONResponse, parse_plan_output
+
+PLAN = {
+    "theme": "Culture", "location": "Tokyo", "days": 1, "notes": "extra keys are kept",
+    "itinerary": [{"day": "Day 1", "activities": [{"time": "10:00 AM (2h)", "poi": {"id": "p1", "n": "Museum"}}]}],
+}
+
+
+@pytest.mark.parametrize("reply", [
+    json.dumps(PLAN),
+    f"```json\n{json.dumps(PLAN, indent=2)}\n```\nTERMINATE",
+    f"Here is the plan:\n```json\n{json.dumps(PLAN)}\n```\nEnjoy!",
+    f"{json.dumps(PLAN)}\nTERMINATE",
+])
+def test_parse_plan_output_accepts_agent_reply_shapes(reply):
+    assert parse_plan_output(reply) == PLAN
+
+
+@pytest.mark.parametrize("reply", [
+    "Sorry, I could not build a plan.",
+    json.dumps([PLAN]),
+    json.dumps({"theme": "Culture"}),
+    json.dumps({"itinerary": [{"day": "Day 1", "activities": [{"time": "10:00 AM"}]}]}),
+])
+def test_parse_plan_output_rejects_invalid_plans(reply):
+    with pytest.raises(ValueError):
+        parse_plan_output(reply)
+
+
+def test_numeric_day_and_missing_time_are_still_plans():
+    plan = {"itinerary": [{"day": 1, "activities": [{"time": "10:00 AM", "poi": {"id": "p1"}}]},
+                          {"day": "Day 2", "activities": [{"poi": {"id": "p2"}}]}]}
+    assert parse_plan_output(json.dumps(plan)) == plan
+
+
+def test_numeric_day_plan_is_formatted_not_downgraded_to_raw_plan():
+    from backend.autogen_itinerary import extract_final_output
+    from autogen_agentchat.messages import TextMessage
+
+    plan = {"location": "Tokyo", "itinerary": [{"day": 1, "activities": [{"poi": {"id": "p1", "n": "Museum"}}]}]}
+    output = extract_final_output([TextMessage(source="plan_agent", content=json.dumps(plan))], {})
+    assert "raw_plan" not in output and output["itinerary"]["itinerary"][0]["day"] == 1
+
+
+def test_plan_response_renders_like_the_sse_events():
+    created = datetime(2025, 8, 1, 12, 30)
+    body = json.loads(PlanJSONResponse({"session_id": "s", "data": {"created_at": created, 1: "x"}}).body)
+    assert body == {"session_id": "s", "data": {"created_at": "2025-08-01T12:30:00", "1": "x"}}
@@ -0,0 +1,201 @@
+import asyncio
+import copy
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend import plan_store
+from backend.benchmarks.fake_mongo import FakeCollection
+from backend.migrate_plans import migrate
+from backend.plan_store import InvalidCursor, PlanStore, dehydrate_plan, rehydrate_plan
+
+
+def poi(place_id, **extra):
+    return {"name": f"Place {place_id}", "address": f"{place_id} Example St, Tokyo", "lat": 35.66, "lng": 139.70,
+            "rating": 4.5, "price_level": None, "types": ["museum", "point_of_interest"], "place_id": place_id,
+            "source_query": "museums in Tokyo", "source": "api", "score": 88.5, **extra}
+
+
+def record(session_id, place_ids, **extra):
+    days = [{"day": "Day 1", "activities": [
+        {"time": "10:00 AM (2h)", "poi": poi(place_ids[0])},
+        {"time": "12:30 PM (1h)", "poi": poi(place_ids[1], category="restaurant", meal_type="lunch")},
+        {"time": "3:00 PM (2h)", "poi": {"name": "Walk along the river", "place_id": None}},
+    ]}]
+    return {"session_id": session_id, "input_hash": f"hash-{session_id}",
+            "user_input": {"mbti": "INFP", "query": "2 days in Tokyo"},
+            "data": {"success": True, "itinerary": {"location": "Tokyo", "itinerary": days}}, **extra}
+
+
+def store(**kwargs):
+    return PlanStore(FakeCollection("conversations"), FakeCollection("pois"), **kwargs)
+
+
+def test_pois_are_stored_once_and_rehydrated():
+    plans = store(compress_min_bytes=0)
+    first, second = record("s1", ["a", "b"]), record("s2", ["a", "c"])
+    original = copy.deepcopy(first)
+
+    async def run():
+        await plans.save(first)
+        await plans.save(second)
+        return await plans.find_one({"session_id": "s1"}), await plans.find({}, fields=["session_id", "data"])
+
+    loaded, both = asyncio.run(run())
+    assert first == original  # save does not touch the caller's record
+    assert {doc["_id"] for doc in plans.pois.docs} == {"a", "b", "c"}
+    stored = plans.plans.docs[0]["data"]["itinerary"]["itinerary"][0]["activities"]
+    assert stored[1]["poi"] == {"ref": "b", "source_query": "museums in Tokyo", "source": "api", "score": 88.5,
+                                "category": "restaurant", "meal_type": "lunch"}
+    # POIs without a place_id stay inline
+    assert stored[2]["poi"] == {"name": "Walk along the river", "place_id": None}
+
+    assert loaded["data"] == original["data"] and loaded["user_input"] == original["user_input"]
+    assert "poi_ids" not in loaded and "storage_version" not in loaded
+    assert [doc["data"] for doc in both] == [original["data"], second["data"]]
+
+
+def test_place_details_are_shared_across_plans():
+    plans = store(compress_min_bytes=0)
+    updated = record("s2", ["a", "c"])
+    updated["data"]["itinerary"]["itinerary"][0]["activities"][0]["poi"]["rating"] = 4.8
+
+    async def run():
+        await plans.save(record("s1", ["a", "b"]))
+        await plans.save(updated)
+        return await plans.find_one({"session_id": "s1"}, fields=["data"])
+
+    loaded = asyncio.run(run())
+    assert loaded["data"]["itinerary"]["itinerary"][0]["activities"][0]["poi"]["rating"] == 4.8
+
+
+def test_large_blobs_are_compressed_and_projection_skips_them():
+    plans = store(compress_min_bytes=200)
+    original = record("s1", ["a", "b"])
+
+    async def run():
+        await plans.save(copy.deepcopy(original))
+        lookups = []
+        find = plans.pois.find
+        plans.pois.find = lambda *args, **kwargs: lookups.append(args) or find(*args, **kwargs)
+        light = await plans.find_one({"session_id": "s1"}, fields=["session_id", "input_hash"])
+        full = await plans.find_one({"session_id": "s1", "has_itinerary": True}, fields=["data"])
+        return light, full, lookups
+
+    light, full, lookups = asyncio.run(run())
+    doc = plans.plans.docs[0]
+    assert "data" not in doc and isinstance(doc["data_z"], bytes)
+    assert light == {"session_id": "s1", "input_hash": "hash-s1"}
+    assert full == {"data": original["data"]}
+    # One batched lookup, only for the read that asked for the itinerary
+    assert len(lookups) == 1 and set(lookups[0][0]["_id"]["$in"]) == {"a", "b"}
+
+
+def test_legacy_records_are_read_as_stored_and_migrated():
+    plans = store(compress_min_bytes=0)
+    legacy = [record(f"old{i}", ["a", "bc"[i % 2]]) for i in range(4)]
+
+    async def run():
+        for doc in legacy:
+            await plans.plans.insert_one(copy.deepcopy(doc))
+        before = await plans.find_one({"session_id": "old0"}, fields=["data"])
+        dry = await migrate(plans, batch_size=10, limit=0, dry_run=True)
+        assert all("storage_version" not in doc for doc in plans.plans.docs)
+        stats = await migrate(plans, batch_size=10, limit=0, dry_run=False)
+        again = await migrate(plans, batch_size=10, limit=0, dry_run=False)
+        after = await plans.find({}, fields=["session_id", "data"], sort=[("session_id", 1)])
+        return before, dry, stats, again, after
+
+    before, dry, stats, again, after = asyncio.run(run())
+    assert before["data"] == legacy[0]["data"]
+    assert dry["records"] == stats["records"] == 4 and again["records"] == 0
+    assert stats["places"] == 3 and stats["bytes_after"] < stats["bytes_before"]
+    assert [doc["data"] for doc in after] == [doc["data"] for doc in legacy]
+    assert all(doc["storage_version"] == plan_store.STORAGE_VERSION for doc in plans.plans.docs)
+
+
+def test_dehydrate_leaves_non_itinerary_data_alone():
+    assert dehydrate_plan({"success": False, "error": "no plan"}) == ({"success": False, "error": "no plan"}, {})
+    assert dehydrate_plan(None) == (None, {})
+    assert rehydrate_plan({"itinerary": [{"day": "Day 1", "activities": [{"time": "9", "poi": {"ref": "x"}}]}]}, {}) == \
+        {"itinerary": [{"day": "Day 1", "activities": [{"time": "9", "poi": {"place_id": "x"}}]}]}
+
+
+def test_trip_listing_pages_by_keyset_with_filters():
+    plans = store(compress_min_bytes=200)
+    now = datetime(2025, 8, 1, tzinfo=timezone.utc)
+
+    async def run():
+        for i in range(7):
+            doc = record(f"s{i}", ["a", "b"], updated_at=now - timedelta(minutes=i // 2), created_at=now)
+            doc["data"]["itinerary"].update(location="Tokyo" if i % 3 else "Paris", theme="Culture", days=2 + i % 2)
+            await plans.save(doc)
+        await plans.save({"session_id": "failed", "data": {"success": False}, "updated_at": now})
+
+        pages, cursor = [], None
+        while True:
+            page = await plans.list_trips({}, limit=3, cursor=cursor)
+            pages.append([item["session_id"] for item in page["items"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages, page, await plans.list_trips({"location": " tokyo ", "mbti": "infp", "days": 3}, limit=10)
+
+    pages, last, tokyo = asyncio.run(run())
+    # Newest first, ties on updated_at broken by session_id; plans without an itinerary are not listed
+    assert pages == [["s1", "s0", "s3"], ["s2", "s5", "s4"], ["s6"]]
+    assert last["items"][0]["trip"] == {"location": "Paris", "theme": "Culture", "mbti": "INFP", "days": 2,
+                                        "start": None, "end": None}
+    assert set(last["items"][0]) == {"session_id", "trip", "created_at", "updated_at"}
+    assert [item["session_id"] for item in tokyo["items"]] == ["s1", "s5"] and tokyo["next_cursor"] is None
+
+
+def test_trip_listing_rejects_foreign_cursors():
+    with pytest.raises(InvalidCursor):
+        asyncio.run(store().list_trips({}, limit=5, cursor="not-a-cursor"))
+
+
+def test_migration_upgrades_older_storage_versions():
+    plans = store(compress_min_bytes=200)
+    original = record("v2", ["a", "b"], updated_at=datetime(2025, 8, 1, tzinfo=timezone.utc))
+
+    async def run():
+        await plans.save(copy.deepcopy(original))
+        # As written before trip summaries existed
+        del plans.plans.docs[0]["trip"]
+        plans.plans.docs[0]["storage_version"] = 2
+        hidden = await plans.list_trips({"location": "tokyo"}, limit=5)
+        stats = await migrate(plans, batch_size=10, limit=0, dry_run=False)
+        return hidden, stats, await plans.list_trips({"location": "tokyo"}, limit=5), await plans.find_one({"session_id": "v2"})
+
+    hidden, stats, listed, loaded = asyncio.run(run())
+    assert hidden["items"] == [] and stats["records"] == 1
+    assert [item["session_id"] for item in listed["items"]] == ["v2"]
+    assert loaded["data"] == original["data"] and loaded["trip"]["location"] == "Tokyo"
+
+
+def test_plan_etag_changes_when_shared_place_details_change(monkeypatch):
+    os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+    from fastapi.testclient import TestClient
+
+    from backend import app as app_module
+
+    plans = store(compress_min_bytes=0)
+    monkeypatch.setattr(app_module, "plan_store", plans)
+    now = datetime(2025, 8, 1, tzinfo=timezone.utc)
+    asyncio.run(plans.save(record("s1", ["a", "b"], created_at=now, updated_at=now)))
+    client = TestClient(app_module.app)
+
+    first = client.get("/plans/s1")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.json()["session_id"] == "s1"
+    assert client.get("/plans/s1", headers={"If-None-Match": etag}).status_code == 304
+
+    # A later plan updates place "a", which s1 shows too
+    updated = record("s2", ["a", "c"], created_at=now, updated_at=now)
+    updated["data"]["itinerary"]["itinerary"][0]["activities"][0]["poi"]["rating"] = 4.8
+    asyncio.run(plans.save(updated))
+    again = client.get("/plans/s1", headers={"If-None-Match": etag})
+    assert again.status_code == 200 and again.headers["ETag"] != etag
+    assert again.json()["data"]["itinerary"]["itinerary"][0]["activities"][0]["poi"]["rating"] == 4.8
+    assert client.get("/plans/missing").status_code == 404
@@ -0,0 +1,174 @@
+import asyncio
+import importlib
+import json
+import os
+from contextlib import asynccontextmanager
+
+import pytest
+
+from backend.utils import ItineraryDayExtractor
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+
+DAYS = [
+    {"day": "Day 1", "activities": [{"time": "10:00 AM", "poi": {"id": "a"}, "note": "say \"hi\" {politely}"}]},
+    {"day": "Day 2", "activities": [{"time": "9:00 AM", "poi": {"id": "b"}, "note": "a \\ backslash and [brackets]"}]},
+    {"day": "Day 3", "activities": []},
+]
+PLAN = json.dumps({"location": "Tokyo", "itinerary": DAYS})
+
+
+def feed_all(chunks):
+    extractor = ItineraryDayExtractor()
+    return [item for chunk in chunks for item in extractor.feed(chunk)], extractor
+
+
+def test_days_split_across_chunks():
+    chunks = [PLAN[i:i + 7] for i in range(0, len(PLAN), 7)]
+    days, extractor = feed_all(chunks)
+    assert days == list(enumerate(DAYS))
+    assert extractor.done and extractor.days_emitted == 3
+
+
+def test_several_days_in_one_chunk_keep_their_indices():
+    head, tail = PLAN[:40], PLAN[40:]
+    days, _ = feed_all([f"```json\n{head}", f"{tail}\n```"])
+    assert [index for index, _ in days] == [0, 1, 2]
+    assert [day["day"] for _, day in days] == ["Day 1", "Day 2", "Day 3"]
+
+
+def test_braces_and_escaped_quotes_inside_strings():
+    days, _ = feed_all(list(PLAN))
+    assert days[0][1]["activities"][0]["note"] == 'say "hi" {politely}'
+    assert days[1][1]["activities"][0]["note"] == "a \\ backslash and [brackets]"
+
+
+def test_unparsable_day_is_skipped_without_shifting_later_days():
+    broken = '{"itinerary": [{"day": "Day 1", "activities": [1,]}, {"day": "Day 2"}]}'
+    days, extractor = feed_all([broken])
+    assert days == [(0, {"day": "Day 2"})]
+    assert extractor.done
+
+
+def test_text_after_the_itinerary_array_is_ignored():
+    days, extractor = feed_all([PLAN[:-1], ', "extra": [{"day": "not a day"}]}'])
+    assert len(days) == 3 and extractor.done
+
+
+@pytest.fixture
+def stream_app(monkeypatch):
+    """The /plan/stream endpoint on the pipeline engine, with plan_agent answering in one message"""
+    from autogen_agentchat.base import TaskResult
+    from autogen_agentchat.messages import TextMessage
+    from fastapi.testclient import TestClient
+
+    from backend import app as app_module
+
+    # app imports the workflow modules top-level (backend/ on sys.path), so patch those
+    autogen_itinerary = importlib.import_module("autogen_itinerary")
+    pipeline = importlib.import_module("pipeline")
+    saved = []
+
+    async def summarize_stage(user_input):
+        return pipeline.TripSummary(location="Tokyo", days=3, mbti=user_input["mbti"])
+
+    async def poi_stage(summary, web_places=None):
+        return pipeline.PoiHandoff(summary=summary, pois=[{"place_id": "a", "name": "Museum", "score": 90}])
+
+    class PlanAgent:
+        async def run_stream(self, task):
+            yield TaskResult(messages=[TextMessage(source="plan_agent", content=PLAN)])
+
+    @asynccontextmanager
+    async def lease_agents(*names):
+        yield (PlanAgent(),)
+
+    async def save_plan_record(session_id, user_input, input_hash, raw_data):
+        saved.append((session_id, raw_data))
+
+    monkeypatch.setattr(autogen_itinerary, "PLAN_ENGINE", "pipeline")
+    monkeypatch.setattr(pipeline, "PLANNER_MODE", "llm")
+    monkeypatch.setattr(pipeline, "summarize_stage", summarize_stage)
+    monkeypatch.setattr(pipeline, "poi_stage", poi_stage)
+    monkeypatch.setattr(pipeline, "lease_agents", lease_agents)
+    monkeypatch.setattr(app_module, "PLAN_REUSE_WINDOW_SECONDS", 0)
+    monkeypatch.setattr(app_module, "save_plan_record", save_plan_record)
+    return TestClient(app_module.app), saved
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:  # not just a keep-alive comment
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_plan_stream_event_sequence(stream_app):
+    client, saved = stream_app
+    response = client.post("/plan/stream", json={"mbti": "INFP", "query": "3 days in Tokyo"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "session" and names[-1] == "final"
+    assert names.index("summary") < names.index("pois") < names.index("day")
+    days = [payload for name, payload in events if name == "day"]
+    assert [day["index"] for day in days] == [0, 1, 2]
+    assert [day["day"]["day"] for day in days] == ["Day 1", "Day 2", "Day 3"]
+
+    session_id = events[0][1]["session_id"]
+    assert events[-1][1]["session_id"] == session_id
+    assert saved and saved[0][0] == session_id
+
+
+def test_keepalive_closes_the_source_when_the_client_goes_away():
+    from backend import app as app_module
+
+    cleaned = []
+
+    async def source():
+        try:
+            yield "day", {"index": 0}
+            await asyncio.sleep(10)
+            yield "day", {"index": 1}
+        finally:
+            cleaned.append("released")
+
+    async def run():
+        stream = app_module.with_keepalive(source(), interval=0.01)
+        first = await stream.__anext__()
+        await stream.__anext__()  # a keep-alive while the source is busy
+        await stream.aclose()
+        return first, list(cleaned)
+
+    first, cleaned_on_close = asyncio.run(run())
+    assert first == ("day", {"index": 0}) and cleaned_on_close == ["released"]
+
+
+def test_incremental_replan_is_streamed_with_keepalives(stream_app, monkeypatch):
+    from backend import app as app_module
+
+    client, saved = stream_app
+    days = [{"day": "Day 1", "activities": []}, {"day": "Day 2", "activities": [{"time": "9:00 AM", "poi": {"id": "x"}}]}]
+    replanned = {"success": True, "itinerary": {"location": "Tokyo", "itinerary": days}, "replan": {"changed_days": ["Day 2"]}}
+
+    async def load_base_plan(user_input):
+        return object()
+
+    async def incremental_replan(workflow_input, base):
+        await asyncio.sleep(0.05)
+        return replanned
+
+    monkeypatch.setattr(app_module, "load_base_plan", load_base_plan)
+    monkeypatch.setattr(app_module, "incremental_replan", incremental_replan)
+    monkeypatch.setattr(app_module, "SSE_KEEPALIVE_SECONDS", 0.01)
+
+    response = client.post("/plan/stream", json={"mbti": "INFP", "query": "swap day 2"})
+    assert ": keep-alive" in response.text
+    events = parse_sse(response.text)
+    assert [name for name, _ in events] == ["session", "day", "final"]
+    assert events[1][1] == {"index": 1, "day": days[1]}
+    assert events[2][1]["data"] == replanned and saved[0][1] == replanned
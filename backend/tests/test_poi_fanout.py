@@ -0,0 +1,125 @@
+import asyncio
+import importlib
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+from backend.tools import poi_activity_tool
+
+WEB_PLACES = ["Hidden Garden", "Old Museum", "Hidden Garden"]
+
+
+def result(place_id, rating=4.5):
+    return {"place_id": place_id, "name": place_id, "rating": rating, "types": ["museum"],
+            "geometry": {"location": {"lat": 35.0, "lng": 139.0}}, "formatted_address": f"{place_id} street"}
+
+
+def results_for(query):
+    """Overlapping results, so dedup order matters: every query shares a few places with the others"""
+    if query.startswith("Hidden Garden"):
+        return [result("garden"), result("shared-1")]
+    if query.startswith("Old Museum"):
+        return [result("museum"), result("garden")]
+    seed = sum(map(ord, query)) % 4
+    return [result(f"shared-{(seed + i) % 4}") for i in range(3)] + [result(f"{query[:12]}-{i}") for i in range(4)]
+
+
+class SlowPlacesClient:
+    """Answers Text Search after a delay that differs per query, so completion order != query order"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queries = []
+
+    async def get(self, url, params=None, timeout=None):
+        self.queries.append(params["query"])
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.002 * (sum(map(ord, params["query"])) % 7))
+        finally:
+            self.in_flight -= 1
+        request = httpx.Request("GET", url, params=params)
+        return httpx.Response(200, json={"status": "OK", "results": results_for(params["query"])}, request=request)
+
+
+@pytest.fixture
+def places(monkeypatch):
+    client = SlowPlacesClient()
+
+    @asynccontextmanager
+    async def fake_http_client():
+        yield client
+
+    async def no_ingest(results):
+        return None
+
+    async def no_restaurants(*args, **kwargs):
+        return []
+
+    monkeypatch.setattr(poi_activity_tool, "get_http_client", fake_http_client)
+    monkeypatch.setattr(poi_activity_tool, "ingest_results", no_ingest)
+    monkeypatch.setattr(poi_activity_tool, "search_nearby_restaurants", no_restaurants)
+    monkeypatch.setattr(poi_activity_tool.places_cache, "enabled", False)
+    return client
+
+
+async def sequential_pois(location, mbti, theme, web_places):
+    """gather_activity_pois as it ran before the fan-out: one request at a time"""
+    seen, pois = set(), []
+    for query in poi_activity_tool.build_activity_queries(location, mbti, theme):
+        for poi in await poi_activity_tool.fetch_google_places(query):
+            if poi["place_id"] not in seen:
+                seen.add(poi["place_id"])
+                pois.append({**poi, "source": "api"})
+    for place in web_places:
+        query = f"{place} in {location}"
+        for poi in await poi_activity_tool.fetch_google_places(query, max_results=1):
+            if poi["place_id"] not in seen:
+                seen.add(poi["place_id"])
+                pois.append({**poi, "matched_from": place, "source_query": query, "source": "web"})
+    return poi_activity_tool.apply_mbti_scoring(pois, mbti)
+
+
+def test_fan_out_matches_sequential_order_and_dedup(places):
+    async def run():
+        concurrent = await poi_activity_tool.gather_activity_pois("Tokyo", "INFP", "culture", web_places=WEB_PLACES)
+        return concurrent, await sequential_pois("Tokyo", "INFP", "culture", WEB_PLACES)
+
+    concurrent, sequential = asyncio.run(run())
+    assert [p["place_id"] for p in concurrent] == [p["place_id"] for p in sequential]
+    assert concurrent == sequential
+    assert len({p["place_id"] for p in concurrent}) == len(concurrent)
+    assert places.max_in_flight > 1
+
+
+def test_poi_max_concurrency_caps_places_calls(places, monkeypatch):
+    # poi_activity_tool imports tools.concurrency top-level (backend/ on sys.path)
+    monkeypatch.setattr(importlib.import_module("tools.concurrency"), "POI_MAX_CONCURRENCY", 2)
+    pois = asyncio.run(poi_activity_tool.gather_activity_pois("Tokyo", "INFP", "culture", web_places=WEB_PLACES))
+
+    assert pois
+    assert len(places.queries) == 4 + len(WEB_PLACES)
+    assert places.max_in_flight == 2
+
+
+def test_web_places_none_means_none_and_discovery_shares_the_query_budget(places, monkeypatch):
+    discoveries = []
+
+    async def discover(location, theme):
+        discoveries.append(location)
+        return ["Hidden Garden", "Old Museum", "Quiet Temple", "Night Market", "River Walk", "Tea House"]
+
+    monkeypatch.setattr(poi_activity_tool, "discover_web_places", discover)
+    plain = asyncio.run(poi_activity_tool.gather_activity_pois("Tokyo", "INFP", "culture"))
+    assert discoveries == [] and len(places.queries) == 4
+    assert all(p["source"] == "api" for p in plain if p.get("category") != "restaurant")
+
+    places.queries.clear()
+    asyncio.run(poi_activity_tool.gather_activity_pois("Tokyo", "INFP", "culture", discover_web=True))
+    # 4 text searches leave room for 4 names under max_queries=8
+    assert discoveries == ["Tokyo"] and len(places.queries) == poi_activity_tool.MAX_ACTIVITY_QUERIES
+    web_queries = {f"{name} in Tokyo" for name in ("Hidden Garden", "Old Museum", "Quiet Temple", "Night Market")}
+    assert set(places.queries) == set(poi_activity_tool.build_activity_queries("Tokyo", "INFP", "culture")) | web_queries
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from backend.tools import poi_model
+from backend.tools.poi_model import POI, POICatalog, dumps_wire, load_places, rehydrate_itinerary, rehydrate_pois, poi_catalog, to_wire
+from backend.tools.poi_store import POIStore
+
+RAW_TEXT = {
+    "name": "Ghibli Museum", "formatted_address": "1 Chome-1-83 Shimorenjaku, Mitaka, Tokyo 181-0013, Japan",
+    "geometry": {"location": {"lat": 35.696238, "lng": 139.5704317}}, "rating": 4.5,
+    "types": ["tourist_attraction", "museum", "point_of_interest", "establishment"], "place_id": "ChIJLYwD5TTuGGARBZKEP5BV4U0",
+}
+RAW_NEARBY = {
+    "name": "Ramen Nagi", "vicinity": "1-3 Golden Gai", "geometry": {"location": {"lat": 35.6941, "lng": 139.7046}},
+    "rating": 4.4, "price_level": 1, "types": ["restaurant", "food", "point_of_interest", "establishment"], "place_id": "r-nagi",
+}
+
+
+def test_dicts_keep_the_shape_the_tools_returned():
+    poi = POI.from_text_search(RAW_TEXT, "Ghibli Museum in Tokyo").to_dict()
+    assert list(poi) == ["name", "address", "lat", "lng", "rating", "price_level", "types", "place_id", "source_query"]
+    restaurant = POI.from_nearby_search(RAW_NEARBY, "ramen").to_dict()
+    assert list(restaurant) == ["name", "address", "lat", "lng", "rating", "price_level", "types", "place_id",
+                                "source", "matched_keyword", "category"]
+    assert restaurant["address"] == "1-3 Golden Gai" and restaurant["category"] == "restaurant"
+
+
+def test_wire_format_is_compact():
+    poi = POI.from_text_search(RAW_TEXT, "Ghibli Museum in Tokyo").to_dict()
+    poi.update(source="web", score=93.4)
+    assert to_wire(poi) == {"id": "ChIJLYwD5TTuGGARBZKEP5BV4U0", "n": "Ghibli Museum", "la": 35.6962, "ln": 139.5704,
+                            "r": 4.5, "t": ["tourist_attraction", "museum"], "c": "a", "s": 93}
+    assert len(dumps_wire([poi])) < len(json.dumps([poi])) / 2
+
+
+def test_plan_references_are_rehydrated():
+    activity = {**POI.from_text_search(RAW_TEXT, "q").to_dict(), "source": "api", "score": 90}
+    restaurant = {**POI.from_nearby_search(RAW_NEARBY, "ramen").to_dict(), "score": 80}
+    dumps_wire([activity, restaurant])
+    plan = {"itinerary": [{"day": "Day 1", "activities": [
+        {"time": "10:00 AM (2h)", "poi": {"id": activity["place_id"], "n": "Ghibli Museum", "la": 35.6962, "s": 90}},
+        {"time": "12:00 PM (1h)", "poi": {"id": "r-nagi", "n": "Ramen Nagi", "c": "r", "s": 80, "m": "lunch"}},
+        {"time": "3:00 PM (2h)", "poi": {"id": "unknown", "n": "Somewhere", "la": 35.1, "c": "a"}},
+    ]}]}
+    facts = POI.from_places(RAW_TEXT).to_dict()
+    entries = rehydrate_itinerary(plan)["itinerary"][0]["activities"]
+    # Exact coordinates and all types come back; per-request fields come from the plan's entry
+    assert entries[0]["poi"] == {**facts, "score": 90}
+    assert entries[1]["poi"] == {**POI.from_places(RAW_NEARBY).to_dict(), "category": "restaurant", "score": 80, "meal_type": "lunch"}
+    assert entries[2]["poi"] == {"place_id": "unknown", "name": "Somewhere", "lat": 35.1, "category": "activity"}
+    assert poi_catalog.get("r-nagi") == POI.from_places(RAW_NEARBY).to_dict()
+
+
+def test_concurrent_requests_do_not_share_per_request_fields():
+    base = POI.from_nearby_search(RAW_NEARBY, "ramen").to_dict()
+    # Two requests score the same place for different MBTI types, the second one last
+    infp_wire, = json.loads(dumps_wire([{**base, "score": 91.0, "meal_type": "dinner"}]))
+    estj_wire, = json.loads(dumps_wire([{**base, "score": 42.0, "matched_from": "critic"}]))
+
+    infp, estj = rehydrate_pois([infp_wire, estj_wire])
+    assert (infp["score"], infp["meal_type"]) == (91, "dinner")
+    assert estj["score"] == 42 and "meal_type" not in estj and "matched_from" not in estj
+    assert "score" not in poi_catalog.get("r-nagi")
+
+
+def test_catalog_is_bounded():
+    catalog = POICatalog(max_entries=2)
+    catalog.remember([{"place_id": "a"}, {"place_id": "b"}, {"place_id": "c"}])
+    assert len(catalog) == 2 and catalog._entries.get("a") is None
+
+
+def test_places_from_another_worker_are_loaded_in_one_batch(monkeypatch):
+    store = POIStore()
+    store.ingest([RAW_TEXT, {**RAW_NEARBY, "place_id": "r-other"}])
+    queries = []
+    get_many = store.get_many
+    monkeypatch.setattr(store, "get_many", lambda ids: queries.append(list(ids)) or get_many(ids))
+    monkeypatch.setattr(poi_model, "get_poi_store", lambda: store)
+    monkeypatch.setattr(poi_model, "poi_catalog", POICatalog())
+    plan = {"itinerary": [{"day": "Day 1", "activities": [
+        {"time": "10:00 AM", "poi": {"id": RAW_TEXT["place_id"], "s": 90}},
+        {"time": "12:00 PM", "poi": {"id": "r-other", "c": "r", "s": 70}},
+        {"time": "3:00 PM", "poi": {"id": "missing", "n": "Somewhere"}},
+    ]}]}
+
+    # Rehydration itself never reads SQLite
+    assert poi_model.poi_catalog.get("r-other") is None
+    asyncio.run(load_places(plan))
+    entries = rehydrate_itinerary(plan)["itinerary"][0]["activities"]
+    assert queries == [[RAW_TEXT["place_id"], "r-other", "missing"]]
+    assert entries[0]["poi"] == {**POI.from_places(RAW_TEXT).to_dict(), "score": 90}
+    assert entries[1]["poi"]["name"] == "Ramen Nagi" and entries[1]["poi"]["category"] == "restaurant"
+    assert entries[2]["poi"] == {"place_id": "missing", "name": "Somewhere"}
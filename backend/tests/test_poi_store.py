@@ -0,0 +1,139 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import httpx
+from backend.tools.poi_store import BACKEND_DIR, POIStore, haversine_m, resolve_store_path
+
+
+def place(place_id, lat, lng, rating=4.5, **extra):
+    return {"place_id": place_id, "name": place_id, "rating": rating,
+            "geometry": {"location": {"lat": lat, "lng": lng}}, "types": ["restaurant"], **extra}
+
+
+def test_nearby_answers_radius_and_keyword_queries():
+    store = POIStore()
+    center = (35.6595, 139.7005)
+    results = [
+        place("close", 35.6600, 139.7010, 4.2, vicinity="1 Close St"),
+        place("far", 35.6700, 139.7200, 4.9),           # ~2km away
+        place("best", 35.6590, 139.7000, 4.8),
+    ]
+    store.record_nearby(*center, 3000, "Ramen", results)
+
+    assert store.covers(*center, 1000, "ramen")
+    assert not store.covers(*center, 1000, "sushi")
+    assert not store.covers(35.70, 139.75, 1000, "ramen")
+
+    within = store.nearby(*center, 1000, "ramen")
+    assert [r["place_id"] for r in within] == ["best", "close"]
+    assert within[1]["vicinity"] == "1 Close St"
+    assert all(haversine_m(*center, r["geometry"]["location"]["lat"], r["geometry"]["location"]["lng"]) <= 1000 for r in within)
+    assert [r["place_id"] for r in store.nearby(*center, 1000, "ramen", min_rating=4.5)] == ["best"]
+
+
+def test_saturated_search_only_covers_same_center():
+    store = POIStore()
+    results = [place(f"p{i}", 35.0 + i * 1e-4, 139.0, 4.0) for i in range(20)]
+    store.record_nearby(35.0, 139.0, 5000, "", results)
+    assert store.covers(35.0, 139.0, 1000, "")
+    assert not store.covers(35.01, 139.0, 1000, "")
+
+
+def test_repeated_searches_keep_one_coverage_row(tmp_path):
+    path = str(tmp_path / "poi_store.sqlite3")
+    store = POIStore(path)
+    for count in (3, 20, 5):
+        store.record_nearby(35.0, 139.0, 1000, "Ramen", [place(f"p{i}", 35.0, 139.0) for i in range(count)])
+    store.record_nearby(35.0, 139.0, 2000, "ramen", [])
+    rows = store._conn.execute("SELECT radius, result_count FROM coverage ORDER BY radius").fetchall()
+    assert rows == [(1000.0, 5), (2000.0, 0)]
+
+    # Stores written before coverage rows were unique are deduplicated when opened
+    store._conn.executescript("DROP INDEX coverage_circle; INSERT INTO coverage SELECT * FROM coverage;")
+    store.close()
+    reopened = POIStore(path)
+    assert reopened._conn.execute("SELECT COUNT(*) FROM coverage").fetchone()[0] == 2
+
+
+def test_relative_store_paths_do_not_depend_on_the_working_directory():
+    assert resolve_store_path(".cache/poi_store.sqlite3") == str(BACKEND_DIR / ".cache" / "poi_store.sqlite3")
+    assert resolve_store_path("/var/lib/trip/poi.sqlite3") == "/var/lib/trip/poi.sqlite3"
+    assert resolve_store_path(":memory:") == ":memory:"
+
+
+def test_text_search_results_do_not_lose_nearby_fields():
+    store = POIStore()
+    store.record_nearby(35.0, 139.0, 1000, "sushi", [place("a", 35.0, 139.0, vicinity="Shibuya")])
+    store.ingest([place("a", 35.0, 139.0, 4.9, formatted_address="Shibuya, Tokyo")])
+    merged = store.get("a")
+    assert merged["vicinity"] == "Shibuya" and merged["formatted_address"] == "Shibuya, Tokyo"
+    assert store.nearby(35.0, 139.0, 1000, "sushi")[0]["rating"] == 4.9
+
+
+def test_search_nearby_restaurants_skips_api_when_covered(monkeypatch):
+    from backend.tools import critic_meal_tool
+
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.params["keyword"])
+        return httpx.Response(200, json={"status": "OK", "results": [place("r1", 35.0, 139.0, 4.6)]})
+
+    store = POIStore()
+    monkeypatch.setattr(critic_meal_tool, "get_poi_store", lambda: store)
+    monkeypatch.setattr(critic_meal_tool.places_cache, "enabled", False)
+
+    @asynccontextmanager
+    async def mock_http_client():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            yield client
+
+    monkeypatch.setattr(critic_meal_tool, "get_http_client", mock_http_client)
+
+    async def run():
+        first = await critic_meal_tool.search_nearby_restaurants(35.0, 139.0, cuisine_keywords=["ramen"])
+        second = await critic_meal_tool.search_nearby_restaurants(35.0, 139.0, cuisine_keywords=["ramen", "sushi"])
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert calls == ["ramen", "sushi"]
+    assert first[0]["place_id"] == second[0]["place_id"] == "r1"
+
+
+def test_stale_cached_response_is_not_recorded_as_fresh_coverage(monkeypatch):
+    from backend.cache import CacheEntry, TieredCache
+    from backend.tools import critic_meal_tool
+    from backend.tools.places_cache import nearby_key
+
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.params["keyword"])
+        return httpx.Response(200, json={"status": "OK", "results": [place("r1", 35.0, 139.0, 4.6)]})
+
+    @asynccontextmanager
+    async def mock_http_client():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            yield client
+
+    store = POIStore()
+    cache = TieredCache("test_places", ttl=60, stale_ttl=3600)
+    now = time.time()
+    # Fetched 30 minutes ago: served under stale-while-revalidate
+    cache.memory.set(nearby_key(35.0, 139.0, 1000, "ramen"),
+                     CacheEntry([place("old", 35.0, 139.0)], now - 1800, now - 1740, now + 1800))
+    monkeypatch.setattr(critic_meal_tool, "get_poi_store", lambda: store)
+    monkeypatch.setattr(critic_meal_tool, "places_cache", cache)
+    monkeypatch.setattr(critic_meal_tool, "get_http_client", mock_http_client)
+
+    async def run():
+        served = await critic_meal_tool._fetch_nearby_candidates(35.0, 139.0, 1000, "ramen")
+        covered_before_refresh = store.covers(35.0, 139.0, 1000, "ramen")
+        await asyncio.gather(*cache._refreshing.values())
+        return served, covered_before_refresh
+
+    served, covered_before_refresh = asyncio.run(run())
+    assert served[0]["place_id"] == "old" and not covered_before_refresh
+    # The background revalidation is a real fetch, so it records the circle
+    assert calls == ["ramen"] and store.covers(35.0, 139.0, 1000, "ramen")
+    assert store.get("r1") is not None and store.get("old") is None
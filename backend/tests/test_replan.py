@@ -0,0 +1,121 @@
+import asyncio
+import copy
+
+import pytest
+
+from backend import replan
+from backend.replan import apply_edit, base_plan_from, parse_edit
+
+
+def poi(place_id, lat, lng, score=80, **extra):
+    return {"place_id": place_id, "name": place_id.replace("_", " ").title(), "lat": lat, "lng": lng, "score": score, **extra}
+
+
+PLAN = {
+    "theme": "Culture", "location": "Tokyo", "days": 2, "mbti": "INFJ",
+    "itinerary": [
+        {"day": "Day 1", "title": "Old Tokyo", "description": "Temples.", "activities": [
+            {"time": "10:00 AM (2h)", "poi": poi("senso_ji", 35.7148, 139.7967)},
+            {"time": "12:00 PM (1h)", "poi": poi("ramen_a", 35.7120, 139.7950, category="restaurant", meal_type="lunch")},
+            {"time": "1:30 PM (2h)", "poi": poi("ueno_park", 35.7156, 139.7745)},
+            {"time": "6:00 PM (1h)", "poi": poi("sushi_a", 35.7100, 139.7750, category="restaurant", meal_type="dinner")},
+        ]},
+        {"day": "Day 2", "activities": [
+            {"time": "10:00 AM (2h)", "poi": poi("meiji_jingu", 35.6764, 139.6993)},
+            {"time": "12:00 PM (1h)", "poi": poi("cafe_b", 35.6700, 139.7000, category="restaurant")},
+            {"time": "1:30 PM (2h)", "poi": poi("shibuya_crossing", 35.6595, 139.7005)},
+            {"time": "6:00 PM (1h)", "poi": poi("izakaya_b", 35.6590, 139.7010, category="restaurant")},
+        ]},
+    ],
+}
+
+
+@pytest.mark.parametrize("query, days, target, action, keyword", [
+    ("Swap day 2's dinner for sushi", [1], "dinner", "replace", "sushi"),
+    ("Can you change the lunch on the first day?", [0], "lunch", "replace", None),
+    ("Replace Ueno Park with a museum", [0], "poi", "replace", "museum"),
+    ("remove the meals on the last day", [1], "meals", "remove", None),
+    ("redo day 1 with something else", [0], "day", "replace", None),
+    ("Different restaurants every day", [0, 1], "meals", "replace", None),
+])
+def test_parse_edit_understands_local_changes(query, days, target, action, keyword):
+    edit = parse_edit(query, PLAN)
+    assert (edit.days, edit.target, edit.action, edit.keyword) == (days, target, action, keyword)
+
+
+@pytest.mark.parametrize("query", [
+    "Plan a 4-day trip to Tokyo instead",
+    "add another day",
+    "make it more relaxing",
+    "remove day 2",
+    "swap day 9's dinner",
+])
+def test_parse_edit_leaves_global_changes_to_the_full_workflow(query):
+    assert parse_edit(query, PLAN) is None
+
+
+def test_base_plan_from_accepts_response_data_and_itinerary():
+    response = {"session_id": "s1", "data": {"success": True, "itinerary": PLAN}}
+    assert base_plan_from(response).session_id == "s1"
+    assert base_plan_from(response["data"]).plan is PLAN
+    assert base_plan_from(PLAN).plan is PLAN
+    assert base_plan_from({"raw_plan": "text"}) is None
+
+
+def test_meal_swap_only_touches_that_meal(monkeypatch):
+    searched = []
+
+    async def fake_restaurants(lat, lng, location, mbti, cuisine_keywords=None, max_results=5):
+        searched.append((round(lat, 4), round(lng, 4), cuisine_keywords))
+        return [poi("sushi_a", lat, lng, score=99, category="restaurant"),   # already in the plan
+                poi("far_sushi", lat + 0.2, lng, score=95, category="restaurant"),
+                poi("near_sushi", lat + 0.001, lng, score=85, category="restaurant")]
+
+    async def no_text_search(*args, **kwargs):
+        raise AssertionError("a meal swap must not run activity searches")
+
+    monkeypatch.setattr(replan, "search_nearby_restaurants", fake_restaurants)
+    monkeypatch.setattr(replan, "fetch_google_places", no_text_search)
+    original = copy.deepcopy(PLAN)
+
+    plan, changed = asyncio.run(apply_edit(PLAN, parse_edit("swap day 2's dinner for sushi", PLAN), "INFJ"))
+    assert changed == [1]
+    assert PLAN == original
+    # Searched once, next to the last activity of day 2
+    assert searched == [(35.6595, 139.7005, ["sushi"])]
+    dinner = plan["itinerary"][1]["activities"][3]
+    assert dinner["time"] == "6:00 PM (1h)"
+    assert dinner["poi"]["place_id"] == "near_sushi" and dinner["poi"]["meal_type"] == "dinner"
+    assert plan["itinerary"][1]["activities"][:3] == PLAN["itinerary"][1]["activities"][:3]
+    assert plan["itinerary"][0] is not PLAN["itinerary"][0] and plan["itinerary"][0] == PLAN["itinerary"][0]
+
+
+def test_activity_replacement_and_removal(monkeypatch):
+    async def fake_text_search(query, max_results=5):
+        assert query == "museum in Tokyo"
+        return [poi("senso_ji", 35.7148, 139.7967, types=["tourist_attraction"]),
+                poi("tokyo_national_museum", 35.7188, 139.7765, types=["museum"]),
+                poi("edo_museum", 35.6966, 139.7957, types=["museum"])]
+
+    monkeypatch.setattr(replan, "fetch_google_places", fake_text_search)
+    monkeypatch.setattr(replan, "apply_mbti_scoring", lambda pois, mbti: pois)
+
+    plan, changed = asyncio.run(apply_edit(PLAN, parse_edit("Replace Ueno Park with a museum", PLAN), "INFJ"))
+    assert changed == [0]
+    entry = plan["itinerary"][0]["activities"][2]
+    assert entry["time"] == "1:30 PM (2h)" and entry["poi"]["place_id"] == "tokyo_national_museum"
+
+    plan, changed = asyncio.run(apply_edit(PLAN, parse_edit("remove the meals on the last day", PLAN), "INFJ"))
+    assert changed == [1]
+    assert [e["poi"]["place_id"] for e in plan["itinerary"][1]["activities"]] == ["meiji_jingu", "shibuya_crossing"]
+
+
+def test_edit_that_changes_nothing_runs_the_full_workflow(monkeypatch):
+    async def only_planned_restaurants(lat, lng, location, mbti, cuisine_keywords=None, max_results=5):
+        return [poi("sushi_a", lat, lng, score=99, category="restaurant")]
+
+    monkeypatch.setattr(replan, "REPLAN_MODE", "incremental")
+    monkeypatch.setattr(replan, "search_nearby_restaurants", only_planned_restaurants)
+    user_input = {"mbti": "INFJ", "Query": "swap day 2's dinner for sushi"}
+
+    assert asyncio.run(replan.incremental_replan(user_input, base_plan_from(PLAN))) is None
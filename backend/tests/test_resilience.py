@@ -0,0 +1,206 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.resilience import (
+    AdaptiveLimiter, CircuitBreaker, CircuitOpenError, QuotaExhausted, ResilientService, TokenBucket, UpstreamThrottled,
+)
+
+
+def _status_error(status: int, headers=None) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://example.test/search")
+    response = httpx.Response(status, request=request, headers=headers)
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=response)
+
+
+def _flaky(failures):
+    """Attempt function raising the given errors in turn, then returning "ok\""""
+    calls = {"n": 0}
+
+    async def attempt():
+        calls["n"] += 1
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    return attempt, calls
+
+
+def test_retries_throttling_and_5xx_then_succeeds(monkeypatch):
+    monkeypatch.setattr("backend.resilience.RETRY_MAX_DELAY", 0.01)
+    monkeypatch.setattr("backend.resilience.backoff_delay", lambda attempt: 0)
+    service = ResilientService("test", rate=0, max_attempts=3)
+    attempt, calls = _flaky([_status_error(429, {"Retry-After": "0"}), _status_error(503)])
+
+    assert asyncio.run(service.call(attempt)) == "ok"
+    assert calls["n"] == 3
+    assert service.counters["retries"] == 2
+    assert service.counters["throttled"] == 1
+    assert service.counters["failures"] == 0
+
+
+def test_client_errors_are_not_retried():
+    service = ResilientService("test", rate=0, max_attempts=3)
+    attempt, calls = _flaky([_status_error(400)])
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(service.call(attempt))
+    assert calls["n"] == 1
+    assert service.breaker("default").failures == 0
+
+
+def test_retries_are_bounded(monkeypatch):
+    monkeypatch.setattr("backend.resilience.backoff_delay", lambda attempt: 0)
+    service = ResilientService("test", rate=0, max_attempts=2)
+    attempt, calls = _flaky([UpstreamThrottled("OVER_QUERY_LIMIT")] * 5)
+
+    with pytest.raises(UpstreamThrottled):
+        asyncio.run(service.call(attempt))
+    assert calls["n"] == 2
+    assert service.counters["failures"] == 1
+
+
+def test_quota_counts_attempts_and_rejects_without_retry(monkeypatch):
+    monkeypatch.setattr("backend.resilience.backoff_delay", lambda attempt: 0)
+    service = ResilientService("test", rate=0, max_attempts=3)
+    service.set_quota(3)
+    attempt, calls = _flaky([_status_error(503)])
+
+    assert asyncio.run(service.call(attempt)) == "ok"
+    assert service.quota_left() == 1
+    asyncio.run(service.call(attempt))
+    with pytest.raises(QuotaExhausted):
+        asyncio.run(service.call(attempt))
+    assert calls["n"] == 3
+    assert service.counters["quota_rejected"] == 1
+    # Running out of budget is not an upstream failure
+    assert service.breaker("default").failures == 0
+
+
+def test_circuit_opens_fails_fast_and_recovers_through_a_probe():
+    async def run():
+        service = ResilientService("test", rate=0, max_attempts=1, failure_threshold=2, reset_timeout=0.05)
+        attempt, calls = _flaky([_status_error(502), httpx.ReadTimeout("slow")])
+        for _ in range(2):
+            with pytest.raises(Exception):
+                await service.call(attempt, endpoint="nearby")
+        assert service.breaker("nearby").state == "open"
+
+        with pytest.raises(CircuitOpenError):
+            await service.call(attempt, endpoint="nearby")
+        assert calls["n"] == 2
+        # Other endpoints of the same service are unaffected
+        assert await service.call(attempt, endpoint="text") == "ok"
+
+        await asyncio.sleep(0.06)
+        assert await service.call(attempt, endpoint="nearby") == "ok"
+        assert service.breaker("nearby").state == "closed"
+        assert service.counters["circuit_rejected"] == 1
+        assert service.counters["circuit_opened"] == 1
+
+    asyncio.run(run())
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow() is True
+    assert breaker.state == "half_open"
+    assert breaker.allow() is False
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_cancelled_probe_does_not_keep_the_circuit_half_open():
+    async def run():
+        service = ResilientService("test", rate=20, burst=1, max_attempts=1, failure_threshold=1, reset_timeout=0.01)
+        attempt, calls = _flaky([_status_error(503)])
+        with pytest.raises(httpx.HTTPStatusError):
+            await service.call(attempt, endpoint="nearby")
+        await asyncio.sleep(0.02)
+
+        # The probe is cancelled while it waits for a token of the drained bucket
+        probe = asyncio.create_task(service.call(attempt, endpoint="nearby"))
+        await asyncio.sleep(0.005)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert calls["n"] == 1
+
+        assert await service.call(attempt, endpoint="nearby") == "ok"
+        assert service.breaker("nearby").state == "closed"
+
+    asyncio.run(run())
+
+
+def test_fast_fails_and_cancelled_waits_cost_no_quota():
+    async def run():
+        service = ResilientService("test", rate=20, burst=1, max_attempts=1, failure_threshold=1, reset_timeout=60)
+        service.set_quota(2)
+        attempt, calls = _flaky([_status_error(503)])
+        with pytest.raises(httpx.HTTPStatusError):
+            await service.call(attempt, endpoint="nearby")
+        # An outage: the open circuit rejects without sending anything
+        for _ in range(5):
+            with pytest.raises(CircuitOpenError):
+                await service.call(attempt, endpoint="nearby")
+        assert service.quota_left() == 1
+
+        # Cancelled while waiting for a token of the drained bucket: the token comes back too
+        waiting = asyncio.create_task(service.call(attempt, endpoint="text"))
+        await asyncio.sleep(0.005)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert service.quota_left() == 1 and service.bucket._tokens > -0.5
+
+        # Two requests wait for tokens with one request of quota left: only one is sent
+        results = await asyncio.gather(*(service.call(attempt, endpoint="text") for _ in range(2)), return_exceptions=True)
+        return results, calls["n"]
+
+    results, sent = asyncio.run(run())
+    assert sorted(map(str, results)) == sorted(["ok", str(QuotaExhausted("test request quota of 2 is used up"))])
+    assert sent == 2
+
+
+def test_token_bucket_spaces_out_requests():
+    async def run():
+        bucket = TokenBucket(rate=100, burst=2)
+        start = time.perf_counter()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.perf_counter() - start
+
+    # 2 from the burst, then 4 more at 100/s
+    assert asyncio.run(run()) >= 0.035
+
+
+def test_adaptive_limiter_halves_on_overload_and_grows_back():
+    async def run():
+        limiter = AdaptiveLimiter(max_limit=8)
+        await limiter.acquire()
+        limiter.release(overloaded=True)
+        assert limiter.limit == 4
+        for _ in range(8):
+            await limiter.acquire()
+            limiter.release(overloaded=False)
+        assert 5 < limiter.limit <= 8
+
+        # Concurrency never exceeds the current limit
+        limiter = AdaptiveLimiter(max_limit=2)
+        peak = {"now": 0, "max": 0}
+
+        async def work():
+            await limiter.acquire()
+            peak["now"] += 1
+            peak["max"] = max(peak["max"], peak["now"])
+            await asyncio.sleep(0.01)
+            peak["now"] -= 1
+            limiter.release(overloaded=False)
+
+        await asyncio.gather(*(work() for _ in range(6)))
+        assert peak["max"] == 2
+
+    asyncio.run(run())
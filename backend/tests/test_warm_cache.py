@@ -0,0 +1,82 @@
+import asyncio
+import os
+from collections import Counter
+
+import pytest
+
+from backend import warm_cache
+from backend.cache import DiskStore, TieredCache
+from backend.resilience import ResilientService
+
+
+@pytest.fixture
+def places(monkeypatch, tmp_path):
+    """Places searches counted per cache key, cached in a temporary persistent tier"""
+    cache = TieredCache("places", ttl=3600, persistent=DiskStore(os.path.join(tmp_path, "places.sqlite3")))
+    api = ResilientService("places", rate=0)
+    fetched = Counter()
+
+    async def fetch(key, value):
+        async def attempt():
+            fetched[key] += 1
+            return value
+        return await cache.get_or_fetch(key, lambda: api.call(attempt))
+
+    async def fetch_google_places(query, max_results=5):
+        raw = [{"place_id": f"{query}-{i}", "name": query, "rating": 4.5,
+                "geometry": {"location": {"lat": 35.0 + i / 100, "lng": 139.0}}} for i in range(2)]
+        try:
+            return warm_cache.text_search_pois(await fetch(warm_cache.text_search_key(query), raw), query)
+        except Exception:
+            return []
+
+    async def search_nearby_restaurants(lat, lng, location, max_results=3):
+        for keyword in warm_cache.get_cuisine_keywords(location):
+            try:
+                await fetch(warm_cache.nearby_key(lat, lng, warm_cache.NEARBY_SEARCH_RADIUS, keyword), [])
+            except Exception:
+                pass
+        return []
+
+    async def no_http_client():
+        return None
+
+    monkeypatch.setattr(warm_cache, "places_cache", cache)
+    monkeypatch.setattr(warm_cache, "places_api", api)
+    monkeypatch.setattr(warm_cache, "get_poi_store", lambda: None)
+    monkeypatch.setattr(warm_cache, "fetch_google_places", fetch_google_places)
+    monkeypatch.setattr(warm_cache, "search_nearby_restaurants", search_nearby_restaurants)
+    monkeypatch.setattr(warm_cache, "init_http_client", no_http_client)
+    monkeypatch.setattr(warm_cache, "close_http_client", no_http_client)
+    return fetched
+
+
+def test_expand_mbti_groups():
+    assert warm_cache.expand_mbti(["nt", "INTJ", "ENFP"]) == ["INTJ", "INTP", "ENTJ", "ENTP", "ENFP"]
+    assert len(warm_cache.expand_mbti(["all"])) == 16
+    with pytest.raises(ValueError):
+        warm_cache.expand_mbti(["XYZW"])
+
+
+def test_warm_run_fills_cache_and_resumes_within_budget(places):
+    jobs = warm_cache.build_jobs(["Tokyo"], ["Culture", "Food"], ["INTJ", "ESFP"])
+    before = [warm_cache.freshness(job, 600) for job in jobs]
+    # Three theme queries shared, one per type; nearby searches are unknown until those are cached
+    assert [s.text["missing"] for s in before] == [5, 5] and all(sum(s.nearby.values()) == 0 for s in before)
+
+    # A budget too small for both jobs stops part way
+    warm_cache.places_api.set_quota(13)
+    outcome = asyncio.run(warm_cache.run_jobs(jobs, 600, concurrency=1))
+    assert outcome["warmed"] == ["Tokyo/Culture"] and outcome["incomplete"] == ["Tokyo/Food"]
+
+    # The next run only fetches what is still missing
+    fetched = sum(places.values())
+    warm_cache.places_api.set_quota(None)
+    asyncio.run(warm_cache.run_jobs(jobs, 600, concurrency=2))
+    assert set(places.values()) == {1} and sum(places.values()) > fetched
+
+    after = [warm_cache.freshness(job, 600) for job in jobs]
+    assert all(s.to_fetch == 0 and s.coverage == 1.0 and s.nearby["fresh"] for s in after)
+    # Everything expires within the hour, so a wider refresh window wants all of it again
+    assert all(s.to_fetch == sum(s.text.values()) + sum(s.nearby.values()) for s in
+               (warm_cache.freshness(job, 7200) for job in jobs))
@@ -0,0 +1,91 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+
+from backend.tools import web_discovery
+from backend.tools.web_discovery import extract_place_names
+
+ARTICLE = """<html><head><style>h2 { color: red }</style><script>var x = "<li>Not A Place</li>";</script></head>
+<body><nav><li>Home</li><li>Contact</li></nav>
+<h1>Best things to do in Kyoto</h1>
+<h2>1. Fushimi Inari Taisha</h2><p>Thousands of torii gates.</p>
+<h2>2. Kinkaku-ji &amp; its garden</h2>
+<ul><li><strong>Arashiyama Bamboo Grove</strong> - go early</li><li>Nishiki Market: food stalls</li>
+<li>walk along the river at sunset</li></ul>
+<h3>Where to stay</h3></body></html>"""
+
+
+def _mock_client(handler):
+    @asynccontextmanager
+    async def client():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as c:
+            yield c
+    return client
+
+
+def test_extract_place_names_keeps_proper_nouns_ranked_by_mentions():
+    texts = [
+        "1. Fushimi Inari Taisha\nKinkaku-ji\nArashiyama Bamboo Grove - go early\nWhere to stay\nKyoto",
+        "Nishiki Market: food stalls\nwalk along the river at sunset\n#2 Arashiyama Bamboo Grove",
+    ]
+    names = extract_place_names(texts, location="Kyoto")
+    assert names[0] == "Arashiyama Bamboo Grove"
+    assert set(names) == {"Arashiyama Bamboo Grove", "Fushimi Inari Taisha", "Kinkaku-ji", "Nishiki Market"}
+
+
+def test_page_text_is_streamed_capped_and_cached(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(str(request.url))
+        body = ARTICLE.encode() + b"<li>Far Away Place</li>" * 50000
+        return httpx.Response(200, content=body, headers={"content-type": "text/html; charset=utf-8"})
+
+    monkeypatch.setattr(web_discovery, "get_http_client", _mock_client(handler))
+    monkeypatch.setattr(web_discovery, "WEB_PAGE_MAX_BYTES", len(ARTICLE) + 100)
+    web_discovery.web_page_cache.clear()
+
+    async def run():
+        first = await web_discovery.fetch_page_text("https://guide.test/kyoto")
+        second = await web_discovery.fetch_page_text("https://guide.test/kyoto")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second and len(calls) == 1
+    assert "Fushimi Inari Taisha" in first and "Kinkaku-ji & its garden" in first
+    assert "Not A Place" not in first and "Home" not in first
+    # Only the first few bytes of the padding were downloaded
+    assert first.count("Far Away Place") <= 5
+
+
+def test_discover_web_places_feeds_names_and_tolerates_failures(monkeypatch):
+    async def fake_search(query, max_results=5):
+        return [{"url": "https://guide.test/ok", "content": ""}, {"url": "https://guide.test/broken", "content": ""}]
+
+    def handler(request):
+        if request.url.path == "/broken":
+            return httpx.Response(500)
+        return httpx.Response(200, text=ARTICLE, headers={"content-type": "text/html"})
+
+    monkeypatch.setattr(web_discovery, "web_search", fake_search)
+    monkeypatch.setattr(web_discovery, "get_http_client", _mock_client(handler))
+    web_discovery.web_page_cache.clear()
+
+    places = asyncio.run(web_discovery.discover_web_places("Kyoto", "culture"))
+    assert "Fushimi Inari Taisha" in places and "Nishiki Market" in places
+    assert "Best things to do in Kyoto" not in places
+
+
+def test_discover_web_places_is_bounded_by_timeout(monkeypatch):
+    async def slow_search(query, max_results=5):
+        await asyncio.sleep(5)
+        return []
+
+    monkeypatch.setattr(web_discovery, "web_search", slow_search)
+    monkeypatch.setattr(web_discovery, "WEB_DISCOVERY_TIMEOUT", 0.05)
+    assert asyncio.run(web_discovery.discover_web_places("Kyoto")) == []
+
+
+def test_discovery_is_off_by_default():
+    assert web_discovery.WEB_DISCOVERY_ENABLED is False
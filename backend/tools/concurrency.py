@@ -0,0 +1,49 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Optional, TypeVar
+
+from observability import span
+
+T = TypeVar("T")
+
+# Max number of in-flight Places requests for a single gather_activity_pois call
+POI_MAX_CONCURRENCY = int(os.getenv("POI_MAX_CONCURRENCY", "8"))
+
+_request_semaphore: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("_request_semaphore", default=None)
+
+
+@contextmanager
+def request_concurrency(limit: Optional[int] = None):
+    """Bound the outbound HTTP calls made inside this block (per request, not per process)"""
+    limit = limit or POI_MAX_CONCURRENCY
+    token = _request_semaphore.set(asyncio.Semaphore(max(1, limit)))
+    try:
+        yield
+    finally:
+        _request_semaphore.reset(token)
+
+
+async def bounded(coro: Awaitable[T]) -> T:
+    """Await a leaf request under the current request's limit (no limit outside request_concurrency)"""
+    semaphore = _request_semaphore.get()
+    if semaphore is None:
+        return await coro
+    async with semaphore:
+        return await coro
+
+
+@contextmanager
+def timed_stage(name: str, timings: Optional[Dict[str, float]] = None):
+    """Record the wall time of a stage into timings and print it (also traced as a span)"""
+    start = time.perf_counter()
+    try:
+        with span(name):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if timings is not None:
+            timings[name] = round(elapsed, 3)
+        print(f"⏱️ {name} took {elapsed:.2f}s")
@@ -1,11 +1,21 @@
-import httpx
+import asyncio
 from typing import List, Optional
 import os
 from dotenv import load_dotenv
+from http_client import get_http_client
+from observability import external_call
+from resilience import places_api
+from tools.concurrency import bounded
+from cache import min_freshness
+from tools.places_cache import GOOGLE_PLACES_BASE_URL, nearby_key, places_cache, raise_for_places_status
+from tools.poi_store import get_poi_store
+from tools.poi_model import POI, dumps_wire
+from tools.mbti_scoring import get_engine
 
 load_dotenv()
 GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
-PLACES_NEARBY_ENDPOINT = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+PLACES_NEARBY_ENDPOINT = f"{GOOGLE_PLACES_BASE_URL}/nearbysearch/json"
+NEARBY_SEARCH_RADIUS = 1000
 
 def get_cuisine_keywords(location: str) -> List[str]:
     """Get cuisine keywords based on location"""
@@ -20,24 +30,54 @@ def get_cuisine_keywords(location: str) -> List[str]:
     return location_cuisine.get(location.lower(), ['local', 'traditional'])
 
 def apply_restaurant_mbti_scoring(restaurants: List[dict], mbti: str) -> List[dict]:
-    """Apply MBTI-based scoring to restaurants"""
-    for restaurant in restaurants:
-        base_score = (restaurant.get('rating', 4.0) - 1) * 20
-        restaurant_types = [t.lower() for t in restaurant.get('types', [])]
-        
-        mbti_bonus = 0
-        if mbti and len(mbti) >= 4:
-            if 'E' in mbti:  # Extroverts prefer bustling restaurants
-                if any(t in restaurant_types for t in ['bar', 'night_club']):
-                    mbti_bonus += 5
-            else:  # Introverts prefer quieter dining
-                if any(t in restaurant_types for t in ['cafe', 'bakery']):
-                    mbti_bonus += 5
-            if 'S' in mbti:  # Sensors prefer traditional food
-                mbti_bonus += 3
-            
-        restaurant['score'] = min(100, max(60, base_score + mbti_bonus + 10))
-    return restaurants
+    """Apply MBTI-based scoring to restaurants (rules in tools/mbti_rules.json, "restaurant" profile)"""
+    return get_engine().apply(restaurants, mbti, profile="restaurant")
+
+async def _nearby_search_raw(lat: float, lng: float, radius: int, keyword: str) -> List[dict]:
+    """Raw Places Nearby Search results for a single keyword (raises on failure so errors are not cached)"""
+    params = {
+        "key": GOOGLE_PLACES_API_KEY,
+        "location": f"{lat},{lng}",
+        "radius": radius,
+        "type": "restaurant",
+        "keyword": keyword
+    }
+
+    async def attempt() -> List[dict]:
+        async with get_http_client() as client, external_call("places_nearby_search"):
+            response = await bounded(client.get(PLACES_NEARBY_ENDPOINT, params=params, timeout=10.0))
+            response.raise_for_status()
+            data = response.json()
+            raise_for_places_status(data)
+            return data.get("results", [])
+
+    return await places_api.call(attempt, endpoint="nearbysearch")
+
+async def _fetch_nearby_candidates(lat: float, lng: float, radius: int, keyword: str) -> List[dict]:
+    """
+    Nearby Search results for a single keyword. Answered from the local POI store when an earlier
+    search already covers the circle, otherwise from the places cache / API. Only responses that
+    come from the API are fed into the store: a cached (possibly stale) one must not be recorded
+    as freshly covered.
+    """
+    store = get_poi_store()
+    if store is not None:
+        try:
+            if await asyncio.to_thread(store.covers, lat, lng, radius, keyword, min_freshness()):
+                return await asyncio.to_thread(store.nearby, lat, lng, radius, keyword)
+        except Exception as e:
+            print(f"POI store lookup failed, falling back to Places API: {e}")
+
+    async def fetch() -> List[dict]:
+        results = await _nearby_search_raw(lat, lng, radius, keyword)
+        if store is not None:
+            try:
+                await asyncio.to_thread(store.record_nearby, lat, lng, radius, keyword, results)
+            except Exception as e:
+                print(f"POI store update failed: {e}")
+        return results
+
+    return await places_cache.get_or_fetch(nearby_key(lat, lng, radius, keyword), fetch)
 
 async def search_nearby_restaurants(
     lat: float,
@@ -45,7 +85,7 @@ async def search_nearby_restaurants(
     location: str = "",  #  location for cuisine keywords
     mbti: str = "", # MBTI for scoring
     cuisine_keywords: Optional[List[str]] = None,
-    radius: int = 1000,
+    radius: int = NEARBY_SEARCH_RADIUS,
     min_rating: float = 4.0,
     max_results: int = 5
 ) -> List[dict]:
@@ -62,49 +102,43 @@ async def search_nearby_restaurants(
 
     # Default to empty string if no keyword provided
     keywords = cuisine_keywords if cuisine_keywords else [""]
-    
-    for keyword in keywords:
-        params = {
-            "key": GOOGLE_PLACES_API_KEY,
-            "location": f"{lat},{lng}",
-            "radius": radius,
-            "type": "restaurant",
-            "keyword": keyword
-        }
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(PLACES_NEARBY_ENDPOINT, params=params)
-                response.raise_for_status()
-                data = response.json()
-                candidates = data.get("results", [])
-                
-                for r in candidates:
-                    rating = r.get("rating", 0)
-                    place_id = r.get("place_id")
-                    if (
-                        place_id not in seen and
-                        rating is not None and rating >= min_rating
-                    ):
-                        seen.add(place_id)
-                        all_results.append({
-                            "name": r.get("name"),
-                            "address": r.get("vicinity"),
-                            "lat": r.get("geometry", {}).get("location", {}).get("lat"),
-                            "lng": r.get("geometry", {}).get("location", {}).get("lng"),
-                            "rating": rating,
-                            "price_level": r.get("price_level"),
-                            "types": r.get("types", []),
-                            "place_id": place_id,
-                            "source": "nearby_api",
-                            "matched_keyword": keyword,
-                            "category": "restaurant" # for consistent tagging
-                        })
-                        if len(all_results) >= max_results:
-                            break
-        except Exception as e:
-            print(f"Failed nearby search for keyword '{keyword}' near ({lat}, {lng}): {e}")
+
+    # Run one request per keyword concurrently, then merge in keyword order so results stay deterministic
+    keyword_results = await asyncio.gather(
+        *(_fetch_nearby_candidates(lat, lng, radius, keyword) for keyword in keywords),
+        return_exceptions=True
+    )
+
+    for keyword, candidates in zip(keywords, keyword_results):
+        if isinstance(candidates, Exception):
+            print(f"Failed nearby search for keyword '{keyword}' near ({lat}, {lng}): {candidates}")
+            continue
+        for r in candidates:
+            rating = r.get("rating", 0)
+            place_id = r.get("place_id")
+            if (
+                place_id not in seen and
+                rating is not None and rating >= min_rating
+            ):
+                seen.add(place_id)
+                all_results.append(POI.from_nearby_search(r, keyword).to_dict())
+                if len(all_results) >= max_results:
+                    break
     #Apply MBTI scoring to all restaurants    
     if mbti:
         all_results = apply_restaurant_mbti_scoring(all_results, mbti)
     print(f"✅ search_nearby_restaurants returning {len(all_results)} restaurants")
     return all_results
+
+async def search_nearby_restaurants_compact(
+    lat: float,
+    lng: float,
+    location: str = "",
+    mbti: str = "",
+    cuisine_keywords: Optional[List[str]] = None,
+    radius: int = NEARBY_SEARCH_RADIUS,
+    min_rating: float = 4.0,
+    max_results: int = 5
+) -> str:
+    """search_nearby_restaurants for agents: the restaurants in the compact wire format (see tools/poi_model.py)"""
+    return dumps_wire(await search_nearby_restaurants(lat, lng, location, mbti, cuisine_keywords, radius, min_rating, max_results))
@@ -0,0 +1,284 @@
+"""
+Algorithmic day planner: turns the gather_activity_pois POI list into per-day routes.
+
+  1. haversine_matrix     - vectorized NumPy pairwise distances (km)
+  2. cluster_days         - capacitated clustering of activities into N days
+  3. order_route          - nearest-neighbour tour + 2-opt improvement per day
+  4. insert_meals         - cheapest-insertion of a lunch and a dinner restaurant per day
+
+The output follows the itinerary JSON format in prompts/plan_agent.txt, so the LLM only
+has to write descriptive text instead of doing the geometry itself.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Time slots follow the TIMING section of prompts/plan_agent.txt
+ACTIVITY_SLOTS = {
+    1: ["10:00 AM (2h)"],
+    2: ["10:00 AM (2h)", "1:30 PM (2h)"],
+    3: ["10:00 AM (2h)", "1:15 PM (2h)", "3:30 PM (2h)"],
+}
+LUNCH_SLOT = "12:00 PM (1h)"
+DINNER_SLOT = "6:00 PM (1h)"
+
+
+def haversine_cross(lat1: Sequence[float], lng1: Sequence[float], lat2: Sequence[float], lng2: Sequence[float]) -> np.ndarray:
+    """Great-circle distances in km between every point of set 1 (rows) and set 2 (columns)"""
+    lat1_r = np.radians(np.asarray(lat1, dtype=np.float64))[:, None]
+    lng1_r = np.radians(np.asarray(lng1, dtype=np.float64))[:, None]
+    lat2_r = np.radians(np.asarray(lat2, dtype=np.float64))[None, :]
+    lng2_r = np.radians(np.asarray(lng2, dtype=np.float64))[None, :]
+    a = np.sin((lat1_r - lat2_r) / 2) ** 2 + np.cos(lat1_r) * np.cos(lat2_r) * np.sin((lng1_r - lng2_r) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_matrix(lat: Sequence[float], lng: Sequence[float]) -> np.ndarray:
+    """Pairwise distances in km, computed in one broadcast pass"""
+    return haversine_cross(lat, lng, lat, lng)
+
+
+def haversine_to(lat: Sequence[float], lng: Sequence[float], lat0: float, lng0: float) -> np.ndarray:
+    """Distances in km from every point to (lat0, lng0)"""
+    return haversine_cross(lat, lng, [lat0], [lng0])[:, 0]
+
+
+def _farthest_point_seeds(dist: np.ndarray, k: int, first: int) -> List[int]:
+    seeds = [first]
+    nearest = dist[first].copy()
+    while len(seeds) < k:
+        candidate = int(np.argmax(nearest))
+        seeds.append(candidate)
+        nearest = np.minimum(nearest, dist[candidate])
+    return seeds
+
+
+def cluster_days(
+    lat: np.ndarray,
+    lng: np.ndarray,
+    n_days: int,
+    capacity: int,
+    iterations: int = 10,
+) -> List[List[int]]:
+    """
+    Capacitated clustering: every day gets at most `capacity` points and days are
+    balanced (sizes differ by at most one). Deterministic for a given input order.
+    """
+    n = len(lat)
+    if n == 0 or n_days <= 0:
+        return [[] for _ in range(max(n_days, 0))]
+    k = min(n_days, n)
+    # Balanced per-day quotas, capped by capacity
+    quotas = np.full(k, n // k)
+    quotas[: n % k] += 1
+    quotas = np.minimum(quotas, capacity)
+
+    dist = haversine_matrix(lat, lng)
+    centers = np.array(_farthest_point_seeds(dist, k, first=0))
+    center_lat, center_lng = lat[centers].astype(np.float64), lng[centers].astype(np.float64)
+    assignment = np.full(n, -1)
+
+    for _ in range(iterations):
+        # Distance of every point to every center: shape (n, k)
+        to_centers = haversine_cross(lat, lng, center_lat, center_lng)
+        # Greedy fill in order of how much a point would lose by not getting its best center
+        sorted_d = np.sort(to_centers, axis=1)
+        regret = sorted_d[:, 1] - sorted_d[:, 0] if k > 1 else -sorted_d[:, 0]
+        order = np.lexsort((np.arange(n), -regret))
+        remaining = quotas.copy()
+        new_assignment = np.full(n, -1)
+        for p in order:
+            for c in np.argsort(to_centers[p], kind="stable"):
+                if remaining[c] > 0:
+                    new_assignment[p] = c
+                    remaining[c] -= 1
+                    break
+        if np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+        for c in range(k):
+            members = assignment == c
+            if members.any():
+                center_lat[c] = lat[members].mean()
+                center_lng[c] = lng[members].mean()
+
+    days = [sorted(np.flatnonzero(assignment == c).tolist()) for c in range(k)]
+    # Longer trips than we have points for get empty days at the end
+    days.extend([] for _ in range(n_days - k))
+    return days
+
+
+def route_length(route: Sequence[int], dist: np.ndarray) -> float:
+    if len(route) < 2:
+        return 0.0
+    idx = np.asarray(route)
+    return float(dist[idx[:-1], idx[1:]].sum())
+
+
+def two_opt(route: List[int], dist: np.ndarray, max_passes: int = 50) -> List[int]:
+    """Improve an open path by reversing segments while that shortens it"""
+    route = list(route)
+    n = len(route)
+    if n < 4:
+        return route
+    for _ in range(max_passes):
+        improved = False
+        for i in range(0, n - 2):
+            a, b = route[i], route[i + 1]
+            # Vectorized check of every j for this i
+            js = np.arange(i + 2, n)
+            c = np.asarray(route)[js]
+            d_next = np.asarray(route + [route[-1]])[js + 1]
+            before = dist[a, b] + np.where(js < n - 1, dist[c, d_next], 0.0)
+            after = dist[a, c] + np.where(js < n - 1, dist[b, d_next], 0.0)
+            gain = before - after
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-9:
+                j = int(js[best])
+                route[i + 1:j + 1] = reversed(route[i + 1:j + 1])
+                improved = True
+        if not improved:
+            break
+    return route
+
+
+def order_route(points: List[int], dist: np.ndarray) -> List[int]:
+    """Nearest-neighbour path starting from the most peripheral point, then 2-opt"""
+    if len(points) <= 2:
+        return list(points)
+    sub = dist[np.ix_(points, points)]
+    start = int(np.argmax(sub.sum(axis=1)))
+    unvisited = set(range(len(points)))
+    unvisited.remove(start)
+    path = [start]
+    while unvisited:
+        last = path[-1]
+        nxt = min(unvisited, key=lambda j: (sub[last, j], j))
+        path.append(nxt)
+        unvisited.remove(nxt)
+    path = two_opt(path, sub)
+    return [points[i] for i in path]
+
+
+def insert_meals(
+    route: List[Tuple[float, float]],
+    restaurants_lat: np.ndarray,
+    restaurants_lng: np.ndarray,
+    used: np.ndarray,
+) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Pick the lunch restaurant with the smallest detour between the first and second stop,
+    and the dinner restaurant closest to the last stop. Marks chosen restaurants as used.
+    """
+    if len(restaurants_lat) == 0 or not route:
+        return None, None
+
+    def pick(costs: np.ndarray) -> Optional[int]:
+        costs = np.where(used, np.inf, costs)
+        best = int(np.argmin(costs))
+        if not np.isfinite(costs[best]):
+            return None
+        used[best] = True
+        return best
+
+    first = route[0]
+    d_first = haversine_to(restaurants_lat, restaurants_lng, *first)
+    if len(route) > 1:
+        second = route[1]
+        d_second = haversine_to(restaurants_lat, restaurants_lng, *second)
+        lunch = pick(d_first + d_second)
+    else:
+        lunch = pick(d_first)
+    dinner = pick(haversine_to(restaurants_lat, restaurants_lng, *route[-1]))
+    return lunch, dinner
+
+
+def _has_coordinates(poi: Dict[str, Any]) -> bool:
+    return poi.get("lat") is not None and poi.get("lng") is not None
+
+
+def plan_days(
+    pois: List[Dict[str, Any]],
+    days: int,
+    activities_per_day: int = 3,
+    min_activities_per_day: int = 2,
+) -> List[Dict[str, Any]]:
+    """Arrange POIs into `days` day plans (2-3 activities + lunch + dinner each)"""
+    activities = [p for p in pois if p.get("category") != "restaurant" and _has_coordinates(p)]
+    restaurants = [p for p in pois if p.get("category") == "restaurant" and _has_coordinates(p)]
+
+    # Keep the best-scored activities that fit into the trip
+    activities.sort(key=lambda p: -(p.get("score") or 0))
+    budget = max(days * min_activities_per_day, min(len(activities), days * activities_per_day))
+    activities = activities[:budget]
+
+    itinerary = []
+    if activities:
+        lat = np.array([p["lat"] for p in activities], dtype=np.float64)
+        lng = np.array([p["lng"] for p in activities], dtype=np.float64)
+        dist = haversine_matrix(lat, lng)
+        clusters = cluster_days(lat, lng, days, activities_per_day)
+    else:
+        dist = np.zeros((0, 0))
+        clusters = [[] for _ in range(days)]
+
+    restaurants.sort(key=lambda p: -(p.get("score") or p.get("rating") or 0))
+    r_lat = np.array([p["lat"] for p in restaurants], dtype=np.float64)
+    r_lng = np.array([p["lng"] for p in restaurants], dtype=np.float64)
+    used = np.zeros(len(restaurants), dtype=bool)
+
+    # Visit day clusters west-to-east so consecutive days also flow geographically
+    clusters.sort(key=lambda c: (len(c) == 0, float(np.mean([activities[i]["lng"] for i in c])) if c else 0.0))
+
+    for day_index, cluster in enumerate(clusters):
+        route = order_route(cluster, dist) if cluster else []
+        stops = [(activities[i]["lat"], activities[i]["lng"]) for i in route]
+        lunch, dinner = insert_meals(stops, r_lat, r_lng, used)
+        slots = ACTIVITY_SLOTS.get(len(route), [f"Stop {i + 1} (2h)" for i in range(len(route))])
+
+        entries = []
+        for position, (poi_index, slot) in enumerate(zip(route, slots)):
+            entries.append({"time": slot, "poi": activities[poi_index]})
+            if position == 0 and lunch is not None:
+                entries.append({"time": LUNCH_SLOT, "poi": {**restaurants[lunch], "meal_type": "lunch"}})
+        if dinner is not None:
+            entries.append({"time": DINNER_SLOT, "poi": {**restaurants[dinner], "meal_type": "dinner"}})
+
+        itinerary.append({
+            "day": f"Day {day_index + 1}",
+            "activities": entries,
+            "travel_km": round(route_length(route, dist), 2) if route else 0.0,
+        })
+    return itinerary
+
+
+def trip_start(value: Any) -> date:
+    """Start date of a trip summary; today when it is missing or not ISO 8601 (LLM output like "Aug 3")"""
+    if value:
+        try:
+            return date.fromisoformat(str(value))
+        except ValueError:
+            print(f"Start date {value!r} is not YYYY-MM-DD, starting today")
+    return date.today()
+
+
+def build_itinerary(summary: Dict[str, Any], pois: List[Dict[str, Any]], activities_per_day: int = 3) -> Dict[str, Any]:
+    """Full itinerary document in the plan_agent JSON format"""
+    days = int(summary.get("days") or 3)
+    start_date = trip_start(summary.get("start"))
+    start = str(start_date)
+    end = summary.get("end") or str(start_date + timedelta(days=days - 1))
+    return {
+        "theme": summary.get("theme"),
+        "location": summary.get("location"),
+        "days": days,
+        "start": start,
+        "end": end,
+        "mbti": summary.get("mbti"),
+        "inclusion": summary.get("inclusion", []),
+        "exclusion": summary.get("exclusion", []),
+        "itinerary": plan_days(pois, days, activities_per_day=activities_per_day),
+    }
@@ -0,0 +1,150 @@
+"""
+Table-driven MBTI scoring shared by activities (poi_activity_tool) and restaurants (critic_meal_tool).
+
+Rules live in tools/mbti_rules.json (override with MBTI_RULES_PATH). Each profile has a base
+score ((rating - 1) * 20 + offset, clamped to [min_score, max_score]) plus rules of the form
+    {"when": "E" | "!E", "types": [...], "bonus": n}
+A rule adds its bonus once when the MBTI condition holds and the place has any of the types
+(an empty type list means "always").
+
+Place types are encoded as integer bitmasks over the rule vocabulary, and every MBTI type gets a
+precomputed (rule_masks, bonuses) table, so a whole POI batch is scored in one NumPy pass.
+"""
+import json
+import os
+from dataclasses import dataclass
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MBTI_RULES_PATH = os.getenv("MBTI_RULES_PATH", str(Path(__file__).resolve().parent / "mbti_rules.json"))
+MBTI_TYPES = ["".join(letters) for letters in product("EI", "SN", "TF", "JP")]
+
+
+@dataclass(frozen=True)
+class ScoringTable:
+    """Rules that apply to one MBTI string for one profile"""
+    rule_masks: np.ndarray   # int64, one bitmask per active rule
+    bonuses: np.ndarray      # float64, one bonus per active rule
+    always: np.ndarray       # bool, rule has no type condition
+
+
+class MBTIScoringEngine:
+    def __init__(self, rules: Dict[str, Any]):
+        self.rules = rules
+        vocabulary = sorted({t.lower() for profile in rules.values() for rule in profile["rules"] for t in rule["types"]})
+        if len(vocabulary) > 63:
+            raise ValueError(f"MBTI rules reference {len(vocabulary)} place types, at most 63 fit in a bitmask")
+        self.type_bits = {t: 1 << i for i, t in enumerate(vocabulary)}
+        # Places returns the same few types lists over and over, so encodings are memoized
+        self._mask_cache: Dict[Tuple[str, ...], int] = {}
+        self._tables: Dict[Tuple[str, str], ScoringTable] = {}
+        for profile in rules:
+            for mbti in MBTI_TYPES:
+                self._tables[(profile, mbti)] = self._build_table(profile, mbti)
+
+    @classmethod
+    def from_file(cls, path: str = MBTI_RULES_PATH) -> "MBTIScoringEngine":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _build_table(self, profile: str, mbti: str) -> ScoringTable:
+        config = self.rules[profile]
+        active = []
+        if not (config.get("require_full_mbti") and not (mbti and len(mbti) >= 4)):
+            for rule in config["rules"]:
+                letter = rule["when"].lstrip("!")
+                holds = letter in mbti
+                if rule["when"].startswith("!"):
+                    holds = not holds
+                if holds:
+                    active.append(rule)
+        return ScoringTable(
+            rule_masks=np.array([self.encode_types(rule["types"]) for rule in active], dtype=np.int64),
+            bonuses=np.array([rule["bonus"] for rule in active], dtype=np.float64),
+            always=np.array([not rule["types"] for rule in active], dtype=bool),
+        )
+
+    def table(self, profile: str, mbti: str) -> ScoringTable:
+        key = (profile, mbti or "")
+        table = self._tables.get(key)
+        if table is None:
+            # Non-canonical strings ("", lowercase, partial) are built once and kept
+            table = self._tables[key] = self._build_table(profile, mbti or "")
+        return table
+
+    def encode_types(self, types: Optional[Sequence[str]]) -> int:
+        key = tuple(types or ())
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = 0
+            for t in key:
+                mask |= self.type_bits.get(t.lower(), 0)
+            if len(self._mask_cache) < 4096:
+                self._mask_cache[key] = mask
+        return mask
+
+    def score_batch(self, pois: List[Dict[str, Any]], mbti: str, profile: str = "activity") -> np.ndarray:
+        """Scores for every POI, in input order"""
+        n = len(pois)
+        if n == 0:
+            return np.zeros(0)
+        config = self.rules[profile]
+        table = self.table(profile, mbti)
+        default_rating = config["default_rating"]
+        ratings = np.fromiter(((p.get("rating") or default_rating) for p in pois), dtype=np.float64, count=n)
+        base = (ratings - 1) * 20
+        if len(table.bonuses):
+            masks = np.fromiter((self.encode_types(p.get("types")) for p in pois), dtype=np.int64, count=n)
+            hits = ((masks[:, None] & table.rule_masks[None, :]) != 0) | table.always[None, :]
+            base = base + hits @ table.bonuses
+        return np.clip(base + config["offset"], config["min_score"], config["max_score"])
+
+    def apply(self, pois: List[Dict[str, Any]], mbti: str, profile: str = "activity") -> List[Dict[str, Any]]:
+        """Write poi['score'] for the whole batch"""
+        for poi, score in zip(pois, self.score_batch(pois, mbti, profile).tolist()):
+            poi["score"] = round(score, 2)
+        return pois
+
+    def rank(self, pois: List[Dict[str, Any]], mbti: str, k: int, profile: str = "activity") -> List[Dict[str, Any]]:
+        """Score the batch and return its k best POIs, best first"""
+        return top_k(self.apply(pois, mbti, profile), k)
+
+
+def top_k(pois: List[Dict[str, Any]], k: int, key: str = "score") -> List[Dict[str, Any]]:
+    """
+    The k highest-scored POIs without sorting the whole list (argpartition).
+    Ties keep input order, i.e. the same result as sorted(..., reverse=True)[:k].
+    """
+    n = len(pois)
+    if k <= 0 or n == 0:
+        return []
+    scores = np.fromiter(((p.get(key) or 0) for p in pois), dtype=np.float64, count=n)
+    if k >= n:
+        candidates = np.arange(n)
+    else:
+        kth = scores[np.argpartition(-scores, k - 1)[:k]].min()
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[: k - len(above)]
+        candidates = np.concatenate([above, ties])
+    order = np.lexsort((candidates, -scores[candidates]))
+    return [pois[i] for i in candidates[order]]
+
+
+_engine: Optional[MBTIScoringEngine] = None
+
+
+def get_engine() -> MBTIScoringEngine:
+    global _engine
+    if _engine is None:
+        _engine = MBTIScoringEngine.from_file()
+    return _engine
+
+
+def reload_rules(path: Optional[str] = None) -> MBTIScoringEngine:
+    """Re-read the rules file (e.g. after tuning weights) without restarting"""
+    global _engine
+    _engine = MBTIScoringEngine.from_file(path or MBTI_RULES_PATH)
+    return _engine
@@ -0,0 +1,51 @@
+import os
+from dotenv import load_dotenv
+from cache import TieredCache, get_disk_store, normalize_text
+from observability import register_cache_stats
+from resilience import UpstreamThrottled, UpstreamUnavailable
+
+load_dotenv()
+
+# Fresh for a day, then served stale (and refreshed in the background) for up to a week
+PLACES_CACHE_ENABLED = os.getenv("PLACES_CACHE_ENABLED", "true").lower() == "true"
+PLACES_CACHE_TTL = float(os.getenv("PLACES_CACHE_TTL", "86400"))
+PLACES_CACHE_STALE_TTL = float(os.getenv("PLACES_CACHE_STALE_TTL", "604800"))
+PLACES_CACHE_MAX_ENTRIES = int(os.getenv("PLACES_CACHE_MAX_ENTRIES", "5000"))
+# Set to a file path (e.g. ".cache/places.sqlite3") to enable the persistent tier
+PLACES_CACHE_PATH = os.getenv("PLACES_CACHE_PATH")
+# Point at a local stand-in (e.g. benchmarks/fake_services.py) to run without Google
+GOOGLE_PLACES_BASE_URL = os.getenv("GOOGLE_PLACES_BASE_URL", "https://maps.googleapis.com/maps/api/place").rstrip("/")
+# 4 decimals is roughly 11m, close enough to treat two nearby searches as the same
+PLACES_CACHE_COORD_PRECISION = int(os.getenv("PLACES_CACHE_COORD_PRECISION", "4"))
+
+places_cache = TieredCache(
+    "places",
+    ttl=PLACES_CACHE_TTL,
+    stale_ttl=PLACES_CACHE_STALE_TTL,
+    max_entries=PLACES_CACHE_MAX_ENTRIES,
+    persistent=get_disk_store(PLACES_CACHE_PATH),
+    enabled=PLACES_CACHE_ENABLED,
+)
+register_cache_stats("places", places_cache)
+
+
+def text_search_key(query: str) -> str:
+    """Key for a Text Search request; max_results is applied after the cache"""
+    return f"text:{normalize_text(query)}"
+
+
+def nearby_key(lat: float, lng: float, radius: int, keyword: str = "") -> str:
+    """Key for a Nearby Search request around rounded coordinates"""
+    p = PLACES_CACHE_COORD_PRECISION
+    return f"nearby:{round(lat, p):.{p}f},{round(lng, p):.{p}f}:{int(radius)}:{normalize_text(keyword)}"
+
+
+def raise_for_places_status(data: dict) -> None:
+    """Places reports quota/key errors with HTTP 200; raise so they are never cached (and throttling is retried)"""
+    status = data.get("status", "OK")
+    if status == "OVER_QUERY_LIMIT":
+        raise UpstreamThrottled(f"Places API status {status}: {data.get('error_message', '')}")
+    if status == "UNKNOWN_ERROR":
+        raise UpstreamUnavailable(f"Places API status {status}: {data.get('error_message', '')}")
+    if status not in ("OK", "ZERO_RESULTS"):
+        raise RuntimeError(f"Places API status {status}: {data.get('error_message', '')}")
@@ -1,14 +1,28 @@
+import asyncio
 import json
-from typing import List, Optional
-import httpx
+from typing import Dict, List, Optional
 import os
 from dotenv import load_dotenv
+from http_client import get_http_client
+from observability import external_call
+from resilience import places_api
 from tools.critic_meal_tool import search_nearby_restaurants
+from tools.concurrency import bounded, request_concurrency, timed_stage
+from tools.places_cache import GOOGLE_PLACES_BASE_URL, places_cache, raise_for_places_status, text_search_key
+from tools.poi_store import get_poi_store, ingest_results
+from tools.poi_model import POI, dumps_wire
+from tools.mbti_scoring import get_engine, top_k
+from tools.web_discovery import discover_web_places
 
 load_dotenv()
 
 GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
-PLACES_ENDPOINT = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+PLACES_ENDPOINT = f"{GOOGLE_PLACES_BASE_URL}/textsearch/json"
+# Text searches per gather_activity_pois call and results kept per search
+MAX_ACTIVITY_QUERIES = 8
+MAX_RESULTS_PER_QUERY = 5
+# Top activities whose surroundings are searched for restaurants
+NEARBY_ACTIVITIES = 4
 
 def build_activity_queries(
     location: str,
@@ -28,32 +42,33 @@ def build_activity_queries(
             queries.append(f"{inc} in {location} related to {theme}")
     return queries
 
-# Google Places Text Search API
-async def fetch_google_places(query: str, max_results: int = 5) -> List[dict]:
+async def _text_search_raw(query: str) -> List[dict]:
+    """Raw Places Text Search results for a query (raises on failure so errors are not cached)"""
     params = {
         "query": query,
         "key": GOOGLE_PLACES_API_KEY
     }
-    try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(PLACES_ENDPOINT, params=params)
+
+    async def attempt() -> List[dict]:
+        async with get_http_client() as client, external_call("places_text_search"):
+            response = await bounded(client.get(PLACES_ENDPOINT, params=params, timeout=15.0))
             response.raise_for_status()
             data = response.json()
-            results = data.get("results", [])[:max_results]
-            return [
-                {
-                    "name": r.get("name"),
-                    "address": r.get("formatted_address"),
-                    "lat": r.get("geometry", {}).get("location", {}).get("lat"),
-                    "lng": r.get("geometry", {}).get("location", {}).get("lng"),
-                    "rating": r.get("rating"),
-                    "price_level": r.get("price_level"),
-                    "types": r.get("types", []),
-                    "place_id": r.get("place_id"),
-                    "source_query": query
-                }
-                for r in results
-            ]
+            raise_for_places_status(data)
+            return data.get("results", [])
+
+    results = await places_api.call(attempt, endpoint="textsearch")
+    await ingest_results(results)
+    return results
+
+def text_search_pois(raw_results: List[dict], query: str, max_results: int = MAX_RESULTS_PER_QUERY) -> List[dict]:
+    return [POI.from_text_search(r, query).to_dict() for r in raw_results[:max_results]]
+
+# Google Places Text Search API
+async def fetch_google_places(query: str, max_results: int = MAX_RESULTS_PER_QUERY) -> List[dict]:
+    try:
+        raw_results = await places_cache.get_or_fetch(text_search_key(query), lambda: _text_search_raw(query))
+        return text_search_pois(raw_results, query, max_results)
     except Exception as e:
         print(f"Query failed: {query}\nError: {e}")
         return []
@@ -62,9 +77,12 @@ async def enrich_web_places(web_places: List[str], location: str, max_results_pe
     enriched = []
     seen = set()
 
-    for place in web_places:
-        query = f"{place} in {location}"
-        results = await fetch_google_places(query, max_results=max_results_per_place)
+    queries = [f"{place} in {location}" for place in web_places]
+    place_results = await asyncio.gather(
+        *(fetch_google_places(query, max_results=max_results_per_place) for query in queries)
+    )
+    # Merge in input order so the first mention of a place wins, same as a sequential run
+    for place, query, results in zip(web_places, queries, place_results):
         for r in results:
             if r["place_id"] and r["place_id"] not in seen:
                 seen.add(r["place_id"])
@@ -81,89 +99,147 @@ async def gather_activity_pois(
     theme: str = "culture",
     inclusion: Optional[List[str]] = None,
     web_places: Optional[List[str]] = None,
-    max_queries: int = 8,
-    max_results_per_query: int = 5
+    max_queries: int = MAX_ACTIVITY_QUERIES,
+    max_results_per_query: int = MAX_RESULTS_PER_QUERY,
+    discover_web: bool = False,
 ) -> List[dict]:
-    print(f"🔍 gather_activity_pois called with: location={location}, theme={theme}, mbti={mbti}")
-    queries = build_activity_queries(location, mbti, theme, inclusion)
+    pois_by_mbti = await gather_activity_pois_by_mbti(
+        location, [mbti], theme, inclusion, web_places, max_queries, max_results_per_query, discover_web
+    )
+    return pois_by_mbti[mbti]
+
+async def gather_activity_pois_by_mbti(
+    location: str,
+    mbtis: List[str],
+    theme: str = "culture",
+    inclusion: Optional[List[str]] = None,
+    web_places: Optional[List[str]] = None,
+    max_queries: int = MAX_ACTIVITY_QUERIES,
+    max_results_per_query: int = MAX_RESULTS_PER_QUERY,
+    discover_web: bool = False,
+) -> Dict[str, List[dict]]:
+    """
+    gather_activity_pois for several MBTI types of the same trip (POST /plan/batch): each text
+    search and the web discovery run once, then every type gets its own copy of the candidates,
+    scored and with restaurants near its own top activities. Each list is the same as a separate
+    gather_activity_pois call would return.
+
+    discover_web=True looks for web_places in travel articles (tools/web_discovery.py) while the
+    text search runs, when none are supplied. The web place lookups share the max_queries budget
+    with the text searches: a type's searches plus its web places never exceed max_queries.
+    """
+    mbtis = list(dict.fromkeys(mbtis))
+    print(f"🔍 gather_activity_pois called with: location={location}, theme={theme}, mbti={', '.join(mbtis)}")
+    queries_by_mbti = {mbti: build_activity_queries(location, mbti, theme, inclusion)[:max_queries] for mbti in mbtis}
+    # The theme/inclusion queries are the same for every type, only the MBTI query differs
+    queries = list(dict.fromkeys(q for qs in queries_by_mbti.values() for q in qs))
+    # Every type runs the same number of searches, so they all leave the same room for web places
+    web_budget = max(0, max_queries - len(queries_by_mbti[mbtis[0]])) if mbtis else 0
+    timings = {}
+
+    async def run_text_search() -> List[List[dict]]:
+        with timed_stage("text_search", timings):
+            return await asyncio.gather(
+                *(fetch_google_places(query, max_results=max_results_per_query) for query in queries)
+            )
+
+    async def run_web_enrichment() -> List[dict]:
+        places = web_places
+        if places is None and discover_web and web_budget:
+            # Nothing supplied: look for places in travel articles while the text search runs
+            with timed_stage("web_discovery", timings):
+                places = await discover_web_places(location, theme)
+        places = (places or [])[:web_budget]
+        if not places:
+            return []
+        with timed_stage("web_enrichment", timings):
+            return await enrich_web_places(places, location)
+
+    # All outbound Places calls for this request share one concurrency limit
+    with request_concurrency(), timed_stage("gather_activity_pois", timings):
+        # Text search and web enrichment are independent, so they fan out together
+        query_results, web_results = await asyncio.gather(run_text_search(), run_web_enrichment())
+        results_by_query = dict(zip(queries, query_results))
+
+        with timed_stage("nearby_restaurants", timings):
+            pois = await asyncio.gather(
+                *(
+                    _assemble_pois(location, mbti, [results_by_query[q] for q in queries_by_mbti[mbti]], web_results)
+                    for mbti in mbtis
+                )
+            )
+    pois_by_mbti = dict(zip(mbtis, pois))
+
+    for mbti, all_results in pois_by_mbti.items():
+        # Count activities vs restaurants for debug
+        activities_count = len([r for r in all_results if r.get('category') != 'restaurant'])
+        restaurants_count = len([r for r in all_results if r.get('category') == 'restaurant'])
+        print(f"✅ gather_activity_pois returning {len(all_results)} total POIs for {mbti or 'any MBTI'} ({activities_count} activities + {restaurants_count} restaurants)")
+    print(f"⏱️ gather_activity_pois stage timings: {timings}")
+    print(f"📦 places cache: {places_cache.stats()}")
+    print(f"🛡️ places API: {places_api.stats()}")
+    poi_store = get_poi_store()
+    if poi_store is not None:
+        print(f"🗺️ POI store: {poi_store.stats()}")
+    return pois_by_mbti
+
+def rank_activity_pois(mbti: str, query_results: List[List[dict]], web_results: List[dict]) -> List[dict]:
+    """One MBTI type's scored activities from the shared search results (copied, scoring writes into them)"""
     seen = set()
     all_results = []
-
-    for query in queries[:max_queries]:
-        pois = await fetch_google_places(query, max_results=max_results_per_query)
+    # Dedup in query order, API results before web results, exactly as the sequential version did
+    for pois in query_results:
         for poi in pois:
             if poi["place_id"] and poi["place_id"] not in seen:
                 seen.add(poi["place_id"])
-                poi["source"] = "api"
-                all_results.append(poi)
+                all_results.append({**poi, "source": "api"})
 
     # web_content enrichment
-    if web_places:
-        web_results = await enrich_web_places(web_places, location)
-        for poi in web_results:
-            if poi["place_id"] and poi["place_id"] not in seen:
-                seen.add(poi["place_id"])
-                poi["source"] = "web"
-                all_results.append(poi)
+    for poi in web_results:
+        if poi["place_id"] and poi["place_id"] not in seen:
+            seen.add(poi["place_id"])
+            all_results.append({**poi, "source": "web"})
     # Apply MBTI scoring before returning
-    all_results = apply_mbti_scoring(all_results, mbti)
+    return apply_mbti_scoring(all_results, mbti)
+
+async def _assemble_pois(location: str, mbti: str, query_results: List[List[dict]], web_results: List[dict]) -> List[dict]:
+    """One MBTI type's POI list: its ranked activities plus restaurants near the best ones"""
+    all_results = rank_activity_pois(mbti, query_results, web_results)
+    seen = {poi["place_id"] for poi in all_results}
 
     # call search_nearby_restaurants for each high rated activity
-    top_activities = sorted(all_results, key=lambda x: x.get('score', 0), reverse=True)[:4]
-
-    for activity in top_activities:  # Use each activity's location
-        nearby_restaurants = await search_nearby_restaurants(
-            activity['lat'],     # Use EACH activity's coordinates
-            activity['lng'], 
-            location, 
-            mbti,
-            max_results=3
+    top_activities = top_k(all_results, NEARBY_ACTIVITIES)
+
+    restaurant_batches = await asyncio.gather(
+        *(
+            search_nearby_restaurants(
+                activity['lat'],     # Use EACH activity's coordinates
+                activity['lng'],
+                location,
+                mbti,
+                max_results=3
+            )
+            for activity in top_activities
         )
-        # Add restaurants directly to all_results (avoiding duplicates)
+    )
+    # Add restaurants directly to all_results in activity order (avoiding duplicates)
+    for nearby_restaurants in restaurant_batches:
         for restaurant in nearby_restaurants:
             if restaurant["place_id"] not in seen:
                 seen.add(restaurant["place_id"])
                 all_results.append(restaurant)
-     
-     # Count activities vs restaurants for debug
-    activities_count = len([r for r in all_results if r.get('category') != 'restaurant'])
-    restaurants_count = len([r for r in all_results if r.get('category') == 'restaurant'])
-    
-    print(f"✅ gather_activity_pois returning {len(all_results)} total POIs ({activities_count} activities + {restaurants_count} restaurants)")
     return all_results
 
+async def gather_activity_pois_compact(
+    location: str,
+    mbti: str = "",
+    theme: str = "culture",
+    inclusion: Optional[List[str]] = None,
+    web_places: Optional[List[str]] = None,
+) -> str:
+    """gather_activity_pois for agents: the POIs in the compact wire format (see tools/poi_model.py)"""
+    return dumps_wire(await gather_activity_pois(location, mbti, theme, inclusion, web_places))
+
 def apply_mbti_scoring(pois: List[dict], mbti: str) -> List[dict]:
-    """Apply MBTI-based scoring to POI list"""
-    for poi in pois:
-        rating = poi.get('rating') or 4.0  # Handle None ratings
-        base_score = (rating - 1) * 20  # Convert 1-5 rating to 0-80
-        poi_types = [t.lower() for t in poi.get('types', [])]
-        
-        # MBTI bonuses
-        mbti_bonus = 0
-        
-        # Extrovert vs Introvert
-        if 'E' in mbti:
-            if any(t in poi_types for t in ['shopping_mall', 'amusement_park', 'night_club']):
-                mbti_bonus += 10
-        else:  # Introvert
-            if any(t in poi_types for t in ['library', 'museum', 'park', 'garden']):
-                mbti_bonus += 10
-        
-        # Sensor vs Intuitive  
-        if 'S' in mbti:
-            if any(t in poi_types for t in ['restaurant', 'store', 'market', 'food']):
-                mbti_bonus += 5
-        else:  # Intuitive
-            if any(t in poi_types for t in ['museum', 'art_gallery', 'university']):
-                mbti_bonus += 5
-        
-        # Feeler bonus
-        if 'F' in mbti:
-            if any(t in poi_types for t in ['zoo', 'aquarium', 'park', 'place_of_worship']):
-                mbti_bonus += 5
-        
-        # Final score
-        poi['score'] = min(100, max(60, base_score + mbti_bonus + 10))  # Score between 60-100
-    
-    return pois
\ No newline at end of file
+    """Apply MBTI-based scoring to POI list (rules in tools/mbti_rules.json, "activity" profile)"""
+    return get_engine().apply(pois, mbti, profile="activity")
@@ -0,0 +1,254 @@
+"""
+Typed POI model shared by the tools, plus the compact wire format used between agents.
+
+Tools build every POI with POI.from_text_search / POI.from_nearby_search and hand plain dicts
+(POI.to_dict) to the rest of the backend, so the full shape stays the one the frontend knows.
+
+What goes into an LLM context is the wire format instead (to_wire / dumps_wire):
+    {"id": place_id, "n": name, "la": lat, "ln": lng, "r": rating, "p": price_level,
+     "t": [types], "c": "a" | "r", "s": score, "m": meal_type}
+Coordinates are rounded to ~11m, generic types are pruned, None values and addresses,
+queries and debug fields are dropped. The place facts of every POI put on the wire are
+remembered by place_id, so plan_agent only has to echo {"id": ...} and rehydrate_itinerary()
+restores the details. The catalog is shared by every request in the process, so it holds no
+per-request fields (score, category, meal_type, ...); those come from the wire entry itself.
+Places this worker has not seen (another worker put them on the wire, or they were evicted) are
+read from the local POI store in one batch by load_places() before rehydration, off the event loop.
+"""
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from tools.poi_store import get_poi_store
+
+WIRE_COORD_PRECISION = int(os.getenv("POI_WIRE_COORD_PRECISION", "4"))
+WIRE_MAX_TYPES = int(os.getenv("POI_WIRE_MAX_TYPES", "3"))
+POI_CATALOG_MAX_ENTRIES = int(os.getenv("POI_CATALOG_MAX_ENTRIES", "20000"))
+
+# Types that say nothing about what a place is like
+GENERIC_TYPES = frozenset({"point_of_interest", "establishment", "political", "premise", "geocode", "food", "store"})
+
+WIRE_KEYS = {
+    "id": "place_id", "n": "name", "la": "lat", "ln": "lng", "r": "rating",
+    "p": "price_level", "t": "types", "c": "category", "s": "score", "m": "meal_type",
+}
+CATEGORY_CODES = {"activity": "a", "restaurant": "r"}
+# What a place is, the same for every request; the other POI fields depend on the request
+PLACE_FACTS = ("name", "address", "lat", "lng", "rating", "price_level", "types", "place_id")
+
+
+@dataclass(slots=True)
+class POI:
+    # Field order is the key order of the dicts the tools return
+    name: Optional[str] = None
+    address: Optional[str] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    rating: Optional[float] = None
+    price_level: Optional[int] = None
+    types: List[str] = field(default_factory=list)
+    place_id: Optional[str] = None
+    source_query: Optional[str] = None
+    source: Optional[str] = None
+    matched_keyword: Optional[str] = None
+    category: Optional[str] = None
+    matched_from: Optional[str] = None
+    meal_type: Optional[str] = None
+    score: Optional[float] = None
+
+    @staticmethod
+    def _location(raw: Dict[str, Any]) -> Dict[str, Any]:
+        return raw.get("geometry", {}).get("location", {})
+
+    @classmethod
+    def from_text_search(cls, raw: Dict[str, Any], query: str) -> "POI":
+        location = cls._location(raw)
+        return cls(
+            place_id=raw.get("place_id"),
+            name=raw.get("name"),
+            lat=location.get("lat"),
+            lng=location.get("lng"),
+            rating=raw.get("rating"),
+            price_level=raw.get("price_level"),
+            types=raw.get("types", []),
+            address=raw.get("formatted_address"),
+            source_query=query,
+        )
+
+    @classmethod
+    def from_nearby_search(cls, raw: Dict[str, Any], keyword: str) -> "POI":
+        location = cls._location(raw)
+        return cls(
+            place_id=raw.get("place_id"),
+            name=raw.get("name"),
+            lat=location.get("lat"),
+            lng=location.get("lng"),
+            rating=raw.get("rating", 0),
+            price_level=raw.get("price_level"),
+            types=raw.get("types", []),
+            address=raw.get("vicinity"),
+            source="nearby_api",
+            matched_keyword=keyword,
+            category="restaurant",
+        )
+
+    @classmethod
+    def from_places(cls, raw: Dict[str, Any]) -> "POI":
+        """Any raw Places result (text or nearby search), without request context"""
+        location = cls._location(raw)
+        return cls(
+            name=raw.get("name"),
+            address=raw.get("formatted_address") or raw.get("vicinity"),
+            lat=location.get("lat"),
+            lng=location.get("lng"),
+            rating=raw.get("rating"),
+            price_level=raw.get("price_level"),
+            types=raw.get("types", []),
+            place_id=raw.get("place_id"),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "POI":
+        return cls(**{k: data.get(k) for k in cls.__slots__ if k in data})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dict in the shape the tools have always returned (unset optional fields left out)"""
+        data = asdict(self)
+        for key in ("source_query", "source", "matched_keyword", "category", "matched_from", "meal_type", "score"):
+            if data[key] is None:
+                del data[key]
+        return data
+
+
+def prune_types(types: Optional[List[str]], limit: int = WIRE_MAX_TYPES) -> List[str]:
+    return [t for t in (types or []) if t not in GENERIC_TYPES][:limit]
+
+
+def to_wire(poi: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact form of one POI dict for LLM contexts"""
+    p = WIRE_COORD_PRECISION
+    wire = {
+        "id": poi.get("place_id"),
+        "n": poi.get("name"),
+        "la": round(poi["lat"], p) if poi.get("lat") is not None else None,
+        "ln": round(poi["lng"], p) if poi.get("lng") is not None else None,
+        "r": poi.get("rating"),
+        "p": poi.get("price_level"),
+        "t": prune_types(poi.get("types")),
+        "c": CATEGORY_CODES.get(poi.get("category") or "activity"),
+        "s": round(poi["score"]) if isinstance(poi.get("score"), (int, float)) else None,
+        "m": poi.get("meal_type"),
+    }
+    return {k: v for k, v in wire.items() if v not in (None, [])}
+
+
+def from_wire(wire: Dict[str, Any]) -> Dict[str, Any]:
+    """Expand short keys back to full field names (without looking anything up)"""
+    data = {WIRE_KEYS.get(k, k): v for k, v in wire.items()}
+    if data.get("category") in ("a", "r"):
+        data["category"] = "restaurant" if data["category"] == "r" else "activity"
+    return data
+
+
+class POICatalog:
+    """place_id -> place facts for everything that was put on the wire (LRU bounded)"""
+
+    def __init__(self, max_entries: int = POI_CATALOG_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def remember(self, pois: List[Dict[str, Any]]) -> None:
+        for poi in pois:
+            place_id = poi.get("place_id")
+            if place_id:
+                self._entries[place_id] = {k: poi[k] for k in PLACE_FACTS if k in poi}
+                self._entries.move_to_end(place_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, place_id: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(place_id)
+
+    async def load_missing(self, place_ids: List[str]) -> None:
+        """Read the places not in the catalog from the local POI store (one query, in a thread)"""
+        missing = [place_id for place_id in dict.fromkeys(place_ids) if place_id not in self._entries]
+        store = get_poi_store()
+        if not missing or store is None:
+            return
+        try:
+            rows = await asyncio.to_thread(store.get_many, missing)
+        except Exception as e:
+            print(f"POI store lookup failed, rehydrating from the wire entries: {e}")
+            return
+        self.remember([POI.from_places(raw).to_dict() for raw in rows.values()])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+poi_catalog = POICatalog()
+
+
+def wire_pois(pois: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Compact POI list; remembers the full POIs for rehydration"""
+    poi_catalog.remember(pois)
+    return [to_wire(poi) for poi in pois]
+
+
+def dumps_wire(pois: List[Dict[str, Any]]) -> str:
+    """JSON text of the compact POI list, as handed to an agent"""
+    return json.dumps(wire_pois(pois), ensure_ascii=False, separators=(",", ":"))
+
+
+def rehydrate_poi(poi: Any) -> Any:
+    """
+    Full POI for a wire/short entry: place facts from the catalog (the wire has rounded
+    coordinates and pruned types), everything else (score, category, meal_type) from the entry
+    """
+    if not isinstance(poi, dict):
+        return poi
+    expanded = from_wire(poi)
+    facts = poi_catalog.get(expanded["place_id"]) if expanded.get("place_id") else None
+    if facts is None:
+        return expanded
+    extras = {k: v for k, v in expanded.items() if v is not None and (k not in PLACE_FACTS or k not in facts)}
+    return {**facts, **extras}
+
+
+def _referenced_place_ids(value: Any) -> List[str]:
+    """place_ids of the POIs rehydrate_itinerary / rehydrate_day / rehydrate_pois would look up"""
+    if isinstance(value, dict) and isinstance(value.get("itinerary"), list):
+        return [place_id for day in value["itinerary"] for place_id in _referenced_place_ids(day)]
+    if isinstance(value, dict) and isinstance(value.get("activities"), list):
+        value = [entry["poi"] for entry in value["activities"] if isinstance(entry, dict) and "poi" in entry]
+    if not isinstance(value, list):
+        return []
+    return [from_wire(poi).get("place_id") for poi in value if isinstance(poi, dict) and from_wire(poi).get("place_id")]
+
+
+async def load_places(value: Any) -> None:
+    """Make sure the places a plan, day or POI list refers to can be rehydrated without blocking"""
+    await poi_catalog.load_missing(_referenced_place_ids(value))
+
+
+def rehydrate_pois(pois: List[Any]) -> List[Any]:
+    return [rehydrate_poi(poi) for poi in pois]
+
+
+def rehydrate_day(day: Any) -> Any:
+    if isinstance(day, dict) and isinstance(day.get("activities"), list):
+        for entry in day["activities"]:
+            if isinstance(entry, dict) and "poi" in entry:
+                entry["poi"] = rehydrate_poi(entry["poi"])
+    return day
+
+
+def rehydrate_itinerary(plan: Any) -> Any:
+    """Replace the {"id": ...} references plan_agent wrote with the full POI details"""
+    if isinstance(plan, dict) and isinstance(plan.get("itinerary"), list):
+        for day in plan["itinerary"]:
+            rehydrate_day(day)
+    return plan
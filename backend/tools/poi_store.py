@@ -0,0 +1,250 @@
+"""
+Local geospatial POI store fed by every Places result (Text Search and Nearby Search).
+
+  - pois:          one row per place_id with its latest raw Places result, indexed on (lat, lng)
+  - poi_keywords:  which Nearby Search keyword returned a place (searches use type=restaurant)
+  - coverage:      circles (center, radius, keyword) we have already searched and when
+
+search_nearby_restaurants asks covers() before calling the API: when a fresh earlier search
+for the same keyword fully contains the requested circle, nearby() answers from the store with
+a bounding-box lookup on the (lat, lng) index followed by an exact haversine filter.
+Results keep the raw Places shape so callers process them exactly like API results.
+
+Nearby Search returns at most one page (20 results) ranked over the whole circle, so a
+saturated search only covers requests around (almost) the same center.
+"""
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from cache import normalize_text
+from observability import register_cache_stats
+
+load_dotenv()
+
+POI_STORE_ENABLED = os.getenv("POI_STORE_ENABLED", "true").lower() == "true"
+# ":memory:" keeps the store for the lifetime of the process only; relative paths are resolved
+# against backend/, so the server and warm_cache.py share one file wherever they are started
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+POI_STORE_PATH = os.getenv("POI_STORE_PATH", ".cache/poi_store.sqlite3")
+# How long a searched circle counts as covered (restaurants do not move much in a week)
+POI_STORE_COVERAGE_TTL = float(os.getenv("POI_STORE_COVERAGE_TTL", "604800"))
+# A saturated search covers requests whose center is at most this far away (meters)
+POI_STORE_CENTER_TOLERANCE_M = float(os.getenv("POI_STORE_CENTER_TOLERANCE_M", "50"))
+
+PLACES_PAGE_SIZE = 20
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, a)))
+
+
+def bounding_box(lat: float, lng: float, radius_m: float) -> tuple:
+    """(min_lat, max_lat, min_lng, max_lng) containing the circle"""
+    d_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    d_lng = min(180.0, math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)))
+    return lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng
+
+
+def resolve_store_path(path: str) -> str:
+    if path == ":memory:" or os.path.isabs(path):
+        return path
+    return str(BACKEND_DIR / path)
+
+
+def _location(result: Dict[str, Any]) -> tuple:
+    location = result.get("geometry", {}).get("location", {})
+    return location.get("lat"), location.get("lng")
+
+
+class POIStore:
+    def __init__(self, path: str = ":memory:", coverage_ttl: float = POI_STORE_COVERAGE_TTL):
+        self.path = path
+        self.coverage_ttl = coverage_ttl
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.counters = {"covered": 0, "gaps": 0, "served_pois": 0, "ingested_pois": 0}
+        with self._lock:
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS pois ("
+                " place_id TEXT PRIMARY KEY, lat REAL NOT NULL, lng REAL NOT NULL,"
+                " rating REAL, raw TEXT NOT NULL, updated_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS pois_lat_lng ON pois (lat, lng);"
+                "CREATE TABLE IF NOT EXISTS poi_keywords ("
+                " keyword TEXT NOT NULL, place_id TEXT NOT NULL, PRIMARY KEY (keyword, place_id));"
+                "CREATE TABLE IF NOT EXISTS coverage ("
+                " keyword TEXT NOT NULL, lat REAL NOT NULL, lng REAL NOT NULL, radius REAL NOT NULL,"
+                " result_count INTEGER NOT NULL, fetched_at REAL NOT NULL);"
+                # One row per searched circle; stores written before the unique index keep their latest row
+                "DELETE FROM coverage WHERE rowid NOT IN"
+                " (SELECT MAX(rowid) FROM coverage GROUP BY keyword, lat, lng, radius);"
+                "DROP INDEX IF EXISTS coverage_keyword_lat;"
+                "CREATE UNIQUE INDEX IF NOT EXISTS coverage_circle ON coverage (keyword, lat, lng, radius);"
+            )
+            self._conn.commit()
+
+    def ingest(self, results: List[Dict[str, Any]], keyword: Optional[str] = None) -> int:
+        """Upsert raw Places results; fields missing from the new result keep their stored value"""
+        rows = {}
+        for r in results:
+            lat, lng = _location(r)
+            if r.get("place_id") and lat is not None and lng is not None:
+                rows[r["place_id"]] = r
+        if not rows:
+            return 0
+        now = time.time()
+        with self._lock:
+            placeholders = ",".join("?" * len(rows))
+            existing = dict(self._conn.execute(
+                f"SELECT place_id, raw FROM pois WHERE place_id IN ({placeholders})", list(rows)
+            ).fetchall())
+            upserts = []
+            for place_id, r in rows.items():
+                merged = {**json.loads(existing[place_id]), **r} if place_id in existing else r
+                lat, lng = _location(merged)
+                upserts.append((place_id, lat, lng, merged.get("rating"), json.dumps(merged, ensure_ascii=False), now))
+            self._conn.executemany("INSERT OR REPLACE INTO pois VALUES (?, ?, ?, ?, ?, ?)", upserts)
+            if keyword is not None:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO poi_keywords VALUES (?, ?)",
+                    [(normalize_text(keyword), place_id) for place_id in rows],
+                )
+            self._conn.commit()
+        self.counters["ingested_pois"] += len(rows)
+        return len(rows)
+
+    def record_nearby(self, lat: float, lng: float, radius: float, keyword: str, results: List[Dict[str, Any]]) -> None:
+        """Store a Nearby Search response and mark its circle as covered for the keyword"""
+        self.ingest(results, keyword=keyword)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO coverage VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (keyword, lat, lng, radius) DO UPDATE"
+                " SET result_count = excluded.result_count, fetched_at = excluded.fetched_at",
+                (normalize_text(keyword), lat, lng, float(radius), len(results), time.time()),
+            )
+            self._conn.commit()
+
+    def covers(self, lat: float, lng: float, radius: float, keyword: str = "", min_fresh: float = 0.0) -> bool:
+        """True when an earlier search for the keyword, fresh for min_fresh more seconds, fully contains this circle"""
+        min_lat, max_lat, _, _ = bounding_box(lat, lng, radius + 50000)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT lat, lng, radius, result_count FROM coverage"
+                " WHERE keyword = ? AND lat BETWEEN ? AND ? AND fetched_at >= ?",
+                (normalize_text(keyword), min_lat, max_lat, time.time() - self.coverage_ttl + min_fresh),
+            ).fetchall()
+        covered = False
+        for c_lat, c_lng, c_radius, result_count in rows:
+            offset = haversine_m(lat, lng, c_lat, c_lng)
+            if result_count >= PLACES_PAGE_SIZE:
+                covered = offset <= POI_STORE_CENTER_TOLERANCE_M and radius <= c_radius
+            else:
+                covered = offset + radius <= c_radius
+            if covered:
+                break
+        self.counters["covered" if covered else "gaps"] += 1
+        return covered
+
+    def nearby(
+        self,
+        lat: float,
+        lng: float,
+        radius: float,
+        keyword: str = "",
+        min_rating: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Raw Places results for the keyword within radius meters, best rated (then closest) first"""
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.place_id, p.lat, p.lng, p.rating, p.raw FROM pois p"
+                " JOIN poi_keywords k ON k.place_id = p.place_id AND k.keyword = ?"
+                " WHERE p.lat BETWEEN ? AND ? AND p.lng BETWEEN ? AND ?",
+                (normalize_text(keyword), min_lat, max_lat, min_lng, max_lng),
+            ).fetchall()
+        matches = []
+        for place_id, p_lat, p_lng, rating, raw in rows:
+            if min_rating is not None and (rating is None or rating < min_rating):
+                continue
+            distance = haversine_m(lat, lng, p_lat, p_lng)
+            if distance <= radius:
+                matches.append((-(rating or 0), distance, place_id, raw))
+        matches.sort()
+        self.counters["served_pois"] += len(matches)
+        return [json.loads(raw) for *_, raw in matches]
+
+    def get(self, place_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT raw FROM pois WHERE place_id = ?", (place_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, place_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """place_id -> raw Places result for the ids that are stored"""
+        if not place_ids:
+            return {}
+        placeholders = ",".join("?" * len(place_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT place_id, raw FROM pois WHERE place_id IN ({placeholders})", list(place_ids)
+            ).fetchall()
+        return {place_id: json.loads(raw) for place_id, raw in rows}
+
+    def purge_coverage(self) -> int:
+        """Drop expired coverage rows (POIs themselves are kept and refreshed on the next search)"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM coverage WHERE fetched_at < ?", (time.time() - self.coverage_ttl,))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["covered"] + self.counters["gaps"]
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM pois").fetchone()[0]
+        return {
+            **self.counters,
+            "coverage_rate": round(self.counters["covered"] / lookups, 3) if lookups else 0.0,
+            "stored_pois": total,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[POIStore] = None
+
+
+def get_poi_store() -> Optional[POIStore]:
+    """Shared store, opened on first use; None when POI_STORE_ENABLED=false"""
+    global _store
+    if not POI_STORE_ENABLED:
+        return None
+    if _store is None:
+        _store = POIStore(resolve_store_path(POI_STORE_PATH or ":memory:"))
+        register_cache_stats("poi_store", _store)
+    return _store
+
+
+async def ingest_results(results: List[Dict[str, Any]]) -> None:
+    """Feed raw Places results into the store without failing the caller"""
+    store = get_poi_store()
+    if store is None or not results:
+        return
+    try:
+        await asyncio.to_thread(store.ingest, results)
+    except Exception as e:
+        print(f"POI store ingest failed: {e}")
@@ -1,16 +1,19 @@
 import os
-import httpx
 from typing import List, Dict
 from dotenv import load_dotenv
+from http_client import get_http_client
+from observability import external_call
+from resilience import tavily_api
 
 load_dotenv()
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com").rstrip("/")
 
 async def web_search(query: str, max_results: int = 5) -> List[Dict]:
     if not TAVILY_API_KEY:
         return [{"error": "Tavily API key not configured."}]
 
-    url = "https://api.tavily.com/search"
+    url = f"{TAVILY_BASE_URL}/search"
     headers = {"Authorization": f"Bearer {TAVILY_API_KEY}"}
     payload = {
         "query": query,
@@ -20,14 +23,17 @@ async def web_search(query: str, max_results: int = 5) -> List[Dict]:
         "include_answer": False
     }
 
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        try:
-            response = await client.post(url, headers=headers, json=payload)
+    async def attempt() -> Dict:
+        async with get_http_client() as client, external_call("tavily_search"):
+            response = await client.post(url, headers=headers, json=payload, timeout=15.0)
             response.raise_for_status()
-            data = response.json()
-        except Exception as e:
-            print(f"Tavily API error: {e}")
-            return []
+            return response.json()
+
+    try:
+        data = await tavily_api.call(attempt, endpoint="search")
+    except Exception as e:
+        print(f"Tavily API error: {e}")
+        return []
 
     return [
         {
@@ -38,18 +44,3 @@ async def web_search(query: str, max_results: int = 5) -> List[Dict]:
         for item in data.get("results", [])
     ]
 
-
-import requests
-from bs4 import BeautifulSoup
-
-def clean_html_from_url(url: str) -> str:
-    try:
-        resp = requests.get(url, timeout=10)
-        soup = BeautifulSoup(resp.text, "html.parser")
-        items = soup.find_all(["li", "h2", "strong", "b"])
-        lines = [item.get_text(strip=True) for item in items if item.get_text()]
-        text = "\n".join(lines)
-        return text[:1500]
-    except Exception as e:
-        print(f"[clean_html_from_url] Parse error: {e}")
-        return ""
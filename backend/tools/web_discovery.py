@@ -0,0 +1,204 @@
+"""
+Web-discovery stage: find place names in travel articles and feed them to gather_activity_pois.
+
+Off by default (WEB_DISCOVERY_ENABLED): it costs a Tavily search, the page downloads and one
+Places text search per name found. The pipeline and batch engines opt in with
+gather_activity_pois(discover_web=WEB_DISCOVERY_ENABLED); web_places=None alone means no web places.
+
+    discover_web_places(location, theme)
+        web_search (Tavily)  ->  fetch the top result pages concurrently  ->  extract place names
+
+Pages are downloaded with the shared async HTTP client as a stream and parsed chunk by chunk
+with the stdlib HTMLParser; the download stops after WEB_PAGE_MAX_BYTES or once enough text
+has been collected. Cleaned page text is cached by URL (same cache tiers as the places cache).
+The whole stage is bounded by WEB_DISCOVERY_TIMEOUT and never raises: no places means the
+plan is built from the Places text search alone.
+"""
+import asyncio
+import codecs
+import os
+import re
+from collections import Counter
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from cache import TieredCache, get_disk_store
+from http_client import get_http_client
+from observability import external_call, register_cache_stats
+from tools.tavily_search_tool import web_search
+
+load_dotenv()
+
+WEB_DISCOVERY_ENABLED = os.getenv("WEB_DISCOVERY_ENABLED", "false").lower() == "true"
+# Result pages fetched per discovery and the overall time budget for the stage (seconds)
+WEB_DISCOVERY_MAX_PAGES = int(os.getenv("WEB_DISCOVERY_MAX_PAGES", "3"))
+WEB_DISCOVERY_TIMEOUT = float(os.getenv("WEB_DISCOVERY_TIMEOUT", "8"))
+WEB_DISCOVERY_MAX_PLACES = int(os.getenv("WEB_DISCOVERY_MAX_PLACES", "8"))
+# Stop downloading a page after this many bytes; keep at most this many characters of text
+WEB_PAGE_MAX_BYTES = int(os.getenv("WEB_PAGE_MAX_BYTES", "262144"))
+WEB_PAGE_MAX_CHARS = int(os.getenv("WEB_PAGE_MAX_CHARS", "1500"))
+WEB_PAGE_CACHE_TTL = float(os.getenv("WEB_PAGE_CACHE_TTL", "604800"))
+WEB_PAGE_CACHE_PATH = os.getenv("WEB_PAGE_CACHE_PATH", os.getenv("PLACES_CACHE_PATH"))
+
+web_page_cache = TieredCache(
+    "web_pages",
+    ttl=WEB_PAGE_CACHE_TTL,
+    max_entries=1000,
+    persistent=get_disk_store(WEB_PAGE_CACHE_PATH),
+)
+register_cache_stats("web_pages", web_page_cache)
+
+# Articles list their places as headings, list items and bold text
+_TEXT_TAGS = {"li", "h1", "h2", "h3", "h4", "strong", "b"}
+_SKIP_TAGS = {"script", "style", "noscript", "svg", "nav", "footer", "header", "form"}
+_NUMBERING = re.compile(r"^\s*(?:#?\d+[.):]?|[-•*])\s+")
+_DESCRIPTION_SPLIT = re.compile(r"\s+[-–—|]\s+|:\s+|\s+\(")
+_LOWERCASE_WORDS = {"of", "the", "and", "de", "la", "le", "du", "des", "di", "del", "da", "at", "on", "in", "&", "'s"}
+_GENERIC_NAMES = {
+    "home", "menu", "search", "share", "contact", "about", "about us", "read more", "subscribe", "privacy policy",
+    "related posts", "comments", "leave a reply", "faq", "sign up", "log in", "table of contents", "where to stay",
+    "getting there", "how to get there", "tips", "conclusion", "final thoughts", "things to do", "map",
+}
+
+
+class _TextCollector(HTMLParser):
+    """Collects the text of heading/list/bold elements; fed incrementally as chunks arrive"""
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.items: List[str] = []
+        self.chars = 0
+        self._depth = 0
+        self._skip = 0
+        self._buffer: List[str] = []
+
+    @property
+    def full(self) -> bool:
+        return self.chars >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag in _TEXT_TAGS:
+            if self._depth == 0:
+                self._buffer = []
+            self._depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in _TEXT_TAGS and self._depth > 0:
+            self._depth -= 1
+            if self._depth == 0:
+                self._flush()
+
+    def handle_data(self, data):
+        if self._depth and not self._skip:
+            self._buffer.append(data)
+
+    def _flush(self) -> None:
+        text = " ".join("".join(self._buffer).split())
+        self._buffer = []
+        if text and not self.full:
+            self.items.append(text)
+            self.chars += len(text) + 1
+
+    def text(self) -> str:
+        return "\n".join(self.items)[:self.max_chars]
+
+
+async def _download_page_text(url: str) -> str:
+    """Stream the page and parse as it arrives; stops at WEB_PAGE_MAX_BYTES or WEB_PAGE_MAX_CHARS"""
+    collector = _TextCollector(WEB_PAGE_MAX_CHARS)
+    received = 0
+    async with get_http_client() as client, external_call("web_page"):
+        async with client.stream("GET", url, timeout=5.0, follow_redirects=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            if "html" not in content_type:
+                return ""
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                collector.feed(decoder.decode(chunk[: max(0, WEB_PAGE_MAX_BYTES - (received - len(chunk)))]))
+                if collector.full or received >= WEB_PAGE_MAX_BYTES:
+                    break
+            # A multi-byte character cut at the end of the stream is flushed, not dropped
+            collector.feed(decoder.decode(b"", final=True))
+    collector.close()
+    return collector.text()
+
+
+async def fetch_page_text(url: str) -> str:
+    """Cleaned heading/list text of a page (cached by URL); empty string on any failure"""
+    try:
+        return await web_page_cache.get_or_fetch(url, lambda: _download_page_text(url))
+    except Exception as e:
+        print(f"[web_discovery] could not fetch {url}: {e}")
+        return ""
+
+
+def _clean_candidate(line: str) -> Optional[str]:
+    name = _NUMBERING.sub("", line).strip()
+    name = _DESCRIPTION_SPLIT.split(name, maxsplit=1)[0].strip(" .,:;!?\"'“”")
+    if not 3 <= len(name) <= 60 or not name[0].isupper():
+        return None
+    words = name.split()
+    if len(words) > 6 or name.lower() in _GENERIC_NAMES:
+        return None
+    # Proper nouns: every significant word is capitalized (or a number, e.g. "Pier 39")
+    if not all(w[0].isupper() or w[0].isdigit() or w.lower() in _LOWERCASE_WORDS for w in words):
+        return None
+    return name
+
+
+def extract_place_names(texts: List[str], location: str = "", limit: int = WEB_DISCOVERY_MAX_PLACES) -> List[str]:
+    """Candidate place names, most mentioned first (ties keep first-seen order)"""
+    counts: Counter = Counter()
+    first_seen: Dict[str, int] = {}
+    display: Dict[str, str] = {}
+    location_key = location.strip().lower()
+    for text in texts:
+        for line in text.splitlines():
+            name = _clean_candidate(line)
+            if name is None:
+                continue
+            key = name.lower()
+            if key == location_key:
+                continue
+            counts[key] += 1
+            first_seen.setdefault(key, len(first_seen))
+            display.setdefault(key, name)
+    ranked = sorted(counts, key=lambda k: (-counts[k], first_seen[k]))
+    return [display[k] for k in ranked[:limit]]
+
+
+async def _discover(location: str, theme: str) -> List[str]:
+    results = await web_search(f"best {theme} places to visit in {location}", max_results=WEB_DISCOVERY_MAX_PAGES + 2)
+    results = [r for r in results if r.get("url")]
+    if not results:
+        return []
+    urls = [r["url"] for r in results[:WEB_DISCOVERY_MAX_PAGES]]
+    pages = await asyncio.gather(*(fetch_page_text(url) for url in urls))
+    # Tavily snippets go last: they are short but cost nothing extra
+    texts = list(pages) + [r.get("content", "").replace(". ", "\n") for r in results]
+    return extract_place_names(texts, location)
+
+
+async def discover_web_places(location: str, theme: str = "culture") -> List[str]:
+    """Place names for gather_activity_pois(web_places=...); [] when slow or failing"""
+    if not location:
+        return []
+    try:
+        places = await asyncio.wait_for(_discover(location, theme), timeout=WEB_DISCOVERY_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"[web_discovery] gave up after {WEB_DISCOVERY_TIMEOUT:.0f}s for {location}")
+        return []
+    except Exception as e:
+        print(f"[web_discovery] failed for {location}: {e}")
+        return []
+    print(f"🌐 web_discovery found {len(places)} places for {location}: {places}")
+    return places
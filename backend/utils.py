@@ -1,7 +1,30 @@
+import json
 import os
+import random
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple, Union
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Share of raw agent outputs printed in full (0 = never, 1 = always); they can be tens of KB each
+AGENT_OUTPUT_LOG_SAMPLE_RATE = float(os.getenv("AGENT_OUTPUT_LOG_SAMPLE_RATE", "0"))
+
+# Resolved from this file, so prompts load the same way whatever the working directory is
+PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
+
+_FENCE_START = "```json"
+_FENCE_END = "```"
+
+
+@lru_cache(maxsize=None)
 def load_prompt(file: str) -> str:
-    path = os.path.join("prompts", f"{file}.txt")
+    """Prompt text from backend/prompts; read once per process"""
+    path = PROMPTS_DIR / f"{file}.txt"
     try:
         with open(path, "r", encoding="utf-8") as f:
             return f.read()
@@ -11,11 +34,112 @@ def load_prompt(file: str) -> str:
         return "You are a helpful AI assistant."
     
 
-def clean_json_content(raw: str) -> str:
-    print(raw)
-    raw = raw.split("TERMINATE")[0].strip()
-    if raw.startswith("```json"):
-        raw = raw[len("```json"):].strip()
-    if raw.endswith("```"):
-        raw = raw[:-3].strip()
+def log_sampled(label: str, text: Callable[[], str], rate: Optional[float] = None) -> None:
+    """Print text() for a sample of calls; text is only built when it is printed"""
+    rate = AGENT_OUTPUT_LOG_SAMPLE_RATE if rate is None else rate
+    if rate > 0 and (rate >= 1 or random.random() < rate):
+        print(f"{label}: {text()}")
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """orjson.loads when available (several times faster on large plans), json.loads otherwise"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def extract_json_text(raw: str) -> str:
+    """
+    The JSON part of an agent reply in one pass: text before TERMINATE, inside the first
+    ```json fence if there is one, otherwise the whole reply without fence markers.
+    """
+    end = raw.find("TERMINATE")
+    if end != -1:
+        raw = raw[:end]
+    start = raw.find(_FENCE_START)
+    if start != -1:
+        start += len(_FENCE_START)
+        close = raw.find(_FENCE_END, start)
+        return raw[start:close if close != -1 else len(raw)].strip()
+    raw = raw.strip()
+    if raw.endswith(_FENCE_END):
+        raw = raw[:-len(_FENCE_END)].strip()
     return raw
+
+
+def clean_json_content(raw: str) -> str:
+    log_sampled("agent output", lambda: raw)
+    return extract_json_text(raw)
+
+
+def parse_agent_json(content: str) -> Optional[Any]:
+    """Best-effort parse of an agent's JSON reply (fenced or bare); None if it is not JSON"""
+    try:
+        return json_loads(extract_json_text(content))
+    except Exception:
+        return None
+
+
+class ItineraryDayExtractor:
+    """
+    Incrementally pulls finished day objects out of a (possibly partial) plan_agent
+    JSON output, so each day can be sent to the client as soon as its closing brace arrives.
+    """
+
+    _ARRAY_START = re.compile(r'"itinerary"\s*:\s*\[')
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = None       # scan position inside the itinerary array
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._obj_start = None
+        self.done = False
+        self.days_emitted = 0
+
+    def feed(self, text: str) -> List[Tuple[int, dict]]:
+        """Append more output and return (index, day) for each day completed by it"""
+        self.buffer += text
+        if self.done:
+            return []
+        if self._pos is None:
+            match = self._ARRAY_START.search(self.buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        days = []
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._obj_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0 and ch == "]":
+                    self.done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and ch == "}" and self._obj_start is not None:
+                    try:
+                        days.append((self.days_emitted + len(days), json_loads(buf[self._obj_start:i + 1])))
+                    except ValueError as e:
+                        print(f"Skipping unparsable itinerary day: {e}")
+                    self._obj_start = None
+            i += 1
+        self._pos = i
+        self.days_emitted += len(days)
+        return days
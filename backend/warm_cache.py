@@ -0,0 +1,291 @@
+"""
+Offline warm-cache builder: prefetch Places data for popular destinations so the first plan of
+the day is answered from the persistent cache instead of cold Places calls.
+
+For every destination x theme it runs the text searches gather_activity_pois runs for each MBTI
+type of the configured groups (build_activity_queries -> fetch_google_places), ranks the
+activities per type and searches restaurants around the top ones (search_nearby_restaurants).
+The calls go through the tools' own caches, so the results land where the app reads first: the
+persistent tier of the places cache (PLACES_CACHE_PATH, which must be the app's file) and the
+POI store (POI_STORE_PATH).
+
+  - only entries that are missing or stop being fresh within --refresh-within are fetched
+    (cache.refresh_expiring), so an interrupted run picks up where it stopped and a nightly
+    refresh only pays for what is about to expire
+  - --max-requests caps the Places requests of a run (resilience quota); the destinations with
+    the most missing or expiring entries are warmed first
+  - --concurrency destinations are warmed at once, each under the tools' per-request limit
+    (POI_MAX_CONCURRENCY), all under PLACES_RATE_LIMIT
+  - the report lists per destination x theme how many searches are fresh, expiring or missing
+    and when its first entry expires; --report-only prints it without calling Places
+
+Web discovery is not warmed: Tavily searches are not cached, and the page text they link to is
+cached by URL (web_page_cache, WEB_PAGE_CACHE_PATH) only once a search has returned the URL.
+
+Config file (JSON), or the same keys as command line options:
+    {"destinations": ["Tokyo", "Paris"], "themes": ["Culture", "Food"], "mbti": ["NT", "NF", "SJ", "SP"]}
+MBTI entries are types (INTJ) or groups: NT, NF, SJ, SP, all.
+
+Usage (from backend/, with the app's PLACES_CACHE_PATH):
+    python warm_cache.py --destinations Tokyo Paris --themes Culture Food --mbti NT NF SJ SP
+    python warm_cache.py --config warm_cache.json --max-requests 2000 --report-json report.json
+    python warm_cache.py --config warm_cache.json --report-only
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from cache import refresh_expiring
+from http_client import close_http_client, init_http_client
+from resilience import places_api
+from tools.concurrency import request_concurrency
+from tools.critic_meal_tool import NEARBY_SEARCH_RADIUS, get_cuisine_keywords, search_nearby_restaurants
+from tools.mbti_scoring import MBTI_TYPES, top_k
+from tools.places_cache import nearby_key, places_cache, text_search_key
+from tools.poi_activity_tool import (
+    MAX_ACTIVITY_QUERIES,
+    NEARBY_ACTIVITIES,
+    build_activity_queries,
+    fetch_google_places,
+    rank_activity_pois,
+    text_search_pois,
+)
+from tools.poi_store import get_poi_store
+
+# Keirsey temperaments; types within a group tend to get the same top activities
+MBTI_GROUPS = {
+    "NT": ["INTJ", "INTP", "ENTJ", "ENTP"],
+    "NF": ["INFJ", "INFP", "ENFJ", "ENFP"],
+    "SJ": ["ISTJ", "ISFJ", "ESTJ", "ESFJ"],
+    "SP": ["ISTP", "ISFP", "ESTP", "ESFP"],
+    "ALL": MBTI_TYPES,
+}
+# Refresh what expires before the next nightly run would (places cache entries are fresh for a day)
+DEFAULT_REFRESH_WITHIN = 6 * 3600
+
+
+def expand_mbti(entries: Sequence[str]) -> List[str]:
+    types: List[str] = []
+    for entry in entries:
+        entry = entry.strip().upper()
+        if entry in MBTI_GROUPS:
+            types.extend(MBTI_GROUPS[entry])
+        elif entry in MBTI_TYPES:
+            types.append(entry)
+        else:
+            raise ValueError(f"Unknown MBTI type or group '{entry}', expected a type or one of {sorted(MBTI_GROUPS)}")
+    return list(dict.fromkeys(types))
+
+
+@dataclass(frozen=True)
+class WarmJob:
+    destination: str
+    theme: str
+    mbtis: Tuple[str, ...]
+
+    def queries_by_mbti(self) -> Dict[str, List[str]]:
+        return {mbti: build_activity_queries(self.destination, mbti, self.theme)[:MAX_ACTIVITY_QUERIES] for mbti in self.mbtis}
+
+    def queries(self) -> List[str]:
+        return list(dict.fromkeys(q for qs in self.queries_by_mbti().values() for q in qs))
+
+
+def build_jobs(destinations: Sequence[str], themes: Sequence[str], mbti: Sequence[str]) -> List[WarmJob]:
+    mbtis = tuple(expand_mbti(mbti))
+    return [WarmJob(destination, theme, mbtis) for destination in destinations for theme in themes]
+
+
+@dataclass
+class Freshness:
+    """Cache state of one job's searches; nearby searches are only known once the text searches are cached"""
+    job: WarmJob
+    text: Dict[str, int] = field(default_factory=lambda: {"fresh": 0, "expiring": 0, "missing": 0})
+    nearby: Dict[str, int] = field(default_factory=lambda: {"fresh": 0, "expiring": 0, "missing": 0})
+    first_expiry: Optional[float] = None
+
+    @property
+    def to_fetch(self) -> int:
+        return sum(counts["expiring"] + counts["missing"] for counts in (self.text, self.nearby))
+
+    @property
+    def coverage(self) -> float:
+        known = sum(self.text.values()) + sum(self.nearby.values())
+        return (self.text["fresh"] + self.nearby["fresh"]) / known if known else 0.0
+
+    def _note_expiry(self, fresh_until: float) -> None:
+        if self.first_expiry is None or fresh_until < self.first_expiry:
+            self.first_expiry = fresh_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self.job),
+            "text": self.text,
+            "nearby": self.nearby,
+            "coverage": round(self.coverage, 3),
+            "first_expiry": self.first_expiry,
+        }
+
+
+def _classify(fresh_until: Optional[float], now: float, refresh_within: float) -> str:
+    if fresh_until is None or fresh_until <= now:
+        return "missing"
+    return "expiring" if fresh_until <= now + refresh_within else "fresh"
+
+
+def freshness(job: WarmJob, refresh_within: float) -> Freshness:
+    """What a warm run would fetch for the job, read from the persistent tier and the POI store only"""
+    now = time.time()
+    state = Freshness(job)
+    disk, store = places_cache.persistent, get_poi_store()
+
+    results_by_query: Dict[str, List[dict]] = {}
+    for query in job.queries():
+        entry = disk.get(places_cache.namespace, text_search_key(query)) if disk is not None else None
+        state.text[_classify(entry.fresh_until if entry else None, now, refresh_within)] += 1
+        if entry is not None:
+            state._note_expiry(entry.fresh_until)
+            results_by_query[query] = text_search_pois(entry.value, query)
+
+    sites = set()
+    for mbti, queries in job.queries_by_mbti().items():
+        if all(q in results_by_query for q in queries):
+            ranked = rank_activity_pois(mbti, [results_by_query[q] for q in queries], [])
+            sites.update((poi["lat"], poi["lng"]) for poi in top_k(ranked, NEARBY_ACTIVITIES))
+    for lat, lng in sites:
+        for keyword in get_cuisine_keywords(job.destination):
+            entry = disk.get(places_cache.namespace, nearby_key(lat, lng, NEARBY_SEARCH_RADIUS, keyword)) if disk is not None else None
+            status = _classify(entry.fresh_until if entry else None, now, refresh_within)
+            if status != "fresh" and store is not None:
+                # search_nearby_restaurants answers from the POI store when it covers the circle
+                if store.covers(lat, lng, NEARBY_SEARCH_RADIUS, keyword, refresh_within):
+                    status = "fresh"
+                elif status == "missing" and store.covers(lat, lng, NEARBY_SEARCH_RADIUS, keyword):
+                    status = "expiring"
+            state.nearby[status] += 1
+            if entry is not None:
+                state._note_expiry(entry.fresh_until)
+    return state
+
+
+async def warm(job: WarmJob, refresh_within: float) -> None:
+    """Fetch the job's missing and expiring searches; fresh ones are cache hits and cost nothing"""
+    with refresh_expiring(refresh_within), request_concurrency():
+        queries_by_mbti = job.queries_by_mbti()
+        queries = job.queries()
+        results = await asyncio.gather(*(fetch_google_places(query) for query in queries))
+        results_by_query = dict(zip(queries, results))
+
+        # Restaurants are cached per location and keyword; the MBTI type only changes their scores
+        sites = {}
+        for mbti, mbti_queries in queries_by_mbti.items():
+            ranked = rank_activity_pois(mbti, [results_by_query[q] for q in mbti_queries], [])
+            for poi in top_k(ranked, NEARBY_ACTIVITIES):
+                sites[(poi["lat"], poi["lng"])] = None
+        await asyncio.gather(
+            *(search_nearby_restaurants(lat, lng, job.destination, max_results=3) for lat, lng in sites)
+        )
+
+
+async def run_jobs(jobs: List[WarmJob], refresh_within: float, concurrency: int) -> Dict[str, Any]:
+    """Warm the jobs in order until done or the Places quota runs out"""
+    limit = asyncio.Semaphore(max(1, concurrency))
+    outcome = {"warmed": [], "incomplete": [], "skipped": []}
+
+    async def one(job: WarmJob) -> None:
+        async with limit:
+            name = f"{job.destination}/{job.theme}"
+            if places_api.quota_left() == 0:
+                outcome["skipped"].append(name)
+                return
+            rejected = places_api.counters["quota_rejected"]
+            start = time.perf_counter()
+            await warm(job, refresh_within)
+            # Failed searches are not cached, so the next run fetches whatever is still missing
+            if places_api.counters["quota_rejected"] > rejected:
+                outcome["incomplete"].append(name)
+            else:
+                outcome["warmed"].append(name)
+            print(f"🔥 {name} finished in {time.perf_counter() - start:.1f}s ({places_api.requests} Places requests so far)")
+
+    await init_http_client()
+    try:
+        await asyncio.gather(*(one(job) for job in jobs))
+    finally:
+        await close_http_client()
+    return outcome
+
+
+def print_report(states: List[Freshness], refresh_within: float) -> None:
+    now = time.time()
+    print(f"\nCache coverage (expiring = not fresh {refresh_within / 3600:.1f}h from now)")
+    print(f"  {'destination':<18} {'theme':<12} {'text f/e/m':>12} {'nearby f/e/m':>14} {'coverage':>9} {'expires in':>11}")
+    for state in states:
+        text = "/".join(str(state.text[k]) for k in ("fresh", "expiring", "missing"))
+        nearby = "/".join(str(state.nearby[k]) for k in ("fresh", "expiring", "missing"))
+        expires = f"{(state.first_expiry - now) / 3600:.1f}h" if state.first_expiry else "-"
+        print(f"  {state.job.destination:<18} {state.job.theme:<12} {text:>12} {nearby:>14} {state.coverage:>9.0%} {expires:>11}")
+    to_fetch = sum(state.to_fetch for state in states)
+    print(f"  {len(states)} destination/theme pairs, {to_fetch} known searches to fetch")
+
+
+def load_config(args: argparse.Namespace) -> Dict[str, List[str]]:
+    config = json.loads(Path(args.config).read_text()) if args.config else {}
+    for key in ("destinations", "themes", "mbti"):
+        if getattr(args, key):
+            config[key] = getattr(args, key)
+    if not config.get("destinations"):
+        raise SystemExit("No destinations: pass --destinations or a --config file")
+    config.setdefault("themes", ["Culture"])
+    config.setdefault("mbti", ["all"])
+    return config
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", help="JSON file with destinations, themes and mbti")
+    parser.add_argument("--destinations", nargs="+")
+    parser.add_argument("--themes", nargs="+")
+    parser.add_argument("--mbti", nargs="+", help="MBTI types or groups (NT NF SJ SP all), default all")
+    parser.add_argument("--refresh-within", type=float, default=DEFAULT_REFRESH_WITHIN, help="Refetch entries that stop being fresh within this many seconds")
+    parser.add_argument("--max-requests", type=int, default=0, help="Places request budget for this run (0 = unlimited)")
+    parser.add_argument("--concurrency", type=int, default=2, help="Destination/theme pairs warmed at once")
+    parser.add_argument("--report-only", action="store_true", help="Only print the coverage report, no Places calls")
+    parser.add_argument("--report-json", help="Write the coverage report to this path")
+    args = parser.parse_args()
+
+    if places_cache.persistent is None or not places_cache.enabled:
+        raise SystemExit("Set PLACES_CACHE_PATH (and PLACES_CACHE_ENABLED=true) to the app's persistent places cache")
+    config = load_config(args)
+    jobs = build_jobs(config["destinations"], config["themes"], config["mbti"])
+    states = [freshness(job, args.refresh_within) for job in jobs]
+
+    outcome = None
+    if not args.report_only:
+        # Text searches of a job that are not cached yet hide its nearby searches, so count them heavier
+        todo = sorted((s for s in states if s.to_fetch), key=lambda s: -(s.to_fetch + s.text["missing"] * NEARBY_ACTIVITIES))
+        print(f"Warming {len(todo)} of {len(jobs)} destination/theme pairs into {places_cache.persistent.path}")
+        places_api.set_quota(args.max_requests or None)
+        outcome = asyncio.run(run_jobs([s.job for s in todo], args.refresh_within, args.concurrency))
+        print(f"\nPlaces requests: {places_api.requests}, warmed {len(outcome['warmed'])},"
+              f" incomplete {len(outcome['incomplete'])}, skipped {len(outcome['skipped'])} (request budget)")
+        states = [freshness(job, args.refresh_within) for job in jobs]
+
+    print_report(states, args.refresh_within)
+    if args.report_json:
+        report = {
+            "generated_at": time.time(),
+            "refresh_within": args.refresh_within,
+            "places_requests": places_api.requests,
+            "run": outcome,
+            "jobs": [state.to_dict() for state in states],
+        }
+        Path(args.report_json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())